@@ -3,6 +3,7 @@
 # Please see the LICENSE file that should have been included as part of this package.
 
 from iutest.core import importutils
+from iutest.core.timeouts import timeout
 
 
 def runUi(modulePathOrDir=None, topDir=None, exit_=False):
@@ -27,10 +28,28 @@ def runTests(runnerName, *testModulePathsOrDir, **arguments):
         miscArguments (dict): Typical supported arguments are:
             topDir (str): The dir contains the python modules that the tests need for running.
             stopOnError (bool): Stop the tests running on the first error/failure.
+            jobs (int): Run the tests in this many processes, for PyUnit and nose2 runners.
+            preloadModules (list): The modules the PyUnit worker processes import beforehand.
+            maxTestsPerWorker (int): Replace a PyUnit worker process after this many tests.
+            maxWorkerMemory (int): Replace a PyUnit worker process once it uses this many MB.
+            shard (str): Only run a shard of the tests, e.g. "2/4" for the 2nd of 4 shards.
+            durationsFile (str): The json file to read and record the test durations.
+            historyFile (str): The sqlite file to record the results of the tests to.
+            slowFactor (float): Flag the tests slower than their p95 duration times it.
+            rerunFailed (int): Rerun each failed test up to this many times to find the
+                flaky ones.
+            rerunFresh (bool): Rerun the failed tests in a new process each.
+            junitXml (str): Stream the results to this JUnit xml file.
+            jsonLines (str): Stream the results to this json-lines file.
+            affected (str): Only run the tests affected by the changed files, detected by
+                "mtime" or "git".
+            timeout (float): Error out a test once it runs this many seconds.
+            sessionTimeout (float): Stop the run once it takes this many seconds.
+            watch (bool): Rerun the tests affected by the changed files until Ctrl+C.
     """
     from iutest import cli
 
     cli.runTests(runnerName, *testModulePathsOrDir, **arguments)
 
 
-__all__ = ["importutils", "runUi", "runTests"]
+__all__ = ["importutils", "timeout", "runUi", "runTests"]
@@ -47,7 +47,37 @@ def runTests(runnerName, *testModulePathsOrDir, **arguments):
         miscArguments (dict): Typical supported arguments are:
             topDir (str): The dir contains the python modules that the tests need for running.
             stopOnError (bool): Stop the tests running on the first error/failure.
+            jobs (int): Run the tests in this many processes, for PyUnit and nose2 runners.
+            preloadModules (list): The modules the PyUnit worker processes import beforehand.
+            maxTestsPerWorker (int): Replace a PyUnit worker process after this many tests.
+            maxWorkerMemory (int): Replace a PyUnit worker process once it uses this many MB.
+            shard (str): Only run a shard of the tests, e.g. "2/4" for the 2nd of 4 shards.
+            durationsFile (str): The json file to read and record the test durations, which
+                balance the shards and the parallel workers.
+            historyFile (str): The sqlite file to record the results of the tests to,
+                instead of the one in the IUTest data dir.
+            slowFactor (float): Flag the tests that take longer than the p95 duration of
+                their recent passed runs times this factor, 0 to not flag any.
+            rerunFailed (int): Rerun each failed test by itself up to this many times, the
+                tests that pass in a rerun are reported as flaky.
+            rerunFresh (bool): Rerun the failed tests in a new process each.
+            junitXml (str): Stream the results to this JUnit xml file as tests finish.
+            jsonLines (str): Stream the results to this file as a json object per line.
+            affected (str): Only run the tests affected by the changed files, "mtime" for
+                the files modified since their tests ran last time, "git" for the changes
+                in the local git checkout.
+            timeout (float): Error out a test once it runs this many seconds, the tests
+                decorated by iutest.timeout() override it.
+            sessionTimeout (float): Stop the run once it takes this many seconds.
+            watch (bool): Keep watching the source files after the run, reimport the
+                changed modules and rerun the tests affected by them, until Ctrl+C.
+            noDiscoveryCache (bool): List the tests by importing all the test modules
+                instead of using the on-disk discovery cache.
     """
+    from iutest.core import resultwriters
+    from iutest.core import scheduler
+    from iutest.core import testdurations
+    from iutest.core import testhistory
     from iutest.core import testmanager
     from iutest.core.runners import runnerconstants
 
@@ -59,19 +89,138 @@ def runTests(runnerName, *testModulePathsOrDir, **arguments):
     testRootDir = dirs[0] if dirs else None
     topDir = arguments.get("topDir", None)
     stopOnError = arguments.get("stopOnError", False)
+    jobs = arguments.get("jobs", 1)
+    shard = arguments.get("shard", None)
+    durationsFile = arguments.get("durationsFile", None)
+    if durationsFile:
+        testdurations.TestDurations.useFile(durationsFile)
+    historyFile = arguments.get("historyFile", None)
+    if historyFile:
+        testhistory.TestHistory.useFile(historyFile)
+
     manager = testmanager.TestManager(
         ui=None, startDirOrModule=testRootDir, topDir=topDir
     )
     manager.setRunnerMode(runnerconstants.runnerModeFromName(runnerName))
     manager.setStopOnError(stopOnError)
-    if testRootDir:
-        manager.runAllTests()
-    else:
-        manager.runTests(*testModulePathsOrDir)
+    manager.setUseDiscoveryCache(not arguments.get("noDiscoveryCache", False))
+    manager.setParallelJobs(jobs)
+    manager.setWorkerPreloadModules(arguments.get("preloadModules", None))
+    manager.setWorkerRecycleLimits(
+        arguments.get("maxTestsPerWorker", 0), arguments.get("maxWorkerMemory", 0)
+    )
+    manager.setTestTimeouts(
+        arguments.get("timeout", 0), arguments.get("sessionTimeout", 0)
+    )
+    slowFactor = arguments.get("slowFactor", None)
+    if slowFactor is not None:
+        manager.setSlowTestFactor(slowFactor)
+    manager.setFlakyReruns(
+        arguments.get("rerunFailed", 0), arguments.get("rerunFresh", False)
+    )
+    writers = []
+    if arguments.get("junitXml"):
+        writers.append(resultwriters.JUnitXmlWriter(arguments["junitXml"]))
+    if arguments.get("jsonLines"):
+        writers.append(resultwriters.JsonLinesWriter(arguments["jsonLines"]))
+    manager.setResultWriters(writers)
+    if shard:
+        try:
+            shardIndex, shardCount = scheduler.parseShard(shard)
+        except ValueError as e:
+            logger.error(str(e))
+            return
+
+        # Only the shared durations split the tests the same way on all the machines.
+        durations = testdurations.TestDurations.get() if durationsFile else None
+        manager.setShard(shardIndex, shardCount, durations=durations)
+
+    affected = arguments.get("affected", None)
+    watch = arguments.get("watch", False)
+    try:
+        if affected:
+            testIds = None if testRootDir else list(testModulePathsOrDir)
+            testIds = manager.affectedTestIds(testIds, changeDetection=affected)
+            if not testIds:
+                logger.info("No tests are affected by the changes.")
+                if not watch:
+                    return
+            else:
+                manager.runTests(*testIds)
+        elif testRootDir:
+            manager.runAllTests()
+        else:
+            manager.runTests(*testModulePathsOrDir)
+
+        if watch:
+            _watchAndRerun(manager, None if testRootDir else testModulePathsOrDir)
+    finally:
+        manager.shutdownWorkerPools()
+        manager.setResultWriters([])
+
+
+def _watchAndRerun(manager, testIds):
+    """Rerun the tests affected by the changed files until it is interrupted by Ctrl+C.
+
+    Args:
+        manager (TestManager): The manager that ran the tests.
+        testIds (list): The tests to pick from, None for all the tests.
+    """
+    from iutest.core import filewatcher
+    from iutest.core import importutils
+
+    try:
+        import queue
+    except ImportError:
+        import Queue as queue
+
+    changes = queue.Queue()
+    watcher = filewatcher.FileWatcher(manager.watchDirs(), changes.put)
+    watcher.start()
+    if not watcher.isRunning():
+        return
+
+    logger.info(
+        "Watch the files in %s by %s, press Ctrl+C to stop.",
+        ", ".join(watcher.dirs()),
+        watcher.backendName(),
+    )
+    try:
+        while True:
+            try:
+                # Wake up periodically so that Ctrl+C is handled on Windows too.
+                changedFiles = changes.get(timeout=1.0)
+            except queue.Empty:
+                continue
+
+            while not changes.empty():
+                changedFiles.extend(changes.get_nowait())
+
+            importutils.reimportModulesOfFiles(changedFiles)
+            manager.shutdownWorkerPools()
+            affectedIds = manager.affectedTestIds(
+                list(testIds) if testIds else None, changedFiles=changedFiles
+            )
+            if not affectedIds:
+                logger.info("No tests are affected by the changed files.")
+                continue
+
+            logger.info(
+                "Rerun %s tests affected by %s changed files.",
+                len(affectedIds),
+                len(changedFiles),
+            )
+            manager.runTests(*affectedIds)
+    except KeyboardInterrupt:
+        logger.info("Stop watching the files.")
+    finally:
+        watcher.stop()
 
 
 def main():
     from iutest import _version
+    from iutest.core import constants
+    from iutest.core import workerpool
     from iutest.core.runners import runnerconstants
 
     parser = argparse.ArgumentParser(description="IUTest")
@@ -97,6 +246,161 @@ def main():
         help="Stop test running once there is an test error or failure",
     )
 
+    parser.add_argument(
+        "--noDiscoveryCache",
+        action="store_true",
+        dest="noDiscoveryCache",
+        default=False,
+        help="Import all the test modules to list the tests instead of using the "
+        "discovery cache, e.g. after a shared base class of the tests changed",
+    )
+
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        action="store",
+        dest="jobs",
+        type=int,
+        default=1,
+        help="Run the tests in N processes in parallel, for PyUnit and nose2 runners. "
+        "PyUnit needs python 3 for it, in a DCC its workers run the standalone python "
+        "of the DCC, e.g. mayapy, or the one set by $IUTEST_WORKER_PYTHON",
+    )
+
+    parser.add_argument(
+        "--preload",
+        action="store",
+        dest="preload",
+        default="",
+        help="Comma separated modules the worker processes import before running tests",
+    )
+
+    parser.add_argument(
+        "--maxTestsPerWorker",
+        action="store",
+        dest="maxTestsPerWorker",
+        type=int,
+        default=0,
+        help="Replace a worker process after it ran N tests, 0 for no limit",
+    )
+
+    parser.add_argument(
+        "--maxWorkerMemory",
+        action="store",
+        dest="maxWorkerMemory",
+        type=int,
+        default=0,
+        help="Replace a worker process once its memory exceeds N MB, 0 for no limit",
+    )
+
+    parser.add_argument(
+        "--timeout",
+        action="store",
+        dest="timeout",
+        type=float,
+        default=0,
+        help="Error out a test once it runs N seconds and dump the thread stacks, 0 for no limit",
+    )
+
+    parser.add_argument(
+        "--sessionTimeout",
+        action="store",
+        dest="sessionTimeout",
+        type=float,
+        default=0,
+        help="Stop the test run once it takes N seconds, 0 for no limit",
+    )
+
+    parser.add_argument(
+        "--shard",
+        action="store",
+        dest="shard",
+        default=None,
+        help="Only run the i-th of n shards of the tests, e.g. 2/4, for splitting the tests across machines",
+    )
+
+    parser.add_argument(
+        "--durationsFile",
+        action="store",
+        dest="durationsFile",
+        default=None,
+        help="The json file of the test durations to balance the shards, share it across the machines",
+    )
+
+    parser.add_argument(
+        "--historyFile",
+        action="store",
+        dest="historyFile",
+        default=None,
+        help="The sqlite file to record the results of all the test runs to",
+    )
+
+    parser.add_argument(
+        "--slowFactor",
+        action="store",
+        dest="slowFactor",
+        type=float,
+        default=None,
+        help="Flag the tests slower than N times the p95 duration of their recent runs, "
+        "0 to not flag any, 1.5 by default",
+    )
+
+    parser.add_argument(
+        "--rerunFailed",
+        action="store",
+        dest="rerunFailed",
+        type=int,
+        default=0,
+        help="Rerun each failed test by itself up to N times, report the ones that pass "
+        "as flaky and record how often they flip in the history",
+    )
+
+    parser.add_argument(
+        "--rerunFresh",
+        action="store_true",
+        dest="rerunFresh",
+        default=False,
+        help="Rerun each failed test in a new process, with --rerunFailed",
+    )
+
+    parser.add_argument(
+        "--junitXml",
+        action="store",
+        dest="junitXml",
+        default=None,
+        help="Stream the test results to this JUnit xml file as the tests finish",
+    )
+
+    parser.add_argument(
+        "--jsonLines",
+        action="store",
+        dest="jsonLines",
+        default=None,
+        help="Stream the test results to this file as a json object per line",
+    )
+
+    parser.add_argument(
+        "--affected",
+        action="store",
+        dest="affected",
+        nargs="?",
+        const=constants.CHANGE_DETECTION_MTIME,
+        default=None,
+        choices=constants.CHANGE_DETECTION_ITEMS,
+        help="Only run the tests affected by the changed files, detected by their modified time "
+        "since the tests ran last time, or by 'git' for the changes in the local checkout",
+    )
+
+    parser.add_argument(
+        "-w",
+        "--watch",
+        action="store_true",
+        dest="watch",
+        default=False,
+        help="Keep watching the python files after the run, rerun the tests affected by "
+        "the changed files until Ctrl+C",
+    )
+
     parser.add_argument(
         "-t",
         "--topDir",
@@ -140,7 +444,27 @@ def main():
             )
             return
 
-        arguments = {"topDir": results.topDir, "stopOnError": results.stopOnError}
+        arguments = {
+            "topDir": results.topDir,
+            "stopOnError": results.stopOnError,
+            "jobs": results.jobs,
+            "preloadModules": workerpool.parseModuleNames(results.preload),
+            "maxTestsPerWorker": results.maxTestsPerWorker,
+            "maxWorkerMemory": results.maxWorkerMemory,
+            "shard": results.shard,
+            "durationsFile": results.durationsFile,
+            "historyFile": results.historyFile,
+            "slowFactor": results.slowFactor,
+            "rerunFailed": results.rerunFailed,
+            "rerunFresh": results.rerunFresh,
+            "junitXml": results.junitXml,
+            "jsonLines": results.jsonLines,
+            "affected": results.affected,
+            "timeout": results.timeout,
+            "sessionTimeout": results.sessionTimeout,
+            "watch": results.watch,
+            "noDiscoveryCache": results.noDiscoveryCache,
+        }
         runTests(results.runner, *results.testPathsOrDir, **arguments)
 
 
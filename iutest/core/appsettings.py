@@ -4,6 +4,7 @@
 
 import collections
 import logging
+import os
 from iutest.core import constants
 from iutest.qt import QtCore, variantToPyValue
 
@@ -14,6 +15,31 @@ def get():
     return AppSettings.get()
 
 
+def dataDir():
+    """Get the dir to store IUTest data files, it is next to the settings ini file.
+
+    Notes:
+        Qt might not be available when running tests from the command line, we use
+        the same location as QSettings does in this case.
+    """
+    if QtCore:
+        settingsDir = os.path.dirname(AppSettings.get().fileName())
+    else:
+        settingsDir = os.path.join(
+            os.path.expanduser("~"), ".config", constants.ORG_MGLAND
+        )
+        if os.name == "nt" and os.environ.get("APPDATA"):
+            settingsDir = os.path.join(os.environ["APPDATA"], constants.ORG_MGLAND)
+
+    dirPath = os.path.join(settingsDir, constants.APP_NAME)
+    if not os.path.isdir(dirPath):
+        try:
+            os.makedirs(dirPath)
+        except OSError:
+            logger.debug("Unable to create the data dir %s", dirPath)
+    return dirPath
+
+
 class SettingsGroupContext(object):
     def __init__(self, groupName):
         self._groupName = groupName
@@ -0,0 +1,113 @@
+# Copyright 2019-2020 by Wenfeng Gao, MGLAND animation studio. All rights reserved.
+# This file is part of IUTest, and is released under the "MIT License Agreement".
+# Please see the LICENSE file that should have been included as part of this package.
+
+import ctypes
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TestRunInterrupted(Exception):
+    """Raised in the test running thread to interrupt the running test."""
+
+
+def raiseInThread(threadIdent, excType):
+    """Raise the exception in the thread once it runs python code again.
+
+    Returns:
+        bool: Whether the exception is set to the thread.
+    """
+    count = ctypes.pythonapi.PyThreadState_SetAsyncExc(
+        ctypes.c_long(threadIdent), ctypes.py_object(excType)
+    )
+    if count > 1:
+        # Should never happen, undo it in case it does.
+        clearRaiseInThread(threadIdent)
+        return False
+    return count == 1
+
+
+def clearRaiseInThread(threadIdent):
+    """Drop the exception set by raiseInThread if the thread hasn't raised it yet."""
+    ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_long(threadIdent), None)
+
+
+class BackgroundTestRun(object):
+    """Run the tests in a worker thread so that the ui keeps responding, the ui is
+    updated by the UiStream calls, which are queued to the ui thread.
+
+    Notes:
+        Cancelling the run stops it before the next test, interrupting it raises
+        TestRunInterrupted in the running test as well, which only takes effect once
+        the thread runs python code again.
+    """
+
+    def __init__(self, runFunc, cancelFunc=None):
+        """
+        Args:
+            runFunc (callable): The function to run the tests.
+            cancelFunc (callable): The function to ask the runner to stop before the next test.
+        """
+        self._runFunc = runFunc
+        self._cancelFunc = cancelFunc
+        self._thread = None
+        self._cancelled = False
+        self._interrupted = False
+        self._finished = False
+        self._error = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="IUTestRunner")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self._runFunc()
+        except TestRunInterrupted:
+            logger.warning("The test run was interrupted.")
+        except Exception as e:
+            self._error = e
+            logger.exception("Error running tests.")
+        finally:
+            self._finished = True
+
+    def cancel(self):
+        if self._cancelled or self._finished:
+            return
+
+        self._cancelled = True
+        if self._cancelFunc:
+            self._cancelFunc()
+
+    def interrupt(self):
+        """Cancel the run and raise TestRunInterrupted in the running test.
+
+        Returns:
+            bool: Whether the exception is set to the running thread.
+        """
+        self.cancel()
+        if self._interrupted or self._finished or not self._thread:
+            return False
+
+        self._interrupted = True
+        return raiseInThread(self._thread.ident, TestRunInterrupted)
+
+    def isCancelled(self):
+        return self._cancelled
+
+    def isInterrupted(self):
+        return self._interrupted
+
+    def isFinished(self):
+        return self._finished
+
+    def error(self):
+        return self._error
+
+    def wait(self, timeout=None):
+        if self._thread:
+            self._thread.join(timeout)
+        return self._finished
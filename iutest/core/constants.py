@@ -26,6 +26,13 @@ ITEM_CATEGORY_MODULE = 2
 ITEM_CATEGORY_SUITE = 3
 ITEM_CATEGORY_TEST = 4
 
+LISTING_MODE_IMPORT = 0
+LISTING_MODE_STATIC = 1
+
+CHANGE_DETECTION_MTIME = "mtime"
+CHANGE_DETECTION_GIT = "git"
+CHANGE_DETECTION_ITEMS = (CHANGE_DETECTION_MTIME, CHANGE_DETECTION_GIT)
+
 
 KEYWORD_TEST_STATE_NONE = ":normal"
 KEYWORD_TEST_STATE_RUN = ":ran"
@@ -35,6 +42,9 @@ KEYWORD_TEST_STATE_EXPECTED_FAIL = ":error"
 KEYWORD_TEST_STATE_UNEXPECTED_PASS = ":error"
 KEYWORD_TEST_STATE_FAILED = ":failed"
 KEYWORD_TEST_STATE_ERROR = ":error"
+KEYWORD_TEST_STATE_FLAKY = ":flaky"
+# Not a state of the items, it matches the tests that failed but passed when rerun.
+KEYWORD_FLAKY_STATE = -2
 KEYWORD_TEST_STATES = collections.OrderedDict(
     [
         (KEYWORD_TEST_STATE_NONE, TEST_RESULT_NONE),
@@ -45,6 +55,7 @@ KEYWORD_TEST_STATES = collections.OrderedDict(
         (KEYWORD_TEST_STATE_UNEXPECTED_PASS, TEST_RESULT_UNEXPECTED_PASS),
         (KEYWORD_TEST_STATE_FAILED, TEST_RESULT_EXPECTED_FAIL),
         (KEYWORD_TEST_STATE_ERROR, TEST_RESULT_ERROR),
+        (KEYWORD_TEST_STATE_FLAKY, KEYWORD_FLAKY_STATE),
     ]
 )
 
@@ -85,8 +96,26 @@ CONFIG_KEY_LAST_TOP_DIR = "lastTopDir"
 CONFIG_KEY_PANEL_VIS_STATE = "panelVisState"
 CONFIG_KEY_AUTO_FILTERING_STATE = "autoFiltering"
 CONFIG_KEY_AUTO_CLEAR_LOG_STATE = "autoClearLog"
+CONFIG_KEY_FOLLOW_RUNNING_TEST = "followRunningTest"
 
 CONFIG_KEY_STOP_ON_ERROR = "stopOnError"
+CONFIG_KEY_STATIC_LISTING = "staticListing"
+CONFIG_KEY_PARALLEL_RUN = "parallelRun"
+CONFIG_KEY_RUN_IN_UI_THREAD = "runInUiThread"
+CONFIG_KEY_AFFECTED_BY_GIT = "affectedByGit"
+CONFIG_KEY_WATCH_FILES = "watchFiles"
+CONFIG_KEY_WORKER_PRELOAD_MODULES = "workerPreloadModules"
+CONFIG_KEY_WORKER_MAX_TESTS = "workerMaxTests"
+CONFIG_KEY_WORKER_MAX_MEMORY = "workerMaxMemory"
+CONFIG_KEY_TEST_TIMEOUT = "testTimeout"
+CONFIG_KEY_SESSION_TIMEOUT = "sessionTimeout"
+CONFIG_KEY_SLOW_TEST_PERCENT = "slowTestPercent"
+CONFIG_KEY_SLOW_TEST_PERCENT_DEFAULT = 150
+CONFIG_KEY_FLAKY_RERUNS = "flakyReruns"
+CONFIG_KEY_FLAKY_RERUN_FRESH_PROCESS = "flakyRerunFreshProcess"
+CONFIG_KEY_LOG_MAX_BLOCK_COUNT = "logMaxBlockCount"
+CONFIG_KEY_LOG_MAX_BLOCK_COUNT_DEFAULT = 20000
+CONFIG_KEY_LOG_SPILL_FILE = "logSpillFile"
 
 CONFIG_KEY_CODE_EDITOR = "codeEditor"
 CODE_FILE_VAR = "$file"
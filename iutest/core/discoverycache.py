@@ -0,0 +1,257 @@
+# Copyright 2019-2020 by Wenfeng Gao, MGLAND animation studio. All rights reserved.
+# This file is part of IUTest, and is released under the "MIT License Agreement".
+# Please see the LICENSE file that should have been included as part of this package.
+
+import os
+import json
+import hashlib
+import logging
+
+from iutest.core import appsettings
+from iutest.core import pyunitutils
+
+logger = logging.getLogger(__name__)
+
+
+def fileFingerprint(filePath, lastFingerprint=None):
+    """Get the (size, mtime, hash) fingerprint of a file.
+
+    Notes:
+        Hashing the content is the expensive part, so if the size and mtime are both
+        the same as the last fingerprint, we reuse the last hash.
+
+    Args:
+        filePath (str): The file to get the fingerprint.
+        lastFingerprint (dict): The fingerprint recorded last time, could be None.
+
+    Returns:
+        dict: The fingerprint, None if the file is not readable.
+    """
+    try:
+        stat = os.stat(filePath)
+    except OSError:
+        return None
+
+    fingerprint = {"size": stat.st_size, "mtime": stat.st_mtime}
+    if (
+        lastFingerprint
+        and lastFingerprint.get("size") == stat.st_size
+        and lastFingerprint.get("mtime") == stat.st_mtime
+    ):
+        fingerprint["hash"] = lastFingerprint.get("hash")
+        return fingerprint
+
+    try:
+        with open(filePath, "rb") as f:
+            fingerprint["hash"] = hashlib.sha1(f.read()).hexdigest()
+    except (IOError, OSError):
+        return None
+
+    return fingerprint
+
+
+class DiscoveryCache(object):
+    """An on-disk cache of the test ids discovered from each test module file.
+
+    Notes:
+        The cache is stored per startDirOrModule and topDir pair, each test module entry
+        is keyed by the file path and validated by the file size, mtime and content hash.
+        Only the test modules that are new or changed need to be imported again.
+        An entry is validated by its own test module file only, if a test class is
+        changed in another file, e.g. a shared base class or a helper adding tests, the
+        entry stays the same until the test module changes, clear the cache then.
+
+        Only the caches of the most recently listed dirs are kept, the file of the cache
+        is touched each time it is used so the older ones are dropped first.
+    """
+
+    _version = 1
+    _cacheDirName = "discoveryCache"
+    _maxCacheFiles = 32
+
+    lastHitCount = 0
+    lastMissCount = 0
+
+    def __init__(self, startDirOrModule, topDir, cacheDir=None):
+        self._startDirOrModule = startDirOrModule or ""
+        self._topDir = topDir or ""
+        self._cacheDir = cacheDir
+        self._walkDir = None
+        self._baseDir = None
+        self._prefix = ""
+        self._entries = {}
+        self._resolveDirs()
+
+    def _resolveDirs(self):
+        root = pyunitutils.discoveryRoot(self._startDirOrModule, self._topDir)
+        if not root:
+            return
+
+        self._walkDir, self._baseDir, self._prefix = root
+        if not self._prefix:
+            self._topDir = self._baseDir
+
+    def isApplicable(self):
+        return bool(self._walkDir)
+
+    def cacheKey(self):
+        key = "|".join(
+            [os.path.normpath(self._startDirOrModule), os.path.normpath(self._topDir)]
+        )
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    def cacheDir(self):
+        if not self._cacheDir:
+            self._cacheDir = os.path.join(appsettings.dataDir(), self._cacheDirName)
+        return self._cacheDir
+
+    def cacheFilePath(self):
+        return os.path.join(self.cacheDir(), "{}.json".format(self.cacheKey()))
+
+    def topDir(self):
+        return self._topDir
+
+    def _load(self):
+        self._entries = {}
+        cacheFile = self.cacheFilePath()
+        if not os.path.isfile(cacheFile):
+            return
+
+        try:
+            with open(cacheFile, "r") as f:
+                data = json.load(f)
+        except Exception:
+            logger.debug("Unable to read the discovery cache %s", cacheFile)
+            return
+
+        if (
+            data.get("version") != self._version
+            or data.get("startDirOrModule") != self._startDirOrModule
+            or data.get("topDir") != self._topDir
+        ):
+            logger.debug("Discovery cache %s is outdated.", cacheFile)
+            return
+
+        self._entries = data.get("files", {})
+
+    def _save(self):
+        cacheDir = self.cacheDir()
+        if not os.path.isdir(cacheDir):
+            try:
+                os.makedirs(cacheDir)
+            except OSError:
+                logger.debug("Unable to create the discovery cache dir %s", cacheDir)
+                return
+
+        data = {
+            "version": self._version,
+            "startDirOrModule": self._startDirOrModule,
+            "topDir": self._topDir,
+            "files": self._entries,
+        }
+        cacheFile = self.cacheFilePath()
+        tempFile = cacheFile + ".tmp"
+        try:
+            with open(tempFile, "w") as f:
+                json.dump(data, f)
+            if os.path.isfile(cacheFile):
+                os.remove(cacheFile)
+            os.rename(tempFile, cacheFile)
+        except (IOError, OSError):
+            logger.debug("Unable to write the discovery cache %s", cacheFile)
+            return
+
+        self._prune()
+
+    def _touch(self):
+        try:
+            os.utime(self.cacheFilePath(), None)
+        except OSError:
+            pass
+
+    def _prune(self):
+        """Remove the least recently used caches beyond the limit."""
+        cacheDir = self.cacheDir()
+        try:
+            fileNames = [f for f in os.listdir(cacheDir) if f.endswith(".json")]
+        except OSError:
+            return
+
+        if len(fileNames) <= self._maxCacheFiles:
+            return
+
+        filePaths = [os.path.join(cacheDir, f) for f in fileNames]
+        mtimes = {}
+        for filePath in filePaths:
+            try:
+                mtimes[filePath] = os.path.getmtime(filePath)
+            except OSError:
+                mtimes[filePath] = 0
+        filePaths.sort(key=mtimes.get, reverse=True)
+        for filePath in filePaths[self._maxCacheFiles :]:
+            try:
+                os.remove(filePath)
+            except OSError:
+                logger.debug("Unable to remove the discovery cache %s", filePath)
+
+    def clear(self):
+        self._entries = {}
+        cacheFile = self.cacheFilePath()
+        if os.path.isfile(cacheFile):
+            os.remove(cacheFile)
+
+    def iterTestIds(self, moduleTestIdsLoader):
+        """Iterate all test ids, only the changed or new test modules will be loaded.
+
+        Args:
+            moduleTestIdsLoader (callable): Called with the python module path to load the
+                test ids from it, it should return None if the tests failed to load.
+
+        Yields:
+            str: The test id.
+        """
+        self._load()
+        hitCount = 0
+        missCount = 0
+        entries = {}
+        for modulePath, filePath, _ in pyunitutils.iterTestModuleFiles(
+            self._walkDir, self._baseDir, self._prefix
+        ):
+            lastEntry = self._entries.get(filePath)
+            fingerprint = fileFingerprint(filePath, lastEntry)
+            if not fingerprint:
+                continue
+
+            if (
+                lastEntry
+                and lastEntry.get("module") == modulePath
+                and lastEntry.get("hash") == fingerprint["hash"]
+            ):
+                hitCount += 1
+                testIds = lastEntry.get("ids", [])
+            else:
+                missCount += 1
+                testIds = moduleTestIdsLoader(modulePath)
+                if testIds is None:
+                    # Failed to load, we don't cache it so it will be loaded next time.
+                    continue
+
+            entry = dict(fingerprint)
+            entry["module"] = modulePath
+            entry["ids"] = list(testIds)
+            entries[filePath] = entry
+            for testId in testIds:
+                yield testId
+
+        self.__class__.lastHitCount = hitCount
+        self.__class__.lastMissCount = missCount
+        logger.info(
+            "Test discovery cache: %s modules hit, %s modules reloaded.",
+            hitCount,
+            missCount,
+        )
+        if missCount or entries != self._entries:
+            self._entries = entries
+            self._save()
+        else:
+            self._touch()
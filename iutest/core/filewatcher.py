@@ -0,0 +1,320 @@
+# Copyright 2019-2020 by Wenfeng Gao, MGLAND animation studio. All rights reserved.
+# This file is part of IUTest, and is released under the "MIT License Agreement".
+# Please see the LICENSE file that should have been included as part of this package.
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import logging
+import threading
+import ctypes
+import ctypes.util
+
+logger = logging.getLogger(__name__)
+
+_ignoredDirNames = frozenset(
+    (".git", ".hg", ".svn", "__pycache__", ".tox", ".nox", ".venv", "node_modules")
+)
+
+# inotify constants from <sys/inotify.h>:
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_watchMask = (
+    _IN_MODIFY
+    | _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+    | _IN_DELETE_SELF
+)
+_eventHeader = struct.Struct("iIII")
+
+
+def _iterWatchedDirs(rootDir):
+    for dirPath, dirNames, _ in os.walk(rootDir):
+        dirNames[:] = [
+            d for d in dirNames if d not in _ignoredDirNames and not d.startswith(".")
+        ]
+        yield dirPath
+
+
+def topMostDirs(dirs):
+    """Remove the dirs inside the other dirs, and the ones that don't exist."""
+    result = []
+    for d in sorted(set(os.path.abspath(d) for d in dirs if d and os.path.isdir(d))):
+        if not any(d.startswith(os.path.join(r, "")) for r in result):
+            result.append(d)
+    return result
+
+
+class _PollingBackend(object):
+    """Find the changes by comparing the modified time of the files periodically."""
+
+    name = "polling"
+
+    def __init__(self, dirs, extensions, interval):
+        self._dirs = dirs
+        self._extensions = extensions
+        self._interval = interval
+        self._snapshot = self._takeSnapshot()
+
+    def _takeSnapshot(self):
+        snapshot = {}
+        for rootDir in self._dirs:
+            for dirPath in _iterWatchedDirs(rootDir):
+                try:
+                    fileNames = os.listdir(dirPath)
+                except OSError:
+                    continue
+                for fileName in fileNames:
+                    if os.path.splitext(fileName)[1] not in self._extensions:
+                        continue
+                    filePath = os.path.join(dirPath, fileName)
+                    try:
+                        snapshot[filePath] = os.path.getmtime(filePath)
+                    except OSError:
+                        pass
+        return snapshot
+
+    def wait(self, timeout, stopEvent):
+        stopEvent.wait(min(timeout, self._interval))
+        snapshot = self._takeSnapshot()
+        lastSnapshot = self._snapshot
+        self._snapshot = snapshot
+        changed = set(
+            p for p, mtime in snapshot.items() if lastSnapshot.get(p) != mtime
+        )
+        changed.update(p for p in lastSnapshot if p not in snapshot)
+        return changed
+
+    def close(self):
+        pass
+
+
+class _InotifyBackend(object):
+    """Get the changes from the Linux kernel, the dirs are watched recursively."""
+
+    name = "inotify"
+
+    def __init__(self, dirs, extensions):
+        self._extensions = extensions
+        self._libc = self._loadLibC()
+        self._fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "Unable to initialise inotify.")
+
+        self._watchedDirs = {}
+        try:
+            for rootDir in dirs:
+                for dirPath in _iterWatchedDirs(rootDir):
+                    self._addWatch(dirPath)
+        except OSError:
+            self.close()
+            raise
+
+    @staticmethod
+    def _loadLibC():
+        if not sys.platform.startswith("linux"):
+            raise OSError(errno.ENOSYS, "inotify is only available on Linux.")
+
+        libName = ctypes.util.find_library("c") or "libc.so.6"
+        libc = ctypes.CDLL(libName, use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "inotify is not available.")
+
+        libc.inotify_add_watch.argtypes = (
+            ctypes.c_int,
+            ctypes.c_char_p,
+            ctypes.c_uint32,
+        )
+        return libc
+
+    def _addWatch(self, dirPath):
+        encodedPath = dirPath.encode(sys.getfilesystemencoding() or "utf-8")
+        wd = self._libc.inotify_add_watch(self._fd, encodedPath, _watchMask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err in (errno.ENOENT, errno.ENOTDIR):
+                return
+            # e.g. ENOSPC once the fs.inotify.max_user_watches is used up.
+            raise OSError(err, "Unable to watch {}".format(dirPath))
+        self._watchedDirs[wd] = dirPath
+
+    def _decodeName(self, name):
+        name = name.rstrip(b"\0")
+        return name.decode(sys.getfilesystemencoding() or "utf-8", "replace")
+
+    def wait(self, timeout, stopEvent):
+        try:
+            readable, _, _ = select.select([self._fd], [], [], timeout)
+        except (OSError, select.error):
+            return set()
+        if not readable:
+            return set()
+
+        try:
+            data = os.read(self._fd, 65536)
+        except OSError:
+            return set()
+
+        changed = set()
+        offset = 0
+        while offset + _eventHeader.size <= len(data):
+            wd, mask, _, nameLength = _eventHeader.unpack_from(data, offset)
+            offset += _eventHeader.size
+            name = self._decodeName(data[offset : offset + nameLength])
+            offset += nameLength
+
+            if mask & _IN_Q_OVERFLOW:
+                logger.warning("Too many file changes, some of them are missed.")
+                continue
+
+            dirPath = self._watchedDirs.get(wd)
+            if mask & _IN_IGNORED:
+                self._watchedDirs.pop(wd, None)
+                continue
+            if not dirPath or not name:
+                continue
+
+            filePath = os.path.join(dirPath, name)
+            if mask & _IN_ISDIR:
+                if mask & (_IN_CREATE | _IN_MOVED_TO) and name not in _ignoredDirNames:
+                    self._watchNewDir(filePath, changed)
+                continue
+
+            if os.path.splitext(name)[1] in self._extensions:
+                changed.add(filePath)
+
+        return changed
+
+    def _watchNewDir(self, newDir, changed):
+        """Watch the new dir, its files may be written before the watch is added."""
+        try:
+            for dirPath in _iterWatchedDirs(newDir):
+                self._addWatch(dirPath)
+                for fileName in os.listdir(dirPath):
+                    if os.path.splitext(fileName)[1] in self._extensions:
+                        changed.add(os.path.join(dirPath, fileName))
+        except OSError:
+            logger.warning("Unable to watch the new dir %s", newDir)
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class FileWatcher(object):
+    """Watch the files under the dirs in a background thread, the callback is called in
+    that thread with the list of changed files once the changes settle for a while, so
+    that a burst of saves triggers it only once.
+
+    Notes:
+        inotify is used on Linux, otherwise the files are polled for their modified time.
+    """
+
+    def __init__(
+        self,
+        dirs,
+        callback,
+        extensions=(".py",),
+        debounceTime=0.5,
+        pollInterval=1.0,
+        usePolling=False,
+    ):
+        """
+        Args:
+            dirs (list): The dirs to watch recursively.
+            callback (callable): Called as callback(changedFiles) in the watcher thread.
+            extensions (tuple): The extensions of the files to watch.
+            debounceTime (float): Wait until no change happened for these seconds.
+            pollInterval (float): How often to poll the files without inotify.
+            usePolling (bool): Always poll the files even if inotify is available.
+        """
+        self._dirs = topMostDirs(dirs)
+        self._callback = callback
+        self._extensions = tuple(extensions)
+        self._debounceTime = debounceTime
+        self._pollInterval = pollInterval
+        self._usePolling = usePolling
+        self._backend = None
+        self._thread = None
+        self._stopEvent = threading.Event()
+
+    def dirs(self):
+        return list(self._dirs)
+
+    def backendName(self):
+        return self._backend.name if self._backend else ""
+
+    def isRunning(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    def _makeBackend(self):
+        if not self._usePolling:
+            try:
+                return _InotifyBackend(self._dirs, self._extensions)
+            except (OSError, AttributeError) as e:
+                logger.debug("Unable to use inotify, poll the files instead: %s", e)
+
+        return _PollingBackend(self._dirs, self._extensions, self._pollInterval)
+
+    def start(self):
+        if self.isRunning():
+            return
+
+        if not self._dirs:
+            logger.warning("No dir to watch.")
+            return
+
+        # The backend takes its snapshot here so the changes after start() are caught.
+        self._backend = self._makeBackend()
+        self._stopEvent.clear()
+        self._thread = threading.Thread(target=self._watch, name="IUTestFileWatcher")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        if not self._thread:
+            return
+
+        self._stopEvent.set()
+        self._thread.join()
+        self._thread = None
+
+    def _watch(self):
+        pending = set()
+        lastChangeTime = 0
+        try:
+            while not self._stopEvent.is_set():
+                timeout = self._debounceTime if pending else self._pollInterval
+                changed = self._backend.wait(timeout, self._stopEvent)
+                now = time.time()
+                if changed:
+                    pending.update(changed)
+                    lastChangeTime = now
+                    continue
+
+                if pending and now - lastChangeTime >= self._debounceTime:
+                    changedFiles = sorted(pending)
+                    pending = set()
+                    try:
+                        self._callback(changedFiles)
+                    except Exception:
+                        logger.exception("Error handling the changed files.")
+        finally:
+            self._backend.close()
@@ -0,0 +1,506 @@
+# Copyright 2019-2020 by Wenfeng Gao, MGLAND animation studio. All rights reserved.
+# This file is part of IUTest, and is released under the "MIT License Agreement".
+# Please see the LICENSE file that should have been included as part of this package.
+
+import os
+import sys
+import ast
+import json
+import types
+import hashlib
+import logging
+import sysconfig
+import subprocess
+import collections
+
+from iutest.core import appsettings
+from iutest.core import constants
+from iutest.core import pyunitutils
+
+logger = logging.getLogger(__name__)
+
+
+def _normPath(filePath):
+    return os.path.normcase(os.path.abspath(filePath))
+
+
+def _excludedDirs():
+    """The dirs of the standard library and the installed packages, which are not
+    considered as the code under test.
+    """
+    paths = sysconfig.get_paths()
+    dirs = set()
+    for key in ("stdlib", "platstdlib", "purelib", "platlib"):
+        if paths.get(key):
+            dirs.add(_normPath(paths[key]) + os.sep)
+    return tuple(dirs)
+
+
+def _sourceFileOfModule(module):
+    filePath = getattr(module, "__file__", None)
+    if not filePath:
+        return None
+
+    root, ext = os.path.splitext(filePath)
+    if ext in (".pyc", ".pyo"):
+        filePath = root + ".py"
+    elif ext != ".py":
+        return None
+
+    return filePath if os.path.isfile(filePath) else None
+
+
+def _fileMTime(filePath):
+    try:
+        return os.path.getmtime(filePath)
+    except OSError:
+        return None
+
+
+def _resolveImportFrom(moduleName, isPackage, node):
+    if not node.level:
+        return node.module
+
+    parts = moduleName.split(".")
+    if not isPackage:
+        parts = parts[:-1]
+    if node.level > 1:
+        parts = parts[: -(node.level - 1)]
+    if node.module:
+        parts.append(node.module)
+    return ".".join([p for p in parts if p])
+
+
+def _parseImportedNames(moduleName, filePath):
+    """Get the module names a python file imports, including the ones imported within
+    the functions or conditionally.
+    """
+    try:
+        with open(filePath, "rb") as f:
+            tree = ast.parse(f.read(), filePath)
+    except Exception:
+        logger.debug("Unable to parse %s for the imports.", filePath)
+        return set()
+
+    isPackage = os.path.basename(filePath) == "__init__.py"
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                names.add(alias.name)
+
+        elif isinstance(node, ast.ImportFrom):
+            base = _resolveImportFrom(moduleName, isPackage, node)
+            if not base:
+                continue
+
+            names.add(base)
+            for alias in node.names:
+                if alias.name != "*":
+                    # It might be a sub module, the names that aren't modules are ignored.
+                    names.add("{}.{}".format(base, alias.name))
+
+    return names
+
+
+def _parentPackages(moduleName):
+    parts = moduleName.split(".")
+    return [".".join(parts[:i]) for i in range(1, len(parts))]
+
+
+class ImportGraph(object):
+    """The import graph of the python modules of the code under test.
+
+    Notes:
+        The imports are parsed statically, then complemented with what the modules
+        reference at runtime, e.g. the modules imported dynamically, if the modules were
+        imported during the discovery.
+        The modules of the standard library and the installed packages are left out.
+    """
+
+    def __init__(self, searchRoots=None):
+        self._searchRoots = list(searchRoots or [])
+        self._excludedDirs = _excludedDirs()
+        self._moduleFiles = {}
+        self._parsedImports = {}  # filePath: (mtime, names)
+        self._runtimeModuleFiles = {}
+        self._runtimeImports = {}
+
+    def _isExcluded(self, filePath):
+        return _normPath(filePath).startswith(self._excludedDirs)
+
+    def recordRuntimeModules(self):
+        """Record the modules imported in the current session and what they reference."""
+        for moduleName, module in list(sys.modules.items()):
+            if not isinstance(module, types.ModuleType):
+                continue
+
+            filePath = _sourceFileOfModule(module)
+            if not filePath or self._isExcluded(filePath):
+                continue
+
+            self._runtimeModuleFiles[moduleName] = filePath
+            subModulePrefix = moduleName + "."
+            names = set()
+            for value in list(vars(module).values()):
+                if isinstance(value, types.ModuleType):
+                    name = value.__name__
+                    if name.startswith(subModulePrefix):
+                        # Importing a sub module sets it on the package, which doesn't
+                        # mean the package imports it.
+                        continue
+                else:
+                    name = getattr(value, "__module__", None)
+                if isinstance(name, str) and name != moduleName:
+                    names.add(name)
+            self._runtimeImports[moduleName] = names
+
+    def moduleFile(self, moduleName):
+        """Get the source file of a module of the code under test, None if it is not."""
+        if moduleName in self._runtimeModuleFiles:
+            return self._runtimeModuleFiles[moduleName]
+
+        if moduleName not in self._moduleFiles:
+            filePath = pyunitutils.findModuleFile(moduleName, self._searchRoots)
+            if filePath and self._isExcluded(filePath):
+                filePath = None
+            self._moduleFiles[moduleName] = filePath
+        return self._moduleFiles[moduleName]
+
+    def isExcludedModule(self, module):
+        """Whether the module is not the code under test, e.g. a builtin module, or one
+        of the standard library or the installed packages.
+        """
+        filePath = _sourceFileOfModule(module)
+        return not filePath or self._isExcluded(filePath)
+
+    def importedModules(self, moduleName, filePath, includeParents=True):
+        """
+        Args:
+            includeParents (bool): Whether the parent packages count as imported, which
+                are always imported before the module.
+        """
+        mtime = _fileMTime(filePath)
+        parsed = self._parsedImports.get(filePath)
+        if not parsed or parsed[0] != mtime:
+            parsed = (mtime, _parseImportedNames(moduleName, filePath))
+            self._parsedImports[filePath] = parsed
+
+        names = set(parsed[1])
+        names.update(self._runtimeImports.get(moduleName, ()))
+        if includeParents:
+            names.update(_parentPackages(moduleName))
+        names.discard(moduleName)
+        return names
+
+    def build(self, rootModules):
+        """Walk the graph from the root modules.
+
+        Args:
+            rootModules (dict): The file paths of the root modules by module name.
+
+        Returns:
+            tuple: (moduleFiles, importers) where moduleFiles are the file paths of all
+                the reachable modules by name, importers are the sets of the module names
+                that import each module.
+        """
+        moduleFiles = {}
+        importers = collections.defaultdict(set)
+        queue = list(rootModules)
+        seen = set(queue)
+        while queue:
+            moduleName = queue.pop()
+            filePath = rootModules.get(moduleName) or self.moduleFile(moduleName)
+            if not filePath:
+                continue
+
+            moduleFiles[moduleName] = filePath
+            for imported in self.importedModules(moduleName, filePath):
+                importers[imported].add(moduleName)
+                if imported not in seen:
+                    seen.add(imported)
+                    queue.append(imported)
+
+        return moduleFiles, importers
+
+
+def _iterImporters(moduleNames, importers, visited):
+    """Iterate the modules and all the modules importing them directly or indirectly,
+    skipping the visited ones.
+    """
+    queue = [m for m in moduleNames if m not in visited]
+    visited.update(queue)
+    while queue:
+        moduleName = queue.pop()
+        yield moduleName
+        for importer in importers.get(moduleName, ()):
+            if importer not in visited:
+                visited.add(importer)
+                queue.append(importer)
+
+
+def changedFilesFromGit(workDir):
+    """Get the files changed in the git checkout of the dir, compared to HEAD.
+
+    Returns:
+        list: The absolute paths of the modified and the untracked files, None if the
+            dir is not in a git checkout or git is not available.
+    """
+    commands = (
+        ["git", "rev-parse", "--show-toplevel"],
+        ["git", "diff", "--name-only", "HEAD"],
+        ["git", "ls-files", "--others", "--exclude-standard"],
+    )
+    outputs = []
+    for command in commands:
+        try:
+            output = subprocess.check_output(
+                command, cwd=workDir, stderr=subprocess.STDOUT
+            )
+        except (OSError, subprocess.CalledProcessError) as e:
+            logger.debug("Unable to run %s: %s", " ".join(command), e)
+            return None
+        outputs.append(output.decode("utf-8", "replace").splitlines())
+
+    repoDir = outputs[0][0].strip()
+    files = []
+    for relPath in outputs[1] + outputs[2]:
+        relPath = relPath.strip()
+        if relPath:
+            files.append(os.path.join(repoDir, relPath))
+    return files
+
+
+class TestImpactAnalyzer(object):
+    """Figure out the tests affected by the changed python files.
+
+    Notes:
+        The changes are detected either by comparing the modified time of the files
+        each test module depends on with the last time the test module ran, or by the
+        changes in the local git checkout.
+
+        The state of each startDirOrModule and topDir pair is a file in the state dir,
+        the states of the dirs that no longer exist are removed once per session.
+    """
+
+    _version = 1
+    _stateDirName = "impactAnalysis"
+    _prunedStateDirs = set()
+
+    def __init__(self, startDirOrModule, topDir, stateDir=None):
+        self._startDirOrModule = startDirOrModule or ""
+        self._topDir = topDir or ""
+        self._stateDir = stateDir
+        self._root = pyunitutils.discoveryRoot(self._startDirOrModule, self._topDir)
+        searchRoots = []
+        if self._root:
+            searchRoots.append(self._root[1:])
+        if self._topDir and os.path.isdir(self._topDir):
+            searchRoots.append((self._topDir, ""))
+        self._graph = ImportGraph(searchRoots)
+        self._lastRunTimes = None
+
+    def importGraph(self):
+        return self._graph
+
+    def _stateFilePath(self):
+        if not self._stateDir:
+            self._stateDir = os.path.join(appsettings.dataDir(), self._stateDirName)
+        key = "|".join(
+            [os.path.normpath(self._startDirOrModule), os.path.normpath(self._topDir)]
+        )
+        fileName = "{}.json".format(hashlib.sha1(key.encode("utf-8")).hexdigest())
+        return os.path.join(self._stateDir, fileName)
+
+    def _loadLastRunTimes(self):
+        if self._lastRunTimes is not None:
+            return self._lastRunTimes
+
+        self._lastRunTimes = {}
+        filePath = self._stateFilePath()
+        if os.path.isfile(filePath):
+            try:
+                with open(filePath, "r") as f:
+                    data = json.load(f)
+                if data.get("version") == self._version:
+                    self._lastRunTimes = data.get("lastRunTimes", {})
+            except Exception:
+                logger.debug("Unable to read the impact analysis state %s", filePath)
+        return self._lastRunTimes
+
+    def _saveLastRunTimes(self):
+        filePath = self._stateFilePath()
+        try:
+            if not os.path.isdir(self._stateDir):
+                os.makedirs(self._stateDir)
+            with open(filePath, "w") as f:
+                json.dump(
+                    {
+                        "version": self._version,
+                        "startDirOrModule": self._startDirOrModule,
+                        "topDir": self._topDir,
+                        "lastRunTimes": self._lastRunTimes,
+                    },
+                    f,
+                )
+        except (IOError, OSError):
+            logger.debug("Unable to write the impact analysis state %s", filePath)
+            return
+
+        if self._stateDir not in self._prunedStateDirs:
+            self._prunedStateDirs.add(self._stateDir)
+            self._pruneStates()
+
+    @staticmethod
+    def _isStaleState(data):
+        if "topDir" not in data:
+            # Written before the dirs were recorded, there is no telling what it is for.
+            return True
+
+        rootDir = data.get("topDir") or data.get("startDirOrModule")
+        return bool(rootDir) and os.path.isabs(rootDir) and not os.path.isdir(rootDir)
+
+    def _pruneStates(self):
+        """Remove the states of the dirs that no longer exist, e.g. temporary dirs."""
+        try:
+            fileNames = [f for f in os.listdir(self._stateDir) if f.endswith(".json")]
+        except OSError:
+            return
+
+        for fileName in fileNames:
+            filePath = os.path.join(self._stateDir, fileName)
+            try:
+                with open(filePath, "r") as f:
+                    data = json.load(f)
+            except Exception:
+                data = {}
+            if not isinstance(data, dict) or self._isStaleState(data):
+                try:
+                    os.remove(filePath)
+                except OSError:
+                    logger.debug(
+                        "Unable to remove the impact analysis state %s", filePath
+                    )
+
+    def testModules(self):
+        """Get the file paths of the test modules by their module names."""
+        if self._root:
+            walkDir, baseDir, prefix = self._root
+            return dict(
+                (modulePath, filePath)
+                for modulePath, filePath, _ in pyunitutils.iterTestModuleFiles(
+                    walkDir, baseDir, prefix
+                )
+            )
+
+        filePath = self._graph.moduleFile(self._startDirOrModule)
+        return {self._startDirOrModule: filePath} if filePath else {}
+
+    @staticmethod
+    def _testModulesOfId(testId, testModules):
+        parts = testId.split(".")
+        for i in range(len(parts), 0, -1):
+            modulePath = ".".join(parts[:i])
+            if modulePath in testModules:
+                if (
+                    i == len(parts)
+                    and os.path.basename(testModules[modulePath]) == "__init__.py"
+                ):
+                    break
+                return [modulePath]
+
+        # A package id stands for all the test modules in it.
+        prefix = testId + "."
+        return [m for m in testModules if m == testId or m.startswith(prefix)]
+
+    def recordRuntimeModules(self):
+        self._graph.recordRuntimeModules()
+
+    def markTestsRun(self, testIds, runTime):
+        """Record the time the tests started to run, the files changed after it will make
+        their test modules affected.
+        """
+        testModules = self.testModules()
+        lastRunTimes = self._loadLastRunTimes()
+        for testId in testIds:
+            for modulePath in self._testModulesOfId(testId, testModules):
+                lastRunTimes[modulePath] = runTime
+        self._saveLastRunTimes()
+
+    def _affectedByMTime(self, testModules, moduleFiles, importers):
+        lastRunTimes = self._loadLastRunTimes()
+        neverRun = set(m for m in testModules if m not in lastRunTimes)
+        if not lastRunTimes:
+            return neverRun
+
+        # Spread the newest mtime to the importers, the newest file goes first so that
+        # each module only needs to be visited once.
+        newestTimes = {}
+        visited = set()
+        mtimes = [(_fileMTime(f) or 0, m) for m, f in moduleFiles.items()]
+        for mtime, moduleName in sorted(mtimes, reverse=True):
+            for affected in _iterImporters([moduleName], importers, visited):
+                newestTimes[affected] = mtime
+
+        affected = set(neverRun)
+        for modulePath, runTime in lastRunTimes.items():
+            if modulePath in testModules and newestTimes.get(modulePath, 0) > runTime:
+                affected.add(modulePath)
+        return affected
+
+    def _affectedByFiles(self, testModules, moduleFiles, importers, changedFiles):
+        changed = set(_normPath(f) for f in changedFiles)
+        changedModules = [m for m, f in moduleFiles.items() if _normPath(f) in changed]
+        affected = set(_iterImporters(changedModules, importers, set()))
+        return affected.intersection(testModules)
+
+    def affectedTestModules(
+        self, changeDetection=constants.CHANGE_DETECTION_MTIME, changedFiles=None
+    ):
+        """Get the names of the test modules affected by the changed files.
+
+        Args:
+            changeDetection (str): How to find the changed files.
+            changedFiles (list): The changed files if they are known already, e.g. from
+                the file watcher, the changeDetection is ignored then.
+        """
+        testModules = self.testModules()
+        moduleFiles, importers = self._graph.build(testModules)
+        if changedFiles is not None:
+            return self._affectedByFiles(
+                testModules, moduleFiles, importers, changedFiles
+            )
+
+        if changeDetection == constants.CHANGE_DETECTION_GIT:
+            workDir = self._topDir if os.path.isdir(self._topDir) else os.getcwd()
+            changedFiles = changedFilesFromGit(workDir)
+            if changedFiles is not None:
+                return self._affectedByFiles(
+                    testModules, moduleFiles, importers, changedFiles
+                )
+            logger.warning(
+                "Unable to get the changed files from git, use the file modified time instead."
+            )
+
+        return self._affectedByMTime(testModules, moduleFiles, importers)
+
+    def affectedTestIds(
+        self,
+        testIds,
+        changeDetection=constants.CHANGE_DETECTION_MTIME,
+        changedFiles=None,
+    ):
+        """Filter the test ids of the affected test modules.
+
+        Returns:
+            list: The affected test ids, in their original order.
+        """
+        affectedModules = self.affectedTestModules(changeDetection, changedFiles)
+        testModules = self.testModules()
+        result = []
+        for testId in testIds:
+            modules = self._testModulesOfId(testId, testModules)
+            if not modules or affectedModules.intersection(modules):
+                # We can't tell the impact of the test outside the test modules.
+                result.append(testId)
+        return result
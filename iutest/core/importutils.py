@@ -3,46 +3,120 @@
 # Please see the LICENSE file that should have been included as part of this package.
 
 import sys
+import time
 import logging
 from iutest import dependencies
+from iutest.core import modulereloader
 from iutest.core import pathutils
 
 logger = logging.getLogger(__name__)
 
 
-def isReimportFeatureAvailable(silentCheck=False):
-    if not hasattr(sys, "maxint"):
-        return False
-    if silentCheck:
-        return dependencies.ReimportWrapper.get().isValid()
+def _useReimportPackage():
+    """The reimport package is only preferred on Python 2 where it is available."""
+    return hasattr(sys, "maxint") and dependencies.ReimportWrapper.get().isValid()
+
 
-    return dependencies.ReimportWrapper.check()
+def isReimportFeatureAvailable(silentCheck=False):
+    """The built-in reload engine makes it always available, the argument is kept for
+    the compatibility.
+    """
+    return True
 
 
 def isModuleModified(dotPath):
-    if not isReimportFeatureAvailable():
-        return None
-    return dependencies.ReimportWrapper.getModule().modified(dotPath)
+    if _useReimportPackage():
+        return dependencies.ReimportWrapper.getModule().modified(dotPath)
+    return modulereloader.ModuleReloader.get().isModuleChanged(dotPath)
 
 
-def reimportByModulePath(dotPath):
-    if not isReimportFeatureAvailable():
+def _reloadModules(moduleNames):
+    """Reload the modules and the modules importing them, and log the time each one
+    takes.
+
+    Returns:
+        tuple: The lists of the reloaded and the failed module names.
+    """
+    if _useReimportPackage():
+        reloaded = []
+        failed = []
+        for moduleName in moduleNames:
+            try:
+                dependencies.ReimportWrapper.getModule().reimport(moduleName)
+            except Exception:
+                logger.exception("Unable to reimport module %s", moduleName)
+                failed.append(moduleName)
+            else:
+                reloaded.append(moduleName)
+        return reloaded, failed
+
+    timings = modulereloader.ModuleReloader.get().reload(
+        moduleNames, includeImporters=True
+    )
+    for moduleName, seconds in timings:
+        logger.info("Reimported %s in %.3fs", moduleName, seconds)
+    reloaded = [m for m, _ in timings]
+    reloadedSet = set(reloaded)
+    failed = [m for m in moduleNames if m not in reloadedSet]
+    return reloaded, failed
+
+
+def _printReimportPlan(moduleNames):
+    if _useReimportPackage():
+        print("Would reimport: {}".format(moduleNames))
         return
+
+    reloader = modulereloader.ModuleReloader.get()
+    plan = reloader.reloadPlan(moduleNames)
+    print("Would reimport {} modules in this order:".format(len(plan)))
+    knownTime = 0.0
+    unknownCount = 0
+    for moduleName, isChanged in plan:
+        lastTime = reloader.lastReloadTime(moduleName)
+        if lastTime is None:
+            unknownCount += 1
+            timeText = "?"
+        else:
+            knownTime += lastTime
+            timeText = "{:.3f}s".format(lastTime)
+        reason = "changed" if isChanged else "imports a changed module"
+        print("    {} ({}, last took {})".format(moduleName, reason, timeText))
+
+    summary = "They took {:.3f}s last time".format(knownTime)
+    if unknownCount:
+        summary += ", {} modules weren't reimported before".format(unknownCount)
+    print(summary + ".")
+
+
+def reimportByModulePath(dotPath):
     try:
-        mod = pathutils.objectFromDotPath(dotPath)
-        dependencies.ReimportWrapper.getModule().reimport(mod)
-        logger.info("Reimported module: %s", dotPath)
-    except:
+        pathutils.objectFromDotPath(dotPath)
+    except Exception:
         logger.exception("Error reloading module: %s", dotPath)
+        return
 
+    moduleName = dotPath
+    while moduleName and moduleName not in sys.modules:
+        moduleName = moduleName.rpartition(".")[0]
+    if moduleName:
+        _reloadModules([moduleName])
+
+
+def reimportAllChangedPythonModules(
+    inclusiveKeyword=None, exclusiveKeyword=None, dryRun=False
+):
+    """Reimport the changed modules, then the modules importing them so that they
+    don't keep the old objects.
 
-def reimportAllChangedPythonModules(inclusiveKeyword=None, exclusiveKeyword=None):
-    """
     Args:
-        filterKeyword (str): A keyword to 
+        inclusiveKeyword (str): Only reimport the modules whose names contain it.
+        exclusiveKeyword (str): Skip the modules whose names contain it.
+        dryRun (bool): Only print the modules to reimport in order, with the time they
+            took last time.
+
+    Returns:
+        list: The names of the changed modules.
     """
-    if not isReimportFeatureAvailable():
-        return
 
     def _iterFilteredModules(modules):
         if not modules:
@@ -61,22 +135,25 @@ def reimportAllChangedPythonModules(inclusiveKeyword=None, exclusiveKeyword=None
 
             yield module
 
-    changed = dependencies.ReimportWrapper.getModule().modified()
+    if _useReimportPackage():
+        changed = dependencies.ReimportWrapper.getModule().modified()
+    else:
+        changed = modulereloader.ModuleReloader.get().changedModules()
     changed = list(_iterFilteredModules(changed))
-    if changed:
+    if changed and dryRun:
+        _printReimportPlan(changed)
+    elif changed:
         print("Reimporting: {} ...".format(changed))
-        successCount = 0
-        failedCount = 0
-        for module in changed:
-            try:
-                dependencies.ReimportWrapper.getModule().reimport(module)
-            except Exception:
-                logger.exception("Unable to reimport module %s", module)
-                failedCount += 1
-            else:
-                successCount += 1
+        startTime = time.time()
+        reloaded, failed = _reloadModules(changed)
+        successCount = len(reloaded)
+        failedCount = len(failed)
         if not failedCount:
-            print("{} modules reimported.".format(successCount))
+            print(
+                "{} modules reimported in {:.3f}s.".format(
+                    successCount, time.time() - startTime
+                )
+            )
         else:
             if not successCount:
                 print("All {} modules failed to reimport.".format(failedCount))
@@ -90,3 +167,18 @@ def reimportAllChangedPythonModules(inclusiveKeyword=None, exclusiveKeyword=None
     else:
         print("No modules need to reimport :)")
     return changed
+
+
+def reimportModulesOfFiles(filePaths):
+    """Reimport the loaded modules of the changed python files and the modules
+    importing them, the modules that are not loaded yet will be imported fresh anyway.
+
+    Returns:
+        list: The names of the reimported modules.
+    """
+    moduleNames = modulereloader.ModuleReloader.get().modulesOfFiles(filePaths)
+    if not moduleNames:
+        return []
+
+    reloaded, _ = _reloadModules(moduleNames)
+    return reloaded
@@ -0,0 +1,366 @@
+# Copyright 2019-2020 by Wenfeng Gao, MGLAND animation studio. All rights reserved.
+# This file is part of IUTest, and is released under the "MIT License Agreement".
+# Please see the LICENSE file that should have been included as part of this package.
+
+import os
+import sys
+import time
+import types
+import hashlib
+import logging
+import collections
+
+try:
+    from importlib import reload as _reload
+except ImportError:
+    from imp import reload as _reload
+
+from iutest.core import impactanalysis
+
+logger = logging.getLogger(__name__)
+
+_neverReloaded = frozenset(("__main__", "__mp_main__"))
+
+
+def _normPath(filePath):
+    return os.path.normcase(os.path.abspath(filePath))
+
+
+def sourceFileOfModule(module):
+    """Get the .py file of the module, None for the builtin and the extension modules."""
+    filePath = getattr(module, "__file__", None)
+    if not filePath:
+        return None
+
+    root, ext = os.path.splitext(filePath)
+    if ext in (".pyc", ".pyo"):
+        filePath = root + ".py"
+    elif ext != ".py":
+        return None
+    return filePath if os.path.isfile(filePath) else None
+
+
+def _fileDigest(filePath):
+    with open(filePath, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+class _FileStamp(object):
+    __slots__ = ("mtime", "size", "digest")
+
+    def __init__(self, filePath):
+        stat = os.stat(filePath)
+        self.mtime = stat.st_mtime
+        self.size = stat.st_size
+        self.digest = None
+
+    def isSameStat(self, other):
+        return self.mtime == other.mtime and self.size == other.size
+
+
+class ModuleReloader(object):
+    """Reload the changed python modules without the third-party reimport package.
+
+    An index of the source files of the loaded modules is kept with their modified
+    time and size, so that finding the changes only stats the files. The content hash
+    is kept for the reloaded files, touching one of them or saving it unchanged later
+    doesn't reload it again.
+
+    Notes:
+        The modules loaded after the last updateIndex() are indexed with the files as
+        they are then, any change made before that cannot be detected.
+    """
+
+    _instance = None
+
+    @classmethod
+    def get(cls):
+        if not cls._instance:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self):
+        self._stamps = {}
+        self._moduleFiles = {}
+        self._modulesByFile = {}
+        self._reloadTimes = {}
+        self._graph = None
+
+    def _indexModule(self, moduleName, module):
+        filePath = sourceFileOfModule(module)
+        if not filePath:
+            # Still record it so that it is not checked again.
+            self._moduleFiles[moduleName] = None
+            return
+
+        try:
+            stamp = _FileStamp(filePath)
+        except OSError:
+            return
+
+        key = _normPath(filePath)
+        self._moduleFiles[moduleName] = key
+        self._modulesByFile.setdefault(key, set()).add(moduleName)
+        self._stamps.setdefault(key, stamp)
+
+    def _unindexModule(self, moduleName):
+        key = self._moduleFiles.pop(moduleName, None)
+        if not key:
+            return
+
+        names = self._modulesByFile.get(key)
+        if names is not None:
+            names.discard(moduleName)
+            if not names:
+                self._modulesByFile.pop(key)
+                self._stamps.pop(key, None)
+
+    def updateIndex(self):
+        """Index the modules loaded since the last call, and forget the removed ones.
+
+        Returns:
+            int: The count of the modules newly indexed.
+        """
+        modules = dict(sys.modules)
+        for moduleName in [m for m in self._moduleFiles if m not in modules]:
+            self._unindexModule(moduleName)
+
+        newNames = [m for m in modules if m not in self._moduleFiles]
+        for moduleName in newNames:
+            module = modules[moduleName]
+            if isinstance(module, types.ModuleType):
+                self._indexModule(moduleName, module)
+        return len(newNames)
+
+    def indexedModuleCount(self):
+        return sum(1 for f in self._moduleFiles.values() if f)
+
+    def moduleFile(self, moduleName):
+        return self._moduleFiles.get(moduleName)
+
+    def modulesOfFiles(self, filePaths):
+        """Get the indexed modules of the files, in O(files) without touching the others."""
+        self.updateIndex()
+        names = set()
+        for filePath in filePaths:
+            names.update(self._modulesByFile.get(_normPath(filePath), ()))
+        return sorted(names)
+
+    def _isFileChanged(self, key):
+        stamp = self._stamps.get(key)
+        try:
+            current = _FileStamp(key)
+        except OSError:
+            # Removed file, the module cannot be reloaded anyway.
+            return False
+
+        if stamp is None or current.isSameStat(stamp):
+            return False
+
+        if stamp.digest is None:
+            # The digest of the indexed version is unknown, trust the stat.
+            return True
+
+        current.digest = _fileDigest(key)
+        if current.digest == stamp.digest:
+            # Touched or saved without a change.
+            self._stamps[key] = current
+            return False
+        return True
+
+    def changedModules(self, filePaths=None):
+        """Get the names of the loaded modules whose source files changed.
+
+        Args:
+            filePaths (list): Only check the modules of these files, e.g. the ones from
+                the file watcher, otherwise the stat of all the indexed files is checked.
+        """
+        self.updateIndex()
+        if filePaths is None:
+            keys = list(self._stamps)
+        else:
+            keys = set(_normPath(f) for f in filePaths)
+        names = set()
+        for key in keys:
+            if key in self._modulesByFile and self._isFileChanged(key):
+                names.update(self._modulesByFile[key])
+        return sorted(names)
+
+    def isModuleChanged(self, moduleName):
+        self.updateIndex()
+        key = self._moduleFiles.get(moduleName)
+        return bool(key) and self._isFileChanged(key)
+
+    def _importGraph(self):
+        if not self._graph:
+            self._graph = impactanalysis.ImportGraph()
+        return self._graph
+
+    def dependencyGraph(self):
+        """Get the import graph of the loaded modules of the code under test, from their
+        import statements and what they reference at runtime.
+
+        Returns:
+            tuple: (imports, importers), the sets of the module names that each module
+                imports and that import each module.
+        """
+        self.updateIndex()
+        graph = self._importGraph()
+        graph.recordRuntimeModules()
+        loaded = {}
+        for moduleName, filePath in self._moduleFiles.items():
+            module = sys.modules.get(moduleName)
+            if (
+                filePath
+                and module is not None
+                and moduleName not in _neverReloaded
+                and not graph.isExcludedModule(module)
+            ):
+                loaded[moduleName] = filePath
+
+        imports = {}
+        importers = collections.defaultdict(set)
+        for moduleName, filePath in loaded.items():
+            names = graph.importedModules(moduleName, filePath, includeParents=False)
+            names = set(n for n in names if n in loaded)
+            imports[moduleName] = names
+            for name in names:
+                importers[name].add(moduleName)
+        return imports, importers
+
+    @staticmethod
+    def _sortByImports(moduleNames, imports):
+        """Sort the modules so that each one comes after the modules it imports, the
+        modules in an import cycle are sorted by their names.
+        """
+        candidates = set(moduleNames)
+        order = []
+        done = set()
+
+        def _visit(name, visiting):
+            if name in done or name in visiting:
+                return
+            visiting.add(name)
+            for dep in sorted(imports.get(name, ())):
+                if dep in candidates:
+                    _visit(dep, visiting)
+            visiting.discard(name)
+            done.add(name)
+            order.append(name)
+
+        for name in sorted(candidates):
+            _visit(name, set())
+        return order
+
+    def reloadPlan(self, moduleNames, includeImporters=True):
+        """Get the modules to reload for the changed modules, in the reload order.
+
+        Args:
+            moduleNames (list): The names of the changed modules.
+            includeImporters (bool): Also reload the modules that import the changed
+                modules directly or indirectly, which would keep the old objects of the
+                changed modules otherwise, e.g. by "from module import name".
+
+        Returns:
+            list: The (moduleName, isChanged) pairs.
+        """
+        changed = set(
+            m for m in moduleNames if m in sys.modules and m not in _neverReloaded
+        )
+        imports, importers = self.dependencyGraph()
+        toReload = set(changed)
+        if includeImporters:
+            queue = list(changed)
+            while queue:
+                for importer in importers.get(queue.pop(), ()):
+                    if importer not in toReload:
+                        toReload.add(importer)
+                        queue.append(importer)
+
+        return [(m, m in changed) for m in self._sortByImports(toReload, imports)]
+
+    def reloadOrder(self, moduleNames):
+        """Sort the modules so that each one comes after the modules it imports."""
+        return [m for m, _ in self.reloadPlan(moduleNames, includeImporters=False)]
+
+    def lastReloadTime(self, moduleName):
+        """The seconds the last reload of the module took, None if it wasn't reloaded."""
+        return self._reloadTimes.get(moduleName)
+
+    def dryRun(self, filePaths=None):
+        """List what reloadChanged() would reload without reloading anything.
+
+        Returns:
+            list: The (moduleName, isChanged, lastReloadTime) tuples in the reload order.
+        """
+        return [
+            (m, isChanged, self.lastReloadTime(m))
+            for m, isChanged in self.reloadPlan(self.changedModules(filePaths))
+        ]
+
+    def _markReloaded(self, moduleName):
+        key = self._moduleFiles.get(moduleName)
+        if not key:
+            return
+
+        try:
+            stamp = _FileStamp(key)
+            stamp.digest = _fileDigest(key)
+        except (IOError, OSError):
+            return
+        self._stamps[key] = stamp
+
+    @staticmethod
+    def _removeStaleBytecode(module):
+        # A change within the same second that keeps the file size passes the
+        # validation of the cached bytecode, the reload would get the old code.
+        cachedFile = getattr(module, "__cached__", None)
+        if cachedFile and os.path.isfile(cachedFile):
+            try:
+                os.remove(cachedFile)
+            except OSError:
+                pass
+
+    def reload(self, moduleNames, includeImporters=False):
+        """Reload the modules in their dependency order.
+
+        Args:
+            moduleNames (list): The modules to reload.
+            includeImporters (bool): Also reload the modules importing them, see
+                reloadPlan().
+
+        Returns:
+            list: The (moduleName, seconds) pairs of the reloaded modules, in order.
+        """
+        reloaded = []
+        plan = self.reloadPlan(moduleNames, includeImporters=includeImporters)
+        for moduleName, _ in plan:
+            module = sys.modules.get(moduleName)
+            if module is None:
+                continue
+
+            startTime = time.time()
+            try:
+                self._removeStaleBytecode(module)
+                _reload(module)
+            except Exception:
+                logger.exception("Unable to reload module %s", moduleName)
+                continue
+
+            seconds = time.time() - startTime
+            self._markReloaded(moduleName)
+            self._reloadTimes[moduleName] = seconds
+            reloaded.append((moduleName, seconds))
+            logger.debug("Reloaded %s in %.3fs", moduleName, seconds)
+
+        # Index the modules that the reloaded modules imported for the first time.
+        self.updateIndex()
+        return reloaded
+
+    def reloadChanged(self, filePaths=None, includeImporters=True):
+        """Reload the modules whose source files changed and the modules importing them,
+        see changedModules() and reloadPlan().
+        """
+        return self.reload(
+            self.changedModules(filePaths), includeImporters=includeImporters
+        )
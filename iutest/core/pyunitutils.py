@@ -2,6 +2,22 @@
 # This file is part of IUTest, and is released under the "MIT License Agreement".
 # Please see the LICENSE file that should have been included as part of this package.
 
+import os
+import re
+import sys
+import fnmatch
+import logging
+import unittest
+
+from iutest.core import pathutils
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEST_FILE_PATTERN = "test*.py"
+
+_validModuleNameExp = re.compile(r"[_a-z]\w*\.py$", re.IGNORECASE)
+_loadTestsFailure = "_FailedTest"
+
 
 def parseParameterizedTestId(testId):
     isParameterized = ":" in testId
@@ -10,3 +26,174 @@ def parseParameterizedTestId(testId):
         if isParameterized
         else (isParameterized, testId)
     )
+
+
+def moduleNameFromPath(filePath, baseDir, prefix=""):
+    """Get the python module path of a file or package dir relative to a base dir.
+
+    Args:
+        filePath (str): The python file or the package directory.
+        baseDir (str): The directory the module path starts from, e.g. the top dir.
+        prefix (str): The module path of the baseDir itself if it is a package.
+
+    Returns:
+        str: The python module path, or None if filePath is not under baseDir.
+    """
+    relPath = os.path.relpath(os.path.normpath(filePath), os.path.normpath(baseDir))
+    if relPath.startswith(os.pardir):
+        return None
+
+    relPath = os.path.splitext(relPath)[0]
+    if os.path.basename(relPath) == "__init__":
+        relPath = os.path.dirname(relPath)
+
+    parts = [p for p in relPath.split(os.sep) if p and p != os.curdir]
+    if prefix:
+        parts.insert(0, prefix)
+    return ".".join(parts)
+
+
+def iterTestModuleFiles(
+    startDir, baseDir, prefix="", pattern=DEFAULT_TEST_FILE_PATTERN
+):
+    """Walk the start dir the same way as unittest discovery does.
+
+    Notes:
+        Both the test modules and the packages that contain them are yielded since
+        unittest discovery loads tests from the package __init__ modules as well.
+
+    Args:
+        startDir (str): The directory to search for tests.
+        baseDir (str): The directory the module paths start from, e.g. the top dir.
+        prefix (str): The module path of the baseDir itself if it is a package.
+        pattern (str): The file name pattern of test modules.
+
+    Yields:
+        tuple: (modulePath, filePath, isPackage) where filePath is the __init__.py
+            of the package.
+    """
+    initFile = os.path.join(startDir, "__init__.py")
+    if os.path.isfile(initFile):
+        name = moduleNameFromPath(startDir, baseDir, prefix)
+        if name:
+            yield name, initFile, True
+
+    for fileName in sorted(os.listdir(startDir)):
+        fullPath = os.path.join(startDir, fileName)
+        if os.path.isfile(fullPath):
+            if not _validModuleNameExp.match(fileName):
+                continue
+            if not fnmatch.fnmatch(fileName, pattern):
+                continue
+            name = moduleNameFromPath(fullPath, baseDir, prefix)
+            if name:
+                yield name, fullPath, False
+
+        elif os.path.isfile(os.path.join(fullPath, "__init__.py")):
+            for each in iterTestModuleFiles(fullPath, baseDir, prefix, pattern):
+                yield each
+
+
+def findModuleFile(modulePath, searchRoots=None):
+    """Find the source file of a python module without importing it.
+
+    Args:
+        modulePath (str): The python module path.
+        searchRoots (list): List of (dirPath, prefix) pairs to search in before sys.path,
+            prefix is the module path of dirPath if it is a package dir.
+
+    Returns:
+        str: The .py file or the __init__.py file of the package, None if not found.
+    """
+    roots = list(searchRoots or [])
+    for p in sys.path:
+        p = p or os.getcwd()
+        if os.path.isdir(p):
+            roots.append((p, ""))
+
+    for dirPath, prefix in roots:
+        if prefix:
+            if modulePath == prefix:
+                parts = []
+            elif modulePath.startswith(prefix + "."):
+                parts = modulePath[len(prefix) + 1 :].split(".")
+            else:
+                continue
+        else:
+            parts = modulePath.split(".")
+
+        basePath = os.path.join(dirPath, *parts)
+        initFile = os.path.join(basePath, "__init__.py")
+        if os.path.isfile(initFile):
+            return initFile
+
+        if parts and os.path.isfile(basePath + ".py"):
+            return basePath + ".py"
+
+    return None
+
+
+def discoveryRoot(startDirOrModule, topDir):
+    """Figure out where and how to walk through the test files without importing them.
+
+    Args:
+        startDirOrModule (str): The start dir or the python package path of the tests.
+        topDir (str): The top dir of the tests.
+
+    Returns:
+        tuple: (walkDir, baseDir, prefix) that can be passed to iterTestModuleFiles(),
+            or None if the tests cannot be walked through, e.g. a single test module.
+    """
+    if not startDirOrModule:
+        return None
+
+    if os.path.isdir(startDirOrModule):
+        if not topDir or not os.path.isdir(topDir):
+            topDir = startDirOrModule
+
+        if moduleNameFromPath(startDirOrModule, topDir) is None:
+            return None
+        return startDirOrModule, topDir, ""
+
+    if pathutils.isPath(startDirOrModule):
+        return None
+
+    searchRoots = [(topDir, "")] if topDir and os.path.isdir(topDir) else []
+    moduleFile = findModuleFile(startDirOrModule, searchRoots)
+    if not moduleFile or os.path.basename(moduleFile) != "__init__.py":
+        return None
+
+    packageDir = os.path.dirname(moduleFile)
+    return packageDir, packageDir, startDirOrModule
+
+
+def iterTestCases(tests):
+    """Iterate the test case objects in a test suite recursively.
+    """
+    if isinstance(tests, unittest.BaseTestSuite):
+        for test in tests:
+            for t in iterTestCases(test):
+                yield t
+    else:
+        yield tests
+
+
+def isFailedToLoadTest(test):
+    """Check if the test is the placeholder unittest made for a module failed to load.
+
+    Notes:
+        The error of the load failure will be logged.
+    """
+    if test.__class__.__name__ != _loadTestsFailure:
+        return False
+
+    modulename = test.id().split(_loadTestsFailure)[-1][1:]
+    raiser = getattr(test, modulename, None)
+    if not raiser:
+        return False
+
+    try:
+        raiser()
+    except Exception:
+        logger.exception("Unable to load tests from %s", modulename)
+    return True
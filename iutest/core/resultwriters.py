@@ -0,0 +1,354 @@
+# Copyright 2019-2020 by Wenfeng Gao, MGLAND animation studio. All rights reserved.
+# This file is part of IUTest, and is released under the "MIT License Agreement".
+# Please see the LICENSE file that should have been included as part of this package.
+
+import os
+import re
+import json
+import time
+import logging
+from xml.sax import saxutils
+
+from iutest.core import constants
+
+logger = logging.getLogger(__name__)
+
+OUTCOME_NAMES = {
+    constants.TEST_RESULT_NONE: "unknown",
+    constants.TEST_RESULT_SKIP: "skipped",
+    constants.TEST_RESULT_PASS: "passed",
+    constants.TEST_RESULT_EXPECTED_FAIL: "expectedFailure",
+    constants.TEST_RESULT_UNEXPECTED_PASS: "unexpectedSuccess",
+    constants.TEST_RESULT_FAIL: "failed",
+    constants.TEST_RESULT_ERROR: "error",
+}
+
+# The characters that are not allowed in xml 1.0 even escaped.
+_invalidXmlChars = re.compile(u"[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+
+def _toText(value):
+    """Get the value as unicode text, a byte string, e.g. a python 2 traceback, is
+    decoded as utf-8 and its invalid bytes are replaced.
+    """
+    if isinstance(value, bytes):
+        return value.decode("utf-8", "replace")
+    return u"{}".format(value)
+
+
+class ResultRecord(object):
+    """The result of a finished test, handed to the writers and dropped afterwards."""
+
+    __slots__ = (
+        "testId",
+        "outcome",
+        "duration",
+        "startTime",
+        "details",
+        "worker",
+        "rerun",
+    )
+
+    def __init__(
+        self,
+        testId,
+        outcome,
+        duration,
+        startTime=None,
+        details=None,
+        worker=None,
+        rerun=0,
+    ):
+        self.testId = testId
+        self.outcome = outcome
+        self.duration = duration
+        self.startTime = startTime
+        self.details = details
+        self.worker = worker
+        self.rerun = rerun
+
+    def outcomeName(self):
+        return OUTCOME_NAMES.get(self.outcome, "unknown")
+
+
+class ResultWriter(object):
+    """Stream the results of a run to a file, each test is written once it finishes so
+    that nothing is kept in memory and a crashed run leaves the results so far.
+    """
+
+    def __init__(self, filePath):
+        self._filePath = os.path.abspath(filePath)
+        self._file = None
+        self._startTime = 0
+        self._counts = {}
+
+    def filePath(self):
+        return self._filePath
+
+    def _openFile(self, mode):
+        dirPath = os.path.dirname(self._filePath)
+        if dirPath and not os.path.isdir(dirPath):
+            os.makedirs(dirPath)
+        self._file = open(self._filePath, mode)
+
+    def open(self, runner=""):
+        """Start the file of a new run, the file of the last run is overwritten."""
+        self._startTime = time.time()
+        self._counts = dict((name, 0) for name in OUTCOME_NAMES.values())
+
+    def writeTest(self, record):
+        self._counts[record.outcomeName()] += 1
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+class JsonLinesWriter(ResultWriter):
+    """Write a json object per line: a "run" record, a "test" record per test and a
+    "summary" record once the run ends.
+    """
+
+    def _writeLine(self, data):
+        self._file.write(json.dumps(data, sort_keys=True) + "\n")
+        self._file.flush()
+
+    def open(self, runner=""):
+        ResultWriter.open(self, runner)
+        self._openFile("w")
+        self._writeLine({"type": "run", "runner": runner, "startTime": self._startTime})
+
+    def writeTest(self, record):
+        ResultWriter.writeTest(self, record)
+        data = {
+            "type": "test",
+            "id": record.testId,
+            "outcome": record.outcomeName(),
+            "duration": record.duration,
+            "startTime": record.startTime,
+        }
+        if record.details:
+            data["details"] = _toText(record.details)
+        if record.worker is not None:
+            data["worker"] = record.worker
+        if record.rerun:
+            data["rerun"] = record.rerun
+        self._writeLine(data)
+
+    def close(self):
+        if self._file:
+            stopTime = time.time()
+            self._writeLine(
+                {
+                    "type": "summary",
+                    "stopTime": stopTime,
+                    "duration": stopTime - self._startTime,
+                    "counts": self._counts,
+                }
+            )
+        ResultWriter.close(self)
+
+
+class JUnitXmlWriter(ResultWriter):
+    """Write the results as a JUnit xml report, which most CI servers understand.
+
+    Notes:
+        The file is kept well-formed after every test: each test case is written over
+        the closing tags, which are then written again, and the counts are updated in
+        the fixed-size header of the test suite.
+    """
+
+    _headerWidth = 256
+    _footer = b"</testsuite>\n</testsuites>\n"
+
+    def __init__(self, filePath):
+        ResultWriter.__init__(self, filePath)
+        self._runner = ""
+        self._headerPos = 0
+        self._bodyEnd = 0
+
+    @staticmethod
+    def _text(value):
+        return _invalidXmlChars.sub(u"?", _toText(value))
+
+    @classmethod
+    def _attr(cls, value):
+        return saxutils.quoteattr(cls._text(value))
+
+    def _header(self, duration):
+        failures = (
+            self._counts[OUTCOME_NAMES[constants.TEST_RESULT_FAIL]]
+            + self._counts[OUTCOME_NAMES[constants.TEST_RESULT_UNEXPECTED_PASS]]
+        )
+        skipped = (
+            self._counts[OUTCOME_NAMES[constants.TEST_RESULT_SKIP]]
+            + self._counts[OUTCOME_NAMES[constants.TEST_RESULT_EXPECTED_FAIL]]
+        )
+        header = (
+            '<testsuite name={} tests="{}" failures="{}" errors="{}" skipped="{}" '
+            'time="{:.3f}" timestamp="{}"'
+        ).format(
+            self._attr(self._runner or constants.APP_NAME),
+            sum(self._counts.values()),
+            failures,
+            self._counts[OUTCOME_NAMES[constants.TEST_RESULT_ERROR]],
+            skipped,
+            duration,
+            time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self._startTime)),
+        )
+        return (header.ljust(self._headerWidth - 1) + ">").encode("utf-8")
+
+    def _writeHeader(self, duration):
+        header = self._header(duration)
+        if len(header) != self._headerWidth:
+            logger.debug("The header of %s doesn't fit.", self._filePath)
+            return
+        self._file.seek(self._headerPos)
+        self._file.write(header)
+
+    def open(self, runner=""):
+        ResultWriter.open(self, runner)
+        self._runner = runner
+        self._openFile("wb")
+        self._file.write(b'<?xml version="1.0" encoding="UTF-8"?>\n<testsuites>\n')
+        self._headerPos = self._file.tell()
+        self._file.write(self._header(0) + b"\n")
+        self._bodyEnd = self._file.tell()
+        self._file.write(self._footer)
+        self._file.flush()
+
+    def _testCaseXml(self, record):
+        className, _, name = record.testId.rpartition(".")
+        lines = [
+            u'  <testcase classname={} name={} time="{:.3f}">'.format(
+                self._attr(className), self._attr(name), record.duration or 0.0
+            )
+        ]
+        if record.rerun:
+            lines.append(
+                "    <properties>"
+                '<property name="rerun" value="{}"/>'
+                "</properties>".format(record.rerun)
+            )
+
+        details = _toText(record.details or "")
+        message = details.strip().splitlines()[-1] if details.strip() else ""
+        tag = None
+        if record.outcome == constants.TEST_RESULT_FAIL:
+            tag = "failure"
+        elif record.outcome == constants.TEST_RESULT_ERROR:
+            tag = "error"
+        elif record.outcome == constants.TEST_RESULT_UNEXPECTED_PASS:
+            tag = "failure"
+            message = details = "Unexpected success"
+        elif record.outcome == constants.TEST_RESULT_SKIP:
+            lines.append(u"    <skipped message={}/>".format(self._attr(details)))
+        elif record.outcome == constants.TEST_RESULT_EXPECTED_FAIL:
+            lines.append('    <skipped message="Expected failure"/>')
+
+        if tag:
+            lines.append(
+                u"    <{0} message={1}>{2}</{0}>".format(
+                    tag, self._attr(message), saxutils.escape(self._text(details))
+                )
+            )
+        lines.append("  </testcase>\n")
+        return u"\n".join(lines).encode("utf-8")
+
+    def writeTest(self, record):
+        ResultWriter.writeTest(self, record)
+        self._file.seek(self._bodyEnd)
+        self._file.write(self._testCaseXml(record))
+        self._bodyEnd = self._file.tell()
+        self._file.write(self._footer)
+        self._writeHeader(time.time() - self._startTime)
+        self._file.flush()
+
+    def close(self):
+        if self._file:
+            self._writeHeader(time.time() - self._startTime)
+        ResultWriter.close(self)
+
+
+class ResultWriters(object):
+    """The writers streaming the results of the runs, the test results hooks feed the
+    tests to them as they finish, for all the runners.
+    """
+
+    _instance = None
+
+    @classmethod
+    def get(cls):
+        if not cls._instance:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self):
+        self._writers = []
+        self._isRunning = False
+        self._rerun = 0
+
+    def setWriters(self, writers):
+        """Use these writers from the next run on, the running ones are closed."""
+        self.endRun()
+        self._writers = list(writers or [])
+
+    def writers(self):
+        return list(self._writers)
+
+    def isRunning(self):
+        return self._isRunning
+
+    def _callWriters(self, methodName, *args):
+        for writer in list(self._writers):
+            try:
+                getattr(writer, methodName)(*args)
+            except Exception:
+                # A writer that fails is dropped, it must not stop the tests running.
+                logger.exception("Unable to write the results to %s", writer.filePath())
+                self._writers.remove(writer)
+                try:
+                    writer.close()
+                except Exception:
+                    pass
+
+    def beginRun(self, runner=""):
+        """Start the files of the writers, the tests are only written between
+        beginRun() and endRun(), which can span several runs of the runner.
+        """
+        self.endRun()
+        if not self._writers:
+            return
+
+        self._callWriters("open", runner)
+        self._isRunning = True
+        self._rerun = 0
+
+    def setRerun(self, rerun):
+        """Mark the tests written from now on as the nth rerun of the failed tests."""
+        self._rerun = rerun
+
+    def writeTest(
+        self, testId, outcome, duration, startTime=None, details=None, worker=None
+    ):
+        if not self._isRunning:
+            return
+
+        record = ResultRecord(
+            testId,
+            outcome,
+            duration,
+            startTime=startTime,
+            details=details,
+            worker=worker,
+            rerun=self._rerun,
+        )
+        self._callWriters("writeTest", record)
+
+    def endRun(self):
+        if not self._isRunning:
+            return
+
+        self._isRunning = False
+        self._callWriters("close")
@@ -2,26 +2,238 @@
 # This file is part of IUTest, and is released under the "MIT License Agreement".
 # Please see the LICENSE file that should have been included as part of this package.
 
+import sys
+import array
+import collections
+
+from iutest.core import constants
+
+try:
+    _intern = sys.intern
+except AttributeError:
+    _intern = intern  # python 2
+
+TestRecord = collections.namedtuple(
+    "TestRecord",
+    ("testId", "state", "startTime", "stopTime", "setUpTime", "tearDownTime"),
+)
+
+_UNKNOWN_TIME = -1.0
+
+
+class TestRecords(object):
+    """The records of the tests of a run, in columns of arrays indexed by the test ids.
+
+    Notes:
+        A record costs a few numbers in the arrays besides the interned test id, and
+        every lookup by the test id is a single dict access. The state of a test is the
+        worst of its outcomes, e.g. a failed parameterized case fails the test, while
+        the outcome counts count each outcome reported.
+    """
+
+    # The states that a later outcome replaces.
+    _replaceableStates = (
+        constants.TEST_RESULT_NONE,
+        constants.TEST_RESULT_RUNNING,
+        constants.TEST_RESULT_PASS,
+    )
+
+    def __init__(self):
+        self._rows = {}
+        self._testIds = []
+        self._states = array.array("b")
+        self._startTimes = array.array("d")
+        self._stopTimes = array.array("d")
+        self._setUpTimes = array.array("d")
+        self._tearDownTimes = array.array("d")
+        self._outcomeCounts = [0] * (constants.TEST_RESULT_ERROR + 1)
+
+    def __len__(self):
+        return len(self._testIds)
+
+    def __contains__(self, testId):
+        return testId in self._rows
+
+    def __iter__(self):
+        return iter(self._testIds)
+
+    def testIds(self):
+        """The ids of the recorded tests in the order they started, don't modify it."""
+        return self._testIds
+
+    def add(self, testId, startTime=None):
+        """Record a started test, the test recorded already keeps its record.
+
+        Returns:
+            int: The row of the test.
+        """
+        row = self._rows.get(testId)
+        if row is not None:
+            return row
+
+        row = len(self._testIds)
+        testId = _intern(str(testId))
+        self._rows[testId] = row
+        self._testIds.append(testId)
+        self._states.append(constants.TEST_RESULT_RUNNING)
+        self._startTimes.append(_UNKNOWN_TIME if startTime is None else startTime)
+        self._stopTimes.append(_UNKNOWN_TIME)
+        self._setUpTimes.append(_UNKNOWN_TIME)
+        self._tearDownTimes.append(_UNKNOWN_TIME)
+        return row
+
+    def _row(self, testId):
+        row = self._rows.get(testId)
+        return self.add(testId) if row is None else row
+
+    def addOutcome(self, testId, state):
+        """Count the outcome and keep it as the state of the test unless the test has
+        a worse one already.
+        """
+        self._outcomeCounts[state] += 1
+        row = self._row(testId)
+        if self._states[row] in self._replaceableStates:
+            self._states[row] = state
+
+    def replaceOutcome(self, testId, state):
+        """Replace the state of the test, e.g. a failed test that passed in a rerun, the
+        outcome counts are updated accordingly.
+        """
+        row = self._row(testId)
+        lastState = self._states[row]
+        if lastState not in (constants.TEST_RESULT_NONE, constants.TEST_RESULT_RUNNING):
+            self._outcomeCounts[lastState] -= 1
+        self._outcomeCounts[state] += 1
+        self._states[row] = state
+
+    def outcomeCount(self, state):
+        return self._outcomeCounts[state]
+
+    def setStopTime(self, testId, stopTime):
+        self._stopTimes[self._row(testId)] = stopTime
+
+    def setFixtureTimes(self, testId, setUpTime=None, tearDownTime=None):
+        row = self._row(testId)
+        if setUpTime is not None:
+            self._setUpTimes[row] = setUpTime
+        if tearDownTime is not None:
+            self._tearDownTimes[row] = tearDownTime
+
+    @staticmethod
+    def _time(column, row):
+        value = column[row]
+        return None if value == _UNKNOWN_TIME else value
+
+    def state(self, testId):
+        """The state of the test, constants.TEST_RESULT_NONE if it didn't run."""
+        row = self._rows.get(testId)
+        return constants.TEST_RESULT_NONE if row is None else self._states[row]
+
+    def startTime(self, testId):
+        row = self._rows.get(testId)
+        return None if row is None else self._time(self._startTimes, row)
+
+    def stopTime(self, testId):
+        row = self._rows.get(testId)
+        return None if row is None else self._time(self._stopTimes, row)
+
+    def duration(self, testId):
+        """The seconds the test took, None if it didn't finish."""
+        row = self._rows.get(testId)
+        if row is None:
+            return None
+
+        startTime = self._time(self._startTimes, row)
+        stopTime = self._time(self._stopTimes, row)
+        if startTime is None or stopTime is None:
+            return None
+        return stopTime - startTime
+
+    def record(self, testId):
+        """Get the TestRecord of the test, None if it didn't run."""
+        row = self._rows.get(testId)
+        if row is None:
+            return None
+
+        return TestRecord(
+            self._testIds[row],
+            self._states[row],
+            self._time(self._startTimes, row),
+            self._time(self._stopTimes, row),
+            self._time(self._setUpTimes, row),
+            self._time(self._tearDownTimes, row),
+        )
+
+    def iterRecords(self):
+        for testId in self._testIds:
+            yield self.record(testId)
+
+    def testIdsWithStates(self, *states):
+        """Get the ids of the tests in any of the states, in the order they started."""
+        return [
+            testId
+            for testId, state in zip(self._testIds, self._states)
+            if state in states
+        ]
+
+    def durations(self):
+        """Get the seconds each finished test took by the test id."""
+        return dict(
+            (testId, stopTime - startTime)
+            for testId, startTime, stopTime in zip(
+                self._testIds, self._startTimes, self._stopTimes
+            )
+            if startTime != _UNKNOWN_TIME and stopTime != _UNKNOWN_TIME
+        )
+
 
 class TestRunInfo(object):
     def __init__(self):
         self.reset()
 
     def reset(self):
-        self.runTestIds = []  # The ids here will all be unique.
-        self.runCount = (
-            0
-        )  # The count here will be the actually test run, including potential duplicated.
+        self.records = TestRecords()
+        # The count here will be the actually test run, including potential duplicated.
+        self.runCount = 0
         self.failedTestId = None
-        self.successCount = 0
-        self.failedCount = 0
-        self.errorCount = 0
-        self.skipCount = 0
-        self.expectedFailureCount = 0
-        self.unexpectedSuccessCount = 0
+        self.timedOutTestIds = []
+        self.slowTests = []  # (testId, duration, baseline) of the slow regressions.
+        self.flakyTests = []  # (testId, attempt) of the tests that passed when rerun.
 
         self._sessionStartTime = 0
         self.sessionRunTime = 0
-
-        self._testStartTimes = {}
         self.singleTestRunTime = 0
+
+    @property
+    def runTestIds(self):
+        """The ids of the run tests, they are all unique."""
+        return self.records.testIds()
+
+    @property
+    def successCount(self):
+        return self.records.outcomeCount(constants.TEST_RESULT_PASS)
+
+    @property
+    def failedCount(self):
+        return self.records.outcomeCount(constants.TEST_RESULT_FAIL)
+
+    @property
+    def errorCount(self):
+        return self.records.outcomeCount(constants.TEST_RESULT_ERROR)
+
+    @property
+    def skipCount(self):
+        return self.records.outcomeCount(constants.TEST_RESULT_SKIP)
+
+    @property
+    def expectedFailureCount(self):
+        return self.records.outcomeCount(constants.TEST_RESULT_EXPECTED_FAIL)
+
+    @property
+    def unexpectedSuccessCount(self):
+        return self.records.outcomeCount(constants.TEST_RESULT_UNEXPECTED_PASS)
+
+    @property
+    def testRunTimes(self):
+        """The seconds each finished test took by the test id."""
+        return self.records.durations()
@@ -63,6 +63,15 @@ class BaseTestRunner(object):
     def runTests(self, *testIds):
         self._raiseNotImplementedError()
 
+    def runTestsInFreshProcess(self, *testIds):
+        """Run the tests in a new process, away from what the earlier runs left behind,
+        the runners that cannot do it run them as usual.
+        """
+        logger.warning(
+            "The test runner %s cannot run the tests in a fresh process.", self.name()
+        )
+        self.runTests(*testIds)
+
     def runSingleTestPartially(self, testId, partialMode):
         """Run partial steps of test, like running setUp only, or setUp and test but without teardown.
         Args:
@@ -95,6 +104,17 @@ class BaseTestRunner(object):
     def parseParameterizedTestId(cls, testId):
         return pyunitutils.parseParameterizedTestId(testId)
 
+    def cancelRun(self):
+        """Ask the running tests to stop before the next test, it can be called from
+        another thread than the one running the tests.
+        """
+        pass
+
+    @classmethod
+    def shutdownWorkerPool(cls):
+        """Stop the worker processes the runner keeps between the runs, if any."""
+        pass
+
     @classmethod
     def avoidRunTestsOnPackageLevel(self):
         """A stupid interface to tell the test manager to split these package level test id first.
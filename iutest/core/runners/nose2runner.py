@@ -18,6 +18,8 @@ class Nose2TestRunner(base.BaseTestRunner):
     testlister = None
     partialtest = None
 
+    _mpPlugin = "nose2.plugins.mp"
+
     @classmethod
     def _importPlugins(cls):
         if cls.uihooks and cls.testlister and cls.partialtest:
@@ -51,6 +53,15 @@ class Nose2TestRunner(base.BaseTestRunner):
         return "nose2.svg"
 
     def runTests(self, *testIds):
+        self._runTestsInProcesses(self._manager.parallelJobs(), *testIds)
+
+    def runTestsInFreshProcess(self, *testIds):
+        """Run the tests in a subprocess by nose2.plugins.mp, which starts new ones for
+        every run.
+        """
+        self._runTestsInProcesses(1, *testIds, forceSubprocess=True)
+
+    def _runTestsInProcesses(self, jobs, *testIds, **kwargs):
         if not self._importPlugins():
             self._issueNotInstalledError()
             return
@@ -63,8 +74,13 @@ class Nose2TestRunner(base.BaseTestRunner):
             "iutest.plugins.nose2plugins.testlister",
             "iutest.plugins.nose2plugins.partialtest",
         ]
+        extraArgs = []
+        if jobs > 1 or kwargs.get("forceSubprocess"):
+            plugins.append(self._mpPlugin)
+            extraArgs.extend(["--processes", str(jobs)])
+
         extraHooks = duplicationremoval.TestsDuplicationRemovalHooks.getHooks()
-        self._runTest(plugins, excludePlugins, [], extraHooks, *testIds)
+        self._runTest(plugins, excludePlugins, extraArgs, extraHooks, *testIds)
 
     def _runTest(self, plugins, excludePlugins, extraArgs, extraHooks, *testIds):
         if not testIds:
@@ -91,10 +107,20 @@ class Nose2TestRunner(base.BaseTestRunner):
         argv.extend(testIds)
         argv.extend(["--fail-fast"] if self._manager.stopOnError() else [])
         self.uihooks.UiHooksPlugin.resetLastData()
+        self._applyTimeouts(self._mpPlugin in plugins)
         dependencies.Nose2Wrapper.getModule().discover(
             argv=argv, exit=False, extraHooks=extraHooks
         )
 
+    def _applyTimeouts(self, multiprocess):
+        testTimeout, sessionTimeout = self._manager.testTimeouts()
+        if multiprocess and (testTimeout or sessionTimeout):
+            logger.warning(
+                "The timeouts are not enforced on the tests run by nose2.plugins.mp."
+            )
+            testTimeout = sessionTimeout = 0
+        self.uihooks.UiHooksPlugin.setRunTimeouts(testTimeout, sessionTimeout)
+
     def runSingleTestPartially(self, testId, partialMode):
         """Run partial steps of test, like running setUp only, or setUp and test but without teardown.
         Args:
@@ -132,6 +158,10 @@ class Nose2TestRunner(base.BaseTestRunner):
         ):
             yield tid
 
+    def cancelRun(self):
+        if self._importPlugins():
+            self.uihooks.UiHooksPlugin.requestStop()
+
     @classmethod
     def hasLastListerError(cls):
         if not cls._importPlugins():
@@ -3,25 +3,41 @@
 # Please see the LICENSE file that should have been included as part of this package.
 
 from iutest.core import constants
+import bisect
 import logging
 import os
-from unittest import loader, suite
-from unittest import main as runPyUnittest
+import sys
+import unittest
+from unittest import loader
+from iutest.core import discoverycache
 from iutest.core import pathutils
+from iutest.core import pyunitutils
+from iutest.core import scheduler
+from iutest.core import testdurations
+from iutest.core import workerpool
 from iutest.core.runners import base
 from iutest.core.runners import runnerconstants
 from iutest.plugins.pyunitextentions import pyunitwrappers
 
 logger = logging.getLogger(__name__)
 
+_defaultTestInit = getattr(
+    unittest.TestCase.__init__, "__func__", unittest.TestCase.__init__
+)
+
 
 class PyUnitRunner(base.BaseTestRunner):
     _Icon = None
     _Runner = None
     _lastTests = {}
+    _sortedTestIds = None
     _gotError = False
+    _workerPool = None
 
-    _loadTestsFailure = "_FailedTest"
+    def __init__(self, manager):
+        base.BaseTestRunner.__init__(self, manager)
+        self._runningTestRunner = None
+        self._runningPool = None
 
     @classmethod
     def isValid(cls):
@@ -35,62 +51,348 @@ class PyUnitRunner(base.BaseTestRunner):
     def iconFileName(cls):
         return "pyunit.svg"
 
+    @staticmethod
+    def _canRunInWorkers():
+        reason = workerpool.parallelUnavailableReason()
+        if reason:
+            logger.error("%s The tests run in this process instead.", reason)
+        return not reason
+
     def runTests(self, *testIds):
+        if self._manager.parallelJobs() > 1 and self._canRunInWorkers():
+            self._runTestsInParallel(*testIds)
+            return
+
         self._runTests(constants.RUN_TEST_FULL, *testIds)
 
+    def _parallelTasks(self, *testIds):
+        """Group the test cases by their TestCase class so that the class fixtures
+        run once per task, the longest tasks are run first to balance the workers.
+        """
+        tests = self._makeSuite(testIds)
+        groups = scheduler.groupByTestCase(
+            [test.id() for test in pyunitutils.iterTestCases(tests)]
+        )
+        return scheduler.lptOrder(groups, testdurations.TestDurations.get())
+
+    def _sysPathForWorkers(self):
+        paths = list(sys.path)
+        topDir = self._manager.topDir()
+        if topDir and os.path.isdir(topDir) and topDir not in paths:
+            paths.insert(0, topDir)
+        return paths
+
+    def _makeWorkerPool(self, jobs):
+        maxTests, maxMemoryMB = self._manager.workerRecycleLimits()
+        return workerpool.WorkerPool(
+            jobs,
+            sysPath=self._sysPathForWorkers(),
+            preloadModules=self._manager.workerPreloadModules(),
+            maxTestsPerWorker=maxTests,
+            maxWorkerMemory=maxMemoryMB * 1024 * 1024,
+        )
+
+    def _acquireWorkerPool(self):
+        """Reuse the worker pool of the last run as long as its settings don't change,
+        so that the workers are warm already.
+        """
+        pool = self._makeWorkerPool(self._manager.parallelJobs())
+        lastPool = self.__class__._workerPool
+        if (
+            lastPool
+            and lastPool.isAlive()
+            and lastPool.settingsKey() == pool.settingsKey()
+        ):
+            return lastPool
+
+        self.shutdownWorkerPool()
+        self.__class__._workerPool = pool
+        return pool
+
+    @classmethod
+    def shutdownWorkerPool(cls):
+        if cls._workerPool:
+            cls._workerPool.shutdown()
+            cls._workerPool = None
+
+    def runTestsInFreshProcess(self, *testIds):
+        """Run the tests in a new worker process, which is shut down afterwards."""
+        if not self._canRunInWorkers():
+            self._runTests(constants.RUN_TEST_FULL, *testIds)
+            return
+
+        pool = self._makeWorkerPool(1)
+        try:
+            self._runTestsInParallel(*testIds, pool=pool)
+        finally:
+            pool.shutdown()
+
+    def _runTestsInParallel(self, *testIds, **kwargs):
+        """
+        Args:
+            testIds (tuple): The tests to run.
+            pool (WorkerPool): The pool to run them in, the kept pool by default.
+        """
+        failfast = self._manager.stopOnError()
+        tasks = self._parallelTasks(*testIds)
+        if not tasks:
+            logger.warning("No test to run.")
+            return
+
+        pyunitwrappers.PyUnitTestResult.resetLastData()
+        result = pyunitwrappers.PyUnitParallelTestResult()
+        pool = kwargs.get("pool") or self._acquireWorkerPool()
+        logger.info(
+            "Run %s tests in %s processes.", sum(map(len, tasks)), pool.jobCount()
+        )
+
+        testTimeout, sessionTimeout = self._manager.testTimeouts()
+        result.startTestRun()
+        self._runningPool = pool
+        try:
+            pool.beginRun(
+                failfast=failfast,
+                testTimeout=testTimeout,
+                sessionTimeout=sessionTimeout,
+            )
+            for taskId, taskTestIds in enumerate(tasks):
+                pool.submit(taskId, taskTestIds)
+            self._consumeWorkerMessages(pool, result, tasks, failfast)
+        finally:
+            self._runningPool = None
+            result.stopTestRun()
+            result.stream.setResult()
+
+    def _consumeWorkerMessages(self, pool, result, tasks, failfast):
+        startedIds = set()
+        stoppedIds = set()
+        timedOutTaskIds = set()
+        for msg in pool.iterMessages():
+            msgType = msg[0]
+            if msgType == workerpool.MSG_TEST_START:
+                workerIndex, testId, startTime = msg[1:4]
+                startedIds.add(testId)
+                result.startTest(testId, startTime, workerIndex)
+
+            elif msgType == workerpool.MSG_TEST_OUTCOME:
+                testId, resultCode, details = msg[2:]
+                result.addOutcome(testId, resultCode, details)
+                if failfast and not result.wasSuccessful():
+                    pool.cancel()
+
+            elif msgType == workerpool.MSG_TEST_STOP:
+                testId, stopTime, output, fixtureTimes = msg[2:]
+                stoppedIds.add(testId)
+                result.stopTest(testId, output, stopTime, fixtureTimes)
+
+            elif msgType == workerpool.MSG_TEST_TIMEOUT:
+                testId, taskId, reason, stackDump = msg[2:]
+                timedOutTaskIds.add(taskId)
+                stoppedIds.add(testId)
+                result.addTimeout(testId, reason, stackDump)
+                result.stopTest(testId)
+                if failfast:
+                    pool.cancel()
+
+            elif msgType == workerpool.MSG_PRELOAD_FAILED:
+                moduleName, details = msg[2:]
+                logger.warning("Unable to preload %s:\n%s", moduleName, details)
+
+            elif msgType == workerpool.MSG_WORKER_RECYCLED:
+                logger.debug("Recycle the worker %s: %s", msg[1], msg[2])
+
+            elif msgType == workerpool.MSG_WORKER_CRASHED:
+                taskId = msg[2]
+                if taskId is None:
+                    continue
+                if taskId in timedOutTaskIds:
+                    # Carry on with the tests the replaced worker didn't start.
+                    remainingIds = [t for t in tasks[taskId] if t not in startedIds]
+                    if remainingIds and not pool.isCancelled():
+                        tasks.append(remainingIds)
+                        pool.submit(len(tasks) - 1, remainingIds)
+                    continue
+                for testId in tasks[taskId]:
+                    if testId in stoppedIds:
+                        continue
+                    if testId not in startedIds:
+                        result.startTest(testId)
+                    result.addOutcome(
+                        testId,
+                        constants.TEST_RESULT_ERROR,
+                        "The worker process running the test exited unexpectedly.",
+                    )
+                    result.stopTest(testId)
+                if failfast:
+                    pool.cancel()
+
+    @classmethod
+    def _isCachedTestCurrent(cls, test):
+        """Whether the class of the cached test is still the one of its module, it is not
+        once the module is reimported.
+        """
+        testClass = test.__class__
+        module = sys.modules.get(testClass.__module__)
+        return getattr(module, testClass.__name__, None) is testClass
+
+    @staticmethod
+    def _newTestLike(test, methodName):
+        """Make a new test of the same method as the cached one, None if it cannot be
+        told how the cached one was made, e.g. by a TestCase with its own constructor
+        arguments or by a load_tests() that set it up afterwards.
+        """
+        testClass = test.__class__
+        testInit = getattr(testClass.__init__, "__func__", testClass.__init__)
+        if testInit is not _defaultTestInit:
+            return None
+
+        try:
+            newTest = testClass(methodName)
+        except TypeError:
+            return None
+        if set(vars(newTest)) != set(vars(test)):
+            return None
+        return newTest
+
+    @classmethod
+    def _cachedTestsUnder(cls, testId):
+        """Get the cached tests of a TestCase class or a module id, in the order of
+        their ids.
+        """
+        if cls._sortedTestIds is None:
+            cls._sortedTestIds = sorted(cls._lastTests)
+
+        # The ids starting with "id." sort between "id." and "id/".
+        testIds = cls._sortedTestIds
+        first = bisect.bisect_left(testIds, testId + ".")
+        last = bisect.bisect_left(testIds, testId + "/", first)
+        return [cls._lastTests[tid] for tid in testIds[first:last]]
+
+    @classmethod
+    def _testsFromCache(cls, testId):
+        """Make new tests from the cached tests of the id, which can be the id of a test,
+        a TestCase class or a module.
+
+        Returns:
+            list: The tests, None if the id is unknown or its tests are out of date.
+        """
+        test = cls._lastTests.get(testId)
+        cachedTests = [test] if test else cls._cachedTestsUnder(testId)
+        tests = []
+        for test in cachedTests:
+            methodName = getattr(test, "_testMethodName", None)
+            if not methodName or not cls._isCachedTestCurrent(test):
+                return None
+            # A new test object, the last run may have left states in the cached one.
+            newTest = cls._newTestLike(test, methodName)
+            if newTest is None:
+                return None
+            tests.append(newTest)
+
+        return tests or None
+
+    def _makeSuite(self, testIds):
+        """Make the suite from the tests loaded by the last listing, only the unknown
+        ids are resolved by their names, which imports and loads them again.
+        """
+        suite = unittest.TestSuite()
+        unknownIds = []
+        for testId in testIds:
+            tests = self._testsFromCache(testId)
+            if tests is None:
+                unknownIds.append(testId)
+                continue
+
+            if unknownIds:
+                suite.addTests(loader.defaultTestLoader.loadTestsFromNames(unknownIds))
+                unknownIds = []
+            suite.addTests(tests)
+
+        if unknownIds:
+            suite.addTests(loader.defaultTestLoader.loadTestsFromNames(unknownIds))
+        return suite
+
     def _runTests(self, partialMode=constants.RUN_TEST_FULL, *testIds):
         failfast = self._manager.stopOnError()
-        argv = [""]
-        argv.extend(testIds)
         pyunitwrappers.PyUnitTestResult.resetLastData()
+        testTimeout, sessionTimeout = self._manager.testTimeouts()
         testRunner = pyunitwrappers.PyUnitTestRunnerWrapper(
-            failfast=failfast, partialMode=partialMode
-        )
-        runPyUnittest(
-            None, argv=argv, testRunner=testRunner, exit=False, failfast=failfast
+            failfast=failfast,
+            partialMode=partialMode,
+            testTimeout=testTimeout,
+            sessionTimeout=sessionTimeout,
         )
+        self._runningTestRunner = testRunner
+        try:
+            testRunner.run(self._makeSuite(testIds))
+        finally:
+            self._runningTestRunner = None
         testRunner.resetUiStreamResult()
 
+    def cancelRun(self):
+        testRunner = self._runningTestRunner
+        if testRunner:
+            testRunner.stop()
+
+        pool = self._runningPool
+        if pool:
+            pool.cancel()
+
     def runSingleTestPartially(self, testId, partialMode):
         self._runTests(partialMode, testId)
 
     def _collectAllPaths(self, tests):
-        if isinstance(tests, suite.TestSuite):
-            for t in tests:
-                for p in self._collectAllPaths(t):
-                    yield p
-        else:
-            if not self._isTestFailedToLoad(tests):
+        for test in pyunitutils.iterTestCases(tests):
+            if pyunitutils.isFailedToLoadTest(test):
                 self.__class__._gotError = True
-                return
+                continue
 
-            self._lastTests[tests.id()] = tests
-            yield tests.id()
+            self._lastTests[test.id()] = test
+            self.__class__._sortedTestIds = None
+            yield test.id()
 
     @classmethod
     def _resetLastTests(cls):
         cls._lastTests = {}
+        cls._sortedTestIds = None
+
+    def _loadTestIdsFromModule(self, modulePath):
+        """Load the test ids from a single module, return None if failed to load them.
+        """
+        gotError = self.__class__._gotError
+        self.__class__._gotError = False
+        try:
+            tests = loader.defaultTestLoader.loadTestsFromName(modulePath)
+            testIds = list(self._collectAllPaths(tests))
+        except Exception:
+            self.__class__._gotError = True
+            logger.exception("Unable to load tests from %s", modulePath)
 
-    def _isTestFailedToLoad(self, test):
-        if test.__class__.__name__ == self._loadTestsFailure:
-            modulename = test.id().split(self._loadTestsFailure)[-1][1:]
-            raiser = getattr(test, modulename, None)
-            if not raiser:
-                return True
-            try:
-                raiser()
-            except Exception:
-                logger.exception("Unable to load tests from directory %s", modulename)
-                return False
+        failed = self.__class__._gotError
+        self.__class__._gotError = gotError or failed
+        return None if failed else testIds
 
-        return True
+    def _iterAllTestIdsFromCache(self, cache):
+        topDir = cache.topDir()
+        if topDir and os.path.isdir(topDir) and topDir not in sys.path:
+            sys.path.insert(0, topDir)
+
+        for testId in cache.iterTestIds(self._loadTestIdsFromModule):
+            yield testId
 
     def iterAllTestIds(self):
         self.__class__._gotError = False
         self._resetLastTests()
         startDirOrModule = self._manager.startDirOrModule()
-        startModule = pathutils.objectFromDotPath(startDirOrModule, silent=True)
         topDir = self._manager.topDir()
+        if self._manager.useDiscoveryCache():
+            cache = discoverycache.DiscoveryCache(startDirOrModule, topDir)
+            if cache.isApplicable():
+                for testId in self._iterAllTestIdsFromCache(cache):
+                    yield testId
+                return
+
+        startModule = pathutils.objectFromDotPath(startDirOrModule, silent=True)
         if not topDir or not os.path.isdir(topDir):
             if os.path.isdir(startDirOrModule):
                 topDir = startDirOrModule
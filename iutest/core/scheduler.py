@@ -0,0 +1,115 @@
+# Copyright 2019-2020 by Wenfeng Gao, MGLAND animation studio. All rights reserved.
+# This file is part of IUTest, and is released under the "MIT License Agreement".
+# Please see the LICENSE file that should have been included as part of this package.
+
+import heapq
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def parseShard(text):
+    """Parse a shard spec like "2/4", the shard index starts from 1.
+
+    Returns:
+        tuple: (shardIndex, shardCount)
+
+    Raises:
+        ValueError: If the spec is invalid.
+    """
+    try:
+        index, count = [int(p) for p in text.split("/")]
+    except (ValueError, AttributeError):
+        raise ValueError("Invalid shard {}, it should be like 1/4.".format(text))
+
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(
+            "Invalid shard {}, the index should be from 1 to {}.".format(text, count)
+        )
+    return index, count
+
+
+def groupByTestCase(testIds):
+    """Group the test ids by their TestCase class, in the order they first appear, so
+    that the class fixtures run once per group.
+    """
+    groups = []
+    groupByClass = {}
+    for testId in testIds:
+        key = testId.rpartition(".")[0]
+        if key not in groupByClass:
+            groupByClass[key] = []
+            groups.append(groupByClass[key])
+        groupByClass[key].append(testId)
+    return groups
+
+
+def _groupDurations(groups, durations):
+    if not durations:
+        return [float(len(group)) for group in groups]
+
+    estimates = iter(durations.estimate([t for group in groups for t in group]))
+    return [sum(next(estimates) for _ in group) for group in groups]
+
+
+def _longestFirst(groups, durations):
+    groupDurations = _groupDurations(groups, durations)
+    # Tie on the first test id so that the schedule is deterministic.
+    return sorted(zip(groupDurations, groups), key=lambda x: (-x[0], x[1][0]))
+
+
+def lptOrder(groups, durations=None):
+    """Sort the groups by their estimated duration, longest first.
+
+    Notes:
+        When the workers pick the next group from a shared queue whenever they are free,
+        this is the longest-processing-time-first schedule.
+
+    Args:
+        groups (list): The lists of test ids.
+        durations (TestDurations): The historical durations, None to weight the groups
+            by their test count.
+    """
+    return [group for _, group in _longestFirst(groups, durations)]
+
+
+def lptPartition(groups, binCount, durations=None):
+    """Partition the groups into bins of the similar total duration, each group goes to
+    the bin with the least total duration so far, the longest group first.
+
+    Returns:
+        list: binCount lists of the test ids.
+    """
+    bins = [[] for _ in range(max(1, binCount))]
+    heap = [(0.0, index) for index in range(len(bins))]
+    for duration, group in _longestFirst(groups, durations):
+        load, index = heapq.heappop(heap)
+        bins[index].extend(group)
+        heapq.heappush(heap, (load + duration, index))
+    return bins
+
+
+def selectShard(testIds, shardIndex, shardCount, durations=None, groupTestCases=True):
+    """Get the test ids of a shard, the shards are balanced by the test durations.
+
+    Notes:
+        The result only depends on the inputs, so the machines sharing the same
+        durations, or using none, split the tests the same way.
+
+    Args:
+        testIds (list): All the test ids.
+        shardIndex (int): The shard to get, from 1 to shardCount.
+        shardCount (int): How many shards to split the tests into.
+        durations (TestDurations): The historical durations, None to balance by count.
+        groupTestCases (bool): Keep the tests of a TestCase class in the same shard.
+
+    Returns:
+        list: The test ids of the shard, in their original order.
+    """
+    if groupTestCases:
+        groups = groupByTestCase(testIds)
+    else:
+        groups = [[testId] for testId in testIds]
+
+    selected = set(lptPartition(groups, shardCount, durations)[shardIndex - 1])
+    return [testId for testId in testIds if testId in selected]
@@ -0,0 +1,392 @@
+# Copyright 2019-2020 by Wenfeng Gao, MGLAND animation studio. All rights reserved.
+# This file is part of IUTest, and is released under the "MIT License Agreement".
+# Please see the LICENSE file that should have been included as part of this package.
+
+import ast
+import os
+import sys
+import logging
+from unittest import loader
+
+from iutest.core import pyunitutils
+
+logger = logging.getLogger(__name__)
+
+_UNITTEST_MODULE = "unittest"
+_TEST_METHOD_PREFIX = "test"
+_DEFAULT_TEST_METHOD = "runTest"
+_BUILTIN_BASES = ("object",)
+# The decorators of the test methods that don't change which tests there are.
+_HARMLESS_DECORATORS = (
+    "skip",
+    "skipIf",
+    "skipUnless",
+    "expectedFailure",
+    "staticmethod",
+    "classmethod",
+)
+_FUNCTION_NODES = tuple(
+    getattr(ast, n) for n in ("FunctionDef", "AsyncFunctionDef") if hasattr(ast, n)
+)
+_CONDITIONAL_NODES = tuple(
+    getattr(ast, n) for n in ("If", "Try", "TryExcept", "TryFinally") if hasattr(ast, n)
+)
+
+
+class _Inconclusive(object):
+    """Marker for a class or module that static analysis cannot tell for sure."""
+
+
+INCONCLUSIVE = _Inconclusive()
+
+
+class _ClassInfo(object):
+    def __init__(self, moduleInfo, node):
+        self.moduleInfo = moduleInfo
+        self.name = node.name
+        self.bases = list(node.bases)
+        self.methods = set()
+        # A class decorator could add or remove the tests, e.g. parameterized_class.
+        self.inconclusive = bool(getattr(node, "keywords", None) or node.decorator_list)
+        self._collectMethods(node)
+
+    @staticmethod
+    def _decoratorName(decorator):
+        if isinstance(decorator, ast.Call):
+            decorator = decorator.func
+        if isinstance(decorator, ast.Attribute):
+            return decorator.attr
+        if isinstance(decorator, ast.Name):
+            return decorator.id
+        return None
+
+    def _collectMethods(self, node):
+        for item in node.body:
+            if isinstance(item, _FUNCTION_NODES):
+                self.methods.add(item.name)
+                if item.name.startswith(_TEST_METHOD_PREFIX) and any(
+                    self._decoratorName(d) not in _HARMLESS_DECORATORS
+                    for d in item.decorator_list
+                ):
+                    # Could be turned into several tests or into no test at all.
+                    self.inconclusive = True
+                continue
+
+            targets = []
+            if isinstance(item, ast.Assign):
+                targets = item.targets
+            elif isinstance(item, getattr(ast, "AnnAssign", ())):
+                targets = [item.target]
+
+            for target in targets:
+                if isinstance(target, ast.Name) and target.id.startswith(
+                    _TEST_METHOD_PREFIX
+                ):
+                    # Could be an assigned callable, we don't know.
+                    self.inconclusive = True
+
+    def fullName(self):
+        return "{}.{}".format(self.moduleInfo.modulePath, self.name)
+
+
+class _ModuleInfo(object):
+    """The classes and imported names of a parsed python module."""
+
+    def __init__(self, modulePath, filePath, isPackage):
+        self.modulePath = modulePath
+        self.filePath = filePath
+        self.isPackage = isPackage
+        self.classes = {}
+        self.importedNames = {}  # localName: (modulePath, name or None)
+        self.inconclusive = False
+        self._parse()
+
+    def _packagePath(self):
+        if self.isPackage:
+            return self.modulePath
+        return self.modulePath.rpartition(".")[0]
+
+    def _resolveRelativeModule(self, module, level):
+        if not level:
+            return module
+
+        parts = self._packagePath().split(".")
+        if level > 1:
+            parts = parts[: -(level - 1)]
+        if module:
+            parts.append(module)
+        return ".".join([p for p in parts if p])
+
+    def _parse(self):
+        try:
+            with open(self.filePath, "rb") as f:
+                tree = ast.parse(f.read(), self.filePath)
+        except Exception:
+            self.inconclusive = True
+            return
+
+        for node in tree.body:
+            if isinstance(node, ast.ClassDef):
+                self.classes[node.name] = _ClassInfo(self, node)
+
+            elif isinstance(node, ast.Import):
+                for alias in node.names:
+                    if alias.asname:
+                        self.importedNames[alias.asname] = (alias.name, None)
+                    else:
+                        topName = alias.name.split(".")[0]
+                        self.importedNames[topName] = (topName, None)
+
+            elif isinstance(node, ast.ImportFrom):
+                module = self._resolveRelativeModule(node.module, node.level)
+                for alias in node.names:
+                    if alias.name == "*":
+                        self.inconclusive = True
+                        continue
+                    localName = alias.asname or alias.name
+                    self.importedNames[localName] = (module, alias.name)
+
+            elif isinstance(node, _FUNCTION_NODES):
+                if node.name == "load_tests":
+                    self.inconclusive = True
+
+            elif isinstance(node, _CONDITIONAL_NODES):
+                # Classes defined conditionally cannot be resolved statically.
+                if any(isinstance(n, ast.ClassDef) for n in ast.walk(node)):
+                    self.inconclusive = True
+
+            elif isinstance(node, ast.Assign) and isinstance(node.value, ast.Call):
+                func = node.value.func
+                if isinstance(func, ast.Name) and func.id == "type":
+                    self.inconclusive = True
+
+
+class StaticTestLister(object):
+    """List the unittest test ids by parsing the test files instead of importing them.
+
+    Notes:
+        It finds the unittest.TestCase subclasses, including those derived from other
+        classes within the parsed files, and their test methods.
+        For the test modules the static analysis cannot figure out, e.g. the ones using
+        load_tests() or with test case base classes from compiled modules, the tests
+        are loaded by importing the module as usual.
+    """
+
+    gotError = False
+
+    def __init__(self, startDirOrModule, topDir, fallbackLoader=None):
+        self._startDirOrModule = startDirOrModule
+        self._topDir = topDir
+        self._fallbackLoader = fallbackLoader or self._loadTestIdsByImport
+        self._modules = {}
+        self._classStates = {}
+        self._root = pyunitutils.discoveryRoot(startDirOrModule, topDir)
+        self.fallbackModules = []
+
+    def isApplicable(self):
+        return bool(self._root)
+
+    def _searchRoots(self):
+        walkDir, baseDir, prefix = self._root
+        return [(baseDir, prefix)]
+
+    def _moduleInfo(self, modulePath, filePath=None, isPackage=None):
+        if modulePath in self._modules:
+            return self._modules[modulePath]
+
+        info = None
+        filePath = filePath or pyunitutils.findModuleFile(
+            modulePath, self._searchRoots()
+        )
+        if filePath:
+            if isPackage is None:
+                isPackage = os.path.basename(filePath) == "__init__.py"
+            info = _ModuleInfo(modulePath, filePath, isPackage)
+
+        self._modules[modulePath] = info
+        return info
+
+    def _resolveName(self, moduleInfo, node):
+        """Resolve a base class expression to a _ClassInfo, a unittest TestCase name,
+        None for builtin classes or INCONCLUSIVE.
+        """
+        if isinstance(node, ast.Name):
+            name = node.id
+            if name in moduleInfo.classes:
+                return moduleInfo.classes[name]
+
+            if name in moduleInfo.importedNames:
+                module, attr = moduleInfo.importedNames[name]
+                if attr is None:
+                    return INCONCLUSIVE
+                return self._resolveModuleAttr(module, attr)
+
+            if name in _BUILTIN_BASES:
+                return None
+            return INCONCLUSIVE
+
+        if isinstance(node, ast.Attribute):
+            parts = []
+            while isinstance(node, ast.Attribute):
+                parts.insert(0, node.attr)
+                node = node.value
+
+            if not isinstance(node, ast.Name):
+                return INCONCLUSIVE
+
+            if node.id not in moduleInfo.importedNames:
+                return INCONCLUSIVE
+
+            module, attr = moduleInfo.importedNames[node.id]
+            module = module if attr is None else "{}.{}".format(module, attr)
+            module = ".".join([module] + parts[:-1])
+            return self._resolveModuleAttr(module, parts[-1])
+
+        return INCONCLUSIVE
+
+    def _resolveModuleAttr(self, module, attr):
+        if module == _UNITTEST_MODULE or module.startswith(_UNITTEST_MODULE + "."):
+            return attr if attr.endswith("TestCase") else INCONCLUSIVE
+
+        info = self._moduleInfo(module)
+        if not info or info.inconclusive:
+            return INCONCLUSIVE
+
+        if attr in info.classes:
+            return info.classes[attr]
+
+        if attr in info.importedNames:
+            subModule, subAttr = info.importedNames[attr]
+            if subAttr is not None:
+                return self._resolveModuleAttr(subModule, subAttr)
+
+        return INCONCLUSIVE
+
+    def _classState(self, classInfo, visiting=None):
+        """Get (isTestCase, testMethodNames) of a class, or INCONCLUSIVE."""
+        key = classInfo.fullName()
+        if key in self._classStates:
+            return self._classStates[key]
+
+        visiting = visiting or set()
+        if key in visiting or classInfo.inconclusive:
+            return INCONCLUSIVE
+
+        visiting.add(key)
+        isTestCase = False
+        methods = set(classInfo.methods)
+        state = None
+        for base in classInfo.bases:
+            resolved = self._resolveName(classInfo.moduleInfo, base)
+            if resolved is INCONCLUSIVE:
+                state = INCONCLUSIVE
+                break
+
+            if resolved is None:
+                continue
+
+            if not isinstance(resolved, _ClassInfo):
+                isTestCase = True
+                continue
+
+            baseState = self._classState(resolved, visiting)
+            if baseState is INCONCLUSIVE:
+                state = INCONCLUSIVE
+                break
+
+            isTestCase = isTestCase or baseState[0]
+            methods.update(baseState[1])
+
+        if state is None:
+            state = (isTestCase, methods)
+
+        self._classStates[key] = state
+        return state
+
+    def _testIdsOfClass(self, classInfo, state):
+        _, methods = state
+        names = sorted([m for m in methods if m.startswith(_TEST_METHOD_PREFIX)])
+        if not names and _DEFAULT_TEST_METHOD in methods:
+            names = [_DEFAULT_TEST_METHOD]
+        return ["{}.{}".format(classInfo.fullName(), n) for n in names]
+
+    def testIdsOfModule(self, modulePath, filePath=None, isPackage=None):
+        """Get the test ids in a module statically.
+
+        Returns:
+            list: The test ids, or INCONCLUSIVE if they cannot be figured out statically.
+        """
+        info = self._moduleInfo(modulePath, filePath, isPackage)
+        if not info or info.inconclusive:
+            return INCONCLUSIVE
+
+        classes = []
+        for name, classInfo in info.classes.items():
+            classes.append((name, classInfo))
+
+        # unittest also loads the test cases imported into the module.
+        for localName, (module, attr) in info.importedNames.items():
+            if attr is None or localName in info.classes:
+                continue
+            if not attr[:1].isupper():
+                continue
+            resolved = self._resolveModuleAttr(module, attr)
+            if isinstance(resolved, _ClassInfo):
+                classes.append((localName, resolved))
+
+        testIds = []
+        for _, classInfo in sorted(classes, key=lambda x: x[0]):
+            state = self._classState(classInfo)
+            if state is INCONCLUSIVE:
+                return INCONCLUSIVE
+            if state[0]:
+                testIds.extend(self._testIdsOfClass(classInfo, state))
+
+        return testIds
+
+    def _loadTestIdsByImport(self, modulePath):
+        walkDir, baseDir, prefix = self._root
+        if not prefix and baseDir not in sys.path:
+            sys.path.insert(0, baseDir)
+
+        try:
+            tests = loader.defaultTestLoader.loadTestsFromName(modulePath)
+        except Exception:
+            logger.exception("Unable to load tests from %s", modulePath)
+            return None
+
+        testIds = []
+        for test in pyunitutils.iterTestCases(tests):
+            if pyunitutils.isFailedToLoadTest(test):
+                return None
+            testIds.append(test.id())
+        return testIds
+
+    def iterAllTestIds(self):
+        """Iterate all the test ids, importing the modules only when it is necessary."""
+        self.__class__.gotError = False
+        self.fallbackModules = []
+        if not self._root:
+            return
+
+        walkDir, baseDir, prefix = self._root
+        for modulePath, filePath, isPackage in pyunitutils.iterTestModuleFiles(
+            walkDir, baseDir, prefix
+        ):
+            testIds = self.testIdsOfModule(modulePath, filePath, isPackage)
+            if testIds is INCONCLUSIVE:
+                logger.debug("Load tests by importing %s", modulePath)
+                self.fallbackModules.append(modulePath)
+                testIds = self._fallbackLoader(modulePath)
+                if testIds is None:
+                    self.__class__.gotError = True
+                    continue
+
+            for testId in testIds:
+                yield testId
+
+        if self.fallbackModules:
+            logger.info(
+                "%s test modules were imported to list the tests since static listing was inconclusive.",
+                len(self.fallbackModules),
+            )
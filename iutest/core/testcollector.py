@@ -0,0 +1,133 @@
+# Copyright 2019-2020 by Wenfeng Gao, MGLAND animation studio. All rights reserved.
+# This file is part of IUTest, and is released under the "MIT License Agreement".
+# Please see the LICENSE file that should have been included as part of this package.
+
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _ThreadLogHandler(logging.Handler):
+    """Keep the log records emitted from the collecting thread, so that the main thread
+    can report them to the UI, which must not be touched from another thread.
+    """
+
+    def __init__(self, collector):
+        logging.Handler.__init__(self)
+        self._collector = collector
+
+    def emit(self, record):
+        if record.thread != self._collector.threadIdent():
+            return
+
+        try:
+            msg = self.format(record)
+        except Exception:
+            return
+        self._collector._addLogRecord(record.levelno, msg)
+
+
+class BackgroundTestCollector(object):
+    """Collect the test ids in a worker thread, the collected ids are taken in batches
+    by the main thread.
+
+    Notes:
+        The cancellation happens between two test ids, a module being imported cannot be
+        interrupted, but its tests are discarded.
+    """
+
+    def __init__(self, iterTestIdsFunc):
+        self._iterTestIdsFunc = iterTestIdsFunc
+        self._lock = threading.Lock()
+        self._thread = None
+        self._threadIdent = None
+        self._pendingIds = []
+        self._logRecords = []
+        self._collectedCount = 0
+        self._cancelled = False
+        self._finished = False
+        self._error = None
+        self._logHandler = _ThreadLogHandler(self)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="IUTestCollector")
+        self._thread.daemon = True
+        logging.getLogger().addHandler(self._logHandler)
+        self._thread.start()
+
+    def threadIdent(self):
+        return self._threadIdent
+
+    def _addLogRecord(self, levelno, msg):
+        with self._lock:
+            self._logRecords.append((levelno, msg))
+
+    def _run(self):
+        self._threadIdent = threading.current_thread().ident
+        try:
+            for testId in self._iterTestIdsFunc():
+                if self._cancelled:
+                    break
+
+                with self._lock:
+                    self._pendingIds.append(testId)
+                    self._collectedCount += 1
+        except Exception as e:
+            self._error = e
+            logger.exception("Error collecting tests.")
+        finally:
+            logging.getLogger().removeHandler(self._logHandler)
+            self._finished = True
+
+    def cancel(self):
+        self._cancelled = True
+        with self._lock:
+            self._pendingIds = []
+
+    def isCancelled(self):
+        return self._cancelled
+
+    def isFinished(self):
+        """Whether the collecting thread is done, no matter if it was cancelled or not."""
+        return self._finished
+
+    def isDone(self):
+        """Whether all the collected test ids have been taken after the thread finished."""
+        with self._lock:
+            return self._finished and not self._pendingIds
+
+    def error(self):
+        return self._error
+
+    def collectedCount(self):
+        return self._collectedCount
+
+    def takeTestIds(self, maxCount=None):
+        """Take the collected test ids that haven't been taken yet.
+
+        Args:
+            maxCount (int): The max count of the ids to take, None to take all of them.
+
+        Returns:
+            list: The collected test ids.
+        """
+        with self._lock:
+            if maxCount is None or maxCount >= len(self._pendingIds):
+                testIds = self._pendingIds
+                self._pendingIds = []
+            else:
+                testIds = self._pendingIds[:maxCount]
+                self._pendingIds = self._pendingIds[maxCount:]
+        return testIds
+
+    def takeLogRecords(self):
+        with self._lock:
+            records = self._logRecords
+            self._logRecords = []
+        return records
+
+    def wait(self, timeout=None):
+        if self._thread:
+            self._thread.join(timeout)
+        return self._finished
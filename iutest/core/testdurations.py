@@ -0,0 +1,127 @@
+# Copyright 2019-2020 by Wenfeng Gao, MGLAND animation studio. All rights reserved.
+# This file is part of IUTest, and is released under the "MIT License Agreement".
+# Please see the LICENSE file that should have been included as part of this package.
+
+import os
+import json
+import logging
+
+from iutest.core import appsettings
+
+logger = logging.getLogger(__name__)
+
+
+class TestDurations(object):
+    """The historical run time of each test, used to schedule the tests.
+
+    Notes:
+        Each duration is a moving average of the recent runs, so that a single slow run
+        doesn't change the schedule too much.
+    """
+
+    _version = 1
+    _fileName = "testDurations.json"
+    _smoothing = 0.5
+    _defaultDuration = 1.0
+    _instance = None
+    _defaultFilePath = None
+
+    @classmethod
+    def get(cls):
+        """Get the store of the default file, which is in the IUTest data dir unless
+        it is changed by useFile().
+        """
+        if not cls._instance:
+            cls._instance = cls(cls._defaultFilePath)
+        return cls._instance
+
+    @classmethod
+    def useFile(cls, filePath):
+        """Use another file as the default store, e.g. one shared by the CI machines."""
+        cls._defaultFilePath = filePath
+        cls._instance = None
+
+    def __init__(self, filePath=None):
+        self._filePath = filePath
+        self._durations = None
+
+    def filePath(self):
+        if not self._filePath:
+            self._filePath = os.path.join(appsettings.dataDir(), self._fileName)
+        return self._filePath
+
+    def _ensureLoaded(self):
+        if self._durations is not None:
+            return
+
+        self._durations = {}
+        filePath = self.filePath()
+        if not os.path.isfile(filePath):
+            return
+
+        try:
+            with open(filePath, "r") as f:
+                data = json.load(f)
+        except Exception:
+            logger.debug("Unable to read the test durations %s", filePath)
+            return
+
+        if data.get("version") == self._version:
+            self._durations = data.get("durations", {})
+
+    def save(self):
+        if self._durations is None:
+            return
+
+        filePath = self.filePath()
+        tempFile = filePath + ".tmp"
+        try:
+            with open(tempFile, "w") as f:
+                json.dump({"version": self._version, "durations": self._durations}, f)
+            if os.path.isfile(filePath):
+                os.remove(filePath)
+            os.rename(tempFile, filePath)
+        except (IOError, OSError):
+            logger.debug("Unable to write the test durations %s", filePath)
+
+    def duration(self, testId, default=None):
+        self._ensureLoaded()
+        return self._durations.get(testId, default)
+
+    def update(self, durations, save=True):
+        """Add the durations of a run.
+
+        Args:
+            durations (dict): The run time in seconds by the test id.
+            save (bool): Write the store to its file afterwards.
+        """
+        if not durations:
+            return
+
+        self._ensureLoaded()
+        for testId, duration in durations.items():
+            lastDuration = self._durations.get(testId)
+            if lastDuration is not None:
+                duration = lastDuration + (duration - lastDuration) * self._smoothing
+            self._durations[testId] = duration
+
+        if save:
+            self.save()
+
+    def estimate(self, testIds):
+        """Estimate the run time of the tests.
+
+        Notes:
+            The tests never run before are estimated by the median duration of the
+            known ones among them, so that they are neither scheduled first nor last.
+
+        Returns:
+            list: The durations in seconds, in the same order of the test ids.
+        """
+        self._ensureLoaded()
+        known = [self._durations.get(t) for t in testIds]
+        knownValues = sorted(d for d in known if d is not None)
+        default = (
+            knownValues[len(knownValues) // 2] if knownValues else self._defaultDuration
+        )
+        return [default if d is None else d for d in known]
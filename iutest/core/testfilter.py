@@ -0,0 +1,140 @@
+# Copyright 2019-2020 by Wenfeng Gao, MGLAND animation studio. All rights reserved.
+# This file is part of IUTest, and is released under the "MIT License Agreement".
+# Please see the LICENSE file that should have been included as part of this package.
+
+import collections
+
+from iutest.core import constants
+
+
+class TestFilter(object):
+    """Find the nodes of a TestNodeStore matching the filter keywords.
+
+    Notes:
+        A normal keyword matches the nodes whose lower case ids contain it, the
+        keywords are 'AND'ed. A state keyword starting with ':' matches the nodes in
+        the state, the state keywords are 'OR'ed.
+
+        A keyword is looked up by its longest part between the dots, which lies in the
+        name of the node or of one of its ancestors, so only the matching subtrees are
+        visited. The matches of the recent keywords are cached, so that typing a longer
+        keyword only checks the matches of the shorter one.
+    """
+
+    _cacheSize = 32
+
+    def __init__(self, store):
+        self._store = store
+        self._textMatches = collections.OrderedDict()
+        self._structureVersion = None
+
+    @staticmethod
+    def splitKeywords(keywords):
+        """Split the keywords into the normal keywords and the state keywords."""
+        textKeywords = []
+        stateKeywords = []
+        for keyword in keywords:
+            if keyword.startswith(":"):
+                stateKeywords.append(keyword)
+            elif keyword:
+                textKeywords.append(keyword)
+        return textKeywords, stateKeywords
+
+    def _cachedCandidates(self, keyword):
+        """Get the fewest cached matches of the keyword or of a substring of it, None
+        if there isn't any.
+        """
+        if self._structureVersion != self._store.structureVersion():
+            self._structureVersion = self._store.structureVersion()
+            self._textMatches.clear()
+            return None
+
+        candidates = None
+        for cachedKeyword, nodes in self._textMatches.items():
+            if cachedKeyword in keyword and (
+                candidates is None or len(nodes) < len(candidates)
+            ):
+                candidates = nodes
+        return candidates
+
+    def _cacheMatches(self, keyword, nodes):
+        self._textMatches.pop(keyword, None)
+        self._textMatches[keyword] = nodes
+        while len(self._textMatches) > self._cacheSize:
+            self._textMatches.popitem(last=False)
+
+    def _nodesWithText(self, keyword):
+        store = self._store
+        root = store.root()
+        candidates = self._cachedCandidates(keyword)
+        verify = True
+        if candidates is None:
+            part = max(keyword.split("."), key=len)
+            # The ids of the nodes don't always contain the id of the root.
+            verify = part != keyword
+            candidates = set()
+            for node in store.nodesWithNameContaining(part):
+                if node == root:
+                    verify = True
+                if node not in candidates:
+                    candidates.update(store.iterDescendants(node))
+
+        if verify:
+            nodes = set(
+                node for node in candidates if keyword in store.testId(node).lower()
+            )
+        else:
+            nodes = set(candidates)
+        nodes.discard(root)
+        self._cacheMatches(keyword, nodes)
+        return nodes
+
+    def _nodesWithStateKeywords(self, stateKeywords):
+        store = self._store
+        nodes = set()
+        for keyword in stateKeywords:
+            desiredState = constants.KEYWORD_TEST_STATES.get(
+                keyword, constants.TEST_RESULT_NONE
+            )
+            if desiredState == constants.KEYWORD_FLAKY_STATE:
+                nodes.update(store.flakyNodes())
+            elif desiredState < 0:
+                for state in range(
+                    constants.TEST_RESULT_RUNNING, constants.TEST_RESULT_ERROR + 1
+                ):
+                    nodes.update(store.nodesInState(state))
+            else:
+                nodes.update(store.nodesInState(desiredState))
+        nodes.discard(store.root())
+        return nodes
+
+    def matchedNodes(self, keywords):
+        """Get the nodes matching all the keywords, None if there is no keyword."""
+        textKeywords, stateKeywords = self.splitKeywords(keywords)
+        if not textKeywords and not stateKeywords:
+            return None
+
+        nodeSets = [self._nodesWithText(keyword) for keyword in textKeywords]
+        if stateKeywords:
+            nodeSets.append(self._nodesWithStateKeywords(stateKeywords))
+
+        nodeSets.sort(key=len)
+        matchedNodes = set(nodeSets[0])
+        for nodes in nodeSets[1:]:
+            matchedNodes.intersection_update(nodes)
+        return matchedNodes
+
+    def visibleNodes(self, keywords):
+        """Get the matched nodes and their ancestors, None if there is no keyword."""
+        matchedNodes = self.matchedNodes(keywords)
+        if matchedNodes is None:
+            return None
+
+        store = self._store
+        visibleNodes = set(matchedNodes)
+        for node in matchedNodes:
+            for ancestor in store.iterAncestors(node):
+                if ancestor in visibleNodes:
+                    break
+                visibleNodes.add(ancestor)
+        return visibleNodes
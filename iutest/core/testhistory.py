@@ -0,0 +1,530 @@
+# Copyright 2019-2020 by Wenfeng Gao, MGLAND animation studio. All rights reserved.
+# This file is part of IUTest, and is released under the "MIT License Agreement".
+# Please see the LICENSE file that should have been included as part of this package.
+
+import os
+import json
+import time
+import logging
+import sqlite3
+import threading
+
+from iutest.core import appsettings
+from iutest.core import constants
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    runner TEXT,
+    startTime REAL,
+    stopTime REAL,
+    testCount INTEGER DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS results (
+    runId INTEGER NOT NULL,
+    testId TEXT NOT NULL,
+    outcome INTEGER,
+    startTime REAL,
+    duration REAL,
+    setUpTime REAL,
+    tearDownTime REAL,
+    worker INTEGER
+);
+CREATE INDEX IF NOT EXISTS resultsByTest ON results (testId, runId);
+CREATE TABLE IF NOT EXISTS durationStats (
+    testId TEXT PRIMARY KEY,
+    durations TEXT
+);
+CREATE TABLE IF NOT EXISTS flipStats (
+    testId TEXT PRIMARY KEY,
+    lastPassed INTEGER,
+    transitions INTEGER,
+    flips INTEGER
+);
+"""
+
+
+def percentile(values, percent):
+    """The nearest-rank percentile of the values."""
+    ordered = sorted(values)
+    rank = int(-(-len(ordered) * percent // 100))  # ceil without float errors.
+    return ordered[min(max(rank, 1), len(ordered)) - 1]
+
+
+class TestResult(object):
+    """A recorded result of a test in a run."""
+
+    __slots__ = (
+        "runId",
+        "testId",
+        "outcome",
+        "startTime",
+        "duration",
+        "setUpTime",
+        "tearDownTime",
+        "worker",
+    )
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    def __repr__(self):
+        return "TestResult({})".format(
+            ", ".join("{}={!r}".format(n, getattr(self, n)) for n in self.__slots__)
+        )
+
+
+class TestHistory(object):
+    """The results of all the tests of all the runs, in a sqlite database next to the
+    settings ini file.
+
+    Notes:
+        The results are queued in memory and written in batches, each in one
+        transaction, so that recording a test costs next to nothing while the tests
+        run. The pending results are written by flush() or once the run ends.
+        The durations of the recent passed runs of each test are kept aside as well, so
+        that the slow tests are found without going through the whole history, and so
+        are the counts of the flips between passing and failing of each test.
+
+        Only the results of the recent runs of each test are kept, the older ones of
+        the tests of a run are deleted once the run ends, so are the oldest runs.
+    """
+
+    _version = 2
+    _fileName = "testHistory.sqlite3"
+    _batchSize = 200
+    _maxResultsPerTest = 100
+    _maxRuns = 1000
+    _instance = None
+    _defaultFilePath = None
+
+    # The durations of this many recent passed runs make the baseline of a test.
+    _durationWindow = 20
+    _minDurationSamples = 5
+    # The tests faster than this are too noisy to call slow.
+    _minSlowDuration = 0.1
+    _slowTestFactor = 1.5
+    _slowTestPercentile = 95
+    # Only passing and failing count as flips, the skips and expected failures don't.
+    _flipOutcomes = (
+        constants.TEST_RESULT_PASS,
+        constants.TEST_RESULT_FAIL,
+        constants.TEST_RESULT_ERROR,
+    )
+
+    @classmethod
+    def setSlowTestFactor(cls, factor):
+        """Report the tests that take longer than their p95 duration times the factor,
+        0 to not report any.
+        """
+        cls._slowTestFactor = max(0.0, float(factor or 0))
+
+    @classmethod
+    def slowTestFactor(cls):
+        return cls._slowTestFactor
+
+    @classmethod
+    def get(cls):
+        """Get the store of the default file, which is in the IUTest data dir unless
+        it is changed by useFile().
+        """
+        if not cls._instance:
+            cls._instance = cls(cls._defaultFilePath)
+        return cls._instance
+
+    @classmethod
+    def useFile(cls, filePath):
+        """Use another database file as the default store, e.g. one of a CI job."""
+        if cls._instance:
+            cls._instance.close()
+        cls._defaultFilePath = filePath
+        cls._instance = None
+
+    def __init__(self, filePath=None):
+        self._filePath = filePath
+        self._connection = None
+        self._lock = threading.RLock()
+        self._pending = []
+        self._runId = None
+        self._runTestCount = 0
+        self._runTestIds = set()
+        self._durationStats = {}
+        self._pendingStats = set()
+        self._flipStats = {}
+        self._pendingFlipStats = set()
+
+    def filePath(self):
+        if not self._filePath:
+            self._filePath = os.path.join(appsettings.dataDir(), self._fileName)
+        return self._filePath
+
+    def _connect(self):
+        if self._connection:
+            return self._connection
+
+        filePath = self.filePath()
+        dirPath = os.path.dirname(filePath)
+        if dirPath and not os.path.isdir(dirPath):
+            os.makedirs(dirPath)
+
+        # The tests run in a background thread while the ui reads the history.
+        connection = sqlite3.connect(filePath, timeout=10.0, check_same_thread=False)
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != self._version:
+            connection.executescript(
+                "DROP TABLE IF EXISTS runs; DROP TABLE IF EXISTS results; "
+                "DROP TABLE IF EXISTS durationStats; DROP TABLE IF EXISTS flipStats;"
+            )
+        connection.executescript(_SCHEMA)
+        connection.execute("PRAGMA user_version = {}".format(self._version))
+        connection.commit()
+        self._connection = connection
+        return connection
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            if self._connection:
+                self._connection.close()
+                self._connection = None
+
+    def currentRunId(self):
+        return self._runId
+
+    def beginRun(self, runner=""):
+        """Start recording a run, the run that is still open is ended first.
+
+        Returns:
+            int: The id of the run, None if the database is not available.
+        """
+        with self._lock:
+            if self._runId is not None:
+                self.endRun()
+
+            try:
+                cursor = self._connect().execute(
+                    "INSERT INTO runs (runner, startTime) VALUES (?, ?)",
+                    (runner, time.time()),
+                )
+                self._connection.commit()
+            except (sqlite3.Error, OSError):
+                logger.exception("Unable to record the run in %s", self.filePath())
+                return None
+
+            self._runId = cursor.lastrowid
+            self._runTestCount = 0
+            self._runTestIds = set()
+            return self._runId
+
+    def recordTest(
+        self,
+        testId,
+        outcome,
+        duration,
+        startTime=None,
+        setUpTime=None,
+        tearDownTime=None,
+        worker=None,
+    ):
+        """Queue the result of a test of the current run.
+
+        Args:
+            testId (str): The test id.
+            outcome (int): One of the constants.TEST_RESULT_*.
+            duration (float): The seconds the test took, including setUp and tearDown.
+            startTime (float): The time the test started.
+            setUpTime (float): The seconds the setUp took, None if unknown.
+            tearDownTime (float): The seconds the tearDown took, None if unknown.
+            worker (int): The index of the worker process running it, None for the
+                tests run in this process.
+        """
+        with self._lock:
+            if self._runId is None:
+                return
+
+            self._pending.append(
+                (
+                    self._runId,
+                    testId,
+                    outcome,
+                    startTime,
+                    duration,
+                    setUpTime,
+                    tearDownTime,
+                    worker,
+                )
+            )
+            self._runTestCount += 1
+            self._runTestIds.add(testId)
+            if outcome == constants.TEST_RESULT_PASS and duration is not None:
+                durations = self._recentDurations(testId)
+                durations.append(duration)
+                del durations[: -self._durationWindow]
+                self._pendingStats.add(testId)
+            if outcome in self._flipOutcomes:
+                self._recordFlip(testId, outcome == constants.TEST_RESULT_PASS)
+            if len(self._pending) >= self._batchSize:
+                self.flush()
+
+    def _recentDurations(self, testId):
+        durations = self._durationStats.get(testId)
+        if durations is not None:
+            return durations
+
+        durations = []
+        try:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT durations FROM durationStats WHERE testId = ?", (testId,)
+                )
+                .fetchone()
+            )
+            if row:
+                durations = json.loads(row[0])
+        except (sqlite3.Error, OSError, ValueError):
+            logger.debug("Unable to read the durations of %s", testId)
+        self._durationStats[testId] = durations
+        return durations
+
+    def _flipStatsOf(self, testId):
+        stats = self._flipStats.get(testId)
+        if stats is not None:
+            return stats
+
+        stats = [None, 0, 0]
+        try:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT lastPassed, transitions, flips FROM flipStats "
+                    "WHERE testId = ?",
+                    (testId,),
+                )
+                .fetchone()
+            )
+            if row:
+                stats = [None if row[0] is None else bool(row[0]), row[1], row[2]]
+        except (sqlite3.Error, OSError):
+            logger.debug("Unable to read the flips of %s", testId)
+        self._flipStats[testId] = stats
+        return stats
+
+    def _recordFlip(self, testId, passed):
+        stats = self._flipStatsOf(testId)
+        lastPassed = stats[0]
+        if lastPassed is not None:
+            stats[1] += 1
+            if lastPassed != passed:
+                stats[2] += 1
+        stats[0] = passed
+        self._pendingFlipStats.add(testId)
+
+    def flipRate(self, testId):
+        """Get how often the test flipped between passing and failing from one result
+        to the next, 0.0 if it has less than two results.
+        """
+        with self._lock:
+            _, transitions, flips = self._flipStatsOf(testId)
+            return float(flips) / transitions if transitions else 0.0
+
+    def flakyTests(self, minFlipRate=0.0, limit=20):
+        """Get the tests that flipped between passing and failing the most often.
+
+        Returns:
+            list: The (testId, flipRate, flips) tuples, the highest flip rate first.
+        """
+        rows = self._query(
+            "SELECT testId, CAST(flips AS REAL) / transitions AS flipRate, flips "
+            "FROM flipStats WHERE flips > 0 AND flipRate >= ? "
+            "ORDER BY flipRate DESC, testId LIMIT ?",
+            (minFlipRate, limit),
+        )
+        return [tuple(row) for row in rows]
+
+    def durationBaseline(self, testId):
+        """Get the p95 duration of the recent passed runs of the test, None if it hasn't
+        run enough times.
+        """
+        with self._lock:
+            durations = self._recentDurations(testId)
+            if len(durations) < self._minDurationSamples:
+                return None
+            return percentile(durations, self._slowTestPercentile)
+
+    def slowTestBaseline(self, testId, duration):
+        """Check the duration of the test against its baseline, it is checked before the
+        duration is recorded.
+
+        Returns:
+            float: The p95 duration if the test is slower than it times the factor,
+                otherwise None.
+        """
+        if not self._slowTestFactor or duration < self._minSlowDuration:
+            return None
+
+        baseline = self.durationBaseline(testId)
+        if baseline is not None and duration > baseline * self._slowTestFactor:
+            return baseline
+        return None
+
+    def flush(self):
+        """Write the pending results and the stats in one transaction."""
+        with self._lock:
+            if not (self._pending or self._pendingStats or self._pendingFlipStats):
+                return
+
+            pending = self._pending
+            self._pending = []
+            stats = [
+                (testId, json.dumps(self._durationStats[testId]))
+                for testId in self._pendingStats
+            ]
+            self._pendingStats = set()
+            flipStats = [
+                (testId,) + tuple(self._flipStats[testId])
+                for testId in self._pendingFlipStats
+            ]
+            self._pendingFlipStats = set()
+            try:
+                with self._connect() as connection:
+                    connection.executemany(
+                        "INSERT INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)", pending
+                    )
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO durationStats VALUES (?, ?)", stats
+                    )
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO flipStats VALUES (?, ?, ?, ?)",
+                        flipStats,
+                    )
+            except (sqlite3.Error, OSError):
+                logger.exception("Unable to record the test results.")
+
+    def endRun(self):
+        with self._lock:
+            if self._runId is None:
+                return
+
+            self.flush()
+            try:
+                with self._connect() as connection:
+                    connection.execute(
+                        "UPDATE runs SET stopTime = ?, testCount = ? WHERE id = ?",
+                        (time.time(), self._runTestCount, self._runId),
+                    )
+                    self._deleteOldResults(connection)
+            except (sqlite3.Error, OSError):
+                logger.exception("Unable to record the end of the run.")
+            self._runId = None
+            self._runTestIds = set()
+
+    def _deleteOldResults(self, connection):
+        """Delete the results of the tests of the run beyond the most recent ones, and
+        the runs beyond the most recent ones.
+        """
+        connection.executemany(
+            "DELETE FROM results WHERE testId = ? AND runId <= ("
+            "SELECT runId FROM results WHERE testId = ? "
+            "ORDER BY runId DESC LIMIT 1 OFFSET ?)",
+            [(t, t, self._maxResultsPerTest) for t in self._runTestIds],
+        )
+        connection.execute(
+            "DELETE FROM runs WHERE id <= ("
+            "SELECT id FROM runs ORDER BY id DESC LIMIT 1 OFFSET ?)",
+            (self._maxRuns,),
+        )
+
+    def _query(self, sql, args=()):
+        with self._lock:
+            self.flush()
+            try:
+                return self._connect().execute(sql, args).fetchall()
+            except (sqlite3.Error, OSError):
+                logger.exception("Unable to read the test history.")
+                return []
+
+    def runs(self, limit=20):
+        """Get the recent runs as (runId, runner, startTime, stopTime, testCount) tuples,
+        the latest first.
+        """
+        return self._query(
+            "SELECT id, runner, startTime, stopTime, testCount FROM runs "
+            "ORDER BY id DESC LIMIT ?",
+            (limit,),
+        )
+
+    def testResults(self, testId, limit=20):
+        """Get the recent results of the test, the latest first."""
+        rows = self._query(
+            "SELECT * FROM results WHERE testId = ? ORDER BY runId DESC LIMIT ?",
+            (testId, limit),
+        )
+        return [TestResult(*row) for row in rows]
+
+    def runResults(self, runId):
+        """Get the results of the tests of the run, in the order they were recorded."""
+        rows = self._query(
+            "SELECT * FROM results WHERE runId = ? ORDER BY rowid", (runId,)
+        )
+        return [TestResult(*row) for row in rows]
+
+    def clear(self):
+        with self._lock:
+            self._pending = []
+            self._pendingStats = set()
+            self._durationStats = {}
+            self._pendingFlipStats = set()
+            self._flipStats = {}
+            try:
+                with self._connect() as connection:
+                    connection.execute("DELETE FROM results")
+                    connection.execute("DELETE FROM runs")
+                    connection.execute("DELETE FROM durationStats")
+                    connection.execute("DELETE FROM flipStats")
+            except (sqlite3.Error, OSError):
+                logger.exception("Unable to clear the test history.")
+
+
+class FixtureTimer(object):
+    """Time the setUp and tearDown of a TestCase by wrapping them on the instance."""
+
+    _phases = ("setUp", "tearDown")
+
+    def __init__(self, test):
+        self._test = test
+        self.times = {}
+        self._attached = []
+        for phase in self._phases:
+            method = getattr(test, phase, None)
+            if method is None or phase in vars(test):
+                continue
+            setattr(test, phase, self._wrap(phase, method))
+            self._attached.append(phase)
+
+    def _wrap(self, phase, method):
+        def _timed(*args, **kwargs):
+            startTime = time.time()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.times[phase] = time.time() - startTime
+
+        return _timed
+
+    def detach(self):
+        for phase in self._attached:
+            try:
+                delattr(self._test, phase)
+            except AttributeError:
+                pass
+        self._attached = []
+
+    def setUpTime(self):
+        return self.times.get("setUp")
+
+    def tearDownTime(self):
+        return self.times.get("tearDown")
@@ -2,9 +2,23 @@
 # This file is part of IUTest, and is released under the "MIT License Agreement".
 # Please see the LICENSE file that should have been included as part of this package.
 
+import os
+import copy
+import time
 import logging
 
+from iutest.core import constants
+from iutest.core import discoverycache
+from iutest.core import filewatcher
+from iutest.core import impactanalysis
+from iutest.core import modulereloader
 from iutest.core import pathutils
+from iutest.core import pyunitutils
+from iutest.core import resultwriters
+from iutest.core import scheduler
+from iutest.core import staticlister
+from iutest.core import testhistory
+from iutest.core import uistream
 from iutest.core.runners import runnerconstants
 from iutest.core.runners import registry
 
@@ -16,6 +30,17 @@ class TestManager(object):
         self._startDirOrModule = ""
         self._topDir = ""
         self._stopOnError = False
+        self._parallelJobs = 1
+        self._workerPreloadModules = []
+        self._workerRecycleLimits = (0, 0)
+        self._testTimeouts = (0, 0)
+        self._flakyReruns = (0, False)
+        self._shard = None
+        self._impactAnalyzer = None
+        self._runCancelled = False
+        self._useDiscoveryCache = True
+        self._listingMode = constants.LISTING_MODE_IMPORT
+        self._staticListerUsed = False
         self._ui = ui
         self._runnerMode = runnerconstants.RUNNER_PYUNIT
         self._runners = {}
@@ -91,6 +116,167 @@ class TestManager(object):
     def stopOnError(self):
         return self._stopOnError
 
+    def setParallelJobs(self, jobs):
+        """Set how many processes to run the tests in parallel.
+
+        Notes:
+            Only the runners that support it run tests in parallel, 1 to run the tests
+            in the current python session as usual.
+        """
+        self._parallelJobs = max(1, int(jobs or 1))
+
+    def parallelJobs(self):
+        return self._parallelJobs
+
+    def setWorkerPreloadModules(self, moduleNames):
+        """Set the modules the worker processes import before running any test.
+
+        Notes:
+            The worker processes are kept between the runs, the heavy dependencies of
+            the tests are better to be preloaded so that they are imported only once.
+        """
+        self._workerPreloadModules = [m for m in moduleNames or [] if m]
+
+    def workerPreloadModules(self):
+        return list(self._workerPreloadModules)
+
+    def setWorkerRecycleLimits(self, maxTests=0, maxMemoryMB=0):
+        """Replace a worker process by a new one after it ran maxTests tests or its
+        memory exceeds maxMemoryMB megabytes, 0 for no limit.
+        """
+        self._workerRecycleLimits = (max(0, int(maxTests)), max(0, int(maxMemoryMB)))
+
+    def workerRecycleLimits(self):
+        return self._workerRecycleLimits
+
+    def setTestTimeouts(self, testTimeout=0, sessionTimeout=0):
+        """Error out a test that runs longer than testTimeout seconds and stop the run
+        once it takes longer than sessionTimeout seconds, 0 for no limit.
+
+        Notes:
+            The tests and the TestCase classes decorated by iutest.timeout() override
+            the testTimeout.
+        """
+        self._testTimeouts = (
+            max(0.0, float(testTimeout or 0)),
+            max(0.0, float(sessionTimeout or 0)),
+        )
+
+    def testTimeouts(self):
+        return self._testTimeouts
+
+    def setSlowTestFactor(self, factor):
+        """Flag the tests that take longer than the p95 duration of their recent passed
+        runs times the factor, 0 to not flag any.
+        """
+        testhistory.TestHistory.setSlowTestFactor(factor)
+
+    def slowTestFactor(self):
+        return testhistory.TestHistory.slowTestFactor()
+
+    def setFlakyReruns(self, rerunCount, freshProcess=False):
+        """Rerun each failed test by itself up to rerunCount times once the run
+        finishes, the tests that pass in a rerun are flaky rather than broken.
+
+        Args:
+            rerunCount (int): The most reruns of each failed test, 0 to not rerun them.
+            freshProcess (bool): Rerun each test in a new process instead of the one
+                that ran the tests, so that the states left by the others don't matter.
+        """
+        self._flakyReruns = (max(0, int(rerunCount or 0)), bool(freshProcess))
+
+    def flakyReruns(self):
+        """Get (rerunCount, freshProcess) of the reruns of the failed tests."""
+        return self._flakyReruns
+
+    def setResultWriters(self, writers):
+        """Stream the results of the runs to files as the tests finish, e.g. for CI.
+
+        Args:
+            writers (list): The resultwriters.ResultWriter objects, each run, including
+                the reruns of its failed tests, overwrites their files.
+        """
+        resultwriters.ResultWriters.get().setWriters(writers)
+
+    def resultWriters(self):
+        return resultwriters.ResultWriters.get().writers()
+
+    def setShard(self, shardIndex, shardCount, durations=None):
+        """Only run one shard of the tests, e.g. to split them across CI machines.
+
+        Notes:
+            All the machines must use the same durations for the shards to not overlap,
+            without the durations the shards are balanced by the test count.
+
+        Args:
+            shardIndex (int): From 1 to shardCount, None to run all the tests.
+            shardCount (int): How many shards the tests are split into.
+            durations (TestDurations): The historical test durations to balance the shards.
+        """
+        if shardIndex is None or shardCount <= 1:
+            self._shard = None
+        else:
+            self._shard = (shardIndex, shardCount, durations)
+
+    def shard(self):
+        """Get (shardIndex, shardCount) of the tests to run, None to run all of them."""
+        return self._shard[:2] if self._shard else None
+
+    def _testIdsOfShard(self, testIds, groupTestCases):
+        if not self._shard:
+            return testIds
+
+        shardIndex, shardCount, durations = self._shard
+        shardIds = scheduler.selectShard(
+            testIds,
+            shardIndex,
+            shardCount,
+            durations=durations,
+            groupTestCases=groupTestCases,
+        )
+        logger.info(
+            "Shard %s/%s: %s of %s tests.",
+            shardIndex,
+            shardCount,
+            len(shardIds),
+            len(testIds),
+        )
+        return shardIds
+
+    def shutdownWorkerPools(self):
+        for runner in self._runners.values():
+            runner.shutdownWorkerPool()
+
+    def setUseDiscoveryCache(self, useCache):
+        """Whether the runner can use the on-disk cache to list the tests.
+
+        Notes:
+            With the cache, only the new or changed test modules will be imported again.
+        """
+        self._useDiscoveryCache = useCache
+
+    def useDiscoveryCache(self):
+        return self._useDiscoveryCache
+
+    def clearDiscoveryCache(self):
+        """Drop the cached test ids of the current dirs, the next listing imports all
+        the test modules again.
+        """
+        discoverycache.DiscoveryCache(self._startDirOrModule, self._topDir).clear()
+
+    def setListingMode(self, listingMode):
+        """Switch the way to list the tests.
+
+        Args:
+            listingMode (int): constants.LISTING_MODE_IMPORT to list the tests by the runner,
+                or constants.LISTING_MODE_STATIC to parse the test files without importing
+                them, only the modules that cannot be parsed statically will be imported.
+        """
+        self._listingMode = listingMode
+
+    def listingMode(self):
+        return self._listingMode
+
     def ui(self):
         return self._ui
 
@@ -117,20 +303,201 @@ class TestManager(object):
     def getRunner(self):
         return self.getRunnerByMode(self._runnerMode)
 
+    def impactAnalyzer(self):
+        """Get the analyzer of the tests affected by the changed files."""
+        dirs = (self._startDirOrModule, self._topDir)
+        if not self._impactAnalyzer or self._impactAnalyzer[0] != dirs:
+            analyzer = impactanalysis.TestImpactAnalyzer(*dirs)
+            self._impactAnalyzer = (dirs, analyzer)
+        return self._impactAnalyzer[1]
+
+    def _runTestIds(self, testIds):
+        if self._runCancelled:
+            logger.info("The test run was cancelled.")
+            return
+
+        runTime = time.time()
+        writers = resultwriters.ResultWriters.get()
+        writers.beginRun(self.getRunner().name())
+        try:
+            self.getRunner().runTests(*testIds)
+            if self._flakyReruns[0] and not self._runCancelled:
+                self._rerunFailedTests()
+        finally:
+            writers.endRun()
+        # Index the modules the tests loaded so that their later changes are found.
+        modulereloader.ModuleReloader.get().updateIndex()
+        if self._runCancelled:
+            # Only the tests that did run are up to date.
+            testIds = self.lastRunTestIds()
+        try:
+            self.impactAnalyzer().markTestsRun(testIds, runTime)
+        except Exception:
+            logger.debug(
+                "Unable to record the run for the impact analysis.", exc_info=True
+            )
+
+    @staticmethod
+    def _failedTestIds(runInfo):
+        return runInfo.records.testIdsWithStates(
+            constants.TEST_RESULT_FAIL, constants.TEST_RESULT_ERROR
+        )
+
+    def _rerunFailedTests(self):
+        """Rerun the failed tests one by one until they pass or run out of reruns, the
+        results of the run are then updated with the tests that passed.
+        """
+        runner = self.getRunner()
+        runInfo = self.lastRunInfo()
+        failedIds = self._failedTestIds(runInfo)
+        if not failedIds:
+            return
+
+        rerunCount, freshProcess = self._flakyReruns
+        logger.info(
+            "Rerun %s failed tests up to %s times each.", len(failedIds), rerunCount
+        )
+        # The reruns reset the run info, keep the one of the whole run.
+        mainRunInfo = copy.copy(runInfo)
+        flakyTests = []
+        writers = resultwriters.ResultWriters.get()
+        for attempt in range(1, rerunCount + 1):
+            writers.setRerun(attempt)
+            for testId in list(failedIds):
+                if self._runCancelled:
+                    break
+
+                if freshProcess:
+                    runner.runTestsInFreshProcess(testId)
+                else:
+                    runner.runTests(testId)
+                if runInfo.records.state(testId) == constants.TEST_RESULT_PASS:
+                    failedIds.remove(testId)
+                    flakyTests.append((testId, attempt))
+
+        runInfo.__dict__.update(mainRunInfo.__dict__)
+        self._applyFlakyTests(runInfo, flakyTests)
+
+    def _applyFlakyTests(self, runInfo, flakyTests):
+        history = testhistory.TestHistory.get()
+        for testId, attempt in flakyTests:
+            runInfo.records.replaceOutcome(testId, constants.TEST_RESULT_PASS)
+            flipRate = history.flipRate(testId)
+            logger.warning(
+                "FLAKY: %s passed on rerun %s, its result flips %.0f%% of the time.",
+                testId,
+                attempt,
+                flipRate * 100,
+            )
+            uistream.UiStream.callUiMethod(
+                "onFlakyTestDetected", testId, attempt, flipRate
+            )
+
+        runInfo.flakyTests = flakyTests
+        if runInfo.failedTestId in set(t for t, _ in flakyTests):
+            failedIds = self._failedTestIds(runInfo)
+            runInfo.failedTestId = failedIds[0] if failedIds else None
+        uistream.UiStream.callUiMethod("onAllTestsFinished")
+
     def runTests(self, *tests):
-        self.getRunner().runTests(*tests)
+        self._runCancelled = False
+        tests = self._testIdsOfShard(list(tests), groupTestCases=False)
+        if not tests:
+            logger.warning("No tests to run in this shard.")
+            return
+
+        self._runTestIds(tests)
 
     def iterAllTestIds(self):
+        self._staticListerUsed = False
+        if self._listingMode == constants.LISTING_MODE_STATIC:
+            lister = staticlister.StaticTestLister(self._startDirOrModule, self._topDir)
+            if lister.isApplicable():
+                self._staticListerUsed = True
+                for testId in lister.iterAllTestIds():
+                    yield testId
+                return
+
         for testId in self.getRunner().iterAllTestIds():
             yield testId
 
+        # What the test modules imported complements the static imports.
+        self.impactAnalyzer().recordRuntimeModules()
+        modulereloader.ModuleReloader.get().updateIndex()
+
+    def affectedTestIds(self, testIds=None, changeDetection=None, changedFiles=None):
+        """Get the tests affected by the changed python files.
+
+        Args:
+            testIds (list): The test ids to pick from, None for all the tests.
+            changeDetection (str): constants.CHANGE_DETECTION_MTIME to find the files
+                changed since their tests ran last time, or constants.CHANGE_DETECTION_GIT
+                for the changes in the local git checkout.
+            changedFiles (list): The files known to be changed, e.g. by the file watcher,
+                it overrides the changeDetection.
+
+        Returns:
+            list: The affected test ids.
+        """
+        if testIds is None:
+            testIds = list(self.iterAllTestIds())
+
+        changeDetection = changeDetection or constants.CHANGE_DETECTION_MTIME
+        return self.impactAnalyzer().affectedTestIds(
+            testIds, changeDetection, changedFiles=changedFiles
+        )
+
+    def watchDirs(self):
+        """The dirs to watch for the changed source files."""
+        startDir = self._startDirOrModule
+        if startDir and not os.path.isdir(startDir):
+            moduleFile = pyunitutils.findModuleFile(startDir)
+            startDir = os.path.dirname(moduleFile) if moduleFile else ""
+        return filewatcher.topMostDirs((startDir, self._topDir))
+
+    def testIdsAffectedByFiles(self, changedFiles, testIds=None):
+        """Get the tests to rerun for the changed files, out of the last run tests by
+        default, the changed modules should be reimported beforehand.
+        """
+        if testIds is None:
+            testIds = self.lastRunTestIds()
+        if not testIds:
+            return []
+
+        return self.affectedTestIds(testIds, changedFiles=changedFiles)
+
+    def runAffectedTests(self, changeDetection=None):
+        tests = self.affectedTestIds(changeDetection=changeDetection)
+        if not tests:
+            logger.info("No tests are affected by the changes.")
+            return
+
+        logger.info("Run %s tests affected by the changes.", len(tests))
+        self.runTests(*tests)
+
     def runAllTests(self):
+        self._runCancelled = False
         tests = list(self.iterAllTestIds())
         if not tests:
             logger.warning("No tests found to run.")
             return
 
-        self.runTests(*tests)
+        tests = self._testIdsOfShard(tests, groupTestCases=True)
+        if not tests:
+            logger.warning("No tests to run in this shard.")
+            return
+
+        self._runTestIds(tests)
+
+    def cancelRun(self):
+        """Ask the running tests to stop before the next test, it can be called from
+        another thread than the one running the tests.
+        """
+        self._runCancelled = True
+        self.getRunner().cancelRun()
+
+    def isRunCancelled(self):
+        return self._runCancelled
 
     def runSingleTestPartially(self, testId, partialMode):
         """Run partial steps of test, like running setUp only, or setUp and test but without teardown.
@@ -139,9 +506,12 @@ class TestManager(object):
             partialMode (int): the test run mode, available values are:
                 constants.RUN_TEST_SETUP_ONLY | constants.RUN_TEST_NO_TEAR_DOWN
         """
+        self._runCancelled = False
         self.getRunner().runSingleTestPartially(testId, partialMode)
 
     def hasLastListerError(self):
+        if self._staticListerUsed:
+            return staticlister.StaticTestLister.gotError
         return self.getRunner().hasLastListerError()
 
     def lastRunTestIds(self):
@@ -0,0 +1,370 @@
+# Copyright 2019-2020 by Wenfeng Gao, MGLAND animation studio. All rights reserved.
+# This file is part of IUTest, and is released under the "MIT License Agreement".
+# Please see the LICENSE file that should have been included as part of this package.
+
+import sys
+import array
+
+from iutest.core import constants
+
+try:
+    _intern = sys.intern
+except AttributeError:
+    _intern = intern  # python 2
+
+NO_NODE = -1
+NOTE_SLOW = 1
+NOTE_FLAKY = 2
+
+_UNKNOWN_TIME = -1.0
+_STATE_COUNT = constants.TEST_RESULT_ERROR + 1
+
+
+class TestNodeStore(object):
+    """The nodes of the test tree: the root, packages, modules, suites and tests.
+
+    Notes:
+        A node is an int, the index of its row in the columns of arrays, e.g. its
+        parent, category, state and timing. Only the interned names and ids and the
+        child lists of the non-leaf nodes are python objects, so the store costs a small
+        fraction of a tree widget item per test. The removed nodes leave holes that are
+        dropped by the next clear().
+
+        Every node counts its children by their states, the state of a parent is
+        derived from the counts: running if any child is running, otherwise the worst
+        state of the children. A state change updates the counts of the ancestors up
+        to the first one whose state stays the same, no siblings are visited.
+
+        The nodes are also indexed by their lower case names and by their states for
+        the tree filter, see TestFilter.
+    """
+
+    _emptyStateCounts = array.array("l", [0] * _STATE_COUNT)
+
+    def __init__(self):
+        self._structureVersion = 0
+        self.clear()
+
+    def clear(self):
+        self._ids = []
+        self._names = []
+        self._children = []
+        self._parents = array.array("l")
+        self._rows = array.array("l")
+        self._categories = array.array("b")
+        self._states = array.array("b")
+        self._startTimes = array.array("d")
+        self._stopTimes = array.array("d")
+        self._childStateCounts = array.array("l")
+        self._nodesById = {}
+        self._nodesByName = {}
+        self._nodesByState = [set() for _ in range(_STATE_COUNT)]
+        self._notes = {}
+        self._testCount = 0
+        self._structureVersion += 1
+
+    def __len__(self):
+        return len(self._nodesById)
+
+    def __contains__(self, testId):
+        return testId in self._nodesById
+
+    def root(self):
+        return 0 if self._ids and self._ids[0] in self._nodesById else NO_NODE
+
+    def node(self, testId):
+        """Get the node of the test id, NO_NODE if it is not in the tree."""
+        return self._nodesById.get(testId, NO_NODE)
+
+    def isInTree(self, node):
+        """Whether the node is still in the tree, i.e. not removed."""
+        if node < 0 or node >= len(self._ids):
+            return False
+        return self._nodesById.get(self._ids[node]) == node
+
+    def structureVersion(self):
+        """A number that changes whenever nodes are added or removed."""
+        return self._structureVersion
+
+    def testId(self, node):
+        return self._ids[node]
+
+    def name(self, node):
+        return self._names[node]
+
+    def parent(self, node):
+        return self._parents[node]
+
+    def row(self, node):
+        return self._rows[node]
+
+    def category(self, node):
+        return self._categories[node]
+
+    def setCategory(self, node, category):
+        if self._categories[node] == category:
+            return
+        if self._categories[node] == constants.ITEM_CATEGORY_TEST:
+            self._testCount -= 1
+        elif category == constants.ITEM_CATEGORY_TEST:
+            self._testCount += 1
+        self._categories[node] = category
+
+    def state(self, node):
+        return self._states[node]
+
+    def childStateCount(self, node, state):
+        """The number of the children of the node in the state."""
+        return self._childStateCounts[node * _STATE_COUNT + state]
+
+    def _aggregatedState(self, node):
+        counts = self._childStateCounts
+        base = node * _STATE_COUNT
+        if counts[base + constants.TEST_RESULT_RUNNING]:
+            return constants.TEST_RESULT_RUNNING
+
+        for state in range(constants.TEST_RESULT_ERROR, constants.TEST_RESULT_NONE, -1):
+            if counts[base + state]:
+                return state
+        return constants.TEST_RESULT_NONE
+
+    def _propagateState(self, parent, oldState, newState):
+        """Move a child of the parent from the old state to the new one and update the
+        ancestors as far as their states change.
+
+        Returns:
+            list: The ancestors whose states changed.
+        """
+        changedNodes = []
+        counts = self._childStateCounts
+        while parent != NO_NODE:
+            base = parent * _STATE_COUNT
+            if oldState is not None:
+                counts[base + oldState] -= 1
+            if newState is not None:
+                counts[base + newState] += 1
+
+            oldState = self._states[parent]
+            newState = self._aggregatedState(parent)
+            if oldState == newState:
+                break
+
+            self._moveState(parent, oldState, newState)
+            changedNodes.append(parent)
+            parent = self._parents[parent]
+        return changedNodes
+
+    def _moveState(self, node, oldState, newState):
+        self._states[node] = newState
+        self._nodesByState[oldState].discard(node)
+        self._nodesByState[newState].add(node)
+
+    def nodesInState(self, state):
+        """The nodes in the state, don't modify it."""
+        return self._nodesByState[state]
+
+    def flakyNodes(self):
+        return set(node for node, note in self._notes.items() if note[0] == NOTE_FLAKY)
+
+    def nodesWithNameContaining(self, text):
+        """Iterate the nodes whose lower case names contain the text."""
+        for name, nodes in self._nodesByName.items():
+            if text in name:
+                for node in nodes:
+                    yield node
+
+    def setState(self, node, state):
+        """Set the state of the node, usually a test, its ancestors follow.
+
+        Returns:
+            list: The node and the ancestors whose states changed.
+        """
+        oldState = self._states[node]
+        if oldState == state:
+            return []
+
+        self._moveState(node, oldState, state)
+        return [node] + self._propagateState(self._parents[node], oldState, state)
+
+    def resetNodes(self, node):
+        """Clear the states, times and notes of the node and its descendants at once.
+
+        Returns:
+            list: The ancestors whose states changed.
+        """
+        changedNodes = self.setState(node, constants.TEST_RESULT_NONE)[1:]
+        counts = self._childStateCounts
+        for each in self.iterDescendants(node):
+            self._moveState(each, self._states[each], constants.TEST_RESULT_NONE)
+            self._startTimes[each] = _UNKNOWN_TIME
+            self._stopTimes[each] = _UNKNOWN_TIME
+            self._notes.pop(each, None)
+            base = each * _STATE_COUNT
+            counts[base : base + _STATE_COUNT] = self._emptyStateCounts
+            counts[base + constants.TEST_RESULT_NONE] = self.childCount(each)
+        return changedNodes
+
+    def childCount(self, node):
+        children = self._children[node]
+        return len(children) if children else 0
+
+    def child(self, node, row):
+        return self._children[node][row]
+
+    def children(self, node):
+        """The child nodes in the order of the rows, don't modify it."""
+        return self._children[node] or ()
+
+    def testCount(self):
+        return self._testCount
+
+    def allIds(self):
+        """The ids of all the nodes in the tree, in no particular order."""
+        return list(self._nodesById)
+
+    def addNode(self, parent, name, testId, category, row=None):
+        """Add a node under the parent, NO_NODE for the root.
+
+        Args:
+            parent (int): The parent node.
+            name (str): The label of the node, the last part of the test id.
+            testId (str): The full test id of the node.
+            category (int): One of the constants.ITEM_CATEGORY_*.
+            row (int): The row among the children of the parent, None to append it.
+
+        Returns:
+            int: The new node.
+        """
+        node = len(self._ids)
+        testId = _intern(str(testId))
+        self._ids.append(testId)
+        self._names.append(_intern(str(name)))
+        self._children.append(None)
+        self._parents.append(parent)
+        self._categories.append(category)
+        self._states.append(constants.TEST_RESULT_NONE)
+        self._startTimes.append(_UNKNOWN_TIME)
+        self._stopTimes.append(_UNKNOWN_TIME)
+        self._childStateCounts.extend(self._emptyStateCounts)
+        self._nodesById[testId] = node
+        self._nodesByName.setdefault(self._names[node].lower(), []).append(node)
+        self._nodesByState[constants.TEST_RESULT_NONE].add(node)
+        self._structureVersion += 1
+        if category == constants.ITEM_CATEGORY_TEST:
+            self._testCount += 1
+
+        if parent == NO_NODE:
+            self._rows.append(0)
+            return node
+
+        siblings = self._children[parent]
+        if siblings is None:
+            siblings = self._children[parent] = []
+        if row is None or row >= len(siblings):
+            self._rows.append(len(siblings))
+            siblings.append(node)
+        else:
+            self._rows.append(row)
+            siblings.insert(row, node)
+            for i in range(row + 1, len(siblings)):
+                self._rows[siblings[i]] = i
+
+        self._propagateState(parent, None, constants.TEST_RESULT_NONE)
+        return node
+
+    def removeNode(self, node):
+        """Remove the node and all its descendants from the tree.
+
+        Returns:
+            list: The ancestors whose states changed.
+        """
+        changedNodes = []
+        parent = self._parents[node]
+        if parent != NO_NODE:
+            siblings = self._children[parent]
+            row = self._rows[node]
+            del siblings[row]
+            for i in range(row, len(siblings)):
+                self._rows[siblings[i]] = i
+            changedNodes = self._propagateState(parent, self._states[node], None)
+
+        for each in self.iterDescendants(node):
+            self._nodesById.pop(self._ids[each], None)
+            name = self._names[each].lower()
+            self._nodesByName[name].remove(each)
+            if not self._nodesByName[name]:
+                del self._nodesByName[name]
+            self._nodesByState[self._states[each]].discard(each)
+            self._notes.pop(each, None)
+            if self._categories[each] == constants.ITEM_CATEGORY_TEST:
+                self._testCount -= 1
+        self._structureVersion += 1
+        return changedNodes
+
+    def iterDescendants(self, node, category=None):
+        """Iterate the node and its descendants depth first, or the top most of them of
+        the category if given.
+        """
+        stack = [node]
+        while stack:
+            each = stack.pop()
+            if category is None or self._categories[each] == category:
+                yield each
+                if category is not None:
+                    continue
+            children = self._children[each]
+            if children:
+                stack.extend(reversed(children))
+
+    def iterAncestors(self, node):
+        """Iterate the parent of the node, its parent and so on up to the root."""
+        node = self._parents[node]
+        while node != NO_NODE:
+            yield node
+            node = self._parents[node]
+
+    def iterTestNodes(self):
+        root = self.root()
+        if root == NO_NODE:
+            return iter(())
+        return self.iterDescendants(root, constants.ITEM_CATEGORY_TEST)
+
+    @staticmethod
+    def _time(column, node):
+        value = column[node]
+        return None if value == _UNKNOWN_TIME else value
+
+    def startTime(self, node):
+        return self._time(self._startTimes, node)
+
+    def stopTime(self, node):
+        return self._time(self._stopTimes, node)
+
+    def setTimes(self, node, startTime=None, stopTime=None):
+        """Set the start and stop time of the test, None to clear them."""
+        self._startTimes[node] = _UNKNOWN_TIME if startTime is None else startTime
+        self._stopTimes[node] = _UNKNOWN_TIME if stopTime is None else stopTime
+
+    def setStopTime(self, node, stopTime):
+        self._stopTimes[node] = _UNKNOWN_TIME if stopTime is None else stopTime
+
+    def duration(self, node):
+        startTime = self.startTime(node)
+        stopTime = self.stopTime(node)
+        if startTime is None or stopTime is None:
+            return None
+        return stopTime - startTime
+
+    def note(self, node):
+        """Get the (kind, toolTip) noted for the test, e.g. NOTE_SLOW, None if any."""
+        return self._notes.get(node)
+
+    def setNote(self, node, kind, toolTip):
+        self._notes[node] = (kind, toolTip)
+
+    def clearNote(self, node):
+        self._notes.pop(node, None)
+
+    def isFlaky(self, node):
+        note = self._notes.get(node)
+        return bool(note) and note[0] == NOTE_FLAKY
@@ -0,0 +1,232 @@
+# Copyright 2019-2020 by Wenfeng Gao, MGLAND animation studio. All rights reserved.
+# This file is part of IUTest, and is released under the "MIT License Agreement".
+# Please see the LICENSE file that should have been included as part of this package.
+
+import os
+import sys
+import time
+import logging
+import tempfile
+import threading
+import traceback
+
+try:
+    import faulthandler
+except ImportError:
+    faulthandler = None
+
+from iutest.core import backgroundrun
+
+logger = logging.getLogger(__name__)
+
+_timeoutAttr = "_iutestTimeout"
+
+
+class TestTimeoutError(Exception):
+    """Raised in the running test once it exceeds its timeout."""
+
+    def __init__(self, msg="The test timed out, see the thread stacks in the log."):
+        Exception.__init__(self, msg)
+
+
+def timeout(seconds):
+    """Decorator to override the default timeout of a TestCase class or a test method.
+
+    Examples:
+        @iutest.timeout(120)
+        class SlowTests(unittest.TestCase):
+            @iutest.timeout(0)  # No limit.
+            def test_verySlow(self):
+                ...
+
+    Args:
+        seconds (float): The time limit of each test in seconds, 0 for no limit.
+    """
+
+    def _decorator(obj):
+        setattr(obj, _timeoutAttr, max(0.0, float(seconds)))
+        return obj
+
+    return _decorator
+
+
+def testTimeout(test, default=0):
+    """Get the timeout of the test, the one of the test method comes first, then the
+    one of its class, the default is used if neither is decorated by timeout().
+    """
+    methodName = getattr(test, "_testMethodName", None)
+    method = getattr(test, methodName, None) if methodName else None
+    for obj in (method, test):
+        value = getattr(obj, _timeoutAttr, None)
+        if value is not None:
+            return value
+
+    return default
+
+
+def dumpAllThreadStacks():
+    """Get the stacks of all the threads as text, by faulthandler where available."""
+    if faulthandler:
+        try:
+            with tempfile.TemporaryFile(mode="w+") as f:
+                faulthandler.dump_traceback(f, all_threads=True)
+                f.seek(0)
+                return f.read()
+        except Exception:
+            logger.debug("Unable to dump the stacks by faulthandler.")
+
+    threadNames = dict((t.ident, t.name) for t in threading.enumerate())
+    lines = []
+    for ident, frame in sys._current_frames().items():
+        lines.append('Thread {} "{}":'.format(ident, threadNames.get(ident, "")))
+        lines.extend(line.rstrip() for line in traceback.format_stack(frame))
+    return "\n".join(lines)
+
+
+def stackDumpPath(pid):
+    """The file the worker process of the pid dumps its stacks to once a test times out."""
+    return os.path.join(tempfile.gettempdir(), "iutest_stacks_{}.txt".format(pid))
+
+
+def readStackDump(pid):
+    """Read and remove the stack dump of the worker process, empty if there is none."""
+    path = stackDumpPath(pid)
+    if not os.path.isfile(path):
+        return ""
+
+    try:
+        with open(path) as f:
+            content = f.read()
+        os.remove(path)
+        return content
+    except (IOError, OSError):
+        return ""
+
+
+class TestWatchdog(object):
+    """Watch the running test and the whole session in a thread, once either exceeds
+    its timeout, the stacks of all the threads are logged and TestTimeoutError is
+    raised in the running test so that it errors out and the next test runs.
+
+    Notes:
+        The exception only takes effect once the test runs python code again, a test
+        blocked in a native call cannot be interrupted in-process, it is reported once
+        it stays blocked for graceTime seconds after the timeout.
+    """
+
+    checkInterval = 0.1
+    graceTime = 5.0
+
+    def __init__(self, testTimeout=0, sessionTimeout=0, onTimeout=None):
+        """
+        Args:
+            testTimeout (float): The default time limit of each test, 0 for no limit.
+            sessionTimeout (float): The time limit of the whole run, 0 for no limit.
+            onTimeout (callable): Called as onTimeout(testId, isSession) in the watchdog
+                thread when the timeout hits, testId is None if no test is running.
+        """
+        self._testTimeout = testTimeout or 0
+        self._sessionTimeout = sessionTimeout or 0
+        self._onTimeout = onTimeout
+        self._lock = threading.Lock()
+        self._stopEvent = threading.Event()
+        self._thread = None
+        self._sessionDeadline = 0
+        self._sessionTimedOut = False
+        self._resetTest()
+
+    def _resetTest(self):
+        self._testId = None
+        self._testDeadline = 0
+        self._threadIdent = None
+        self._firedTime = 0
+        self._reportedBlocked = False
+
+    def isSessionTimedOut(self):
+        return self._sessionTimedOut
+
+    def start(self):
+        if self._thread:
+            return
+
+        if self._sessionTimeout:
+            self._sessionDeadline = time.time() + self._sessionTimeout
+        self._stopEvent.clear()
+        self._thread = threading.Thread(target=self._watch, name="IUTestWatchdog")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        if not self._thread:
+            return
+
+        self._stopEvent.set()
+        self._thread.join()
+        self._thread = None
+
+    def watchTest(self, test):
+        """Start watching the test, it must be called in the thread running it."""
+        seconds = testTimeout(test, self._testTimeout)
+        with self._lock:
+            self._resetTest()
+            self._testId = test.id()
+            self._testDeadline = time.time() + seconds if seconds else 0
+            self._threadIdent = threading.current_thread().ident
+
+    def unwatchTest(self):
+        with self._lock:
+            if self._firedTime:
+                # The test may have finished before the exception took effect.
+                backgroundrun.clearRaiseInThread(self._threadIdent)
+            self._resetTest()
+
+    def _watch(self):
+        while not self._stopEvent.wait(self.checkInterval):
+            with self._lock:
+                self._check(time.time())
+
+    def _check(self, now):
+        if (
+            self._sessionDeadline
+            and not self._sessionTimedOut
+            and now >= self._sessionDeadline
+        ):
+            self._sessionTimedOut = True
+            self._fire(
+                "The test session exceeded its {}s timeout".format(
+                    self._sessionTimeout
+                ),
+                isSession=True,
+            )
+            return
+
+        if not self._testId:
+            return
+
+        if self._firedTime:
+            if not self._reportedBlocked and now - self._firedTime >= self.graceTime:
+                self._reportedBlocked = True
+                logger.error(
+                    "%s is still blocked after it timed out, it may be waiting in a "
+                    "native call which cannot be interrupted.",
+                    self._testId,
+                )
+            return
+
+        if self._testDeadline and now >= self._testDeadline:
+            self._fire("{} exceeded its timeout".format(self._testId), isSession=False)
+
+    def _fire(self, reason, isSession):
+        testId = self._testId
+        logger.error(
+            "%s, the stacks of all the threads:\n%s", reason, dumpAllThreadStacks()
+        )
+        if self._onTimeout:
+            try:
+                self._onTimeout(testId, isSession)
+            except Exception:
+                logger.exception("Error handling the timeout of %s", testId)
+
+        if testId and not self._firedTime:
+            self._firedTime = time.time()
+            backgroundrun.raiseInThread(self._threadIdent, TestTimeoutError)
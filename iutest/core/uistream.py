@@ -6,27 +6,110 @@ import weakref
 import re
 import sys
 import logging
+import threading
+from iutest import qt as _qt
 from iutest.core import constants
 
 logger = logging.getLogger(__name__)
 
 
+def _makeUiThreadDispatcher():
+    """Make the dispatcher in the ui thread, it is only needed when there is a ui."""
+
+    class _UiThreadDispatcher(_qt.QtCore.QObject):
+        """Carry the calls made from other threads to the ui thread by a queued signal,
+        the calls are made in the same order as they are emitted.
+        """
+
+        invoked = _qt.Signal(object)
+
+        def __init__(self):
+            _qt.QtCore.QObject.__init__(self)
+            self._threadIdent = threading.current_thread().ident
+            self.invoked.connect(self._call, _qt.QtCore.Qt.QueuedConnection)
+
+        def isUiThread(self):
+            return threading.current_thread().ident == self._threadIdent
+
+        def _call(self, call):
+            func, args, kwargs = call
+            try:
+                func(*args, **kwargs)
+            except Exception:
+                logger.exception("Unable to call %s in the ui thread.", func)
+
+    return _UiThreadDispatcher()
+
+
+def isUiThread():
+    """Whether it is called in the ui thread, True if there isn't any ui."""
+    dispatcher = UiStream._dispatcher
+    return not dispatcher or dispatcher.isUiThread()
+
+
+def callInUiThread(func, *args, **kwargs):
+    """Call the func directly in the ui thread, or queue it to the ui thread if we are
+    in another thread, e.g. running the tests in background.
+
+    Returns:
+        object: The result of the func, None if the call is queued.
+    """
+    if isUiThread():
+        return func(*args, **kwargs)
+
+    UiStream._dispatcher.invoked.emit((func, args, kwargs))
+    return None
+
+
+class UiUpdateQueue(object):
+    """Collect the calls of the per-test updates to the test window from any thread.
+
+    Notes:
+        The window takes the queued calls and applies them in a batch at a bounded
+        rate, instead of a call queued to the ui thread for every test event.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._updates = []
+
+    def __len__(self):
+        return len(self._updates)
+
+    def put(self, methodName, *args):
+        with self._lock:
+            self._updates.append((methodName, args))
+
+    def take(self):
+        """Take all the queued (methodName, args) in the order they were put."""
+        with self._lock:
+            updates = self._updates
+            self._updates = []
+        return updates
+
+
 class UiStream(object):
     _testMainWindow = None
     _logBrowser = None
+    _uiUpdateQueue = None
+    _dispatcher = None
 
     _urlTemplate = "<a href='?{1}={2}'>{0}</a>"
     _traceExp = None
 
     @classmethod
     def setUi(cls, wgt):
+        if not cls._dispatcher:
+            cls._dispatcher = _makeUiThreadDispatcher()
         cls._testMainWindow = weakref.ref(wgt)
         cls._logBrowser = cls.callUiMethod("getLogBrowserWidget")
+        cls._uiUpdateQueue = cls.callUiMethod("getUiUpdateQueue")
 
     @classmethod
     def unsetUi(cls, wgt):
         if cls._testMainWindow and cls._testMainWindow() == wgt:
             cls._testMainWindow = None
+            cls._uiUpdateQueue = None
 
     @classmethod
     def logBrowser(cls):
@@ -102,19 +185,19 @@ class UiStream(object):
         msg = self._processLinkInStackTrace(msg)
 
         if self._testResult == constants.TEST_RESULT_ERROR:
-            reportUi.logError(msg)
+            callInUiThread(reportUi.logError, msg)
 
         elif self._testResult == constants.TEST_RESULT_FAIL:
-            reportUi.logFailed(msg)
+            callInUiThread(reportUi.logFailed, msg)
 
         elif self._testResult == constants.TEST_RESULT_SKIP:
-            reportUi.logWarning(msg)
+            callInUiThread(reportUi.logWarning, msg)
 
         elif self._testResult == constants.TEST_RESULT_PASS:
-            reportUi.logSuccess(msg)
+            callInUiThread(reportUi.logSuccess, msg)
 
         else:
-            reportUi.logInformation(msg)
+            callInUiThread(reportUi.logInformation, msg)
 
     def writeln(self, msg=None):
         if msg:
@@ -126,6 +209,9 @@ class UiStream(object):
 
     @classmethod
     def callUiMethod(cls, methodName, *args, **kwargs):
+        """Call the method of the test window, the call is queued to the ui thread if it
+        is made from another thread, in which case None is returned.
+        """
         if not cls._testMainWindow:
             return
         ui = cls._testMainWindow()  # deref
@@ -134,7 +220,18 @@ class UiStream(object):
             logger.error("%s has no method called %s", ui, methodName)
             return None
 
-        return method(*args, **kwargs)
+        return callInUiThread(method, *args, **kwargs)
+
+    @classmethod
+    def queueUiUpdate(cls, methodName, *args):
+        """Queue the call of the method of the test window to the UiUpdateQueue of the
+        window, or call it right away if the window doesn't have one.
+        """
+        if cls._uiUpdateQueue is not None:
+            cls._uiUpdateQueue.put(methodName, *args)
+            return
+
+        cls.callUiMethod(methodName, *args)
 
 
 class _UiStreamProcessLinkCtx(object):
@@ -175,7 +272,20 @@ class _UiStreamLinkInfoCtx(object):
 def writePlainTextToUiStream(msg):
     reportUi = UiStream.logBrowser()
     if reportUi:
-        reportUi.logInformation(msg)
+        callInUiThread(reportUi.logInformation, msg)
+
+
+def writeLogMessageToUiStream(levelno, msg):
+    reportUi = UiStream.logBrowser()
+    if not reportUi:
+        return
+
+    if levelno == logging.WARNING:
+        callInUiThread(reportUi.logWarning, msg)
+    elif levelno == logging.ERROR:
+        callInUiThread(reportUi.logFailed, msg)
+    else:
+        callInUiThread(reportUi.logInformation, msg)
 
 
 class BaseCapturer(object):
@@ -213,18 +323,12 @@ class LogHandler(logging.Handler):
         self._rootLogger = logging.getLogger()
 
     def emit(self, record):
-        reportUi = UiStream.logBrowser()
         msg = self.format(record)
         if self._forcePlainOutput:
-            reportUi.logInformation(msg)
+            writePlainTextToUiStream(msg)
             return
 
-        if record.levelno == logging.WARNING:
-            reportUi.logWarning(msg)
-        elif record.levelno == logging.ERROR:
-            reportUi.logFailed(msg)
-        else:
-            reportUi.logInformation(msg)
+        writeLogMessageToUiStream(record.levelno, msg)
 
     def start(self):
         self._rootLogger.addHandler(self)
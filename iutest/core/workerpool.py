@@ -0,0 +1,863 @@
+# Copyright 2019-2020 by Wenfeng Gao, MGLAND animation studio. All rights reserved.
+# This file is part of IUTest, and is released under the "MIT License Agreement".
+# Please see the LICENSE file that should have been included as part of this package.
+
+import os
+import sys
+import time
+import signal
+import atexit
+import collections
+import logging
+import weakref
+import importlib
+import sysconfig
+import traceback
+import multiprocessing
+import unittest
+from unittest import loader
+
+try:
+    from Queue import Empty
+except ImportError:
+    from queue import Empty
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+try:
+    import faulthandler
+except ImportError:
+    faulthandler = None
+
+from iutest.core import constants
+from iutest.core import testhistory
+from iutest.core import timeouts
+
+logger = logging.getLogger(__name__)
+
+# The messages the worker processes send back, they are tuples with the message type first:
+MSG_TASK_START = "taskStart"  # (type, workerIndex, taskId, pid)
+MSG_TEST_START = "testStart"  # (type, workerIndex, testId, startTime, timeout)
+MSG_TEST_OUTCOME = "testOutcome"  # (type, workerIndex, testId, resultCode, details)
+MSG_TEST_STOP = "testStop"  # (type, workerIndex, testId, stopTime, output, fixtureTimes)
+MSG_TASK_DONE = "taskDone"  # (type, workerIndex, taskId)
+MSG_PRELOAD_FAILED = "preloadFailed"  # (type, workerIndex, moduleName, details)
+MSG_WORKER_RECYCLED = "workerRecycled"  # (type, workerIndex, reason)
+MSG_WORKER_EXIT = "workerExit"  # (type, workerIndex, pid, exitCode)
+MSG_WORKER_CRASHED = "workerCrashed"  # (type, workerIndex, taskId or None)
+# (type, workerIndex, testId, taskId, reason, stackDump)
+MSG_TEST_TIMEOUT = "testTimeout"
+
+# The worker index of the messages sent by the zygote process itself.
+ZYGOTE_INDEX = -1
+
+_pollInterval = 0.1
+_idlePollInterval = 1.0
+_shutdownTimeout = 5.0
+# How long past its timeout a test can take before its worker is killed, the worker
+# dumps its stacks and exits by itself at the timeout where faulthandler is available.
+_timeoutKillGrace = 2.0
+_pythonModuleExts = (".py", ".pyc", ".pyo")
+# The environment variable of the python interpreter to start the workers with.
+WORKER_PYTHON_ENV = "IUTEST_WORKER_PYTHON"
+_pythonExecutablePrefixes = ("python", "pypy")
+# The standalone interpreters shipped with the DCCs, or a plain one of their python.
+_hostPythonNames = (
+    "mayapy",
+    "python{}.{}".format(*sys.version_info[:2]),
+    "python{}".format(sys.version_info[0]),
+    "python",
+)
+
+
+def defaultJobCount():
+    try:
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return 1
+
+
+def _isPythonExecutable(filePath):
+    name = os.path.splitext(os.path.basename(filePath))[0].lower()
+    return name.startswith(_pythonExecutablePrefixes)
+
+
+def workerPython():
+    """Get the python interpreter to start the worker processes with, None if there
+    isn't any.
+
+    Notes:
+        In a DCC, e.g. Maya, sys.executable is the application instead of a python
+        interpreter, the standalone one shipped with it is used, e.g. mayapy. The
+        IUTEST_WORKER_PYTHON environment variable overrides it.
+    """
+    executable = os.environ.get(WORKER_PYTHON_ENV)
+    if executable:
+        return executable if os.path.isfile(executable) else None
+
+    executable = sys.executable or ""
+    if _isPythonExecutable(executable):
+        return executable
+
+    searchDirs = [os.path.dirname(executable), sys.exec_prefix]
+    if os.name != "nt":
+        searchDirs[1] = os.path.join(sys.exec_prefix, "bin")
+    exts = (".exe", "") if os.name == "nt" else ("",)
+    for dirPath in searchDirs:
+        for name in _hostPythonNames:
+            for ext in exts:
+                filePath = os.path.join(dirPath, name + ext)
+                if dirPath and os.path.isfile(filePath):
+                    return filePath
+    return None
+
+
+def parallelUnavailableReason():
+    """Get why the tests cannot run in the worker processes, None if they can."""
+    if not hasattr(multiprocessing, "get_context"):
+        return (
+            "Running the tests in parallel needs python 3, this process cannot be "
+            "forked safely while Qt runs in it."
+        )
+
+    if not workerPython():
+        return (
+            "Unable to find a python interpreter for the worker processes, {} is not "
+            "one, set the {} environment variable to one.".format(
+                sys.executable, WORKER_PYTHON_ENV
+            )
+        )
+    return None
+
+
+def _processContext():
+    # Forking a process that has Qt running is not safe, we start fresh interpreters.
+    context = multiprocessing.get_context("spawn")
+    executable = workerPython()
+    if executable != sys.executable:
+        context.set_executable(executable)
+    return context
+
+
+def parseModuleNames(text):
+    """Parse the module names separated by commas or spaces."""
+    return [n for n in text.replace(",", " ").split() if n]
+
+
+def _workerContext():
+    """The context the zygote starts the workers with, forking shares the preloaded
+    modules with the workers copy-on-write, where it is not available the workers are
+    spawned and preload the modules themselves.
+    """
+    getContext = getattr(multiprocessing, "get_context", None)
+    if not getContext:
+        return multiprocessing
+    if "fork" in multiprocessing.get_all_start_methods():
+        return getContext("fork")
+    return getContext("spawn")
+
+
+def _isForkContext(context):
+    getStartMethod = getattr(context, "get_start_method", None)
+    if not getStartMethod:
+        return os.name != "nt"
+    return getStartMethod() == "fork"
+
+
+def _parentWatcher():
+    """Get a function telling whether the parent process is still alive, so that the
+    zygote and the workers don't outlive a crashed IUTest session.
+    """
+    getParentProcess = getattr(multiprocessing, "parent_process", None)
+    parent = getParentProcess() if getParentProcess else None
+    if parent is not None:
+        return parent.is_alive
+
+    parentPid = os.getppid()
+    return lambda: os.getppid() == parentPid
+
+
+def currentMemoryUsage():
+    """Get the resident memory of the current process in bytes, None if unknown.
+
+    Notes:
+        Where the current resident size is not available, the peak one is used.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (IOError, OSError, ValueError, IndexError, AttributeError):
+        pass
+
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    maxRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxRss if sys.platform == "darwin" else maxRss * 1024
+
+
+def _extendSysPath(sysPath):
+    for path in reversed(sysPath):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+
+def _preloadModules(moduleNames, messageQueue, workerIndex):
+    for moduleName in moduleNames:
+        if moduleName in sys.modules:
+            continue
+        try:
+            importlib.import_module(moduleName)
+        except Exception:
+            messageQueue.put(
+                (MSG_PRELOAD_FAILED, workerIndex, moduleName, traceback.format_exc())
+            )
+
+
+def _stdlibDirs():
+    paths = sysconfig.get_paths()
+    return tuple(
+        set(os.path.normcase(paths[k]) + os.sep for k in ("stdlib", "platstdlib"))
+    )
+
+
+def _purgeImportedModules(baseline):
+    """Remove the python modules imported after the worker started, so that the test
+    modules and the code they test are imported fresh in the next run, while the
+    preloaded modules stay warm.
+    """
+    stdlibDirs = _stdlibDirs()
+    for moduleName in list(sys.modules):
+        if moduleName in baseline:
+            continue
+
+        filePath = getattr(sys.modules[moduleName], "__file__", None) or ""
+        if os.path.splitext(filePath)[1] not in _pythonModuleExts:
+            # Extension modules cannot be imported again.
+            continue
+
+        if os.path.normcase(os.path.abspath(filePath)).startswith(stdlibDirs):
+            continue
+
+        del sys.modules[moduleName]
+
+    invalidateCaches = getattr(importlib, "invalidate_caches", None)
+    if invalidateCaches:
+        invalidateCaches()
+
+
+class _WorkerConfig(object):
+    """The settings the zygote and the workers are started with."""
+
+    def __init__(
+        self, jobCount, sysPath, preloadModules, maxTestsPerWorker, maxWorkerMemory
+    ):
+        self.jobCount = jobCount
+        self.sysPath = sysPath
+        self.preloadModules = preloadModules
+        self.maxTestsPerWorker = maxTestsPerWorker
+        self.maxWorkerMemory = maxWorkerMemory
+        self.preloaded = False
+
+    def key(self):
+        return (
+            self.jobCount,
+            tuple(self.sysPath),
+            tuple(self.preloadModules),
+            self.maxTestsPerWorker,
+            self.maxWorkerMemory,
+        )
+
+    def recycleReason(self, testCount):
+        if self.maxTestsPerWorker and testCount >= self.maxTestsPerWorker:
+            return "Ran {} tests.".format(testCount)
+
+        if self.maxWorkerMemory:
+            memory = currentMemoryUsage()
+            if memory and memory >= self.maxWorkerMemory:
+                return "Used {:.1f} MB memory.".format(memory / 1048576.0)
+
+        return None
+
+
+class _WorkerTestResult(unittest.TestResult):
+    """Send the test events to the main process instead of reporting them here."""
+
+    def __init__(
+        self,
+        workerIndex,
+        resultQueue,
+        cancelEvent,
+        failfast=False,
+        testTimeout=0,
+        stackDumpFile=None,
+    ):
+        unittest.TestResult.__init__(self)
+        self.failfast = failfast
+        self._workerIndex = workerIndex
+        self._resultQueue = resultQueue
+        self._cancelEvent = cancelEvent
+        self._testTimeout = testTimeout
+        self._stackDumpFile = stackDumpFile
+        self._output = None
+        self._fixtureTimer = None
+        self._originalStdOut = None
+        self._originalStdErr = None
+
+    def _send(self, msgType, *args):
+        self._resultQueue.put((msgType, self._workerIndex) + args)
+
+    def _startCapture(self):
+        self._output = StringIO()
+        self._originalStdOut = sys.stdout
+        self._originalStdErr = sys.stderr
+        sys.stdout = self._output
+        sys.stderr = self._output
+
+    def _stopCapture(self):
+        if self._output is None:
+            return ""
+
+        sys.stdout = self._originalStdOut
+        sys.stderr = self._originalStdErr
+        output = self._output.getvalue()
+        self._output = None
+        return output
+
+    def startTest(self, test):
+        unittest.TestResult.startTest(self, test)
+        seconds = timeouts.testTimeout(test, self._testTimeout)
+        self._send(MSG_TEST_START, test.id(), time.time(), seconds)
+        self._fixtureTimer = testhistory.FixtureTimer(test)
+        if seconds and faulthandler and self._stackDumpFile:
+            # Dump the stacks and exit, the zygote replaces this worker.
+            faulthandler.dump_traceback_later(
+                seconds, exit=True, file=self._stackDumpFile
+            )
+        self._startCapture()
+
+    def stopTest(self, test):
+        if faulthandler and self._stackDumpFile:
+            faulthandler.cancel_dump_traceback_later()
+        unittest.TestResult.stopTest(self, test)
+        output = self._stopCapture()
+        fixtureTimes = {}
+        if self._fixtureTimer:
+            self._fixtureTimer.detach()
+            fixtureTimes = self._fixtureTimer.times
+            self._fixtureTimer = None
+        self._send(MSG_TEST_STOP, test.id(), time.time(), output, fixtureTimes)
+        if self._cancelEvent.is_set():
+            # The suite checks it before running the next test.
+            self.stop()
+
+    def _sendOutcome(self, test, resultCode, err=None):
+        details = self._exc_info_to_string(err, test) if err else ""
+        self._send(MSG_TEST_OUTCOME, test.id(), resultCode, details)
+        if self.failfast and resultCode in (
+            constants.TEST_RESULT_ERROR,
+            constants.TEST_RESULT_FAIL,
+        ):
+            self._cancelEvent.set()
+
+    def addSuccess(self, test):
+        unittest.TestResult.addSuccess(self, test)
+        self._sendOutcome(test, constants.TEST_RESULT_PASS)
+
+    def addError(self, test, err):
+        unittest.TestResult.addError(self, test, err)
+        self._sendOutcome(test, constants.TEST_RESULT_ERROR, err)
+
+    def addFailure(self, test, err):
+        unittest.TestResult.addFailure(self, test, err)
+        self._sendOutcome(test, constants.TEST_RESULT_FAIL, err)
+
+    def addSkip(self, test, reason):
+        unittest.TestResult.addSkip(self, test, reason)
+        self._send(MSG_TEST_OUTCOME, test.id(), constants.TEST_RESULT_SKIP, reason)
+
+    def addExpectedFailure(self, test, err):
+        unittest.TestResult.addExpectedFailure(self, test, err)
+        self._sendOutcome(test, constants.TEST_RESULT_EXPECTED_FAIL, err)
+
+    def addUnexpectedSuccess(self, test):
+        unittest.TestResult.addUnexpectedSuccess(self, test)
+        self._sendOutcome(test, constants.TEST_RESULT_UNEXPECTED_PASS)
+
+    def addSubTest(self, test, subtest, err):
+        unittest.TestResult.addSubTest(self, test, subtest, err)
+        if err is None:
+            return
+
+        resultCode = constants.TEST_RESULT_ERROR
+        if issubclass(err[0], test.failureException):
+            resultCode = constants.TEST_RESULT_FAIL
+        self._sendOutcome(test, resultCode, err)
+
+
+def _runTask(
+    workerIndex,
+    testIds,
+    resultQueue,
+    cancelEvent,
+    failfast,
+    testTimeout=0,
+    stackDumpFile=None,
+):
+    """Run the tests of a task, return how many tests ran."""
+    result = _WorkerTestResult(
+        workerIndex, resultQueue, cancelEvent, failfast, testTimeout, stackDumpFile
+    )
+    try:
+        suite = loader.defaultTestLoader.loadTestsFromNames(testIds)
+    except Exception:
+        err = sys.exc_info()
+        for testId in testIds:
+            holder = _TestIdHolder(testId)
+            result.startTest(holder)
+            result.addError(holder, err)
+            result.stopTest(holder)
+        return len(testIds)
+
+    suite.run(result)
+    return result.testsRun
+
+
+def _openStackDumpFile():
+    try:
+        return open(timeouts.stackDumpPath(os.getpid()), "w")
+    except (IOError, OSError):
+        return None
+
+
+def _closeStackDumpFile(stackDumpFile):
+    if not stackDumpFile:
+        return
+
+    stackDumpFile.close()
+    try:
+        os.remove(stackDumpFile.name)
+    except OSError:
+        pass
+
+
+def _workerMain(workerIndex, config, taskQueue, resultQueue, cancelEvent):
+    if not config.preloaded:
+        _extendSysPath(config.sysPath)
+        _preloadModules(config.preloadModules, resultQueue, workerIndex)
+
+    stackDumpFile = _openStackDumpFile()
+    isParentAlive = _parentWatcher()
+    baseline = set(sys.modules)
+    lastRunId = None
+    testCount = 0
+    while True:
+        try:
+            task = taskQueue.get(timeout=_idlePollInterval)
+        except Empty:
+            if not isParentAlive():
+                break
+            continue
+
+        if task is None:
+            break
+
+        runId, taskId, testIds, failfast, testTimeout = task
+        if lastRunId is not None and runId != lastRunId:
+            _purgeImportedModules(baseline)
+        lastRunId = runId
+
+        resultQueue.put((MSG_TASK_START, workerIndex, taskId, os.getpid()))
+        if not cancelEvent.is_set():
+            testCount += _runTask(
+                workerIndex,
+                testIds,
+                resultQueue,
+                cancelEvent,
+                failfast,
+                testTimeout,
+                stackDumpFile,
+            )
+        resultQueue.put((MSG_TASK_DONE, workerIndex, taskId))
+
+        reason = config.recycleReason(testCount)
+        if reason:
+            resultQueue.put((MSG_WORKER_RECYCLED, workerIndex, reason))
+            break
+
+    _closeStackDumpFile(stackDumpFile)
+    # Make sure all the messages are delivered before the process exits.
+    resultQueue.close()
+    resultQueue.join_thread()
+
+
+def _zygoteMain(config, taskQueue, resultQueue, eventQueue, cancelEvent, shutdownEvent):
+    """Preload the modules then keep the workers running, the exited workers are
+    replaced by new ones until the pool shuts down.
+
+    Notes:
+        The zygote reports to the eventQueue, it never uses the resultQueue of the
+        workers, whose state would be inherited half-way by the forked workers.
+    """
+    _extendSysPath(config.sysPath)
+    context = _workerContext()
+    if _isForkContext(context):
+        _preloadModules(config.preloadModules, eventQueue, ZYGOTE_INDEX)
+        config.preloaded = True
+
+    isParentAlive = _parentWatcher()
+    workers = {}
+
+    def _startWorker(workerIndex):
+        process = context.Process(
+            target=_workerMain,
+            args=(workerIndex, config, taskQueue, resultQueue, cancelEvent),
+            name="IUTestWorker{}".format(workerIndex),
+        )
+        process.daemon = True
+        process.start()
+        workers[workerIndex] = process
+
+    for workerIndex in range(config.jobCount):
+        _startWorker(workerIndex)
+
+    stopping = False
+    stopTime = None
+    while workers:
+        # Not waiting on the event, a killed waiter would block the one setting it.
+        time.sleep(_pollInterval)
+        if not stopping and (shutdownEvent.is_set() or not isParentAlive()):
+            stopping = True
+            stopTime = time.time()
+            cancelEvent.set()
+            for _ in workers:
+                taskQueue.put(None)
+
+        for workerIndex, process in list(workers.items()):
+            if process.is_alive():
+                if stopping and time.time() - stopTime > _shutdownTimeout:
+                    process.terminate()
+                continue
+
+            process.join()
+            del workers[workerIndex]
+            eventQueue.put(
+                (MSG_WORKER_EXIT, workerIndex, process.pid, process.exitcode)
+            )
+            if not stopping:
+                _startWorker(workerIndex)
+
+
+class _TestIdHolder(object):
+    """Stand for a test that we only know the id of."""
+
+    failureException = AssertionError
+
+    def __init__(self, testId):
+        self._testId = testId
+
+    def id(self):
+        return self._testId
+
+    def shortDescription(self):
+        return None
+
+    def __str__(self):
+        return self._testId
+
+
+class WorkerPool(object):
+    """A persistent pool of worker processes running the tests of the submitted tasks.
+
+    Notes:
+        The workers are forked from a zygote process which has imported the preload
+        modules already, so the heavy dependencies are imported once per pool instead
+        of once per run or worker. Where forking is not available, e.g. on Windows,
+        each worker imports the preload modules when it starts.
+        The pool stays alive between the runs, the workers drop the modules imported
+        by the previous run so that the changes of the tests are picked up, the
+        preload modules are kept, restart the pool to reload them.
+        A worker is replaced by a new one after it ran maxTestsPerWorker tests or its
+        memory exceeds maxWorkerMemory bytes, 0 for no limit.
+        A worker whose test exceeds its timeout dumps its stacks and exits, or it is
+        killed if it doesn't, the test is reported by MSG_TEST_TIMEOUT before the
+        worker crash and the worker is replaced.
+        The processes run workerPython(), start() raises RuntimeError if the pool
+        cannot run here, see parallelUnavailableReason().
+    """
+
+    def __init__(
+        self,
+        jobCount,
+        sysPath=None,
+        preloadModules=None,
+        maxTestsPerWorker=0,
+        maxWorkerMemory=0,
+    ):
+        self._config = _WorkerConfig(
+            max(1, int(jobCount)),
+            list(sysPath or sys.path),
+            list(preloadModules or []),
+            max(0, int(maxTestsPerWorker or 0)),
+            max(0, int(maxWorkerMemory or 0)),
+        )
+        self._context = None
+        self._zygote = None
+        self._taskQueue = None
+        self._resultQueue = None
+        self._eventQueue = None
+        self._backlog = collections.deque()
+        self._cancelEvent = None
+        self._shutdownEvent = None
+        self._runId = 0
+        self._failfast = False
+        self._testTimeout = 0
+        self._sessionTimeout = 0
+        self._sessionDeadline = 0
+        self._pendingTasks = set()
+        self._runningTasks = {}
+        self._runningTests = {}
+        self._timedOutPids = {}
+
+    def jobCount(self):
+        return self._config.jobCount
+
+    def settingsKey(self):
+        """A hashable key of the settings, pools with the same key are interchangeable."""
+        return self._config.key()
+
+    def isAlive(self):
+        return bool(self._zygote and self._zygote.is_alive())
+
+    def start(self):
+        if self.isAlive():
+            return
+
+        reason = parallelUnavailableReason()
+        if reason:
+            raise RuntimeError(reason)
+
+        if not self._context:
+            self._context = _processContext()
+        self._taskQueue = self._context.Queue()
+        self._resultQueue = self._context.Queue()
+        self._eventQueue = self._context.SimpleQueue()
+        self._backlog = collections.deque()
+        self._cancelEvent = self._context.Event()
+        self._shutdownEvent = self._context.Event()
+        self._pendingTasks = set()
+        self._runningTasks = {}
+        self._runningTests = {}
+        self._timedOutPids = {}
+        # The zygote starts the worker processes, so it cannot be a daemon process.
+        self._zygote = self._context.Process(
+            target=_zygoteMain,
+            args=(
+                self._config,
+                self._taskQueue,
+                self._resultQueue,
+                self._eventQueue,
+                self._cancelEvent,
+                self._shutdownEvent,
+            ),
+            name="IUTestZygote",
+        )
+        self._zygote.start()
+        _livePools.add(self)
+
+    def beginRun(self, failfast=False, testTimeout=0, sessionTimeout=0):
+        """Start a new run, the pool is started if it is not alive yet.
+
+        Args:
+            failfast (bool): Stop the workers on the first error or failure.
+            testTimeout (float): The default time limit of each test, 0 for no limit.
+            sessionTimeout (float): The time limit of the whole run, 0 for no limit.
+
+        Notes:
+            If the tasks of the previous run haven't been all consumed, e.g. the caller
+            was interrupted, the pool is restarted to drop them.
+        """
+        if self._pendingTasks:
+            logger.debug("Restart the worker pool to drop the unfinished tasks.")
+            self.shutdown()
+
+        self.start()
+        self._runId += 1
+        self._failfast = failfast
+        self._testTimeout = testTimeout or 0
+        self._sessionTimeout = sessionTimeout or 0
+        self._sessionDeadline = (
+            time.time() + self._sessionTimeout if self._sessionTimeout else 0
+        )
+        self._cancelEvent.clear()
+
+    def submit(self, taskId, testIds):
+        self._pendingTasks.add(taskId)
+        self._taskQueue.put(
+            (self._runId, taskId, list(testIds), self._failfast, self._testTimeout)
+        )
+
+    def cancel(self):
+        """Cancel all the pending tasks, the running tests stop before their next test."""
+        if self._cancelEvent:
+            self._cancelEvent.set()
+
+    def isCancelled(self):
+        return bool(self._cancelEvent and self._cancelEvent.is_set())
+
+    def _pidOfWorker(self, workerIndex):
+        for pid, (index, _) in self._runningTasks.items():
+            if index == workerIndex:
+                return pid
+        return None
+
+    def _killWorker(self, workerIndex, reason):
+        pid = self._pidOfWorker(workerIndex)
+        if pid is None or pid in self._timedOutPids:
+            return
+
+        self._timedOutPids[pid] = reason
+        try:
+            os.kill(pid, getattr(signal, "SIGKILL", signal.SIGTERM))
+        except OSError:
+            logger.debug("Unable to kill the worker process %s.", pid)
+
+    def _killOverdueWorkers(self):
+        now = time.time()
+        if self._sessionDeadline and now >= self._sessionDeadline:
+            self._sessionDeadline = 0
+            reason = "The test session exceeded its {}s timeout".format(
+                self._sessionTimeout
+            )
+            logger.error("%s, stop the run.", reason)
+            self.cancel()
+            for workerIndex in list(self._runningTests):
+                self._killWorker(workerIndex, reason)
+            return
+
+        for workerIndex, (testId, startTime, seconds) in list(
+            self._runningTests.items()
+        ):
+            if seconds and now - startTime >= seconds + _timeoutKillGrace:
+                self._killWorker(
+                    workerIndex, "{} exceeded its {}s timeout".format(testId, seconds)
+                )
+
+    def _timeoutMessage(self, workerIndex, pid, taskId):
+        """Get the MSG_TEST_TIMEOUT message if the worker exited as its test timed out."""
+        stackDump = timeouts.readStackDump(pid)
+        testId, _, seconds = self._runningTests.pop(workerIndex, (None, 0, 0))
+        reason = self._timedOutPids.pop(pid, None)
+        if not testId or not (reason or stackDump):
+            return None
+
+        reason = reason or "{} exceeded its {}s timeout".format(testId, seconds)
+        return (MSG_TEST_TIMEOUT, workerIndex, testId, taskId, reason, stackDump)
+
+    def _onZygoteExited(self):
+        for pid, (workerIndex, taskId) in list(self._runningTasks.items()):
+            yield (MSG_WORKER_CRASHED, workerIndex, taskId)
+            self._pendingTasks.discard(taskId)
+
+        for taskId in sorted(self._pendingTasks):
+            yield (MSG_WORKER_CRASHED, None, taskId)
+
+        self._pendingTasks = set()
+        self._runningTasks = {}
+        self._runningTests = {}
+        self._timedOutPids = {}
+        self._zygote = None
+
+    def _fetchMessages(self):
+        """Fetch the available messages to the backlog, return False if there is none."""
+        try:
+            self._backlog.append(self._resultQueue.get(timeout=_pollInterval))
+            return True
+        except Empty:
+            pass
+
+        gotEvent = False
+        while not self._eventQueue.empty():
+            event = self._eventQueue.get()
+            # The messages a worker sent before it exited are in the result queue already.
+            while True:
+                try:
+                    self._backlog.append(self._resultQueue.get_nowait())
+                except Empty:
+                    break
+            self._backlog.append(event)
+            gotEvent = True
+
+        return gotEvent
+
+    def iterMessages(self):
+        """Yield the messages from the workers until all the submitted tasks are done."""
+        while self._pendingTasks:
+            self._killOverdueWorkers()
+            if not self._backlog and not self._fetchMessages():
+                if self.isAlive():
+                    continue
+
+                for msg in self._onZygoteExited():
+                    yield msg
+                return
+
+            msg = self._backlog.popleft()
+
+            msgType, workerIndex = msg[:2]
+            if msgType == MSG_TASK_START:
+                self._runningTasks[msg[3]] = (workerIndex, msg[2])
+            elif msgType == MSG_TEST_START:
+                self._runningTests[workerIndex] = (msg[2], msg[3], msg[4])
+            elif msgType == MSG_TEST_STOP:
+                self._runningTests.pop(workerIndex, None)
+            elif msgType == MSG_TASK_DONE:
+                self._pendingTasks.discard(msg[2])
+                self._runningTasks = dict(
+                    (pid, t) for pid, t in self._runningTasks.items() if t[1] != msg[2]
+                )
+            elif msgType == MSG_WORKER_EXIT:
+                _, taskId = self._runningTasks.pop(msg[2], (None, None))
+                if taskId is not None:
+                    timeoutMsg = self._timeoutMessage(workerIndex, msg[2], taskId)
+                    if timeoutMsg:
+                        yield timeoutMsg
+                    self._pendingTasks.discard(taskId)
+                    yield msg
+                    msg = (MSG_WORKER_CRASHED, workerIndex, taskId)
+
+            yield msg
+
+    def shutdown(self):
+        """Stop the zygote and all the workers."""
+        _livePools.discard(self)
+        if not self._zygote:
+            return
+
+        self._shutdownEvent.set()
+        self._zygote.join(_shutdownTimeout + 1.0)
+        if self._zygote.is_alive():
+            self._zygote.terminate()
+            self._zygote.join(_pollInterval)
+
+        self._zygote = None
+        self._pendingTasks = set()
+        self._runningTasks = {}
+        self._runningTests = {}
+        self._timedOutPids = {}
+
+
+_livePools = weakref.WeakSet()
+
+
+@atexit.register
+def _shutdownLivePools():
+    # The zygote is not a daemon process, multiprocessing would wait for it at exit.
+    for pool in list(_livePools):
+        pool.shutdown()
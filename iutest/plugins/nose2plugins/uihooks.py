@@ -17,12 +17,32 @@ logger = logging.getLogger(__name__)
 
 class UiHooksPlugin(resultPlugin.ResultReporter, pyunitcommon.PyUnitUiMixin):
     """A nose2 plug to capture the logs for ui.
+
+    Notes:
+        With nose2.plugins.mp, the test events recorded in the subprocesses are replayed
+        here once each test finishes, so we use the time stamps of the events instead
+        of the time they arrive.
     """
 
+    _runningResult = None
+    _stopRequested = False
+    _testTimeout = 0
+    _sessionTimeout = 0
+    historyRunnerName = "nose2"
+
     def __init__(self):
         resultPlugin.ResultReporter.__init__(self)
         pyunitcommon.PyUnitUiMixin.__init__(self, uistream.UiStream())
         self.Cls = self.__class__
+        self.setTimeouts(self._testTimeout, self._sessionTimeout)
+
+    @classmethod
+    def setRunTimeouts(cls, testTimeout=0, sessionTimeout=0):
+        """Set the timeouts of the next runs, they are not enforced on the tests run in
+        the nose2.plugins.mp subprocesses.
+        """
+        cls._testTimeout = testTimeout
+        cls._sessionTimeout = sessionTimeout
 
     @classmethod
     def _mapTestResultCode(cls, resultCode, expected):
@@ -46,28 +66,54 @@ class UiHooksPlugin(resultPlugin.ResultReporter, pyunitcommon.PyUnitUiMixin):
 
         return constants.TEST_RESULT_NONE
 
+    @classmethod
+    def resetLastData(cls):
+        super(UiHooksPlugin, cls).resetLastData()
+        cls._runningResult = None
+        cls._stopRequested = False
+
+    @classmethod
+    def requestStop(cls):
+        """Stop the run before the next test, the tests already sent to the
+        nose2.plugins.mp subprocesses still run.
+        """
+        cls._stopRequested = True
+        if cls._runningResult:
+            cls._runningResult.shouldStop = True
+
+    def _stopAtSessionTimeout(self):
+        self.requestStop()
+
     def startTestRun(self, event):
+        self.Cls._runningResult = event.result
+        if self.Cls._stopRequested:
+            event.result.shouldStop = True
         self._atStartTestRun()
 
     def startTest(self, event):
-        self._atStartTest(event.test)
+        self._atStartTest(event.test, getattr(event, "startTime", None))
         with self.stream.linkInfoCtx(self._linkInfoFromTest(event.test)):
             resultPlugin.ResultReporter.startTest(self, event)
 
         self._startLogProcessers()
 
     def stopTest(self, event):
-        self._atStopTest(event.test)
+        self._atStopTest(event.test, getattr(event, "stopTime", None))
 
     def testOutcome(self, event):
         testId = event.test.id()
         resultCode = self._mapTestResultCode(event.outcome, event.expected)
-        self._atOutcomeAvailable(testId, resultCode)
+        if resultCode == constants.TEST_RESULT_SKIP:
+            details = event.reason
+        else:
+            details = self._getOutcomeDetail(event) if event.exc_info else None
+        self._atOutcomeAvailable(testId, resultCode, details)
 
         with self.stream.resultCtx(resultCode):
             resultPlugin.ResultReporter.testOutcome(self, event)
 
     def stopTestRun(self, event):
+        self.Cls._runningResult = None
         self._atStopTestRun()
 
     def afterTestRun(self, event):
@@ -75,6 +121,7 @@ class UiHooksPlugin(resultPlugin.ResultReporter, pyunitcommon.PyUnitUiMixin):
 
         self.stream.setLinkInfo()
         self.stream.setProcessStackTraceLink(False)
+        self._printSlowTests()
 
         if evt.stopTestEvent.result.wasSuccessful():
             with self.stream.resultCtx(self._mapTestResultCode(result.PASS, True)):
@@ -5,18 +5,24 @@
 import sys
 import logging
 import time
+import unittest
 
 from iutest.core import uistream
 from iutest.core import pathutils
 from iutest.core import runinfo
 from iutest.core import constants
 from iutest.core import pyunitutils
+from iutest.core import resultwriters
+from iutest.core import testdurations
+from iutest.core import testhistory
+from iutest.core import timeouts
 
 logger = logging.getLogger(__name__)
 
 
 class PyUnitUiMixin(object):
     lastRunInfo = runinfo.TestRunInfo()
+    historyRunnerName = ""
 
     _originalStdOut = sys.stdout
     _originalStdErr = sys.stderr
@@ -26,6 +32,33 @@ class PyUnitUiMixin(object):
         self.logHandler = uistream.LogHandler()
         self.stdOutCapturer = uistream.StdOutCapturer(self._originalStdOut)
         self.stdErrCapturer = uistream.StdErrCapturer(self._originalStdErr)
+        self._watchdog = None
+        self._fixtureTimers = {}
+        self._testOutcomes = {}
+        self._testDetails = {}
+        self._testWorkers = {}
+
+    def setTimeouts(self, testTimeout=0, sessionTimeout=0):
+        """Enforce the timeouts on the tests run in this python session.
+
+        Args:
+            testTimeout (float): The default time limit of each test, 0 for no limit.
+            sessionTimeout (float): The time limit of the whole run, 0 for no limit.
+        """
+        self._watchdog = timeouts.TestWatchdog(
+            testTimeout, sessionTimeout, onTimeout=self._onTimeout
+        )
+
+    def _onTimeout(self, testId, isSession):
+        """Called in the watchdog thread, the running test errors out by itself."""
+        if testId and testId not in self.Cls.lastRunInfo.timedOutTestIds:
+            self.Cls.lastRunInfo.timedOutTestIds.append(testId)
+        if isSession:
+            self._stopAtSessionTimeout()
+
+    def _stopAtSessionTimeout(self):
+        """Stop the run before the next test, implemented by the subclasses."""
+        pass
 
     def _linkInfoFromTest(self, test):
         try:
@@ -48,34 +81,39 @@ class PyUnitUiMixin(object):
         if hasattr(self.stream, "callUiMethod"):
             self.stream.callUiMethod(method, *args, **kwargs)
 
+    def _queueUiUpdate(self, method, *args):
+        """Queue the per-test update of the ui, the ui applies them in batches."""
+        if hasattr(self.stream, "queueUiUpdate"):
+            self.stream.queueUiUpdate(method, *args)
+
     @classmethod
     def _recordLastFailedTestId(cls, testId):
         if not cls.lastRunInfo.failedTestId:
             cls.lastRunInfo.failedTestId = testId
 
-    def _atOutcomeAvailable(self, testId, resultCode):
-        if resultCode == constants.TEST_RESULT_ERROR:
-            self.Cls.lastRunInfo.errorCount += 1
+    def _atOutcomeAvailable(self, testId, resultCode, details=None):
+        """
+        Args:
+            testId (str): The test id.
+            resultCode (int): One of the constants.TEST_RESULT_*.
+            details (str): The traceback of the failure or the reason of the skip.
+        """
+        if self._testOutcomes.get(testId) in (None, constants.TEST_RESULT_PASS):
+            # A failed sub test fails the test even though the rest passes.
+            self._testOutcomes[testId] = resultCode
+            if details:
+                self._testDetails[testId] = details
+
+        _, recordId = pyunitutils.parseParameterizedTestId(testId)
+        self.Cls.lastRunInfo.records.addOutcome(recordId, resultCode)
+        if resultCode in (
+            constants.TEST_RESULT_ERROR,
+            constants.TEST_RESULT_FAIL,
+            constants.TEST_RESULT_EXPECTED_FAIL,
+        ):
             self._recordLastFailedTestId(testId)
 
-        elif resultCode == constants.TEST_RESULT_FAIL:
-            self.Cls.lastRunInfo.failedCount += 1
-            self._recordLastFailedTestId(testId)
-
-        elif resultCode == constants.TEST_RESULT_EXPECTED_FAIL:
-            self.Cls.lastRunInfo.expectedFailureCount += 1
-            self._recordLastFailedTestId(testId)
-
-        elif resultCode == constants.TEST_RESULT_UNEXPECTED_PASS:
-            self.Cls.lastRunInfo.unexpectedSuccessCount += 1
-
-        elif resultCode == constants.TEST_RESULT_SKIP:
-            self.Cls.lastRunInfo.skipCount += 1
-
-        elif resultCode == constants.TEST_RESULT_PASS:
-            self.Cls.lastRunInfo.successCount += 1
-
-        self._callUiMethod("showResultOnItemByTestId", testId, resultCode)
+        self._queueUiUpdate("showResultOnItemByTestId", testId, resultCode)
         self.stdOutCapturer.stop()
         self.stdErrCapturer.stop()
         self.logHandler.stop()
@@ -86,7 +124,13 @@ class PyUnitUiMixin(object):
         )  # To avoid double clicking to run single test will end up massive selection.
         self.Cls.lastRunInfo.failedTestId = None
         self.Cls.lastRunInfo._sessionStartTime = time.time()
-        self.Cls.lastRunInfo._testStartTimes = {}
+        self._fixtureTimers = {}
+        self._testOutcomes = {}
+        self._testDetails = {}
+        self._testWorkers = {}
+        testhistory.TestHistory.get().beginRun(self.historyRunnerName)
+        if self._watchdog:
+            self._watchdog.start()
         self._callUiMethod("onTestRunningSessionStart")
 
     def _startLogProcessers(self):
@@ -94,30 +138,118 @@ class PyUnitUiMixin(object):
         self.stdOutCapturer.start()
         self.stdErrCapturer.start()
 
-    def _atStartTest(self, test):
+    def _atStartTest(self, test, startTime=None, worker=None):
+        """
+        Args:
+            test (TestCase): The test to start.
+            startTime (float): The time the test started, if it is reported afterwards,
+                e.g. from another process, None for now.
+            worker (int): The index of the worker process running the test, if any.
+        """
         self.Cls.lastRunInfo.runCount += 1
         originalTestId = test.id()
+        if isinstance(test, unittest.TestCase):
+            self._fixtureTimers[originalTestId] = testhistory.FixtureTimer(test)
+        if worker is not None:
+            self._testWorkers[originalTestId] = worker
         _, testId = pyunitutils.parseParameterizedTestId(originalTestId)
-        if testId not in self.Cls.lastRunInfo.runTestIds:
-            testStartTime = time.time()
-            self.Cls.lastRunInfo._testStartTimes[testId] = testStartTime
-            self.Cls.lastRunInfo.runTestIds.append(testId)
-            self._callUiMethod("onSingleTestStart", testId, testStartTime)
+        records = self.Cls.lastRunInfo.records
+        if testId not in records:
+            testStartTime = startTime or time.time()
+            records.add(testId, testStartTime)
+            self._queueUiUpdate("onSingleTestStart", testId, testStartTime)
+
+        if self._watchdog:
+            self._watchdog.watchTest(test)
+
+    def _atStopTest(self, test, stopTime=None, fixtureTimes=None):
+        """
+        Args:
+            test (TestCase): The test to stop.
+            stopTime (float): The time the test stopped, None for now.
+            fixtureTimes (dict): The seconds the setUp and tearDown took, if they were
+                timed elsewhere, e.g. in a worker process.
+        """
+        if self._watchdog:
+            self._watchdog.unwatchTest()
 
-    def _atStopTest(self, test):
         originalTestId = test.id()
         _, testId = pyunitutils.parseParameterizedTestId(originalTestId)
-        stopTime = time.time()
-        testStartTime = self.Cls.lastRunInfo._testStartTimes.get(
-            testId, self.Cls.lastRunInfo._sessionStartTime
-        )
+        stopTime = stopTime or time.time()
+        records = self.Cls.lastRunInfo.records
+        testStartTime = records.startTime(testId)
+        if testStartTime is None:
+            testStartTime = self.Cls.lastRunInfo._sessionStartTime
+        records.setStopTime(testId, stopTime)
         self.Cls.lastRunInfo.singleTestRunTime = stopTime - testStartTime
 
-        self._callUiMethod("onSingleTestStop", testId, stopTime)
-        self._callUiMethod("repaintUi")
+        fixtureTimer = self._fixtureTimers.pop(originalTestId, None)
+        if fixtureTimer:
+            fixtureTimer.detach()
+            fixtureTimes = fixtureTimer.times
+        fixtureTimes = fixtureTimes or {}
+        records.setFixtureTimes(
+            testId, fixtureTimes.get("setUp"), fixtureTimes.get("tearDown")
+        )
+        history = testhistory.TestHistory.get()
+        duration = self.Cls.lastRunInfo.singleTestRunTime
+        outcome = self._testOutcomes.pop(originalTestId, constants.TEST_RESULT_NONE)
+        if outcome != constants.TEST_RESULT_SKIP:
+            baseline = history.slowTestBaseline(testId, duration)
+            if baseline is not None:
+                self.Cls.lastRunInfo.slowTests.append((testId, duration, baseline))
+                self._queueUiUpdate("onSlowTestDetected", testId, duration, baseline)
+        worker = self._testWorkers.pop(originalTestId, None)
+        history.recordTest(
+            testId,
+            outcome,
+            duration,
+            startTime=testStartTime,
+            setUpTime=fixtureTimes.get("setUp"),
+            tearDownTime=fixtureTimes.get("tearDown"),
+            worker=worker,
+        )
+        resultwriters.ResultWriters.get().writeTest(
+            originalTestId,
+            outcome,
+            duration,
+            startTime=testStartTime,
+            details=self._testDetails.pop(originalTestId, None),
+            worker=worker,
+        )
+
+        self._queueUiUpdate("onSingleTestStop", testId, stopTime)
+        if uistream.isUiThread():
+            # The ui only needs a chance to refresh when the tests block its thread.
+            self._callUiMethod("repaintUi")
+
+    def _printSlowTests(self):
+        """List the tests slower than their historical durations in the run summary."""
+        slowTests = self.Cls.lastRunInfo.slowTests
+        if not slowTests:
+            return
+
+        factor = testhistory.TestHistory.slowTestFactor()
+        with self.stream.resultCtx(constants.TEST_RESULT_EXPECTED_FAIL):
+            self.stream.writeln(self.separator1)
+            self.stream.writeln(
+                "SLOW: {} tests took over {:g}x their p95 duration".format(
+                    len(slowTests), factor
+                )
+            )
+        self.stream.writeln(self.separator2)
+        for testId, duration, baseline in slowTests:
+            self.stream.writeln(
+                "{}: {:.3f}s, p95 {:.3f}s".format(testId, duration, baseline)
+            )
 
     def _atStopTestRun(self):
+        if self._watchdog:
+            self._watchdog.stop()
+
         self.Cls.lastRunInfo.sessionRunTime = (
             time.time() - self.Cls.lastRunInfo._sessionStartTime
         )
+        testdurations.TestDurations.get().update(self.Cls.lastRunInfo.testRunTimes)
+        testhistory.TestHistory.get().endRun()
         self._callUiMethod("onAllTestsFinished")
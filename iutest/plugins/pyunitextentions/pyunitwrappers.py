@@ -4,6 +4,7 @@
 
 import logging
 import sys
+import time
 from unittest import runner
 
 from iutest.core import constants
@@ -15,11 +16,20 @@ logger = logging.getLogger(__name__)
 
 class PyUnitTestRunnerWrapper(runner.TextTestRunner):
     def __init__(
-        self, verbosity=2, failfast=False, partialMode=constants.RUN_TEST_FULL
+        self,
+        verbosity=2,
+        failfast=False,
+        partialMode=constants.RUN_TEST_FULL,
+        testTimeout=0,
+        sessionTimeout=0,
     ):
         self._verbosity = verbosity
         self.stream = uistream.UiStream()
         self._partialMode = partialMode
+        self._testTimeout = testTimeout
+        self._sessionTimeout = sessionTimeout
+        self._result = None
+        self._stopRequested = False
 
         # call baseClass.__init__() here means running the test:
         runner.TextTestRunner.__init__(
@@ -37,6 +47,19 @@ class PyUnitTestRunnerWrapper(runner.TextTestRunner):
     def resetUiStreamResult(self):
         self.stream.setResult()
 
+    def _makeResult(self):
+        self._result = runner.TextTestRunner._makeResult(self)
+        self._result.setTimeouts(self._testTimeout, self._sessionTimeout)
+        if self._stopRequested:
+            self._result.stop()
+        return self._result
+
+    def stop(self):
+        """Stop the run before the next test."""
+        self._stopRequested = True
+        if self._result:
+            self._result.stop()
+
     def _getTestCaseFromTest(self, test):
         while not hasattr(test, "id"):
             tests = list(test)
@@ -69,6 +92,7 @@ class PyUnitTestResult(runner.TextTestResult, pyunitcommon.PyUnitUiMixin):
 
     _originalStdOut = sys.stdout
     _originalStdErr = sys.stderr
+    historyRunnerName = "PyUnit"
 
     def __init__(self, stream, descriptions, verbosity):
         self.Cls = self.__class__
@@ -91,6 +115,9 @@ class PyUnitTestResult(runner.TextTestResult, pyunitcommon.PyUnitUiMixin):
         self.Base.stopTest(test)
         self._atStopTest(test)
 
+    def _stopAtSessionTimeout(self):
+        self.stop()
+
     def stopTestRun(self):
         self.Base.stopTestRun()
         self._atStopTestRun()
@@ -109,28 +136,56 @@ class PyUnitTestResult(runner.TextTestResult, pyunitcommon.PyUnitUiMixin):
     def addError(self, test, err):
         with self.stream.resultCtx(constants.TEST_RESULT_ERROR):
             self.Base.addError(test, err)
-            self._atOutcomeAvailable(test.id(), constants.TEST_RESULT_ERROR)
+            self._atOutcomeAvailable(
+                test.id(), constants.TEST_RESULT_ERROR, self.errors[-1][1]
+            )
 
     def addFailure(self, test, err):
         with self.stream.resultCtx(constants.TEST_RESULT_FAIL):
             self.Base.addFailure(test, err)
-            self._atOutcomeAvailable(test.id(), constants.TEST_RESULT_FAIL)
+            self._atOutcomeAvailable(
+                test.id(), constants.TEST_RESULT_FAIL, self.failures[-1][1]
+            )
+
+    def addSubTest(self, test, subtest, err):
+        if err is None:
+            self.Base.addSubTest(test, subtest, err)
+            return
+
+        # The base class records a failed sub test without calling addFailure().
+        if issubclass(err[0], test.failureException):
+            resultCode = constants.TEST_RESULT_FAIL
+            errors = self.failures
+        else:
+            resultCode = constants.TEST_RESULT_ERROR
+            errors = self.errors
+        with self.stream.resultCtx(resultCode):
+            self.Base.addSubTest(test, subtest, err)
+            self._atOutcomeAvailable(test.id(), resultCode, errors[-1][1])
 
     def addSkip(self, test, reason):
         with self.stream.resultCtx(constants.TEST_RESULT_SKIP):
             self.Base.addSkip(test, reason)
-            self._atOutcomeAvailable(test.id(), constants.TEST_RESULT_SKIP)
+            self._atOutcomeAvailable(test.id(), constants.TEST_RESULT_SKIP, reason)
 
     def addExpectedFailure(self, test, err):
         with self.stream.resultCtx(constants.TEST_RESULT_EXPECTED_FAIL):
             self.Base.addExpectedFailure(test, err)
-            self._atOutcomeAvailable(test.id(), constants.TEST_RESULT_EXPECTED_FAIL)
+            self._atOutcomeAvailable(
+                test.id(),
+                constants.TEST_RESULT_EXPECTED_FAIL,
+                self.expectedFailures[-1][1],
+            )
 
     def addUnexpectedSuccess(self, test):
         with self.stream.resultCtx(constants.TEST_RESULT_UNEXPECTED_PASS):
             self.Base.addUnexpectedSuccess(test)
             self._atOutcomeAvailable(test.id(), constants.TEST_RESULT_UNEXPECTED_PASS)
 
+    def printErrors(self):
+        self.Base.printErrors()
+        self._printSlowTests()
+
     def printErrorList(self, flavour, errors):
         for test, err in errors:
             with self.stream.resultCtx(constants.TEST_RESULT_FAIL):
@@ -147,3 +202,106 @@ class PyUnitTestResult(runner.TextTestResult, pyunitcommon.PyUnitUiMixin):
         # We set the result code to error, so the summary will be in red.
         if errors:
             self.stream.setResult(constants.TEST_RESULT_ERROR)
+
+
+class _TestIdHolder(object):
+    def __init__(self, testId):
+        self._testId = testId
+
+    def id(self):
+        return self._testId
+
+
+class PyUnitParallelTestResult(pyunitcommon.PyUnitUiMixin):
+    """Report the test events streamed back from the worker processes to the ui.
+    """
+
+    separator1 = "=" * 70
+    separator2 = "-" * 70
+    historyRunnerName = "PyUnit"
+
+    _outcomeLabels = {
+        constants.TEST_RESULT_PASS: "ok",
+        constants.TEST_RESULT_ERROR: "ERROR",
+        constants.TEST_RESULT_FAIL: "FAIL",
+        constants.TEST_RESULT_SKIP: "skipped",
+        constants.TEST_RESULT_EXPECTED_FAIL: "expected failure",
+        constants.TEST_RESULT_UNEXPECTED_PASS: "unexpected success",
+    }
+
+    def __init__(self, stream=None):
+        self.Cls = self.__class__
+        pyunitcommon.PyUnitUiMixin.__init__(self, stream or uistream.UiStream())
+        self.testsRun = 0
+        self.errors = []
+        self.failures = []
+        self._sessionStartTime = 0
+
+    def wasSuccessful(self):
+        return not self.errors and not self.failures
+
+    def startTestRun(self):
+        self._sessionStartTime = time.time()
+        self._atStartTestRun()
+
+    def startTest(self, testId, startTime=None, worker=None):
+        self.testsRun += 1
+        self._atStartTest(_TestIdHolder(testId), startTime, worker)
+
+    def addOutcome(self, testId, resultCode, details=""):
+        label = self._outcomeLabels.get(resultCode, "")
+        if resultCode == constants.TEST_RESULT_SKIP and details:
+            label = "{} {!r}".format(label, details)
+
+        with self.stream.resultCtx(resultCode):
+            self.stream.writeln("{} ... {}".format(testId, label))
+            self._atOutcomeAvailable(testId, resultCode, details)
+
+        if resultCode == constants.TEST_RESULT_ERROR:
+            self.errors.append((testId, details))
+        elif resultCode == constants.TEST_RESULT_FAIL:
+            self.failures.append((testId, details))
+
+    def addTimeout(self, testId, reason, stackDump=""):
+        """Report the test whose worker process was killed as it timed out."""
+        if testId not in self.Cls.lastRunInfo.timedOutTestIds:
+            self.Cls.lastRunInfo.timedOutTestIds.append(testId)
+
+        details = "{}, the worker process was replaced.\n{}".format(
+            reason, stackDump or "No stack dump is available."
+        )
+        self.addOutcome(testId, constants.TEST_RESULT_ERROR, details)
+
+    def stopTest(self, testId, output="", stopTime=None, fixtureTimes=None):
+        if output:
+            uistream.writePlainTextToUiStream(output)
+        self._atStopTest(_TestIdHolder(testId), stopTime, fixtureTimes)
+
+    def _printErrorList(self, flavour, errors):
+        for testId, details in errors:
+            with self.stream.resultCtx(constants.TEST_RESULT_FAIL):
+                self.stream.writeln(self.separator1)
+            self.stream.writeln("{}: {}".format(flavour, testId))
+            self.stream.writeln(self.separator2)
+            with self.stream.processStackTraceLinkCtx():
+                self.stream.writeln(details)
+
+    def stopTestRun(self):
+        self._atStopTestRun()
+        self._printErrorList("ERROR", self.errors)
+        self._printErrorList("FAIL", self.failures)
+        self._printSlowTests()
+
+        timeTaken = time.time() - self._sessionStartTime
+        self.stream.writeln(self.separator2)
+        self.stream.writeln("Ran {} tests in {:.3f}s".format(self.testsRun, timeTaken))
+        if self.wasSuccessful():
+            with self.stream.resultCtx(constants.TEST_RESULT_PASS):
+                self.stream.writeln("OK")
+        else:
+            with self.stream.resultCtx(constants.TEST_RESULT_ERROR):
+                self.stream.writeln(
+                    "FAILED (failures={}, errors={})".format(
+                        len(self.failures), len(self.errors)
+                    )
+                )
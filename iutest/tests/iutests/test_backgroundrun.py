@@ -0,0 +1,69 @@
+# Copyright 2019-2020 by Wenfeng Gao, MGLAND animation studio. All rights reserved.
+# This file is part of IUTest, and is released under the "MIT License Agreement".
+# Please see the LICENSE file that should have been included as part of this package.
+
+import unittest
+import threading
+import time
+
+from iutest.core import backgroundrun
+
+
+class BackgroundTestRunTestCase(unittest.TestCase):
+    def test_runFinishes(self):
+        calls = []
+        run = backgroundrun.BackgroundTestRun(lambda: calls.append(1))
+        run.start()
+        self.assertTrue(run.wait(5))
+        self.assertEqual(calls, [1])
+        self.assertIsNone(run.error())
+
+    def test_errorIsKept(self):
+        def _raise():
+            raise ValueError("Boom")
+
+        run = backgroundrun.BackgroundTestRun(_raise)
+        run.start()
+        self.assertTrue(run.wait(5))
+        self.assertIsInstance(run.error(), ValueError)
+
+    def test_cancelCallsCancelFuncOnce(self):
+        started = threading.Event()
+        release = threading.Event()
+        cancelCalls = []
+
+        def _runFunc():
+            started.set()
+            release.wait(5)
+
+        run = backgroundrun.BackgroundTestRun(
+            _runFunc, cancelFunc=lambda: cancelCalls.append(1)
+        )
+        run.start()
+        started.wait(5)
+        run.cancel()
+        run.cancel()
+        release.set()
+        self.assertTrue(run.wait(5))
+        self.assertTrue(run.isCancelled())
+        self.assertEqual(cancelCalls, [1])
+
+    def test_interruptRunningTest(self):
+        started = threading.Event()
+        reached = []
+
+        def _runFunc():
+            started.set()
+            endTime = time.time() + 5
+            while time.time() < endTime:
+                time.sleep(0.01)
+            reached.append(1)
+
+        run = backgroundrun.BackgroundTestRun(_runFunc)
+        run.start()
+        started.wait(5)
+        self.assertTrue(run.interrupt())
+        self.assertTrue(run.wait(5))
+        self.assertTrue(run.isInterrupted())
+        self.assertFalse(reached)
+        self.assertIsNone(run.error())
@@ -22,6 +22,7 @@ class CliTestCase(unittest.TestCase):
         self._tempDir = None
         self._runner = runnerconstants.RUNNER_NAMES[runnerconstants.RUNNER_PYUNIT]
         common.initTestTargets(self)
+        common.useTempDataDir(self)
 
     def tearDown(self):
         if self._tempModuleName in sys.modules:
@@ -0,0 +1,95 @@
+# Copyright 2019-2020 by Wenfeng Gao, MGLAND animation studio. All rights reserved.
+# This file is part of IUTest, and is released under the "MIT License Agreement".
+# Please see the LICENSE file that should have been included as part of this package.
+
+import unittest
+import os
+
+from iutest.core import discoverycache
+from iutest.core import testmanager
+from iutest.tests.iutests import test_runnercommon as common
+
+
+class DiscoveryCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tempDir = common.useTempDir(self)
+        self._cacheDir = os.path.join(self._tempDir, "cache")
+        self._testDir = os.path.join(self._tempDir, "tests")
+        common.writeFile(os.path.join(self._testDir, "pkg", "__init__.py"), "")
+        common.writeFile(os.path.join(self._testDir, "test_a.py"), "a = 1")
+        common.writeFile(os.path.join(self._testDir, "pkg", "test_b.py"), "b = 1")
+        common.writeFile(os.path.join(self._testDir, "helper.py"), "c = 1")
+        self._loadedModules = []
+
+    def _loader(self, modulePath):
+        self._loadedModules.append(modulePath)
+        return ["{}.Case.test_x".format(modulePath)]
+
+    def _listTests(self):
+        self._loadedModules = []
+        cache = discoverycache.DiscoveryCache(
+            self._testDir, self._testDir, cacheDir=self._cacheDir
+        )
+        self.assertTrue(cache.isApplicable())
+        return list(cache.iterTestIds(self._loader))
+
+    def test_cacheHitAndMiss(self):
+        expected = ["pkg.Case.test_x", "pkg.test_b.Case.test_x", "test_a.Case.test_x"]
+        self.assertEqual(self._listTests(), expected)
+        self.assertEqual(sorted(self._loadedModules), ["pkg", "pkg.test_b", "test_a"])
+        self.assertEqual(discoverycache.DiscoveryCache.lastMissCount, 3)
+
+        self.assertEqual(self._listTests(), expected)
+        self.assertEqual(self._loadedModules, [])
+        self.assertEqual(discoverycache.DiscoveryCache.lastHitCount, 3)
+
+        common.writeFile(os.path.join(self._testDir, "test_a.py"), "a = 12")
+        self.assertEqual(self._listTests(), expected)
+        self.assertEqual(self._loadedModules, ["test_a"])
+
+    def test_failedModuleNotCached(self):
+        failedLoader = lambda modulePath: None
+        cache = discoverycache.DiscoveryCache(
+            self._testDir, self._testDir, cacheDir=self._cacheDir
+        )
+        self.assertEqual(list(cache.iterTestIds(failedLoader)), [])
+        self._listTests()
+        self.assertEqual(len(self._loadedModules), 3)
+
+    def test_leastRecentlyUsedCachesRemoved(self):
+        testDirs = []
+        for i in range(3):
+            testDir = os.path.join(self._tempDir, "tests{}".format(i))
+            common.writeFile(os.path.join(testDir, "test_a.py"), "a = 1")
+            testDirs.append(testDir)
+
+        def listTests(testDir):
+            cache = discoverycache.DiscoveryCache(
+                testDir, testDir, cacheDir=self._cacheDir
+            )
+            cache._maxCacheFiles = 2
+            list(cache.iterTestIds(self._loader))
+            return cache.cacheFilePath()
+
+        cacheFiles = [listTests(testDir) for testDir in testDirs[:2]]
+        os.utime(cacheFiles[1], (0, 0))
+        # Listing the first dir again keeps its cache the most recently used.
+        os.utime(cacheFiles[0], (0, 0))
+        listTests(testDirs[0])
+        cacheFiles.append(listTests(testDirs[2]))
+        self.assertEqual([os.path.isfile(f) for f in cacheFiles], [True, False, True])
+
+    def test_cacheKeyChangesWithDirs(self):
+        cache1 = discoverycache.DiscoveryCache(self._testDir, self._testDir)
+        cache2 = discoverycache.DiscoveryCache(self._testDir, self._tempDir)
+        self.assertNotEqual(cache1.cacheKey(), cache2.cacheKey())
+
+    def test_managerClearsCache(self):
+        common.useTempDataDir(self)
+        manager = testmanager.TestManager(None, self._testDir, self._testDir)
+        cache = discoverycache.DiscoveryCache(self._testDir, self._testDir)
+        list(cache.iterTestIds(self._loader))
+        self.assertTrue(os.path.isfile(cache.cacheFilePath()))
+
+        manager.clearDiscoveryCache()
+        self.assertFalse(os.path.isfile(cache.cacheFilePath()))
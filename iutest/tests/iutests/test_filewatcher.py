@@ -0,0 +1,90 @@
+# Copyright 2019-2020 by Wenfeng Gao, MGLAND animation studio. All rights reserved.
+# This file is part of IUTest, and is released under the "MIT License Agreement".
+# Please see the LICENSE file that should have been included as part of this package.
+
+import os
+import sys
+import time
+import importlib
+import threading
+import unittest
+
+from iutest.core import filewatcher
+from iutest.core import importutils
+from iutest.tests.iutests import test_runnercommon as common
+
+
+class FileWatcherTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tempDir = common.useTempDir(self)
+        self._changes = []
+        self._changed = threading.Event()
+
+    def _onChanged(self, changedFiles):
+        self._changes.append(changedFiles)
+        self._changed.set()
+
+    def _writeFile(self, fileName, content):
+        return common.writeFile(os.path.join(self._tempDir, fileName), content)
+
+    def _checkWatcher(self, usePolling):
+        self._writeFile("old.py", "x = 1\n")
+        watcher = filewatcher.FileWatcher(
+            [self._tempDir],
+            self._onChanged,
+            debounceTime=0.3,
+            pollInterval=0.1,
+            usePolling=usePolling,
+        )
+        watcher.start()
+        try:
+            self.assertTrue(watcher.isRunning())
+            # Make sure the new modified time differs with a coarse mtime resolution.
+            time.sleep(0.05 if not usePolling else 1.1)
+            first = self._writeFile("old.py", "x = 2\n")
+            second = self._writeFile(os.path.join("sub", "new.py"), "y = 1\n")
+            self._writeFile("notes.txt", "ignored")
+            self.assertTrue(self._changed.wait(10))
+            time.sleep(0.5)
+        finally:
+            watcher.stop()
+
+        self.assertFalse(watcher.isRunning())
+        # The burst of changes is reported at once.
+        self.assertEqual(len(self._changes), 1)
+        self.assertEqual(self._changes[0], sorted([first, second]))
+
+    def test_pollingWatcher(self):
+        self._checkWatcher(usePolling=True)
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "inotify is Linux only.")
+    def test_inotifyWatcher(self):
+        self._checkWatcher(usePolling=False)
+
+    def test_topMostDirs(self):
+        subDir = os.path.join(self._tempDir, "sub")
+        os.makedirs(subDir)
+        self.assertEqual(
+            filewatcher.topMostDirs(
+                [subDir, self._tempDir, "", os.path.join(self._tempDir, "missing")]
+            ),
+            [os.path.abspath(self._tempDir)],
+        )
+
+    def test_reimportModulesOfFiles(self):
+        filePath = self._writeFile("iutest_watched_module.py", "value = 1\n")
+        sys.path.insert(0, self._tempDir)
+        try:
+            # Not imported by name so that this test module doesn't depend on it.
+            iutest_watched_module = importlib.import_module("iutest_watched_module")
+            self.assertEqual(iutest_watched_module.value, 1)
+            time.sleep(1.1)
+            self._writeFile("iutest_watched_module.py", "value = 2\n")
+            self.assertEqual(
+                importutils.reimportModulesOfFiles([filePath]),
+                ["iutest_watched_module"],
+            )
+            self.assertEqual(iutest_watched_module.value, 2)
+        finally:
+            sys.path.remove(self._tempDir)
+            sys.modules.pop("iutest_watched_module", None)
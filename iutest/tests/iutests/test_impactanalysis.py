@@ -0,0 +1,100 @@
+# Copyright 2019-2020 by Wenfeng Gao, MGLAND animation studio. All rights reserved.
+# This file is part of IUTest, and is released under the "MIT License Agreement".
+# Please see the LICENSE file that should have been included as part of this package.
+
+import unittest
+import os
+import time
+import shutil
+
+from iutest.core import constants
+from iutest.core import impactanalysis
+from iutest.tests.iutests import test_runnercommon as common
+
+_TEST_USING_LIB = """
+import unittest
+from implib import helper
+
+class LibCase(unittest.TestCase):
+    def test_lib(self):
+        pass
+"""
+
+_TEST_STANDALONE = """
+import unittest
+
+class StandaloneCase(unittest.TestCase):
+    def test_standalone(self):
+        pass
+"""
+
+
+class TestImpactAnalyzerTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tempDir = common.useTempDir(self)
+        self._testDir = os.path.join(self._tempDir, "tests")
+        common.writeFile(os.path.join(self._testDir, "implib", "__init__.py"), "")
+        self._helperFile = os.path.join(self._testDir, "implib", "helper.py")
+        common.writeFile(self._helperFile, "VALUE = 1\n")
+        common.writeFile(os.path.join(self._testDir, "test_lib.py"), _TEST_USING_LIB)
+        common.writeFile(
+            os.path.join(self._testDir, "test_standalone.py"), _TEST_STANDALONE
+        )
+        self._stateDir = os.path.join(self._tempDir, "state")
+        self._analyzer = impactanalysis.TestImpactAnalyzer(
+            self._testDir, self._testDir, stateDir=self._stateDir
+        )
+
+    def test_affectedByModifiedTime(self):
+        testIds = [
+            "test_lib.LibCase.test_lib",
+            "test_standalone.StandaloneCase.test_standalone",
+        ]
+        self.assertEqual(self._analyzer.affectedTestIds(testIds), testIds)
+
+        runTime = time.time()
+        self._analyzer.markTestsRun(testIds, runTime)
+        self.assertEqual(self._analyzer.affectedTestIds(testIds), [])
+
+        os.utime(self._helperFile, (runTime + 10, runTime + 10))
+        self.assertEqual(
+            self._analyzer.affectedTestIds(testIds), ["test_lib.LibCase.test_lib"]
+        )
+
+    def test_affectedByChangedFiles(self):
+        testModules = self._analyzer.testModules()
+        self.assertIn("test_lib", testModules)
+        self.assertIn("test_standalone", testModules)
+
+        moduleFiles, importers = self._analyzer.importGraph().build(testModules)
+        affected = self._analyzer._affectedByFiles(
+            testModules, moduleFiles, importers, [self._helperFile]
+        )
+        self.assertEqual(affected, set(["test_lib"]))
+
+    def test_unknownTestIdIsKept(self):
+        self._analyzer.markTestsRun(["test_lib", "test_standalone"], time.time() + 10)
+        testIds = ["other_module.Case.test_a", "test_standalone"]
+        self.assertEqual(
+            self._analyzer.affectedTestIds(
+                testIds, changeDetection=constants.CHANGE_DETECTION_MTIME
+            ),
+            ["other_module.Case.test_a"],
+        )
+
+    def test_statesOfRemovedDirsPruned(self):
+        goneDir = os.path.join(self._tempDir, "gone")
+        common.writeFile(os.path.join(goneDir, "test_gone.py"), _TEST_STANDALONE)
+        goneAnalyzer = impactanalysis.TestImpactAnalyzer(
+            goneDir, goneDir, stateDir=self._stateDir
+        )
+        goneAnalyzer.markTestsRun(["test_gone"], time.time())
+        self._analyzer.markTestsRun(["test_lib"], time.time())
+        self.assertEqual(len(os.listdir(self._stateDir)), 2)
+
+        shutil.rmtree(goneDir)
+        self._analyzer._pruneStates()
+        self.assertEqual(
+            os.listdir(self._stateDir),
+            [os.path.basename(self._analyzer._stateFilePath())],
+        )
@@ -0,0 +1,100 @@
+# Copyright 2019-2020 by Wenfeng Gao, MGLAND animation studio. All rights reserved.
+# This file is part of IUTest, and is released under the "MIT License Agreement".
+# Please see the LICENSE file that should have been included as part of this package.
+
+import unittest
+import os
+import sys
+import time
+
+from iutest.core import importutils
+from iutest.core import modulereloader
+from iutest.tests.iutests import test_runnercommon as common
+
+_BASE = """
+VALUE = {}
+
+class Base(object):
+    pass
+"""
+
+_USER = """
+from iutest_rl_base import Base
+
+class User(Base):
+    pass
+"""
+
+
+class ModuleReloaderTestCase(unittest.TestCase):
+    _moduleNames = ("iutest_rl_base", "iutest_rl_user")
+
+    def setUp(self):
+        self._tempDir = common.useTempDir(self)
+        sys.path.insert(0, self._tempDir)
+        self._writeModule("iutest_rl_base", _BASE.format(1))
+        self._writeModule("iutest_rl_user", _USER)
+        __import__("iutest_rl_user")
+        self._reloader = modulereloader.ModuleReloader()
+        self._reloader.updateIndex()
+
+    def tearDown(self):
+        sys.path.remove(self._tempDir)
+        for moduleName in self._moduleNames:
+            sys.modules.pop(moduleName, None)
+
+    def _writeModule(self, moduleName, content):
+        filePath = os.path.join(self._tempDir, moduleName + ".py")
+        return common.writeFile(filePath, content)
+
+    def _modifyModule(self, moduleName, content):
+        # Make the new modified time differ with a coarse mtime resolution.
+        time.sleep(1.1)
+        return self._writeModule(moduleName, content)
+
+    def test_isReimportFeatureAvailable(self):
+        self.assertTrue(importutils.isReimportFeatureAvailable(silentCheck=True))
+
+    def test_changedModules(self):
+        self.assertEqual(self._reloader.changedModules(), [])
+        filePath = self._modifyModule("iutest_rl_base", _BASE.format(2))
+        self.assertEqual(self._reloader.changedModules(), ["iutest_rl_base"])
+        self.assertEqual(
+            self._reloader.changedModules([filePath, "missing.py"]), ["iutest_rl_base"]
+        )
+        self.assertTrue(self._reloader.isModuleChanged("iutest_rl_base"))
+        self.assertFalse(self._reloader.isModuleChanged("iutest_rl_user"))
+
+    def test_reloadOrder(self):
+        self.assertEqual(
+            self._reloader.reloadOrder(["iutest_rl_user", "iutest_rl_base"]),
+            ["iutest_rl_base", "iutest_rl_user"],
+        )
+
+    def test_reloadChanged(self):
+        self._modifyModule("iutest_rl_base", _BASE.format(2))
+        timings = self._reloader.reloadChanged(includeImporters=False)
+        self.assertEqual([m for m, _ in timings], ["iutest_rl_base"])
+        self.assertEqual(sys.modules["iutest_rl_base"].VALUE, 2)
+        self.assertEqual(self._reloader.changedModules(), [])
+
+        # Saving it without a change doesn't reload it again.
+        self._modifyModule("iutest_rl_base", _BASE.format(2))
+        self.assertEqual(self._reloader.changedModules(), [])
+
+    def test_reloadImporters(self):
+        oldUserClass = sys.modules["iutest_rl_user"].User
+        self._modifyModule("iutest_rl_base", _BASE.format(2))
+        plan = self._reloader.dryRun()
+        self.assertEqual(
+            plan, [("iutest_rl_base", True, None), ("iutest_rl_user", False, None)]
+        )
+        # The dry run doesn't reload anything.
+        self.assertEqual(sys.modules["iutest_rl_base"].VALUE, 1)
+
+        timings = self._reloader.reloadChanged()
+        self.assertEqual([m for m, _ in timings], ["iutest_rl_base", "iutest_rl_user"])
+        user = sys.modules["iutest_rl_user"]
+        self.assertIsNot(user.User, oldUserClass)
+        self.assertIs(user.Base, sys.modules["iutest_rl_base"].Base)
+        self.assertIsNotNone(self._reloader.lastReloadTime("iutest_rl_user"))
@@ -0,0 +1,146 @@
+# Copyright 2019-2020 by Wenfeng Gao, MGLAND animation studio. All rights reserved.
+# This file is part of IUTest, and is released under the "MIT License Agreement".
+# Please see the LICENSE file that should have been included as part of this package.
+
+import unittest
+import os
+import json
+from xml.etree import ElementTree
+
+from iutest.core import constants
+from iutest.core import resultwriters
+from iutest.core.runners import runnerconstants
+from iutest.tests.iutests import test_runnercommon as common
+
+
+class ResultWritersTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tempDir = common.useTempDir(self)
+        self._xmlFile = os.path.join(self._tempDir, "results.xml")
+        self._jsonFile = os.path.join(self._tempDir, "results.jsonl")
+
+    def tearDown(self):
+        resultwriters.ResultWriters.get().setWriters([])
+
+    def _readJsonLines(self):
+        with open(self._jsonFile) as f:
+            return [json.loads(line) for line in f]
+
+    def test_junitXmlIsWellFormedAfterEachTest(self):
+        writer = resultwriters.JUnitXmlWriter(self._xmlFile)
+        writer.open("PyUnit")
+        self.assertEqual(ElementTree.parse(self._xmlFile).getroot().tag, "testsuites")
+
+        writer.writeTest(
+            resultwriters.ResultRecord("m.A.test_a", constants.TEST_RESULT_PASS, 0.5)
+        )
+        writer.writeTest(
+            resultwriters.ResultRecord(
+                "m.A.test_b",
+                constants.TEST_RESULT_FAIL,
+                0.1,
+                details="Traceback:\n  <b> & \x1b\nAssertionError: 1 != 2",
+            )
+        )
+        # Readable before the run ends, e.g. after a crash.
+        suite = ElementTree.parse(self._xmlFile).getroot().find("testsuite")
+        self.assertEqual(suite.get("tests"), "2")
+        self.assertEqual(suite.get("failures"), "1")
+
+        writer.writeTest(
+            resultwriters.ResultRecord(
+                "m.A.test_c", constants.TEST_RESULT_SKIP, 0.0, details="Not now"
+            )
+        )
+        writer.close()
+
+        suite = ElementTree.parse(self._xmlFile).getroot().find("testsuite")
+        self.assertEqual(suite.get("name"), "PyUnit")
+        self.assertEqual(suite.get("tests"), "3")
+        self.assertEqual(suite.get("skipped"), "1")
+        self.assertEqual(suite.get("errors"), "0")
+        cases = suite.findall("testcase")
+        self.assertEqual([c.get("name") for c in cases], ["test_a", "test_b", "test_c"])
+        self.assertEqual(cases[0].get("classname"), "m.A")
+        failure = cases[1].find("failure")
+        self.assertEqual(failure.get("message"), "AssertionError: 1 != 2")
+        self.assertIn("<b> &", failure.text)
+        self.assertEqual(cases[2].find("skipped").get("message"), "Not now")
+
+    def test_jsonLines(self):
+        writer = resultwriters.JsonLinesWriter(self._jsonFile)
+        writer.open("nose2")
+        writer.writeTest(
+            resultwriters.ResultRecord(
+                "m.A.test_a", constants.TEST_RESULT_ERROR, 0.2, worker=1, rerun=2
+            )
+        )
+        records = self._readJsonLines()
+        self.assertEqual([r["type"] for r in records], ["run", "test"])
+        self.assertEqual(records[1]["outcome"], "error")
+        self.assertEqual(records[1]["worker"], 1)
+        self.assertEqual(records[1]["rerun"], 2)
+
+        writer.close()
+        summary = self._readJsonLines()[-1]
+        self.assertEqual(summary["type"], "summary")
+        self.assertEqual(summary["counts"]["error"], 1)
+
+    def test_nonAsciiDetails(self):
+        # A python 2 traceback is a byte string, it could be invalid utf-8 as well.
+        details = b"Traceback:\nAssertionError: \xc3\xa9 != \xff"
+        xmlWriter = resultwriters.JUnitXmlWriter(self._xmlFile)
+        jsonWriter = resultwriters.JsonLinesWriter(self._jsonFile)
+        for writer in (xmlWriter, jsonWriter):
+            writer.open("PyUnit")
+            writer.writeTest(
+                resultwriters.ResultRecord(
+                    "m.A.test_a", constants.TEST_RESULT_FAIL, 0.1, details=details
+                )
+            )
+            writer.close()
+
+        failure = ElementTree.parse(self._xmlFile).getroot().find(".//failure")
+        self.assertEqual(failure.get("message"), u"AssertionError: \xe9 != \ufffd")
+        self.assertEqual(
+            self._readJsonLines()[1]["details"],
+            u"Traceback:\nAssertionError: \xe9 != \ufffd",
+        )
+
+    def test_failedWriterIsDropped(self):
+        class BrokenWriter(resultwriters.JsonLinesWriter):
+            def writeTest(self, record):
+                raise ValueError("Bad record.")
+
+        writers = resultwriters.ResultWriters.get()
+        writers.setWriters(
+            [
+                BrokenWriter(os.path.join(self._tempDir, "broken.jsonl")),
+                resultwriters.JsonLinesWriter(self._jsonFile),
+            ]
+        )
+        writers.beginRun("PyUnit")
+        writers.writeTest("m.A.test_a", constants.TEST_RESULT_PASS, 0.1)
+        writers.writeTest("m.A.test_b", constants.TEST_RESULT_PASS, 0.1)
+        writers.endRun()
+        self.assertEqual(len(writers.writers()), 1)
+        testIds = [r["id"] for r in self._readJsonLines() if r["type"] == "test"]
+        self.assertEqual(testIds, ["m.A.test_a", "m.A.test_b"])
+
+    def test_streamRunResults(self):
+        common.setUpTest(self, runnerconstants.RUNNER_PYUNIT)
+        self._manager.setStartDirOrModule(self._modulePath)
+        self._manager.setResultWriters(
+            [
+                resultwriters.JUnitXmlWriter(self._xmlFile),
+                resultwriters.JsonLinesWriter(self._jsonFile),
+            ]
+        )
+        self._manager.runTests(self._testId)
+        self.assertFalse(resultwriters.ResultWriters.get().isRunning())
+
+        testIds = [r["id"] for r in self._readJsonLines() if r["type"] == "test"]
+        self.assertTrue(testIds)
+        self.assertTrue(all(t.startswith(self._testId) for t in testIds))
+        suite = ElementTree.parse(self._xmlFile).getroot().find("testsuite")
+        self.assertEqual(suite.get("tests"), str(len(testIds)))
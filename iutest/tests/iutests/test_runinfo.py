@@ -0,0 +1,68 @@
+# Copyright 2019-2020 by Wenfeng Gao, MGLAND animation studio. All rights reserved.
+# This file is part of IUTest, and is released under the "MIT License Agreement".
+# Please see the LICENSE file that should have been included as part of this package.
+
+import unittest
+
+from iutest.core import constants
+from iutest.core import runinfo
+
+
+class TestRecordsTestCase(unittest.TestCase):
+    def setUp(self):
+        self._records = runinfo.TestRecords()
+
+    def test_records(self):
+        self.assertEqual(self._records.add("m.A.test_a", 10.0), 0)
+        self.assertEqual(self._records.add("m.A.test_b", 11.0), 1)
+        # The test recorded already keeps its record.
+        self.assertEqual(self._records.add("m.A.test_a", 12.0), 0)
+        self.assertEqual(list(self._records), ["m.A.test_a", "m.A.test_b"])
+        self.assertIn("m.A.test_b", self._records)
+        self.assertNotIn("m.A.test_c", self._records)
+        self.assertEqual(
+            self._records.state("m.A.test_a"), constants.TEST_RESULT_RUNNING
+        )
+        self.assertIsNone(self._records.duration("m.A.test_a"))
+
+        self._records.setStopTime("m.A.test_a", 10.5)
+        self._records.setFixtureTimes("m.A.test_a", setUpTime=0.1)
+        record = self._records.record("m.A.test_a")
+        self.assertEqual(record.startTime, 10.0)
+        self.assertEqual(record.stopTime, 10.5)
+        self.assertEqual(record.setUpTime, 0.1)
+        self.assertIsNone(record.tearDownTime)
+        self.assertEqual(self._records.durations(), {"m.A.test_a": 0.5})
+        self.assertIsNone(self._records.record("m.A.test_c"))
+
+    def test_outcomes(self):
+        self._records.add("m.A.test_a")
+        self._records.addOutcome("m.A.test_a", constants.TEST_RESULT_PASS)
+        # A failed case of a parameterized test fails the test.
+        self._records.addOutcome("m.A.test_a", constants.TEST_RESULT_FAIL)
+        self._records.addOutcome("m.A.test_a", constants.TEST_RESULT_PASS)
+        self._records.addOutcome("m.A.test_b", constants.TEST_RESULT_ERROR)
+        self.assertEqual(self._records.state("m.A.test_a"), constants.TEST_RESULT_FAIL)
+        self.assertEqual(self._records.outcomeCount(constants.TEST_RESULT_PASS), 2)
+        self.assertEqual(
+            self._records.testIdsWithStates(
+                constants.TEST_RESULT_FAIL, constants.TEST_RESULT_ERROR
+            ),
+            ["m.A.test_a", "m.A.test_b"],
+        )
+
+        self._records.replaceOutcome("m.A.test_b", constants.TEST_RESULT_PASS)
+        self.assertEqual(self._records.outcomeCount(constants.TEST_RESULT_ERROR), 0)
+        self.assertEqual(self._records.outcomeCount(constants.TEST_RESULT_PASS), 3)
+
+    def test_runInfoCounts(self):
+        info = runinfo.TestRunInfo()
+        info.records.add("m.A.test_a")
+        info.records.addOutcome("m.A.test_a", constants.TEST_RESULT_SKIP)
+        self.assertEqual(info.runTestIds, ["m.A.test_a"])
+        self.assertEqual(info.skipCount, 1)
+        self.assertEqual(info.successCount, 0)
+
+        info.reset()
+        self.assertFalse(info.runTestIds)
+        self.assertEqual(info.skipCount, 0)
@@ -4,10 +4,15 @@
 
 import unittest
 import os
+import tempfile
+import shutil
 
+from iutest.core import appsettings
 from iutest.core import constants
 from iutest.core import pathutils
 from iutest.core import pyunitutils
+from iutest.core import testdurations
+from iutest.core import testhistory
 from iutest.core import testmanager
 
 
@@ -59,8 +64,47 @@ def initTestTargets(testSuite):
     testSuite._modulePath = "iutest.tests"
 
 
+def useTempDir(testSuite):
+    """Make a temp dir for the test, it is removed once the test finishes."""
+    tempDir = tempfile.mkdtemp()
+    testSuite.addCleanup(shutil.rmtree, tempDir, ignore_errors=True)
+    return tempDir
+
+
+def writeFile(filePath, content):
+    """Write the content to the file, the missing parent dirs are made as well."""
+    dirPath = os.path.dirname(filePath)
+    if dirPath and not os.path.isdir(dirPath):
+        os.makedirs(dirPath)
+    with open(filePath, "w") as f:
+        f.write(content)
+    return filePath
+
+
+def useTempDataDir(testSuite):
+    """Keep the files written by the test runs out of the IUTest data dir of the user,
+    they are removed once the test finishes.
+    """
+    tempDir = useTempDir(testSuite)
+    originalDataDir = appsettings.dataDir
+
+    def restore():
+        testhistory.TestHistory.useFile(None)
+        testdurations.TestDurations.useFile(None)
+        appsettings.dataDir = originalDataDir
+
+    appsettings.dataDir = lambda: tempDir
+    # The stores might be opened already, e.g. by the tests run before.
+    testhistory.TestHistory.useFile(os.path.join(tempDir, "testHistory.sqlite3"))
+    testdurations.TestDurations.useFile(os.path.join(tempDir, "testDurations.json"))
+    testSuite.addCleanup(restore)
+    return tempDir
+
+
 def setUpTest(testSuite, runnerMode):
+    useTempDataDir(testSuite)
     testSuite._manager = testmanager.TestManager(None, None)
+    testSuite.addCleanup(testSuite._manager.shutdownWorkerPools)
     testSuite._manager.setRunnerMode(runnerMode)
     testSuite.assertEqual(testSuite._manager.getRunner().mode(), runnerMode)
     initTestTargets(testSuite)
@@ -162,3 +206,13 @@ def checkTestsNotDuplicated(testSuite):
     testSuite._manager.runTests(testSuite._testId)
     lastRunInfo = testSuite._manager.lastRunInfo()
     testSuite.assertEqual(lastRunInfo.runCount, RunnerDummyTestCase.getTestCount())
+
+
+def checkParallelRun(testSuite):
+    testSuite._manager.setStartDirOrModule(testSuite._modulePath)
+    testSuite._manager.setParallelJobs(2)
+    testSuite._manager.runTests(testSuite._testId)
+    lastRunInfo = testSuite._manager.lastRunInfo()
+    testSuite.assertEqual(lastRunInfo.runCount, RunnerDummyTestCase.getTestCount())
+    testSuite.assertEqual(lastRunInfo.successCount, lastRunInfo.runCount)
+    testSuite.assertTrue(lastRunInfo.runTestIds[0].startswith(testSuite._testId))
@@ -35,3 +35,6 @@ class Nose2RunnerTestCase(unittest.TestCase):
 
     def test_testNotDuplicated(self):
         common.checkTestsNotDuplicated(self)
+
+    def test_parallelRun(self):
+        common.checkParallelRun(self)
@@ -3,15 +3,86 @@
 # Please see the LICENSE file that should have been included as part of this package.
 
 import unittest
+import os
+import sys
+import json
+from xml.etree import ElementTree
 
+from iutest.core import appsettings
+from iutest.core import constants
+from iutest.core import pyunitutils
+from iutest.core import resultwriters
+from iutest.core import testdurations
 from iutest.core.runners import runnerconstants
 from iutest.core.runners import pyunitrunner
 from iutest.tests.iutests import test_runnercommon as common
 
 
+_SUB_TEST_MODULE = """
+import unittest
+
+
+class SubTestCase(unittest.TestCase):
+    def test_sub(self):
+        for i in range(3):
+            with self.subTest(i=i):
+                self.assertNotEqual(i, 1)
+
+    def test_pass(self):
+        pass
+"""
+
+_LOAD_TESTS_MODULE = """
+import unittest
+
+
+class PlainCase(unittest.TestCase):
+    def test_plain(self):
+        pass
+
+
+class ValueCase(unittest.TestCase):
+    def __init__(self, methodName="runTest", value=None):
+        unittest.TestCase.__init__(self, methodName)
+        self.value = value
+
+    def test_value(self):
+        self.assertEqual(self.value, 1)
+
+
+class LoadedCase(unittest.TestCase):
+    def test_loaded(self):
+        self.assertEqual(self.value, 2)
+
+
+def load_tests(loader, tests, pattern):
+    suite = loader.loadTestsFromTestCase(PlainCase)
+    suite.addTest(ValueCase("test_value", value=1))
+    loaded = LoadedCase("test_loaded")
+    loaded.value = 2
+    suite.addTest(loaded)
+    return suite
+"""
+
+
 class PyUnitRunnerTestCase(unittest.TestCase):
     def setUp(self):
         common.setUpTest(self, runnerconstants.RUNNER_PYUNIT)
+        self._tempDir = None
+        self._tempModuleName = "test_iutest_pyunit_temp"
+
+    def tearDown(self):
+        resultwriters.ResultWriters.get().setWriters([])
+        sys.modules.pop(self._tempModuleName, None)
+        if self._tempDir in sys.path:
+            sys.path.remove(self._tempDir)
+
+    def _writeTempModule(self, content):
+        self._tempDir = common.useTempDir(self)
+        moduleFile = os.path.join(self._tempDir, self._tempModuleName + ".py")
+        common.writeFile(moduleFile, content)
+        sys.path.append(self._tempDir)
+        self._manager.setDirs(self._tempDir, self._tempDir)
 
     def test_parseParameterizedTestId(self):
         common.checkParseParameterizedTestId(self)
@@ -36,3 +107,89 @@ class PyUnitRunnerTestCase(unittest.TestCase):
 
     def test_testNotDuplicated(self):
         common.checkTestsNotDuplicated(self)
+
+    def test_parallelRun(self):
+        common.checkParallelRun(self)
+
+    def test_durationsKeptOutOfDataDir(self):
+        self._manager.setStartDirOrModule(self._modulePath)
+        self._manager.runTests(self._testId)
+        durations = testdurations.TestDurations.get()
+        self.assertTrue(durations.filePath().startswith(appsettings.dataDir()))
+        self.assertTrue(os.path.isfile(durations.filePath()))
+        self.assertIsNotNone(
+            durations.duration(self._manager.lastRunInfo().runTestIds[0])
+        )
+
+    def test_makeSuiteFromCachedTests(self):
+        # The on-disk discovery cache lists the ids without loading the tests.
+        self._manager.setUseDiscoveryCache(False)
+        self._manager.setStartDirOrModule(self._modulePath)
+        self.assertTrue(list(self._manager.iterAllTestIds()))
+        runner = self._manager.getRunner()
+        suffix = ".{}.test_dummy".format(common.RunnerDummyTestCase.__name__)
+        testIds = [tid for tid in runner._lastTests if tid.endswith(suffix)]
+        self.assertEqual(len(testIds), 1)
+        testId = testIds[0]
+        cachedTest = runner._lastTests[testId]
+        self.assertTrue(runner._isCachedTestCurrent(cachedTest))
+
+        moduleId = testId[: -len(suffix)]
+        tests = list(pyunitutils.iterTestCases(runner._makeSuite([moduleId])))
+        self.assertIn(testId, [t.id() for t in tests])
+        self.assertFalse([t for t in tests if t is runner._lastTests.get(t.id())])
+
+        # The class of a reimported module is not the cached one any more.
+        staleClass = type(
+            cachedTest.__class__.__name__,
+            (cachedTest.__class__,),
+            {"__module__": cachedTest.__class__.__module__},
+        )
+        self.assertFalse(runner._isCachedTestCurrent(staleClass("test_dummy")))
+
+    @unittest.skipIf(sys.version_info[0] < 3, "No subTest in python 2.")
+    def test_failedSubTest(self):
+        self._writeTempModule(_SUB_TEST_MODULE)
+        xmlFile = os.path.join(self._tempDir, "results.xml")
+        jsonFile = os.path.join(self._tempDir, "results.jsonl")
+        self._manager.setResultWriters(
+            [
+                resultwriters.JUnitXmlWriter(xmlFile),
+                resultwriters.JsonLinesWriter(jsonFile),
+            ]
+        )
+        self._manager.runTests(self._tempModuleName)
+
+        testId = "{}.SubTestCase.test_sub".format(self._tempModuleName)
+        lastRunInfo = self._manager.lastRunInfo()
+        self.assertEqual(lastRunInfo.records.state(testId), constants.TEST_RESULT_FAIL)
+        self.assertEqual(lastRunInfo.failedTestId, testId)
+
+        with open(jsonFile) as f:
+            records = [json.loads(line) for line in f]
+        outcomes = dict((r["id"], r["outcome"]) for r in records if r["type"] == "test")
+        self.assertEqual(outcomes[testId], "failed")
+
+        suite = ElementTree.parse(xmlFile).getroot().find("testsuite")
+        self.assertEqual(suite.get("failures"), "1")
+        failedCases = [c.get("name") for c in suite.findall("testcase") if len(c)]
+        self.assertEqual(failedCases, ["test_sub"])
+
+    def test_customMadeTestsNotRebuilt(self):
+        self._writeTempModule(_LOAD_TESTS_MODULE)
+        self._manager.setUseDiscoveryCache(False)
+        testIds = list(self._manager.iterAllTestIds())
+        self.assertEqual(len(testIds), 3)
+
+        runner = self._manager.getRunner()
+        plainId = self._tempModuleName + ".PlainCase"
+        self.assertEqual(len(runner._testsFromCache(plainId)), 1)
+        for caseName in ("ValueCase.test_value", "LoadedCase.test_loaded"):
+            testId = "{}.{}".format(self._tempModuleName, caseName)
+            self.assertIsNone(runner._testsFromCache(testId))
+        # The module id falls back to loading the module by its load_tests().
+        self.assertIsNone(runner._testsFromCache(self._tempModuleName))
+
+        self._manager.runTests(self._tempModuleName)
+        lastRunInfo = self._manager.lastRunInfo()
+        self.assertEqual(lastRunInfo.successCount, 3)
@@ -0,0 +1,73 @@
+# Copyright 2019-2020 by Wenfeng Gao, MGLAND animation studio. All rights reserved.
+# This file is part of IUTest, and is released under the "MIT License Agreement".
+# Please see the LICENSE file that should have been included as part of this package.
+
+import unittest
+import os
+
+from iutest.core import scheduler
+from iutest.core import testdurations
+from iutest.tests.iutests import test_runnercommon as common
+
+
+class SchedulerTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tempDir = common.useTempDir(self)
+        self._durations = testdurations.TestDurations(
+            os.path.join(self._tempDir, "durations.json")
+        )
+        self._durations.update(
+            {
+                "m.Slow.test_a": 10.0,
+                "m.Slow.test_b": 6.0,
+                "m.Mid.test_a": 8.0,
+                "m.Fast.test_a": 1.0,
+                "m.Fast.test_b": 1.0,
+            }
+        )
+        self._testIds = [
+            "m.Fast.test_a",
+            "m.Fast.test_b",
+            "m.Mid.test_a",
+            "m.Slow.test_a",
+            "m.Slow.test_b",
+            "m.New.test_a",
+        ]
+
+    def test_parseShard(self):
+        self.assertEqual(scheduler.parseShard("2/4"), (2, 4))
+        for invalid in ("0/4", "5/4", "a/b", "1"):
+            with self.assertRaises(ValueError):
+                scheduler.parseShard(invalid)
+
+    def test_durationsStore(self):
+        self._durations.update({"m.Fast.test_a": 3.0})
+        reloaded = testdurations.TestDurations(self._durations.filePath())
+        self.assertEqual(reloaded.duration("m.Fast.test_a"), 2.0)
+        # The unknown test is estimated by the median duration of the known ones.
+        testIds = ["m.New.test_a", "m.Mid.test_a", "m.Fast.test_b", "m.Slow.test_b"]
+        self.assertEqual(reloaded.estimate(testIds), [6.0, 8.0, 1.0, 6.0])
+
+    def test_lptOrder(self):
+        groups = scheduler.groupByTestCase(self._testIds)
+        ordered = scheduler.lptOrder(groups, self._durations)
+        self.assertEqual(
+            [g[0] for g in ordered],
+            ["m.Slow.test_a", "m.Mid.test_a", "m.New.test_a", "m.Fast.test_a"],
+        )
+
+    def test_shardsAreBalancedAndDisjoint(self):
+        shards = [
+            scheduler.selectShard(self._testIds, i, 2, durations=self._durations)
+            for i in (1, 2)
+        ]
+        self.assertEqual(sorted(shards[0] + shards[1]), sorted(self._testIds))
+        self.assertEqual(shards[0], ["m.Slow.test_a", "m.Slow.test_b"])
+        self.assertEqual(
+            shards[1],
+            ["m.Fast.test_a", "m.Fast.test_b", "m.Mid.test_a", "m.New.test_a"],
+        )
+
+        # Without the durations the shards are balanced by the test count.
+        shards = [scheduler.selectShard(self._testIds, i, 3) for i in (1, 2, 3)]
+        self.assertEqual([len(s) for s in shards], [2, 2, 2])
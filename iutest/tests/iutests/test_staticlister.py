@@ -0,0 +1,168 @@
+# Copyright 2019-2020 by Wenfeng Gao, MGLAND animation studio. All rights reserved.
+# This file is part of IUTest, and is released under the "MIT License Agreement".
+# Please see the LICENSE file that should have been included as part of this package.
+
+import unittest
+import os
+
+from iutest.core import staticlister
+from iutest.tests.iutests import test_runnercommon as common
+
+_BASE_MODULE = """
+import unittest
+
+class BaseCase(unittest.TestCase):
+    def test_base(self):
+        pass
+
+class Mixin(object):
+    def test_mixin(self):
+        pass
+"""
+
+_DERIVED_MODULE = """
+from unittest import TestCase
+from pkg.base import BaseCase, Mixin
+
+class DerivedCase(BaseCase, Mixin):
+    def test_derived(self):
+        pass
+
+    def helper(self):
+        pass
+
+class PlainCase(TestCase):
+    def runTest(self):
+        pass
+
+class NotATest(object):
+    def test_no(self):
+        pass
+"""
+
+_LOAD_TESTS_MODULE = """
+def load_tests(loader, tests, pattern):
+    return tests
+"""
+
+_CLASS_DECORATED_MODULE = """
+import unittest
+
+
+def addCases(cls):
+    cls.test_added = lambda self: None
+    return cls
+
+
+@addCases
+class D(unittest.TestCase):
+    def test_static(self):
+        pass
+"""
+
+_METHOD_DECORATED_MODULE = """
+import unittest
+from somewhere import expand
+
+
+class D(unittest.TestCase):
+    @expand([1, 2])
+    def test_expanded(self, value):
+        pass
+"""
+
+_SKIPPED_MODULE = """
+import unittest
+from unittest import skipIf
+
+
+class SkippedCase(unittest.TestCase):
+    @unittest.skip("Not now.")
+    def test_a(self):
+        pass
+
+    @skipIf(True, "Not here.")
+    def test_b(self):
+        pass
+
+    @unittest.expectedFailure
+    def test_c(self):
+        pass
+"""
+
+
+class StaticTestListerTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tempDir = common.useTempDir(self)
+        common.writeFile(os.path.join(self._tempDir, "pkg", "__init__.py"), "")
+        common.writeFile(os.path.join(self._tempDir, "pkg", "base.py"), _BASE_MODULE)
+        common.writeFile(
+            os.path.join(self._tempDir, "pkg", "test_derived.py"), _DERIVED_MODULE
+        )
+        common.writeFile(
+            os.path.join(self._tempDir, "test_dynamic.py"), _LOAD_TESTS_MODULE
+        )
+        self._importedModules = []
+
+    def _fallbackLoader(self, modulePath):
+        self._importedModules.append(modulePath)
+        return ["{}.Dynamic.test_x".format(modulePath)]
+
+    def test_listTestsStatically(self):
+        lister = staticlister.StaticTestLister(
+            self._tempDir, self._tempDir, fallbackLoader=self._fallbackLoader
+        )
+        self.assertTrue(lister.isApplicable())
+        expected = [
+            "pkg.base.BaseCase.test_base",
+            "pkg.test_derived.DerivedCase.test_base",
+            "pkg.test_derived.DerivedCase.test_derived",
+            "pkg.test_derived.DerivedCase.test_mixin",
+            "pkg.test_derived.PlainCase.runTest",
+            "test_dynamic.Dynamic.test_x",
+        ]
+        self.assertEqual(list(lister.iterAllTestIds()), expected)
+        self.assertEqual(self._importedModules, ["test_dynamic"])
+        self.assertFalse(staticlister.StaticTestLister.gotError)
+
+    def test_failedFallbackReportsError(self):
+        lister = staticlister.StaticTestLister(
+            self._tempDir, self._tempDir, fallbackLoader=lambda modulePath: None
+        )
+        testIds = list(lister.iterAllTestIds())
+        self.assertEqual(len(testIds), 5)
+        self.assertTrue(staticlister.StaticTestLister.gotError)
+
+    def test_unresolvableBaseIsInconclusive(self):
+        common.writeFile(
+            os.path.join(self._tempDir, "test_external.py"),
+            "import somewhere\nclass Case(somewhere.Base):\n    def test_a(self): pass\n",
+        )
+        lister = staticlister.StaticTestLister(self._tempDir, self._tempDir)
+        self.assertIs(
+            lister.testIdsOfModule("test_external"), staticlister.INCONCLUSIVE
+        )
+
+
+    def test_decoratorsAreInconclusive(self):
+        modules = {
+            "test_classdecorated": _CLASS_DECORATED_MODULE,
+            "test_methoddecorated": _METHOD_DECORATED_MODULE,
+            "test_skipped": _SKIPPED_MODULE,
+        }
+        for moduleName, content in modules.items():
+            common.writeFile(os.path.join(self._tempDir, moduleName + ".py"), content)
+
+        lister = staticlister.StaticTestLister(self._tempDir, self._tempDir)
+        for moduleName in ("test_classdecorated", "test_methoddecorated"):
+            self.assertIs(
+                lister.testIdsOfModule(moduleName), staticlister.INCONCLUSIVE
+            )
+        self.assertEqual(
+            lister.testIdsOfModule("test_skipped"),
+            [
+                "test_skipped.SkippedCase.test_a",
+                "test_skipped.SkippedCase.test_b",
+                "test_skipped.SkippedCase.test_c",
+            ],
+        )
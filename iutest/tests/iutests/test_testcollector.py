@@ -0,0 +1,59 @@
+# Copyright 2019-2020 by Wenfeng Gao, MGLAND animation studio. All rights reserved.
+# This file is part of IUTest, and is released under the "MIT License Agreement".
+# Please see the LICENSE file that should have been included as part of this package.
+
+import unittest
+import logging
+import threading
+
+from iutest.core import testcollector
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundTestCollectorTestCase(unittest.TestCase):
+    def test_collectInBatches(self):
+        def _iterTestIds():
+            logger.warning("Collecting from thread.")
+            for i in range(10):
+                yield "test_a.Case.test_{}".format(i)
+
+        collector = testcollector.BackgroundTestCollector(_iterTestIds)
+        collector.start()
+        self.assertTrue(collector.wait(5))
+
+        self.assertEqual(collector.collectedCount(), 10)
+        self.assertEqual(len(collector.takeTestIds(4)), 4)
+        self.assertFalse(collector.isDone())
+        self.assertEqual(len(collector.takeTestIds()), 6)
+        self.assertTrue(collector.isDone())
+
+        records = collector.takeLogRecords()
+        self.assertEqual(records, [(logging.WARNING, "Collecting from thread.")])
+
+    def test_cancel(self):
+        proceed = threading.Event()
+
+        def _iterTestIds():
+            yield "test_a.Case.test_1"
+            proceed.wait(5)
+            yield "test_a.Case.test_2"
+
+        collector = testcollector.BackgroundTestCollector(_iterTestIds)
+        collector.start()
+        collector.cancel()
+        proceed.set()
+        self.assertTrue(collector.wait(5))
+        self.assertTrue(collector.isCancelled())
+        self.assertEqual(collector.takeTestIds(), [])
+
+    def test_error(self):
+        def _iterTestIds():
+            yield "test_a.Case.test_1"
+            raise RuntimeError("Boom")
+
+        collector = testcollector.BackgroundTestCollector(_iterTestIds)
+        collector.start()
+        self.assertTrue(collector.wait(5))
+        self.assertIsInstance(collector.error(), RuntimeError)
+        self.assertEqual(collector.takeTestIds(), ["test_a.Case.test_1"])
@@ -0,0 +1,68 @@
+# Copyright 2019-2020 by Wenfeng Gao, MGLAND animation studio. All rights reserved.
+# This file is part of IUTest, and is released under the "MIT License Agreement".
+# Please see the LICENSE file that should have been included as part of this package.
+
+import unittest
+
+from iutest.core import constants
+from iutest.core import testfilter
+from iutest.core import testnodes
+
+
+class TestFilterTestCase(unittest.TestCase):
+    def setUp(self):
+        self._store = testnodes.TestNodeStore()
+        root = self._store.addNode(
+            testnodes.NO_NODE, "/tests", "/tests", constants.ITEM_CATEGORY_ALL
+        )
+        for testId in (
+            "pkg.mod_a.Suite.test_alpha",
+            "pkg.mod_a.Suite.test_beta",
+            "pkg.mod_b.Other.test_alpha",
+        ):
+            parent = root
+            parts = testId.split(".")
+            for i, name in enumerate(parts):
+                path = ".".join(parts[: i + 1])
+                node = self._store.node(path)
+                if node == testnodes.NO_NODE:
+                    category = constants.ITEM_CATEGORY_TEST
+                    if i < len(parts) - 1:
+                        category = constants.ITEM_CATEGORY_SUITE
+                    node = self._store.addNode(parent, name, path, category)
+                parent = node
+        self._filter = testfilter.TestFilter(self._store)
+
+    def _matchedIds(self, *keywords):
+        nodes = self._filter.matchedNodes(keywords)
+        return sorted(self._store.testId(node) for node in nodes)
+
+    def test_textKeywords(self):
+        self.assertIsNone(self._filter.matchedNodes(["", ""]))
+        self.assertEqual(
+            self._matchedIds("alpha"),
+            ["pkg.mod_a.Suite.test_alpha", "pkg.mod_b.Other.test_alpha"],
+        )
+        # The longer keyword is looked up from the matches of the shorter one.
+        self.assertEqual(
+            self._matchedIds("alpha", "mod_b"), ["pkg.mod_b.Other.test_alpha"]
+        )
+        self.assertEqual(
+            self._matchedIds("suite.test_b"), ["pkg.mod_a.Suite.test_beta"]
+        )
+        self.assertEqual(self._matchedIds("tests"), [])
+        self.assertEqual(len(self._matchedIds("mod_a")), 4)
+
+    def test_stateKeywords(self):
+        beta = self._store.node("pkg.mod_a.Suite.test_beta")
+        self._store.setState(beta, constants.TEST_RESULT_ERROR)
+        self.assertEqual(
+            self._matchedIds("test_", constants.KEYWORD_TEST_STATE_ERROR),
+            ["pkg.mod_a.Suite.test_beta"],
+        )
+        self.assertEqual(len(self._matchedIds(constants.KEYWORD_TEST_STATE_RUN)), 4)
+        self.assertEqual(self._matchedIds(constants.KEYWORD_TEST_STATE_FLAKY), [])
+
+        visibleNodes = self._filter.visibleNodes([constants.KEYWORD_TEST_STATE_ERROR])
+        self.assertIn(self._store.root(), visibleNodes)
+        self.assertNotIn(self._store.node("pkg.mod_b"), visibleNodes)
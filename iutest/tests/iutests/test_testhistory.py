@@ -0,0 +1,221 @@
+# Copyright 2019-2020 by Wenfeng Gao, MGLAND animation studio. All rights reserved.
+# This file is part of IUTest, and is released under the "MIT License Agreement".
+# Please see the LICENSE file that should have been included as part of this package.
+
+import unittest
+import os
+import sys
+import time
+
+from iutest.core import constants
+from iutest.core import testhistory
+from iutest.core import testmanager
+from iutest.core.runners import runnerconstants
+from iutest.tests.iutests import test_runnercommon as common
+
+_FLAKY_TESTS = """
+import os
+import unittest
+
+_MARKER = os.path.join(os.path.dirname(__file__), "ranOnce")
+
+
+class FlakyTestCase(unittest.TestCase):
+    def test_flaky(self):
+        if not os.path.isfile(_MARKER):
+            open(_MARKER, "w").close()
+            self.fail("The first run fails.")
+
+    def test_broken(self):
+        self.fail("It always fails.")
+"""
+
+
+class _FixtureTests(unittest.TestCase):
+    def setUp(self):
+        time.sleep(0.05)
+
+    def test_nothing(self):
+        pass
+
+
+class TestHistoryTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tempDir = common.useTempDir(self)
+        self._history = testhistory.TestHistory(
+            os.path.join(self._tempDir, "history.sqlite3")
+        )
+
+    def tearDown(self):
+        self._history.close()
+
+    def test_recordRuns(self):
+        # Nothing is recorded outside a run.
+        self._history.recordTest("m.A.test_a", constants.TEST_RESULT_PASS, 1.0)
+
+        firstRunId = self._history.beginRun("PyUnit")
+        self._history.recordTest(
+            "m.A.test_a", constants.TEST_RESULT_PASS, 1.0, setUpTime=0.2, worker=1
+        )
+        self._history.recordTest("m.A.test_b", constants.TEST_RESULT_FAIL, 0.5)
+        self._history.endRun()
+
+        secondRunId = self._history.beginRun("nose2")
+        self._history.recordTest("m.A.test_a", constants.TEST_RESULT_ERROR, 2.0)
+        self._history.endRun()
+
+        runs = self._history.runs()
+        self.assertEqual([r[0] for r in runs], [secondRunId, firstRunId])
+        self.assertEqual(runs[1][1], "PyUnit")
+        self.assertEqual(runs[1][4], 2)
+
+        results = self._history.testResults("m.A.test_a")
+        self.assertEqual(
+            [r.outcome for r in results],
+            [constants.TEST_RESULT_ERROR, constants.TEST_RESULT_PASS],
+        )
+        self.assertEqual(results[1].setUpTime, 0.2)
+        self.assertEqual(results[1].worker, 1)
+        self.assertIsNone(results[0].worker)
+        self.assertEqual(
+            [r.testId for r in self._history.runResults(firstRunId)],
+            ["m.A.test_a", "m.A.test_b"],
+        )
+
+    def test_batchedWrites(self):
+        self._history.beginRun()
+        for i in range(self._history._batchSize + 10):
+            self._history.recordTest("m.A.test_{}".format(i), 1, 0.0)
+        # Only the last incomplete batch is still pending.
+        self.assertEqual(len(self._history._pending), 10)
+        self._history.endRun()
+        self.assertEqual(len(self._history._pending), 0)
+
+        reopened = testhistory.TestHistory(self._history.filePath())
+        self.assertEqual(reopened.runs()[0][4], self._history._batchSize + 10)
+        reopened.close()
+
+    def test_fixtureTimer(self):
+        test = _FixtureTests("test_nothing")
+        timer = testhistory.FixtureTimer(test)
+        result = unittest.TestResult()
+        test.run(result)
+        timer.detach()
+        self.assertTrue(result.wasSuccessful())
+        self.assertGreaterEqual(timer.setUpTime(), 0.04)
+        self.assertIsNotNone(timer.tearDownTime())
+        self.assertNotIn("setUp", vars(test))
+
+    def test_slowTestBaseline(self):
+        testId = "m.A.test_slow"
+        self._history.beginRun()
+        for duration in (0.2, 0.21, 0.19, 0.2, 0.22):
+            # Not enough runs to tell yet.
+            self.assertIsNone(self._history.slowTestBaseline(testId, 10.0))
+            self._history.recordTest(testId, constants.TEST_RESULT_PASS, duration)
+        # The failed runs don't count.
+        self._history.recordTest(testId, constants.TEST_RESULT_FAIL, 0.01)
+        self._history.endRun()
+
+        self.assertEqual(self._history.durationBaseline(testId), 0.22)
+        self.assertEqual(self._history.slowTestBaseline(testId, 0.5), 0.22)
+        self.assertIsNone(self._history.slowTestBaseline(testId, 0.3))
+
+        # The baseline is kept in the database, not rebuilt from the results.
+        reopened = testhistory.TestHistory(self._history.filePath())
+        self.assertEqual(reopened.durationBaseline(testId), 0.22)
+        reopened.close()
+
+    def test_flipRate(self):
+        testId = "m.A.test_flaky"
+        self._history.beginRun()
+        for outcome in (
+            constants.TEST_RESULT_PASS,
+            constants.TEST_RESULT_FAIL,
+            constants.TEST_RESULT_SKIP,
+            constants.TEST_RESULT_PASS,
+            constants.TEST_RESULT_PASS,
+        ):
+            self._history.recordTest(testId, outcome, 0.1)
+        self._history.recordTest("m.A.test_stable", constants.TEST_RESULT_PASS, 0.1)
+        self._history.recordTest("m.A.test_stable", constants.TEST_RESULT_PASS, 0.1)
+        self._history.endRun()
+
+        # The skip doesn't count, 2 of the 3 transitions are flips.
+        self.assertAlmostEqual(self._history.flipRate(testId), 2.0 / 3)
+        self.assertEqual(self._history.flipRate("m.A.test_stable"), 0.0)
+        self.assertEqual(self._history.flipRate("m.A.test_unknown"), 0.0)
+
+        reopened = testhistory.TestHistory(self._history.filePath())
+        self.assertAlmostEqual(reopened.flipRate(testId), 2.0 / 3)
+        flakyTests = reopened.flakyTests()
+        reopened.close()
+        self.assertEqual([t[0] for t in flakyTests], [testId])
+        self.assertEqual(flakyTests[0][2], 2)
+
+    def test_oldResultsDeleted(self):
+        self._history._maxResultsPerTest = 3
+        self._history._maxRuns = 4
+        runIds = []
+        for i in range(6):
+            runIds.append(self._history.beginRun("PyUnit"))
+            self._history.recordTest("m.A.test_a", constants.TEST_RESULT_PASS, 1.0)
+            if i == 0:
+                self._history.recordTest("m.A.test_b", constants.TEST_RESULT_PASS, 1.0)
+            self._history.endRun()
+
+        results = self._history.testResults("m.A.test_a")
+        self.assertEqual([r.runId for r in results], runIds[:-4:-1])
+        # Only the tests of a run have their old results deleted.
+        self.assertEqual(len(self._history.testResults("m.A.test_b")), 1)
+        self.assertEqual([r[0] for r in self._history.runs()], runIds[:-5:-1])
+
+    def test_percentile(self):
+        self.assertEqual(testhistory.percentile([3, 1, 2], 95), 3)
+        self.assertEqual(testhistory.percentile(list(range(1, 21)), 95), 19)
+        self.assertEqual(testhistory.percentile([5], 50), 5)
+
+
+class FlakyRerunTestCase(unittest.TestCase):
+    _moduleName = "iutest_flaky_tests"
+
+    def setUp(self):
+        self._tempDir = common.useTempDir(self)
+        common.writeFile(
+            os.path.join(self._tempDir, self._moduleName + ".py"), _FLAKY_TESTS
+        )
+        sys.path.insert(0, self._tempDir)
+        common.useTempDataDir(self)
+        testhistory.TestHistory.useFile(os.path.join(self._tempDir, "history.sqlite3"))
+        self._manager = testmanager.TestManager(None, None)
+        self._manager.setRunnerMode(runnerconstants.RUNNER_PYUNIT)
+
+    def tearDown(self):
+        testhistory.TestHistory.useFile(None)
+        sys.path.remove(self._tempDir)
+        sys.modules.pop(self._moduleName, None)
+
+    def test_rerunFailedTests(self):
+        self._manager.setFlakyReruns(2)
+        self._manager.runTests(self._moduleName)
+
+        flakyId = self._moduleName + ".FlakyTestCase.test_flaky"
+        brokenId = self._moduleName + ".FlakyTestCase.test_broken"
+        runInfo = self._manager.lastRunInfo()
+        self.assertEqual(runInfo.flakyTests, [(flakyId, 1)])
+        self.assertEqual(len(runInfo.runTestIds), 2)
+        self.assertEqual(runInfo.successCount, 1)
+        self.assertEqual(runInfo.failedCount, 1)
+        self.assertEqual(runInfo.failedTestId, brokenId)
+
+        history = testhistory.TestHistory.get()
+        self.assertEqual(history.flipRate(flakyId), 1.0)
+        self.assertEqual(history.flipRate(brokenId), 0.0)
+        # The broken test is run once and rerun twice.
+        self.assertEqual(len(history.testResults(brokenId)), 3)
+
+    def test_noReruns(self):
+        self._manager.runTests(self._moduleName)
+        runInfo = self._manager.lastRunInfo()
+        self.assertFalse(runInfo.flakyTests)
+        self.assertEqual(runInfo.failedCount, 2)
@@ -0,0 +1,106 @@
+# Copyright 2019-2020 by Wenfeng Gao, MGLAND animation studio. All rights reserved.
+# This file is part of IUTest, and is released under the "MIT License Agreement".
+# Please see the LICENSE file that should have been included as part of this package.
+
+import unittest
+
+from iutest.core import constants
+from iutest.core import testnodes
+
+
+class TestNodeStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self._store = testnodes.TestNodeStore()
+        self._root = self._store.addNode(
+            testnodes.NO_NODE, "tests", "tests", constants.ITEM_CATEGORY_ALL
+        )
+        self._module = self._store.addNode(
+            self._root, "m", "m", constants.ITEM_CATEGORY_MODULE
+        )
+        self._suite = self._store.addNode(
+            self._module, "A", "m.A", constants.ITEM_CATEGORY_SUITE
+        )
+        for name in ("test_a", "test_c"):
+            self._store.addNode(
+                self._suite, name, "m.A." + name, constants.ITEM_CATEGORY_TEST
+            )
+
+    def test_structure(self):
+        store = self._store
+        self.assertEqual(store.root(), self._root)
+        self.assertEqual(len(store), 5)
+        self.assertEqual(store.testCount(), 2)
+        self.assertIn("m.A.test_c", store)
+
+        node = store.addNode(
+            self._suite, "test_b", "m.A.test_b", constants.ITEM_CATEGORY_TEST, row=1
+        )
+        self.assertEqual(store.row(node), 1)
+        self.assertEqual(store.row(store.node("m.A.test_c")), 2)
+        self.assertEqual(store.parent(node), self._suite)
+        self.assertEqual(
+            list(store.iterAncestors(node)), [self._suite, self._module, self._root]
+        )
+        self.assertEqual(
+            [store.testId(each) for each in store.iterTestNodes()],
+            ["m.A.test_a", "m.A.test_b", "m.A.test_c"],
+        )
+
+        store.removeNode(store.node("m.A.test_a"))
+        self.assertNotIn("m.A.test_a", store)
+        self.assertEqual(store.row(node), 0)
+        self.assertEqual(store.testCount(), 2)
+
+        store.removeNode(self._module)
+        self.assertEqual(store.allIds(), ["tests"])
+        self.assertEqual(store.testCount(), 0)
+        self.assertEqual(store.childCount(self._root), 0)
+
+    def test_timesAndNotes(self):
+        store = self._store
+        node = store.node("m.A.test_a")
+        self.assertIsNone(store.duration(node))
+        store.setTimes(node, startTime=10.0)
+        store.setStopTime(node, 10.25)
+        self.assertEqual(store.duration(node), 0.25)
+
+        self.assertFalse(store.isFlaky(node))
+        store.setNote(node, testnodes.NOTE_FLAKY, "Flaky")
+        self.assertTrue(store.isFlaky(node))
+        store.clearNote(node)
+        self.assertIsNone(store.note(node))
+
+    def test_stateCounts(self):
+        store = self._store
+        testA = store.node("m.A.test_a")
+        testC = store.node("m.A.test_c")
+        self.assertEqual(
+            store.childStateCount(self._suite, constants.TEST_RESULT_NONE), 2
+        )
+
+        changed = store.setState(testA, constants.TEST_RESULT_RUNNING)
+        self.assertEqual(changed, [testA, self._suite, self._module, self._root])
+        self.assertEqual(store.state(self._root), constants.TEST_RESULT_RUNNING)
+
+        store.setState(testA, constants.TEST_RESULT_FAIL)
+        self.assertEqual(store.state(self._root), constants.TEST_RESULT_FAIL)
+        # A passed sibling doesn't change the failed ancestors.
+        self.assertEqual(store.setState(testC, constants.TEST_RESULT_PASS), [testC])
+        self.assertEqual(
+            store.childStateCount(self._suite, constants.TEST_RESULT_PASS), 1
+        )
+
+        self.assertEqual(
+            store.resetNodes(testA), [self._suite, self._module, self._root]
+        )
+        self.assertEqual(store.state(self._root), constants.TEST_RESULT_PASS)
+
+        store.setState(testA, constants.TEST_RESULT_ERROR)
+        store.removeNode(testA)
+        self.assertEqual(store.state(self._suite), constants.TEST_RESULT_PASS)
+
+        store.resetNodes(self._root)
+        self.assertEqual(store.state(testC), constants.TEST_RESULT_NONE)
+        self.assertEqual(
+            store.childStateCount(self._suite, constants.TEST_RESULT_NONE), 1
+        )
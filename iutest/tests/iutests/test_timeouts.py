@@ -0,0 +1,75 @@
+# Copyright 2019-2020 by Wenfeng Gao, MGLAND animation studio. All rights reserved.
+# This file is part of IUTest, and is released under the "MIT License Agreement".
+# Please see the LICENSE file that should have been included as part of this package.
+
+import unittest
+import time
+
+import iutest
+from iutest.core import timeouts
+
+
+@iutest.timeout(3)
+class _DecoratedTests(unittest.TestCase):
+    def test_classTimeout(self):
+        pass
+
+    @iutest.timeout(0)
+    def test_noTimeout(self):
+        pass
+
+
+class _HangTests(unittest.TestCase):
+    @iutest.timeout(0.3)
+    def test_hang(self):
+        endTime = time.time() + 10
+        while time.time() < endTime:
+            time.sleep(0.01)
+
+    def test_quick(self):
+        pass
+
+
+class TimeoutsTestCase(unittest.TestCase):
+    def test_testTimeout(self):
+        self.assertEqual(
+            timeouts.testTimeout(_DecoratedTests("test_classTimeout"), 10), 3
+        )
+        self.assertEqual(timeouts.testTimeout(_DecoratedTests("test_noTimeout"), 10), 0)
+        self.assertEqual(timeouts.testTimeout(_HangTests("test_quick"), 10), 10)
+
+    def test_dumpAllThreadStacks(self):
+        self.assertIn("test_dumpAllThreadStacks", timeouts.dumpAllThreadStacks())
+
+    def test_watchdogErrorsOutHungTest(self):
+        timedOutIds = []
+        watchdog = timeouts.TestWatchdog(
+            onTimeout=lambda testId, _: timedOutIds.append(testId)
+        )
+        watchdog.checkInterval = 0.05
+
+        class _Result(unittest.TestResult):
+            def startTest(self, test):
+                unittest.TestResult.startTest(self, test)
+                watchdog.watchTest(test)
+
+            def stopTest(self, test):
+                watchdog.unwatchTest()
+                unittest.TestResult.stopTest(self, test)
+
+        suite = unittest.TestSuite(
+            [_HangTests("test_hang"), _HangTests("test_quick")]
+        )
+        result = _Result()
+        startTime = time.time()
+        watchdog.start()
+        try:
+            suite.run(result)
+        finally:
+            watchdog.stop()
+
+        self.assertLess(time.time() - startTime, 5)
+        self.assertEqual(result.testsRun, 2)
+        self.assertEqual(len(result.errors), 1)
+        self.assertIn("TestTimeoutError", result.errors[0][1])
+        self.assertEqual(timedOutIds, [_HangTests("test_hang").id()])
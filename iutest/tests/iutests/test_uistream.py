@@ -0,0 +1,37 @@
+# Copyright 2019-2020 by Wenfeng Gao, MGLAND animation studio. All rights reserved.
+# This file is part of IUTest, and is released under the "MIT License Agreement".
+# Please see the LICENSE file that should have been included as part of this package.
+
+import threading
+import unittest
+
+from iutest.core import uistream
+
+
+class UiUpdateQueueTestCase(unittest.TestCase):
+    def test_takeInOrder(self):
+        queue = uistream.UiUpdateQueue()
+
+        def putUpdates(worker):
+            for n in range(50):
+                queue.put("onSingleTestStop", worker, n)
+
+        threads = [threading.Thread(target=putUpdates, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        updates = queue.take()
+        self.assertEqual(len(updates), 200)
+        self.assertFalse(queue.take())
+        for i in range(4):
+            self.assertEqual(
+                [args[1] for _, args in updates if args[0] == i], list(range(50))
+            )
+
+    def test_queueUiUpdateWithoutUi(self):
+        self.assertIsNone(uistream.UiStream._uiUpdateQueue)
+        # Without a ui, the update is dropped silently.
+        uistream.UiStream.queueUiUpdate("onSingleTestStop", "a.test", 0.0)
+        self.assertTrue(uistream.isUiThread())
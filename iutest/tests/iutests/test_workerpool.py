@@ -0,0 +1,164 @@
+# Copyright 2019-2020 by Wenfeng Gao, MGLAND animation studio. All rights reserved.
+# This file is part of IUTest, and is released under the "MIT License Agreement".
+# Please see the LICENSE file that should have been included as part of this package.
+
+import unittest
+import os
+import sys
+import multiprocessing
+
+from iutest.core import constants
+from iutest.core import workerpool
+from iutest.tests.iutests import test_runnercommon as common
+
+_TEST_MODULE = """
+import sys
+import unittest
+
+class Case(unittest.TestCase):
+    def test_preloaded(self):
+        self.assertIn("xml.dom.minidom", sys.modules)
+
+    def test_value(self):
+        self.assertEqual({}, 1)
+"""
+
+_HANG_TEST_MODULE = """
+import time
+import unittest
+
+class Case(unittest.TestCase):
+    def test_hang(self):
+        time.sleep(60)
+
+    def test_quick(self):
+        pass
+"""
+
+
+class WorkerPoolTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tempDir = common.useTempDir(self)
+        self._writeTestModule(0)
+        self._pool = None
+
+    def tearDown(self):
+        if self._pool:
+            self._pool.shutdown()
+
+    def _writeTestModule(self, value):
+        common.writeFile(
+            os.path.join(self._tempDir, "test_pooled.py"), _TEST_MODULE.format(value)
+        )
+
+    def _writeHangTestModule(self):
+        common.writeFile(
+            os.path.join(self._tempDir, "test_pooledhang.py"), _HANG_TEST_MODULE
+        )
+
+    def _makePool(self, **kwargs):
+        self._pool = workerpool.WorkerPool(
+            1, sysPath=[self._tempDir], preloadModules=["xml.dom.minidom"], **kwargs
+        )
+        return self._pool
+
+    def _run(self, *tasks):
+        self._pool.beginRun()
+        for taskId, testIds in enumerate(tasks):
+            self._pool.submit(taskId, testIds)
+
+        outcomes = {}
+        pids = []
+        recycled = 0
+        for msg in self._pool.iterMessages():
+            if msg[0] == workerpool.MSG_TEST_OUTCOME:
+                outcomes[msg[2]] = msg[3]
+            elif msg[0] == workerpool.MSG_TASK_START:
+                pids.append(msg[3])
+            elif msg[0] == workerpool.MSG_WORKER_RECYCLED:
+                recycled += 1
+        return outcomes, pids, recycled
+
+    def test_poolSurvivesBetweenRuns(self):
+        self._makePool()
+        outcomes, pids, _ = self._run(
+            ["test_pooled.Case.test_preloaded", "test_pooled.Case.test_value"]
+        )
+        self.assertEqual(
+            outcomes["test_pooled.Case.test_preloaded"], constants.TEST_RESULT_PASS
+        )
+        self.assertEqual(
+            outcomes["test_pooled.Case.test_value"], constants.TEST_RESULT_FAIL
+        )
+
+        # The changed test module is imported again by the warm worker.
+        self._writeTestModule(1)
+        outcomes, nextPids, _ = self._run(["test_pooled.Case.test_value"])
+        self.assertEqual(
+            outcomes["test_pooled.Case.test_value"], constants.TEST_RESULT_PASS
+        )
+        self.assertEqual(pids, nextPids)
+
+    def test_recycleWorkerAfterTests(self):
+        self._makePool(maxTestsPerWorker=1)
+        outcomes, pids, recycled = self._run(
+            ["test_pooled.Case.test_preloaded"], ["test_pooled.Case.test_preloaded"]
+        )
+        self.assertEqual(len(outcomes), 1)
+        self.assertGreaterEqual(recycled, 1)
+        self.assertEqual(len(set(pids)), 2)
+        self.assertTrue(self._pool.isAlive())
+
+    def test_killWorkerOfTimedOutTest(self):
+        self._writeHangTestModule()
+        self._makePool()
+        self._pool.beginRun(testTimeout=0.5)
+        self._pool.submit(
+            0, ["test_pooledhang.Case.test_hang", "test_pooledhang.Case.test_quick"]
+        )
+
+        messages = list(self._pool.iterMessages())
+        msgTypes = [msg[0] for msg in messages]
+        self.assertIn(workerpool.MSG_TEST_TIMEOUT, msgTypes)
+        timeoutMsg = messages[msgTypes.index(workerpool.MSG_TEST_TIMEOUT)]
+        self.assertEqual(timeoutMsg[2], "test_pooledhang.Case.test_hang")
+        self.assertEqual(timeoutMsg[3], 0)
+        self.assertIn(workerpool.MSG_WORKER_CRASHED, msgTypes)
+        self.assertTrue(self._pool.isAlive())
+
+
+class WorkerPythonTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tempDir = common.useTempDir(self)
+        self._executable = sys.executable
+        self._execPrefix = sys.exec_prefix
+        self._envPython = os.environ.pop(workerpool.WORKER_PYTHON_ENV, None)
+
+    def tearDown(self):
+        sys.executable = self._executable
+        sys.exec_prefix = self._execPrefix
+        os.environ.pop(workerpool.WORKER_PYTHON_ENV, None)
+        if self._envPython is not None:
+            os.environ[workerpool.WORKER_PYTHON_ENV] = self._envPython
+
+    def _touch(self, fileName):
+        return common.writeFile(os.path.join(self._tempDir, fileName), "")
+
+    def test_hostApplication(self):
+        self.assertEqual(workerpool.workerPython(), sys.executable)
+
+        sys.executable = self._touch("maya.bin")
+        sys.exec_prefix = os.path.join(self._tempDir, "missing")
+        self.assertIsNone(workerpool.workerPython())
+        if hasattr(multiprocessing, "get_context"):
+            reason = workerpool.parallelUnavailableReason()
+            self.assertIn(workerpool.WORKER_PYTHON_ENV, reason)
+        with self.assertRaises(RuntimeError):
+            workerpool.WorkerPool(1).start()
+
+        mayapy = self._touch("mayapy.exe" if os.name == "nt" else "mayapy")
+        self.assertEqual(workerpool.workerPython(), mayapy)
+        self.assertIsNone(workerpool.parallelUnavailableReason())
+
+        os.environ[workerpool.WORKER_PYTHON_ENV] = self._executable
+        self.assertEqual(workerpool.workerPython(), self._executable)
@@ -47,6 +47,90 @@ class ConfigWindow(QtWidgets.QDialog):
         self._formLayout.addRow("Go To Code Line", self._codeEditorLE)
         self._formLayout.addRow("", _annoText)
 
+        # Parallel run worker config
+        settings = appsettings.get()
+        self._preloadModulesLE = QtWidgets.QLineEdit(self)
+        self._preloadModulesLE.setText(
+            settings.simpleConfigStrValue(constants.CONFIG_KEY_WORKER_PRELOAD_MODULES)
+        )
+        self._preloadModulesLE.editingFinished.connect(self._onPreloadModulesEdited)
+        self._preloadModulesLE.setPlaceholderText("Example: numpy, maya.standalone")
+        self._preloadModulesLE.setToolTip(
+            "The modules the parallel test worker processes import before running tests,\n"
+            "the workers are kept between the runs, so these are imported only once."
+        )
+
+        self._workerMaxTestsSB = self._makeLimitSpinBox(
+            constants.CONFIG_KEY_WORKER_MAX_TESTS,
+            "Replace a worker process after it ran this many tests, 0 for no limit.",
+        )
+        self._workerMaxMemorySB = self._makeLimitSpinBox(
+            constants.CONFIG_KEY_WORKER_MAX_MEMORY,
+            "Replace a worker process once its memory exceeds this, 0 for no limit.",
+            suffix=" MB",
+        )
+
+        self._formLayout.addRow("Worker Preload Modules", self._preloadModulesLE)
+        self._formLayout.addRow("Recycle Worker After", self._workerMaxTestsSB)
+        self._formLayout.addRow("Worker Memory Limit", self._workerMaxMemorySB)
+
+        # Timeout config
+        self._testTimeoutSB = self._makeLimitSpinBox(
+            constants.CONFIG_KEY_TEST_TIMEOUT,
+            "Error out a test once it runs this long and dump the stacks of all threads,\n"
+            "the tests decorated by iutest.timeout() override it, 0 for no limit.",
+            suffix=" s",
+        )
+        self._sessionTimeoutSB = self._makeLimitSpinBox(
+            constants.CONFIG_KEY_SESSION_TIMEOUT,
+            "Stop the test run once it takes this long, 0 for no limit.",
+            suffix=" s",
+        )
+        self._formLayout.addRow("Test Timeout", self._testTimeoutSB)
+        self._formLayout.addRow("Test Run Timeout", self._sessionTimeoutSB)
+
+        # Slow test config
+        self._slowTestPercentSB = self._makeLimitSpinBox(
+            constants.CONFIG_KEY_SLOW_TEST_PERCENT,
+            "Flag the tests that take longer than this percentage of the p95 duration\n"
+            "of their recent passed runs, 0 to not flag any.",
+            suffix=" %",
+            defaultValue=constants.CONFIG_KEY_SLOW_TEST_PERCENT_DEFAULT,
+            specialValueText="Off",
+        )
+        self._formLayout.addRow("Slow Test Threshold", self._slowTestPercentSB)
+
+        # Flaky test config
+        self._flakyRerunsSB = self._makeLimitSpinBox(
+            constants.CONFIG_KEY_FLAKY_RERUNS,
+            "Rerun each failed test by itself up to this many times after the run,\n"
+            "the tests that pass in a rerun are marked as flaky, 0 to not rerun them.",
+            suffix=" times",
+            specialValueText="Off",
+        )
+        self._formLayout.addRow("Rerun Failed Tests", self._flakyRerunsSB)
+
+        # Log browser config
+        self._logMaxBlockCountSB = self._makeLimitSpinBox(
+            constants.CONFIG_KEY_LOG_MAX_BLOCK_COUNT,
+            "Keep at most this many lines in the log browser, the older lines are\n"
+            "dropped, or appended to the spill file below, 0 for no limit.",
+            suffix=" lines",
+            defaultValue=constants.CONFIG_KEY_LOG_MAX_BLOCK_COUNT_DEFAULT,
+        )
+        self._logSpillFileLE = QtWidgets.QLineEdit(self)
+        self._logSpillFileLE.setText(
+            settings.simpleConfigStrValue(constants.CONFIG_KEY_LOG_SPILL_FILE)
+        )
+        self._logSpillFileLE.editingFinished.connect(self._onLogSpillFileEdited)
+        self._logSpillFileLE.setPlaceholderText("Example: /tmp/iutest.log")
+        self._logSpillFileLE.setToolTip(
+            "The file to append the lines dropped from the log browser to,\n"
+            "leave it empty to drop them."
+        )
+        self._formLayout.addRow("Log Line Limit", self._logMaxBlockCountSB)
+        self._formLayout.addRow("Spill Old Log To", self._logSpillFileLE)
+
         self.setMinimumWidth(400)
         self.setMinimumHeight(100)
 
@@ -57,6 +141,32 @@ class ConfigWindow(QtWidgets.QDialog):
         appsettings.get().saveSimpleConfig(constants.CONFIG_KEY_CODE_EDITOR, txt)
         gotocode.CodeLineVisitor.initEditorSetting()
 
+    def _makeLimitSpinBox(
+        self, configKey, toolTip, suffix="", defaultValue=0, specialValueText="No Limit"
+    ):
+        spinBox = QtWidgets.QSpinBox(self)
+        spinBox.setRange(0, 1000000)
+        spinBox.setSpecialValueText(specialValueText)
+        spinBox.setSuffix(suffix)
+        spinBox.setToolTip(toolTip)
+        spinBox.setValue(
+            appsettings.get().simpleConfigIntValue(configKey, defaultValue)
+        )
+        spinBox.valueChanged.connect(
+            lambda value: appsettings.get().saveSimpleConfig(configKey, value)
+        )
+        return spinBox
+
+    def _onPreloadModulesEdited(self):
+        txt = str(self._preloadModulesLE.text()).strip()
+        appsettings.get().saveSimpleConfig(
+            constants.CONFIG_KEY_WORKER_PRELOAD_MODULES, txt
+        )
+
+    def _onLogSpillFileEdited(self):
+        txt = str(self._logSpillFileLE.text()).strip()
+        appsettings.get().saveSimpleConfig(constants.CONFIG_KEY_LOG_SPILL_FILE, txt)
+
     @classmethod
     def _onDialogDeleted(cls, *_):
         cls._instance = None
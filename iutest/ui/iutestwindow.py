@@ -2,17 +2,22 @@
 # This file is part of IUTest, and is released under the "MIT License Agreement".
 # Please see the LICENSE file that should have been included as part of this package.
 
+import time
+import functools
 import logging
 
 from iutest import dcc
 from iutest import _version
 from iutest.core import importutils
-from iutest.qt import QtCore, QtGui, QtWidgets, iconFromPath, variantToPyValue
+from iutest.qt import QtCore, QtGui, QtWidgets, Signal, iconFromPath, variantToPyValue
 from iutest.core import iconutils
 from iutest.core import appsettings
+from iutest.core import backgroundrun
 from iutest.core import constants
+from iutest.core import filewatcher
 from iutest.core import testmanager
 from iutest.core import uistream
+from iutest.core import workerpool
 from iutest.ui import logbrowser
 from iutest.ui import rootpathedit
 from iutest.ui import unittesttree
@@ -34,10 +39,15 @@ class IUTestWindow(QtWidgets.QWidget):
     _clearLogOnRunIcon = None
     _clearLogIcon = None
     _stopAtErrorIcon = None
+    _runAllIcon = None
     _configIcon = None
     _caseSensitiveIcon = None
     _wholeWordIcon = None
     _panelStateIconSet = None
+    _testRunCheckInterval = 100
+    _treeFilterDelay = 200  # in milliseconds
+    _uiUpdateRate = 10  # The most times a second to apply the test updates.
+    filesChanged = Signal(list)
 
     def __init__(self, startDirOrModule=None, topDir=None, parent=None):
         parent = parent or dcc.findParentWindow()
@@ -47,6 +57,23 @@ class IUTestWindow(QtWidgets.QWidget):
         self._initIcons()
 
         self._testManager = testmanager.TestManager(self, startDirOrModule, topDir)
+        self._testRun = None
+        self._runSessionCount = 0
+        self._testRunTimer = QtCore.QTimer(self)
+        self._testRunTimer.setInterval(self._testRunCheckInterval)
+        self._testRunTimer.timeout.connect(self._checkTestRun)
+        self._treeFilterTimer = QtCore.QTimer(self)
+        self._treeFilterTimer.setSingleShot(True)
+        self._treeFilterTimer.setInterval(self._treeFilterDelay)
+        self._treeFilterTimer.timeout.connect(self._applyPendingTreeFilterText)
+        self._uiUpdates = uistream.UiUpdateQueue()
+        self._uiUpdateTimer = QtCore.QTimer(self)
+        self._uiUpdateTimer.setInterval(1000 // self._uiUpdateRate)
+        self._uiUpdateTimer.timeout.connect(self._applyUiUpdates)
+        self._lastRepaintTime = 0
+        self._fileWatcher = None
+        self._pendingChangedFiles = set()
+        self.filesChanged.connect(self._onFilesChanged)
 
         self._mainLay = uiutils.makeMainLayout(self)
         self.setContentsMargins(0, 0, 0, 0)
@@ -74,6 +101,8 @@ class IUTestWindow(QtWidgets.QWidget):
         self._view.runWithoutTearDown.connect(self._runTestWithoutTearDown)
         self._view.searchNeeded.connect(self._prepareTreeSearch)
         self._view.itemSelectionChanged.connect(self._viewSelectionChanged)
+        self._view.collectingProgress.connect(self._onCollectingProgress)
+        self._view.testsCollected.connect(self._onTestsCollected)
 
         leftLay.addWidget(self._view)
 
@@ -82,6 +111,7 @@ class IUTestWindow(QtWidgets.QWidget):
         _logTopLayout = uiutils.makeMinorHorizontalLayout()
         self._logBrowser = logbrowser.LogBrowser(self)
         self._logBrowser.searchNeeded.connect(self._prepareLogSearch)
+        self._applyLogSettings()
         self._makeLogBrowserTopWidgets(_logTopLayout)
         rightLay.addLayout(_logTopLayout, 0)
         rightLay.addWidget(self._logBrowser, 1)
@@ -91,8 +121,16 @@ class IUTestWindow(QtWidgets.QWidget):
         self._splitter.setStretchFactor(1, 1)
 
         # bottom -----------------------------------
+        _statusLayout = uiutils.makeMinorHorizontalLayout()
         self._statusLbl = statuslabel.StatusLabel(self)
-        self._mainLay.addWidget(self._statusLbl)
+        _statusLayout.addWidget(self._statusLbl, 1)
+        self._cancelCollectingBtn = QtWidgets.QPushButton("Cancel", self)
+        self._cancelCollectingBtn.setToolTip("Stop collecting the tests.")
+        self._cancelCollectingBtn.clicked.connect(self._cancelCollecting)
+        self._cancelCollectingBtn.setVisible(False)
+        _statusLayout.addWidget(self._cancelCollectingBtn, 0)
+        self._mainLay.addLayout(_statusLayout)
+        self._afterCollectingCallbacks = []
 
         _btmLayout = uiutils.makeMinorHorizontalLayout()
         self._makeRunButtons(_btmLayout)
@@ -117,6 +155,9 @@ class IUTestWindow(QtWidgets.QWidget):
     def getLogBrowserWidget(self):
         return self._logBrowser
 
+    def getUiUpdateQueue(self):
+        return self._uiUpdates
+
     def resetUiTestManager(self):
         self._view.setTestManager(self._testManager)
         self._statusLbl.setTestManager(self._testManager)
@@ -224,17 +265,20 @@ class IUTestWindow(QtWidgets.QWidget):
         iconutils.initSingleClassIcon(cls, "_clearLogIcon", "clearLog.svg")
         iconutils.initSingleClassIcon(cls, "_clearLogOnRunIcon", "clearLogOnRun.svg")
         iconutils.initSingleClassIcon(cls, "_stopAtErrorIcon", "stopAtError.svg")
+        iconutils.initSingleClassIcon(cls, "_runAllIcon", "runAll.svg")
         iconutils.initSingleClassIcon(cls, "_caseSensitiveIcon", "caseSensitive.svg")
         iconutils.initSingleClassIcon(cls, "_wholeWordIcon", "wholeWord.svg")
 
-    def _addToggleConfigAction(self, lbl, icon, tooltip, configKey, slot):
+    def _addToggleConfigAction(
+        self, lbl, icon, tooltip, configKey, slot, defaultValue=False
+    ):
         # Cannot use self._configMenu.addAction() directly here since over-zealous garbage collection in some DCC apps:
         act = QtWidgets.QAction(lbl, self)
         act.setIcon(icon)
         act.setCheckable(True)
         act.setToolTip(tooltip)
         act.toggled.connect(slot)
-        value = appsettings.get().simpleConfigBoolValue(configKey)
+        value = appsettings.get().simpleConfigBoolValue(configKey, defaultValue)
         act.setChecked(value)
         self._configMenu.addAction(act)
         return (act, value)
@@ -286,6 +330,40 @@ class IUTestWindow(QtWidgets.QWidget):
         )
         self._testManager.setStopOnError(stopOnError)
 
+        # parallel run act:
+        self._parallelRunAct, parallelRun = self._addToggleConfigAction(
+            "Run Tests In Parallel",
+            self._runAllIcon,
+            "Run the tests in multiple processes, one per CPU core, for PyUnit and nose2 runners.",
+            configKey=constants.CONFIG_KEY_PARALLEL_RUN,
+            slot=self._onParallelRunActionToggled,
+        )
+        self._applyParallelRun(parallelRun)
+
+        # fresh process rerun act:
+        self._rerunFreshAct, _ = self._addToggleConfigAction(
+            "Rerun Failed Tests In Fresh Process",
+            self._runAllIcon,
+            "Rerun each failed test in a new process, when the reruns are turned on "
+            "in the preference.",
+            configKey=constants.CONFIG_KEY_FLAKY_RERUN_FRESH_PROCESS,
+            slot=self._onRerunFreshActionToggled,
+        )
+        self._applyTimeoutSettings()
+
+        # run in ui thread act:
+        self._runInUiThreadAct, self._runInUiThread = self._addToggleConfigAction(
+            "Run Tests In UI Thread",
+            self._runAllIcon,
+            "Run the tests in the ui thread as usual, which is safe for the tests that use "
+            "widgets, maya.cmds or other APIs of the DCC, the ui won't respond until the "
+            "tests finish. Turn it off to opt in to running the tests in a background "
+            "thread, the ui stays responsive and the run can be stopped.",
+            configKey=constants.CONFIG_KEY_RUN_IN_UI_THREAD,
+            slot=self._onRunInUiThreadActionToggled,
+            defaultValue=True,
+        )
+
         # auto filer on run act:
         self._autoFilterAct, stopOnError = self._addToggleConfigAction(
             "Only Show Tests that Run",
@@ -304,6 +382,58 @@ class IUTestWindow(QtWidgets.QWidget):
             slot=self._onAutoClearLogActionToggled,
         )
 
+        # follow running test act:
+        self._followRunningTestAct, _ = self._addToggleConfigAction(
+            "Follow Running Test",
+            self._autoFilterIcon,
+            "Scroll the test tree to the running test as the tests run.",
+            configKey=constants.CONFIG_KEY_FOLLOW_RUNNING_TEST,
+            slot=self._onFollowRunningTestActionToggled,
+            defaultValue=True,
+        )
+
+        # static test listing act:
+        self._staticListingAct, staticListing = self._addToggleConfigAction(
+            "Static Test Listing",
+            self._reloadUiIcon,
+            "List the tests by parsing the test files instead of importing them, "
+            "only the files that cannot be parsed statically will be imported.",
+            configKey=constants.CONFIG_KEY_STATIC_LISTING,
+            slot=self._onStaticListingActionToggled,
+        )
+        self._applyListingMode(staticListing)
+
+        act = QtWidgets.QAction("Clear Discovery Cache", self)
+        act.setIcon(self._resetIcon)
+        act.setToolTip(
+            "Drop the cached test ids of the test dir, so the next reload imports all "
+            "the test modules, e.g. after a shared base class of the tests changed."
+        )
+        act.triggered.connect(self._clearDiscoveryCache)
+        self._configMenu.addAction(act)
+        self._clearDiscoveryCacheAct = act
+
+        # change detection act:
+        self._affectedByGitAct, self._affectedByGit = self._addToggleConfigAction(
+            "Detect Changes By Git",
+            self._reimportIcon,
+            "Find the tests to run by 'Run Affected' from the changes in the git checkout, "
+            "instead of the files modified since their tests ran last time.",
+            configKey=constants.CONFIG_KEY_AFFECTED_BY_GIT,
+            slot=self._onAffectedByGitActionToggled,
+        )
+
+        # watch files act:
+        self._watchFilesAct, watchFiles = self._addToggleConfigAction(
+            "Watch Files And Rerun",
+            self._reimportIcon,
+            "Watch the python files under the test dirs, once they are saved, reimport "
+            "the changed modules and rerun the tests affected by them.",
+            configKey=constants.CONFIG_KEY_WATCH_FILES,
+            slot=self._onWatchFilesActionToggled,
+        )
+        self._applyWatchFiles(watchFiles)
+
         self._configMenu.addSeparator()
         act = self._configMenu.addAction("Preference..")
         act.setIcon(self._configIcon)
@@ -311,6 +441,9 @@ class IUTestWindow(QtWidgets.QWidget):
 
     def _showConfigWindow(self):
         configwindow.ConfigWindow.show(self)
+        self._applyWorkerSettings()
+        self._applyTimeoutSettings()
+        self._applyLogSettings()
 
     def _setInitialTestMode(self):
         initRunnerMode = appsettings.get().simpleConfigIntValue(
@@ -354,8 +487,15 @@ class IUTestWindow(QtWidgets.QWidget):
     def _makeTreeTopWidgets(self, layout):
         reimportBtn = uiutils.makeIconButton(self._reimportIcon, self)
         reimportBtn.setVisible(importutils.isReimportFeatureAvailable(silentCheck=True))
-        reimportBtn.setToolTip("Reimport all changed python module.")
+        reimportBtn.setToolTip(
+            "Reimport all changed python module and the modules importing them, "
+            "right click to list them without reimporting."
+        )
         reimportBtn.clicked.connect(self._reimportAllChangedModules)
+        reimportBtn.setContextMenuPolicy(QtCore.Qt.ActionsContextMenu)
+        listAct = QtWidgets.QAction("List Modules To Reimport", reimportBtn)
+        listAct.triggered.connect(self._listModulesToReimport)
+        reimportBtn.addAction(listAct)
         layout.addWidget(reimportBtn)
 
         reloadUIBtn = uiutils.makeIconButton(self._reloadUiIcon, self)
@@ -393,6 +533,89 @@ class IUTestWindow(QtWidgets.QWidget):
             constants.CONFIG_KEY_AUTO_CLEAR_LOG_STATE, state
         )
 
+    def _onFollowRunningTestActionToggled(self, state):
+        appsettings.get().saveSimpleConfig(
+            constants.CONFIG_KEY_FOLLOW_RUNNING_TEST, state
+        )
+
+    def _applyParallelRun(self, parallel):
+        jobs = workerpool.defaultJobCount() if parallel else 1
+        self._testManager.setParallelJobs(jobs)
+        self._applyWorkerSettings()
+
+    def _applyWorkerSettings(self):
+        settings = appsettings.get()
+        preloadModules = settings.simpleConfigStrValue(
+            constants.CONFIG_KEY_WORKER_PRELOAD_MODULES
+        )
+        self._testManager.setWorkerPreloadModules(
+            workerpool.parseModuleNames(preloadModules)
+        )
+        self._testManager.setWorkerRecycleLimits(
+            settings.simpleConfigIntValue(constants.CONFIG_KEY_WORKER_MAX_TESTS),
+            settings.simpleConfigIntValue(constants.CONFIG_KEY_WORKER_MAX_MEMORY),
+        )
+
+    def _applyLogSettings(self):
+        settings = appsettings.get()
+        self._logBrowser.setMaximumBlockCount(
+            settings.simpleConfigIntValue(
+                constants.CONFIG_KEY_LOG_MAX_BLOCK_COUNT,
+                constants.CONFIG_KEY_LOG_MAX_BLOCK_COUNT_DEFAULT,
+            )
+        )
+        self._logBrowser.setSpillFilePath(
+            settings.simpleConfigStrValue(constants.CONFIG_KEY_LOG_SPILL_FILE)
+        )
+
+    def _applyTimeoutSettings(self):
+        settings = appsettings.get()
+        self._testManager.setTestTimeouts(
+            settings.simpleConfigIntValue(constants.CONFIG_KEY_TEST_TIMEOUT),
+            settings.simpleConfigIntValue(constants.CONFIG_KEY_SESSION_TIMEOUT),
+        )
+        slowTestPercent = settings.simpleConfigIntValue(
+            constants.CONFIG_KEY_SLOW_TEST_PERCENT,
+            constants.CONFIG_KEY_SLOW_TEST_PERCENT_DEFAULT,
+        )
+        self._testManager.setSlowTestFactor(slowTestPercent / 100.0)
+        self._testManager.setFlakyReruns(
+            settings.simpleConfigIntValue(constants.CONFIG_KEY_FLAKY_RERUNS),
+            settings.simpleConfigBoolValue(
+                constants.CONFIG_KEY_FLAKY_RERUN_FRESH_PROCESS
+            ),
+        )
+
+    def _onParallelRunActionToggled(self, state):
+        self._applyParallelRun(state)
+        appsettings.get().saveSimpleConfig(constants.CONFIG_KEY_PARALLEL_RUN, state)
+
+    def _onRerunFreshActionToggled(self, state):
+        appsettings.get().saveSimpleConfig(
+            constants.CONFIG_KEY_FLAKY_RERUN_FRESH_PROCESS, state
+        )
+        self._applyTimeoutSettings()
+
+    def _onRunInUiThreadActionToggled(self, state):
+        self._runInUiThread = state
+        appsettings.get().saveSimpleConfig(constants.CONFIG_KEY_RUN_IN_UI_THREAD, state)
+
+    def _applyListingMode(self, staticListing):
+        listingMode = (
+            constants.LISTING_MODE_STATIC
+            if staticListing
+            else constants.LISTING_MODE_IMPORT
+        )
+        self._testManager.setListingMode(listingMode)
+
+    def _clearDiscoveryCache(self):
+        self._testManager.clearDiscoveryCache()
+        logger.info("The discovery cache is cleared, reload to list the tests again.")
+
+    def _onStaticListingActionToggled(self, state):
+        self._applyListingMode(state)
+        appsettings.get().saveSimpleConfig(constants.CONFIG_KEY_STATIC_LISTING, state)
+
     def _onTestRunnerSwitched(self):
         act = self.sender()
         if not act:
@@ -414,6 +637,61 @@ class IUTestWindow(QtWidgets.QWidget):
         for act in self._testRunnerActions:
             self._updateLabelOfTestRunnerAct(act, runnerMode)
 
+    def _onAffectedByGitActionToggled(self, state):
+        self._affectedByGit = state
+        appsettings.get().saveSimpleConfig(constants.CONFIG_KEY_AFFECTED_BY_GIT, state)
+
+    def _applyWatchFiles(self, watch):
+        if self._fileWatcher:
+            self._fileWatcher.stop()
+            self._fileWatcher = None
+        self._pendingChangedFiles.clear()
+        if not watch:
+            return
+
+        # The watcher thread can only emit the signal, the slot runs in the ui thread.
+        self._fileWatcher = filewatcher.FileWatcher(
+            self._testManager.watchDirs(), self.filesChanged.emit
+        )
+        self._fileWatcher.start()
+        if self._fileWatcher.isRunning():
+            logger.info(
+                "Watch the files in %s by %s.",
+                ", ".join(self._fileWatcher.dirs()),
+                self._fileWatcher.backendName(),
+            )
+
+    def _onWatchFilesActionToggled(self, state):
+        self._applyWatchFiles(state)
+        appsettings.get().saveSimpleConfig(constants.CONFIG_KEY_WATCH_FILES, state)
+
+    def _onFilesChanged(self, changedFiles):
+        self._pendingChangedFiles.update(changedFiles)
+        if self._testRun or self._view.isCollecting():
+            # Rerun once the current run or collecting finishes.
+            return
+
+        changedFiles = sorted(self._pendingChangedFiles)
+        self._pendingChangedFiles.clear()
+        self._hookUiToStream()
+        importutils.reimportModulesOfFiles(changedFiles)
+        # The worker processes keep the preloaded modules, restart them to reload those.
+        self._testManager.shutdownWorkerPools()
+
+        testIds = self._testManager.testIdsAffectedByFiles(
+            changedFiles, self._view.allTestIds() or None
+        )
+        if not testIds:
+            logger.info("No tests are affected by the changed files.")
+            return
+
+        logger.info(
+            "Rerun %s tests affected by %s changed files.",
+            len(testIds),
+            len(changedFiles),
+        )
+        self._runTests(testIds)
+
     def _onStopOnErrorActionToggled(self, stop):
         self._testManager.setStopOnError(stop)
         appsettings.get().saveSimpleConfig(constants.CONFIG_KEY_STOP_ON_ERROR, stop)
@@ -440,6 +718,14 @@ class IUTestWindow(QtWidgets.QWidget):
         self._runAllBtn.clicked.connect(self._runAllTests)
         _btmLayout.addWidget(self._runAllBtn, 1)
 
+        self._runAffectedBtn = QtWidgets.QPushButton("Run A&ffected", self)
+        self._runAffectedBtn.setToolTip(
+            "Run only the tests whose modules import the changed python files, directly or indirectly."
+        )
+        self._runAffectedBtn.setIcon(self._view._runAllIcon)
+        self._runAffectedBtn.clicked.connect(self._runAffectedTests)
+        _btmLayout.addWidget(self._runAffectedBtn, 1)
+
         self._reimportAndRerunBtn = QtWidgets.QPushButton("&Reload && Rerun", self)
         self._reimportAndRerunBtn.setToolTip(
             "Reimport all changed python modules and rerun the last tests."
@@ -448,6 +734,15 @@ class IUTestWindow(QtWidgets.QWidget):
         self._reimportAndRerunBtn.setIcon(self._view._reimportAndRunIcon)
         _btmLayout.addWidget(self._reimportAndRerunBtn, 1)
 
+        self._stopRunBtn = QtWidgets.QPushButton("S&top", self)
+        self._stopRunBtn.setToolTip(
+            "Stop the tests after the running one, click it again to interrupt the running test."
+        )
+        self._stopRunBtn.setIcon(self._stopAtErrorIcon)
+        self._stopRunBtn.clicked.connect(self._stopTestRun)
+        self._stopRunBtn.setVisible(False)
+        _btmLayout.addWidget(self._stopRunBtn, 1)
+
         _runMoreBtn = self._makeRunMoreButton()
         _btmLayout.addWidget(_runMoreBtn, 0)
 
@@ -475,9 +770,14 @@ class IUTestWindow(QtWidgets.QWidget):
     def _reimportAllChangedModules(self):
         importutils.reimportAllChangedPythonModules()
 
+    def _listModulesToReimport(self):
+        importutils.reimportAllChangedPythonModules(dryRun=True)
+
     def _onReloadUiButtonClicked(self):
-        self.reload(keepUiStates=True)
-        self._applyCurrentFilter(removeStateFilters=True, keepUiStates=True)
+        applyFilter = lambda: self._applyCurrentFilter(
+            removeStateFilters=True, keepUiStates=True
+        )
+        self.reload(keepUiStates=True, afterCollected=applyFilter)
 
     def _addStateFilter(self):
         stateKeyword = str(self.sender().text())
@@ -513,9 +813,12 @@ class IUTestWindow(QtWidgets.QWidget):
         self._updateWindowTitle(startDir)
         self._updateDirUI()
         self._treeFilterLE.clear()
-        self.reload(keepUiStates=False)
-        if not self._testManager.hasLastListerError():
-            self._saveLastTestDir(startDir, topDir)
+
+        def _saveDirsIfNoError():
+            if not self._testManager.hasLastListerError():
+                self._saveLastTestDir(startDir, topDir)
+
+        self.reload(keepUiStates=False, afterCollected=_saveDirsIfNoError)
 
     def _setPanelVisState(self, state, saveSettings=True):
         state = min(constants.PANEL_VIS_STATE_BOTH_ON, max(0, int(state)))
@@ -649,24 +952,114 @@ class IUTestWindow(QtWidgets.QWidget):
 
         self._deferredRegenerateMenu()
 
+    def _isCollectingTests(self):
+        if self._view.isCollecting():
+            logger.warning("Please wait until the tests are collected.")
+            return True
+        return False
+
+    def _isRunningTests(self):
+        if self._testRun:
+            logger.warning("Please wait until the tests finish, or stop them.")
+            return True
+        return False
+
+    def _isBusy(self):
+        return self._isCollectingTests() or self._isRunningTests()
+
+    def _startTestRun(self, runFunc, *args):
+        """Run the tests in a background thread, or in the ui thread if it is asked to."""
+        self._hookUiToStream()
+        self._runSessionCount = 0
+        if self._runInUiThread:
+            runFunc(*args)
+            self._onTestRunFinished()
+            return
+
+        self._testRun = backgroundrun.BackgroundTestRun(
+            functools.partial(runFunc, *args), cancelFunc=self._testManager.cancelRun
+        )
+        self._testRun.start()
+        self._testRunTimer.start()
+        self._stopRunBtn.setText("S&top")
+        self._stopRunBtn.setVisible(True)
+        self._updateRunButtonsEnabled()
+
+    def _checkTestRun(self):
+        if self._testRun and not self._testRun.isFinished():
+            return
+
+        self._testRunTimer.stop()
+        self._testRun = None
+        self._onTestRunFinished()
+
+    def _onTestRunFinished(self):
+        self._stopRunBtn.setVisible(False)
+        self._updateRunButtonsEnabled()
+        if self._pendingChangedFiles:
+            self._onFilesChanged([])
+
+    def _stopTestRun(self):
+        if not self._testRun:
+            return
+
+        if not self._testRun.isCancelled():
+            logger.info("Stop the tests after the running one.")
+            self._testRun.cancel()
+            self._stopRunBtn.setText("In&terrupt")
+            return
+
+        if self._testManager.parallelJobs() > 1:
+            logger.info(
+                "The running tests in the worker processes cannot be interrupted."
+            )
+            return
+
+        if self._testRun.interrupt():
+            logger.info("Interrupt the running test.")
+        self._stopRunBtn.setEnabled(False)
+
     def _runAllTests(self):
+        if self._isBusy():
+            return
+
         self._view.resetAllItemsToNormal()
         self._treeFilterLE.clear()
-        self._testManager.runAllTests()
-        self._updateReimportRerunButtonEnabled()
+        self._startTestRun(self._testManager.runAllTests)
 
-    def _runTests(self, testIds):
+    def _runAffectedTests(self):
+        if self._isBusy():
+            return
+
+        changeDetection = (
+            constants.CHANGE_DETECTION_GIT
+            if self._affectedByGit
+            else constants.CHANGE_DETECTION_MTIME
+        )
+        testIds = self._testManager.affectedTestIds(
+            self._view.allTestIds(), changeDetection=changeDetection
+        )
         if not testIds:
+            logger.info("No tests are affected by the changes.")
+            return
+
+        logger.info("Run %s tests affected by the changes.", len(testIds))
+        self._runTests(testIds)
+
+    def _runTests(self, testIds):
+        if not testIds or self._isBusy():
             return
 
         self._beforeRunningTests(testIds)
-        self._testManager.runTests(*testIds)
-        self._updateReimportRerunButtonEnabled()
+        self._startTestRun(self._testManager.runTests, *testIds)
 
     def _viewSelectionChanged(self):
-        hasSel = self._view.hasSelectedTests()
+        idle = not self._testRun
+        hasSel = idle and self._view.hasSelectedTests()
         self._runSelectedBtn.setEnabled(hasSel)
-        hasSelForPartialRun = self._view.hasSelectedTests(hasSelectedTestOrCase=True)
+        hasSelForPartialRun = idle and self._view.hasSelectedTests(
+            hasSelectedTestOrCase=True
+        )
         self._runSetupAct.setEnabled(hasSelForPartialRun)
         self._runNoTearDown.setEnabled(hasSelForPartialRun)
 
@@ -674,10 +1067,17 @@ class IUTestWindow(QtWidgets.QWidget):
         self._runTests(self._view.selectedTestIds(decomposePackageIfNecessary=True))
 
     def _updateReimportRerunButtonEnabled(self):
-        self._reimportAndRerunBtn.setEnabled(bool(self._testManager.lastRunTestIds()))
+        self._reimportAndRerunBtn.setEnabled(
+            not self._testRun and bool(self._testManager.lastRunTestIds())
+        )
 
     def _reimportPyAndRerun(self):
+        if self._isRunningTests():
+            return
+
         importutils.reimportAllChangedPythonModules()
+        # The worker processes keep the preloaded modules, restart them to reload those.
+        self._testManager.shutdownWorkerPools()
         lastRunIds = self._testManager.lastRunTestIds()
         if not lastRunIds:
             logger.warning("Didn't find the last run tests.")
@@ -696,16 +1096,59 @@ class IUTestWindow(QtWidgets.QWidget):
         if not testId:
             logger.error("You need to select test suite or test case.")
             return
-        self._testManager.runSingleTestPartially(testId, partialMode)
-        self._updateReimportRerunButtonEnabled()
 
-    def reload(self, keepUiStates=True):
+        if self._isBusy():
+            return
+
+        self._startTestRun(
+            self._testManager.runSingleTestPartially, testId, partialMode
+        )
+
+    def reload(self, keepUiStates=True, incremental=True, afterCollected=None):
+        """Reload the tests, the tests are collected in background.
+
+        Args:
+            keepUiStates (bool): Keep the view states like expanded items, selection etc.
+            incremental (bool): Only update the tree items of the added or removed tests.
+            afterCollected (callable): Called once the tests are collected.
+        """
+        if self._isRunningTests():
+            return
+
+        self._view.cancelCollecting()
         self._beforeTestCollection()
-        with uistream.LogCaptureContext():  # Report the possible error report to UI as well:
-            self._view.reload(keepUiStates=keepUiStates)
+        if afterCollected:
+            self._afterCollectingCallbacks.append(afterCollected)
+
+        self._cancelCollectingBtn.setVisible(True)
+        self._view.reloadInBackground(
+            keepUiStates=keepUiStates, incremental=incremental
+        )
+        self._cancelCollectingBtn.setVisible(self._view.isCollecting())
+        self._updateRunButtonsEnabled()
+
+    def _cancelCollecting(self):
+        self._view.cancelCollecting()
 
+    def _onCollectingProgress(self, testCount):
+        self._statusLbl.reportCollectingProgress(testCount)
+
+    def _onTestsCollected(self):
+        self._cancelCollectingBtn.setVisible(False)
         self._updateRunButtonsEnabled()
 
+        callbacks = self._afterCollectingCallbacks
+        self._afterCollectingCallbacks = []
+        for callback in callbacks:
+            callback()
+
+        if self._fileWatcher:
+            if self._fileWatcher.dirs() != self._testManager.watchDirs():
+                # The test root dirs changed.
+                self._applyWatchFiles(True)
+            elif self._pendingChangedFiles:
+                self._onFilesChanged([])
+
         if not self._testManager.startDirOrModule():
             return
 
@@ -723,9 +1166,15 @@ class IUTestWindow(QtWidgets.QWidget):
         self._applyFilterTextWithState(searchText, keepUiStates=keepUiStates)
 
     def _updateRunButtonsEnabled(self):
-        enabled = self._view.hasTests()
+        enabled = (
+            self._view.hasTests()
+            and not self._view.isCollecting()
+            and not self._testRun
+        )
         self._resetAllBtn.setEnabled(enabled)
         self._runAllBtn.setEnabled(enabled)
+        self._runAffectedBtn.setEnabled(enabled)
+        self._stopRunBtn.setEnabled(bool(self._testRun))
         self._viewSelectionChanged()
         self._updateReimportRerunButtonEnabled()
 
@@ -741,14 +1190,28 @@ class IUTestWindow(QtWidgets.QWidget):
         self._view.resetTestItemsById(tests)
 
     def _applyTreeFilterText(self, txt):
-        self._applyFilterTextWithState(str(txt), keepUiStates=False)
+        # Filter the tree once the typing pauses instead of on every keystroke.
+        self._treeFilterTimer.start()
+
+    def _applyPendingTreeFilterText(self):
+        self._applyFilterTextWithState(
+            str(self._treeFilterLE.text()), keepUiStates=False
+        )
 
     def _applyFilterTextWithState(self, txt, keepUiStates=True):
+        self._treeFilterTimer.stop()
         lowerTxt = txt.strip().lower()
         keywords = lowerTxt.split(" ")
         self._view.setFilterKeywords(keywords, ensureFirstMatchVisible=not keepUiStates)
 
     def closeEvent(self, event):
+        if self._fileWatcher:
+            self._fileWatcher.stop()
+        if self._testRun:
+            self._testRun.interrupt()
+            self._testRun.wait(self._testRunCheckInterval / 1000.0)
+        self._view.cancelCollecting()
+        self._testManager.shutdownWorkerPools()
         uistream.UiStream.unsetUi(self)
         QtWidgets.QWidget.closeEvent(self, event)
 
@@ -759,24 +1222,64 @@ class IUTestWindow(QtWidgets.QWidget):
 
     def onSingleTestStop(self, testId, endTime):
         self._view.onSingleTestStop(testId, endTime)
-        self._statusLbl.updateReport()
 
     def showResultOnItemByTestId(self, testId, state):
         self._view.showResultOnItemByTestId(testId, state)
 
+    def onSlowTestDetected(self, testId, duration, baseline):
+        self._view.markSlowTest(testId, duration, baseline)
+
+    def onFlakyTestDetected(self, testId, attempt, flipRate):
+        self._view.markFlakyTest(testId, attempt, flipRate)
+
     def onTestRunningSessionStart(self):
         self._statusLbl.setText("Running tests...")
-        if self._clearLogOnRunAct.isChecked():
+        # The reruns of the failed tests keep the logs of the run.
+        if self._clearLogOnRunAct.isChecked() and not self._runSessionCount:
             self._logBrowser.clear()
+        self._runSessionCount += 1
         self._logBrowser.logSeparator()
+        self._uiUpdateTimer.start()
+
+    def _applyUiUpdates(self):
+        """Apply the test updates queued since the last time in one batch."""
+        updates = self._uiUpdates.take()
+        if not updates:
+            return
+
+        self._view.setUpdatesEnabled(False)
+        try:
+            for methodName, args in updates:
+                try:
+                    getattr(self, methodName)(*args)
+                except Exception:
+                    logger.exception("Unable to apply the ui update %s.", methodName)
+        finally:
+            self._view.setUpdatesEnabled(True)
+
+        if self._followRunningTestAct.isChecked():
+            self._view.focusLastStartedTest()
+        self._statusLbl.updateReport()
 
     def onAllTestsFinished(self):
+        self._uiUpdateTimer.stop()
+        self._applyUiUpdates()
+        self._logBrowser.flushLog()
         self._view.onAllTestsFinished()
         if self._autoFilterAct.isChecked():
             self._treeFilterLE.setText(constants.KEYWORD_TEST_STATE_RUN)
         self._statusLbl.updateReport()
 
     def repaintUi(self):
+        if self._testRun:
+            # The ui keeps responding when the tests run in background.
+            return
+
+        now = time.time()
+        if now - self._lastRepaintTime < 1.0 / self._uiUpdateRate:
+            return
+
+        self._lastRepaintTime = now
         eventFlags = (
             QtCore.QEventLoop.ExcludeSocketNotifiers
             | QtCore.QEventLoop.ExcludeUserInputEvents
@@ -2,22 +2,45 @@
 # This file is part of IUTest, and is released under the "MIT License Agreement".
 # Please see the LICENSE file that should have been included as part of this package.
 
+import io
+import logging
+
 from iutest.qt import QtCore, QtGui, QtWidgets, Signal
 from iutest.core import gotocode
 from iutest.ui import uiconstants
 from iutest.ui import uiutils
 from iutest.ui import scrollareapan
 
+logger = logging.getLogger(__name__)
+
 
 class LogBrowser(QtWidgets.QTextBrowser):
+    """The browser of the test logs.
+
+    Notes:
+        The messages are buffered and inserted into the document in one go at most
+        once a frame, so that a chatty test doesn't wait for the document layout on
+        every write. The document keeps the latest lines up to the maximum block count,
+        the older lines are dropped or appended to the spill file if there is one.
+    """
+
     searchNeeded = Signal(str)
 
+    _flushInterval = 33  # in milliseconds
+
     def __init__(self, parent=None):
         QtWidgets.QTextBrowser.__init__(self, parent)
         self._pan = scrollareapan.ScrollAreaPan(self, 1.0)
         self._pan.installEventFilterOn(self.viewport())
         self._codeVisitor = gotocode.CodeLineVisitor(self)
         self._codeVisitor.errorIssued.connect(self._onGoToCodeError)
+        self._pendingHtml = []
+        self._maxBlockCount = 0
+        self._spillFilePath = ""
+        self._flushTimer = QtCore.QTimer(self)
+        self._flushTimer.setSingleShot(True)
+        self._flushTimer.setInterval(self._flushInterval)
+        self._flushTimer.timeout.connect(self.flushLog)
         self._setupUi()
 
     def _setupUi(self):
@@ -46,15 +69,77 @@ class LogBrowser(QtWidgets.QTextBrowser):
         # text-decoration: none;
         self.document().setDefaultStyleSheet(css)
 
+    def setMaximumBlockCount(self, count):
+        """Keep at most this many lines in the browser, 0 for no limit."""
+        self._maxBlockCount = max(0, count)
+        self._trimBlocks()
+
+    def maximumBlockCount(self):
+        return self._maxBlockCount
+
+    def setSpillFilePath(self, filePath):
+        """Append the lines dropped by the maximum block count to the file, empty to
+        drop them.
+        """
+        self._spillFilePath = filePath or ""
+
+    def spillFilePath(self):
+        return self._spillFilePath
+
     def logWithColor(self, msg, color, *args):
-        self.moveCursor(QtGui.QTextCursor.End)
-        # SELF.setTextColor(color)
         msg = msg if not args else (msg % args)
-        msg = "<font color=%s>%s</font>" % (color.name(), msg)
-        self.insertHtml(msg)
+        self._pendingHtml.append("<font color=%s>%s</font>" % (color.name(), msg))
+        if not self._flushTimer.isActive():
+            self._flushTimer.start()
+
+    def flushLog(self):
+        """Insert the buffered messages into the document now."""
+        self._flushTimer.stop()
+        if not self._pendingHtml:
+            return
+
+        # A new line instead of <br> starts a new block, which the block count limits.
+        html = "".join(self._pendingHtml).replace("<br>", "\n")
+        self._pendingHtml = []
+        self.moveCursor(QtGui.QTextCursor.End)
+        self.insertHtml(html)
+        self._trimBlocks()
         self.moveCursor(QtGui.QTextCursor.End)
         self.horizontalScrollBar().setValue(0)
 
+    def _trimBlocks(self):
+        document = self.document()
+        excessCount = document.blockCount() - self._maxBlockCount
+        if not self._maxBlockCount or excessCount <= 0:
+            return
+
+        cursor = QtGui.QTextCursor(document)
+        cursor.movePosition(QtGui.QTextCursor.Start)
+        cursor.movePosition(
+            QtGui.QTextCursor.NextBlock, QtGui.QTextCursor.KeepAnchor, excessCount
+        )
+        if self._spillFilePath:
+            self._spillText(cursor.selection().toPlainText())
+        cursor.removeSelectedText()
+
+    def _spillText(self, text):
+        text = u"{}".format(text).replace(u"\u2028", u"\n").replace(u"\u2029", u"\n")
+        try:
+            with io.open(self._spillFilePath, "a", encoding="utf-8") as f:
+                f.write(text)
+        except (IOError, OSError):
+            logger.exception("Unable to spill the log to %s", self._spillFilePath)
+            self._spillFilePath = ""
+
+    def clear(self):
+        self._flushTimer.stop()
+        self._pendingHtml = []
+        QtWidgets.QTextBrowser.clear(self)
+
+    def find(self, *args):
+        self.flushLog()
+        return QtWidgets.QTextBrowser.find(self, *args)
+
     def onLinkClicked(self, url):
         path, _, line = url.query().rpartition("=")
         if not path:
@@ -67,3 +67,6 @@ class StatusLabel(QtWidgets.QLabel):
     def startCollectingTests(self):
         self.setText("Loading tests...")
         self.repaint()
+
+    def reportCollectingProgress(self, testCount):
+        self.setText("Loading tests... {} tests found.".format(testCount))
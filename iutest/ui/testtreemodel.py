@@ -0,0 +1,206 @@
+# Copyright 2019-2020 by Wenfeng Gao, MGLAND animation studio. All rights reserved.
+# This file is part of IUTest, and is released under the "MIT License Agreement".
+# Please see the LICENSE file that should have been included as part of this package.
+
+import logging
+
+from iutest.qt import QtCore, QtGui
+from iutest.core import testnodes
+
+logger = logging.getLogger(__name__)
+
+
+class TestTreeModel(QtCore.QAbstractItemModel):
+    """The item model of the test tree over a TestNodeStore.
+
+    Notes:
+        The internal pointer of an index is the int of its node, kept alive by the
+        model since the bindings don't hold a reference to it.
+    """
+
+    CategoryRole = QtCore.Qt.UserRole
+    StateRole = QtCore.Qt.UserRole + 1
+
+    _columnCount = 2
+    _noteColors = {
+        testnodes.NOTE_SLOW: "#e8a33d",
+        testnodes.NOTE_FLAKY: "#a77bd1",
+    }
+
+    def __init__(self, iconSet, parent=None):
+        """
+        Args:
+            iconSet (tuple): The icons by the state of each item category.
+            parent (QObject): The parent of the model.
+        """
+        QtCore.QAbstractItemModel.__init__(self, parent)
+        self._store = testnodes.TestNodeStore()
+        self._iconSet = iconSet
+        self._nodeRefs = []
+        self._noteBrushes = {}
+        self._sizeHint = QtCore.QSize(20, 20)
+
+    def store(self):
+        return self._store
+
+    def _ref(self, node):
+        refs = self._nodeRefs
+        while len(refs) <= node:
+            refs.append(len(refs))
+        return refs[node]
+
+    def nodeFromIndex(self, index):
+        if not index.isValid():
+            return testnodes.NO_NODE
+        return index.internalPointer()
+
+    def indexFromNode(self, node, column=0):
+        if node == testnodes.NO_NODE:
+            return QtCore.QModelIndex()
+        return self.createIndex(self._store.row(node), column, self._ref(node))
+
+    def indexFromTestId(self, testId, column=0):
+        return self.indexFromNode(self._store.node(testId), column)
+
+    def clear(self):
+        self.beginResetModel()
+        self._store.clear()
+        self._nodeRefs = []
+        self.endResetModel()
+
+    def addNode(self, parent, name, testId, category, row=None):
+        """Add a node to the store and tell the views about it.
+
+        Returns:
+            int: The new node.
+        """
+        if parent == testnodes.NO_NODE:
+            first = 0
+        else:
+            count = self._store.childCount(parent)
+            first = count if row is None else min(row, count)
+        self.beginInsertRows(self.indexFromNode(parent), first, first)
+        node = self._store.addNode(parent, name, testId, category, row=first)
+        self.endInsertRows()
+        return node
+
+    def removeNode(self, node):
+        parent = self._store.parent(node)
+        row = self._store.row(node)
+        self.beginRemoveRows(self.indexFromNode(parent), row, row)
+        changedNodes = self._store.removeNode(node)
+        self.endRemoveRows()
+        self.nodesChanged(changedNodes)
+
+    def nodeChanged(self, node, column=0):
+        index = self.indexFromNode(node, column)
+        self.dataChanged.emit(index, index)
+
+    def nodesChanged(self, nodes, column=0):
+        for node in nodes:
+            self.nodeChanged(node, column)
+
+    def setState(self, node, state):
+        """Set the state of the node, the ancestors whose states follow are updated."""
+        self.nodesChanged(self._store.setState(node, state))
+
+    def resetNodes(self, node):
+        """Clear the states, times and notes of the node and its descendants."""
+        changedNodes = self._store.resetNodes(node)
+        lastColumn = self._columnCount - 1
+        self.dataChanged.emit(
+            self.indexFromNode(node), self.indexFromNode(node, lastColumn)
+        )
+        for each in self._store.iterDescendants(node):
+            childCount = self._store.childCount(each)
+            if not childCount:
+                continue
+            parentIndex = self.indexFromNode(each)
+            self.dataChanged.emit(
+                self.index(0, 0, parentIndex),
+                self.index(childCount - 1, lastColumn, parentIndex),
+            )
+        self.nodesChanged(changedNodes)
+
+    def index(self, row, column, parent=QtCore.QModelIndex()):
+        if row < 0 or column < 0 or column >= self._columnCount:
+            return QtCore.QModelIndex()
+
+        if not parent.isValid():
+            root = self._store.root()
+            if row or root == testnodes.NO_NODE:
+                return QtCore.QModelIndex()
+            return self.createIndex(0, column, self._ref(root))
+
+        parentNode = parent.internalPointer()
+        if row >= self._store.childCount(parentNode):
+            return QtCore.QModelIndex()
+        return self.createIndex(
+            row, column, self._ref(self._store.child(parentNode, row))
+        )
+
+    def parent(self, index):
+        if not index.isValid():
+            return QtCore.QModelIndex()
+        return self.indexFromNode(self._store.parent(index.internalPointer()))
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if not parent.isValid():
+            return 0 if self._store.root() == testnodes.NO_NODE else 1
+        if parent.column() > 0:
+            return 0
+        return self._store.childCount(parent.internalPointer())
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return self._columnCount
+
+    def hasChildren(self, parent=QtCore.QModelIndex()):
+        return self.rowCount(parent) > 0
+
+    def _durationText(self, node):
+        startTime = self._store.startTime(node)
+        if startTime is None:
+            return ""
+        stopTime = self._store.stopTime(node)
+        if stopTime is None:
+            return "running..."
+        return "%.3f s" % (stopTime - startTime)
+
+    def _noteBrush(self, kind):
+        brush = self._noteBrushes.get(kind)
+        if brush is None:
+            brush = QtGui.QBrush(QtGui.QColor(self._noteColors[kind]))
+            self._noteBrushes[kind] = brush
+        return brush
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        node = index.internalPointer()
+        store = self._store
+        if index.column() == 0:
+            if role == QtCore.Qt.DisplayRole:
+                return store.name(node)
+            if role == QtCore.Qt.DecorationRole:
+                return self._iconSet[store.category(node)][store.state(node)]
+            if role == QtCore.Qt.ToolTipRole:
+                return store.testId(node)
+            if role == QtCore.Qt.SizeHintRole:
+                return self._sizeHint
+            if role == self.CategoryRole:
+                return store.category(node)
+            if role == self.StateRole:
+                return store.state(node)
+            return None
+
+        if role == QtCore.Qt.DisplayRole:
+            return self._durationText(node)
+        if role in (QtCore.Qt.ForegroundRole, QtCore.Qt.ToolTipRole):
+            note = store.note(node)
+            if not note:
+                return None
+            if role == QtCore.Qt.ForegroundRole:
+                return self._noteBrush(note[0])
+            return note[1]
+        return None
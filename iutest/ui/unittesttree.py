@@ -12,8 +12,12 @@ from iutest.core import gotocode
 from iutest.core import importutils
 from iutest.core import loggingutils
 from iutest.core import uistream
+from iutest.core import testcollector
+from iutest.core import testfilter
+from iutest.core import testnodes
 from iutest.ui import uiutils
 from iutest.ui import scrollareapan
+from iutest.ui import testtreemodel
 
 logger = logging.getLogger(__name__)
 
@@ -25,7 +29,7 @@ class ViewStates(object):
 
     def reset(self):
         self._currentItemId = None
-        self._itemExpandStates = {}
+        self._expandedItemIds = set()
         self._horizontalScrollValue = 0
         self._verticalScrollValue = 0
 
@@ -34,12 +38,13 @@ class ViewStates(object):
             return
 
         self.reset()
-        currentItem = self._treeWidget.currentItem()
-        if currentItem:
-            self._currentItemId = self._treeWidget.testIdOfItem(currentItem)
+        store = self._treeWidget.nodeStore()
+        currentNode = self._treeWidget.currentNode()
+        if currentNode != testnodes.NO_NODE:
+            self._currentItemId = store.testId(currentNode)
 
-        for testId, item in self._treeWidget.allItemsIdMap().items():
-            self._itemExpandStates[testId] = item.isExpanded()
+        for node in self._treeWidget.iterExpandedNodes():
+            self._expandedItemIds.add(store.testId(node))
         self._horizontalScrollValue = self._treeWidget.horizontalScrollBar().value()
         self._verticalScrollValue = self._treeWidget.verticalScrollBar().value()
 
@@ -50,23 +55,41 @@ class ViewStates(object):
     def restore(self):
         if not self._treeWidget:
             return
-        itemIdMap = self._treeWidget.allItemsIdMap()
-        cItem = itemIdMap.get(self._currentItemId, None)
-        if cItem:
-            self._treeWidget.setCurrentItem(cItem)
-        for testId, expand in self._itemExpandStates.items():
-            item = itemIdMap.get(testId, None)
-            if item:
-                item.setExpanded(expand)
+        model = self._treeWidget.model()
+        cIndex = model.indexFromTestId(self._currentItemId)
+        if cIndex.isValid():
+            self._treeWidget.setCurrentIndex(cIndex)
+        for testId in self._expandedItemIds:
+            index = model.indexFromTestId(testId)
+            if index.isValid():
+                self._treeWidget.setExpanded(index, True)
         QtCore.QTimer.singleShot(0, self._restoreScrollValue)
 
 
-class UnitTestTreeView(QtWidgets.QTreeWidget):
+class _ReloadContext(object):
+    def __init__(self, startDirOrModule, incremental):
+        self.startDirOrModule = startDirOrModule
+        self.incremental = incremental
+        self.isModule = bool(startDirOrModule) and not pathutils.isPath(
+            startDirOrModule
+        )
+        self.heading = startDirOrModule + "." if self.isModule else ""
+        self.headingCount = len(self.heading)
+        self.testCount = 0
+        self.seenIds = set()
+        self.lastSeenChildren = {}
+        self.addedCount = 0
+
+
+class UnitTestTreeView(QtWidgets.QTreeView):
     runAllTest = Signal()
     runTests = Signal(tuple)
     runSetupOnly = Signal(str)
     runWithoutTearDown = Signal(str)
     searchNeeded = Signal()
+    collectingProgress = Signal(int)
+    testsCollected = Signal()
+    itemSelectionChanged = Signal()
 
     _testAllIcons = []
     _testPackageIcons = []
@@ -80,6 +103,9 @@ class UnitTestTreeView(QtWidgets.QTreeWidget):
     _runSelectedIcon = None
     _reimportAndRunIcon = None
 
+    _populateInterval = 50  # in milliseconds
+    _populateChunkSize = 500
+
     supportPartialCategories = (
         constants.ITEM_CATEGORY_SUITE,
         constants.ITEM_CATEGORY_TEST,
@@ -90,28 +116,40 @@ class UnitTestTreeView(QtWidgets.QTreeWidget):
             pass
 
     def __init__(self, parent):
-        QtWidgets.QTreeWidget.__init__(self, parent)
+        QtWidgets.QTreeView.__init__(self, parent)
         self._pan = scrollareapan.ScrollAreaPan(self, scrollFactor=0.05)
         self._pan.installEventFilterOn(self.viewport())
         self._uiStream = uistream.UiStream()
         self._codeVisitor = gotocode.CodeLineVisitor(self)
         self._codeVisitor.errorIssued.connect(self._onGoToCodeError)
 
+        self._initAllIcons()
+        self._model = testtreemodel.TestTreeModel(self._allItemIconSet, self)
+        self._store = self._model.store()
+        self._filter = testfilter.TestFilter(self._store)
+        self._hiddenNodes = set()
+        self._lastStartedNode = testnodes.NO_NODE
+        self.setModel(self._model)
+        self.selectionModel().selectionChanged.connect(self._onSelectionChanged)
+
         self.setItemDelegate(self._TreeItemDelegate(self))
         self.setTextElideMode(QtCore.Qt.ElideLeft)
-        self.setColumnCount(2)
         self._setHeaderStretch()
         self.setHeaderHidden(True)
         self.setAlternatingRowColors(True)
         self.setExpandsOnDoubleClick(False)
+        self.setUniformRowHeights(True)
         self.setSelectionMode(self.ExtendedSelection)
-        self.itemDoubleClicked.connect(self.onItemDoubleClicked)
+        self.setSelectionBehavior(self.SelectRows)
+        self.doubleClicked.connect(self.onItemDoubleClicked)
         self.setIndentation(10)
 
-        self._rootTestItem = None
-        self._testCases = []
-        self._allItemsIdMap = {}
-        self._initAllIcons()
+        self._reloadContext = None
+        self._collector = None
+        self._collectingKeepUiStates = True
+        self._populateTimer = QtCore.QTimer(self)
+        self._populateTimer.setInterval(self._populateInterval)
+        self._populateTimer.timeout.connect(self._populateCollectedTests)
 
         self._testManager = None
         self._viewStates = ViewStates(self)
@@ -127,6 +165,13 @@ class UnitTestTreeView(QtWidgets.QTreeWidget):
     def setTestManager(self, manager):
         self._testManager = manager
 
+    def nodeStore(self):
+        """The TestNodeStore of the tree, don't change its structure directly."""
+        return self._store
+
+    def _onSelectionChanged(self, *_):
+        self.itemSelectionChanged.emit()
+
     def _setHeaderStretch(self):
         header = self.header()
         header.setStretchLastSection(False)
@@ -139,48 +184,64 @@ class UnitTestTreeView(QtWidgets.QTreeWidget):
 
         header.resizeSection(1, 10)
 
-    def _iterAllDescendentItem(self, parentItem, category):
-        for i in range(parentItem.childCount()):
-            item = parentItem.child(i)
-            if self._categoryOfItem(item) == category:
-                yield item
-                continue
+    def _indexOfNode(self, node, column=0):
+        return self._model.indexFromNode(node, column)
+
+    def currentNode(self):
+        return self._model.nodeFromIndex(self.currentIndex())
+
+    def iterExpandedNodes(self):
+        root = self._store.root()
+        if root == testnodes.NO_NODE:
+            return
 
-            for it in self._iterAllChildrenItem(item, category):
-                yield it
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if not self.isExpanded(self._indexOfNode(node)):
+                continue
+            yield node
+            for child in self._store.children(node):
+                if self._store.childCount(child):
+                    stack.append(child)
 
     def _splitPackageTestIds(self, *testIds):
         if not self._testManager.avoidRunTestsOnPackageLevel():
             return tuple(testIds)
 
-        items = filter(None, [self._findItemById(tid) for tid in testIds])
-        return self._splitPackageTestItems(*items)
+        nodes = [self._store.node(tid) for tid in testIds]
+        return self._splitPackageTestNodes(
+            *[node for node in nodes if node != testnodes.NO_NODE]
+        )
 
-    def _splitPackageTestItems(self, *items):
+    def _splitPackageTestNodes(self, *nodes):
+        store = self._store
         if not self._testManager.avoidRunTestsOnPackageLevel():
-            return tuple([self.testIdOfItem(item) for item in items])
+            return tuple([store.testId(node) for node in nodes])
 
         testIds = []
-        for item in items:
-            if self._categoryOfItem(item) != constants.ITEM_CATEGORY_PACKAGE:
-                testIds.append(self.testIdOfItem(item))
+        for node in nodes:
+            if store.category(node) != constants.ITEM_CATEGORY_PACKAGE:
+                testIds.append(store.testId(node))
                 continue
 
             splittedTests = [
-                self.testIdOfItem(item)
-                for item in self._iterAllDescendentItem(
-                    item, constants.ITEM_CATEGORY_MODULE
-                )
+                store.testId(each)
+                for each in store.iterDescendants(node, constants.ITEM_CATEGORY_MODULE)
             ]
             testIds.extend(splittedTests)
         return tuple(testIds)
 
-    def onItemDoubleClicked(self, item, *_, **__):
-        if item is self._rootTestItem:
+    def onItemDoubleClicked(self, index, *_, **__):
+        node = self._model.nodeFromIndex(index)
+        if node == testnodes.NO_NODE:
+            return
+
+        if node == self._store.root():
             self.runAllTest.emit()
             return
 
-        self.runTests.emit(self._splitPackageTestItems(item))
+        self.runTests.emit(self._splitPackageTestNodes(node))
 
     @classmethod
     def _initComboIcons(cls, iconVarName, iconFileName):
@@ -215,190 +276,91 @@ class UnitTestTreeView(QtWidgets.QTreeWidget):
         iconutils.initSingleClassIcon(cls, "_runSelectedIcon", "runSelected.svg")
 
     def setFilterKeywords(self, keywords, ensureFirstMatchVisible=False):
-        if not self._rootTestItem:
-            return
-
-        itemStates = {}
-        if keywords:
-            itemToFocus = None
-            for item in self._testCases:
-                self._accumulateItemVisibility(item, keywords, itemStates)
-                if not itemToFocus:
-                    itemToFocus = item
-
-            # self._debugItemVisStates(itemStates)
-
-            for index in range(self._rootTestItem.childCount()):
-                self._recursivelySetItemVisibility(
-                    self._rootTestItem.child(index), itemStates, state=None
-                )
-
-            if itemToFocus and ensureFirstMatchVisible:
-                self.focusItem(itemToFocus)
-        else:
-            for index in range(self._rootTestItem.childCount()):
-                self._recursivelySetItemVisibility(
-                    self._rootTestItem.child(index), itemStates, state=True
-                )
-
-    def _recursivelySetItemVisibility(self, item, itemStates, state=None):
-        visible = state
-        stateKey = self.testIdOfItem(item)
-        if state is None:
-            visible = itemStates.get(stateKey, True)
-
-        if not visible:
-            item.setHidden(True)
+        root = self._store.root()
+        if root == testnodes.NO_NODE:
             return
 
-        item.setHidden(False)
-        for index in range(item.childCount()):
-            self._recursivelySetItemVisibility(item.child(index), itemStates, state)
-
-    def _itemMatchs(self, item, keywords):
-        state = variantToPyValue(item.data(0, QtCore.Qt.UserRole + 1))
-        stateMatch = False
-        txtMatch = True
-        lbl = self.testIdOfItem(item).lower()
-        hasFilter = False
-        for each in keywords:
-            if not each.startswith(":"):
-                if each not in lbl:
-                    return False
-
-            if each.startswith(":"):
-                hasFilter = True
-                if not stateMatch:
-                    desiredState = constants.TEST_RESULT_NONE
-                    if each in constants.KEYWORD_TEST_STATES:
-                        desiredState = constants.KEYWORD_TEST_STATES[each]
-                    if desiredState < 0:
-                        stateMatch = state > 0
-                    else:
-                        stateMatch = state == desiredState
-
-        stateMatch = stateMatch or not hasFilter
-        return stateMatch and txtMatch
-
-    def _accumulateItemVisibility(self, item, keywords, itemStates, state=None):
-        if not item:
-            return
-
-        if item is self._rootTestItem:
-            return
-
-        stateKey = self.testIdOfItem(item)
-        itemStates.setdefault(stateKey, state)
-        if state:
-            itemStates[stateKey] = state
-        else:
-            state = self._itemMatchs(item, keywords)
-
-            itemStates[stateKey] = itemStates[stateKey] or state
-            state = itemStates[stateKey]
-
-        self._accumulateItemVisibility(item.parent(), keywords, itemStates, state=state)
-
-    def _debugItemVisStates(self, states):
-        for tid in sorted(states.keys()):
-            print(tid, states[tid])
-
-    def _categoryOfItem(self, item):
-        return variantToPyValue(item.data(0, QtCore.Qt.UserRole))
-
-    def _stateOfItem(self, item):
-        return variantToPyValue(item.data(0, QtCore.Qt.UserRole + 1))
-
-    def _setItemIconState(self, item, state):
-        self._initAllIcons()
-        category = self._categoryOfItem(item)
-        icons = self._allItemIconSet[category]
-        item.setData(0, QtCore.Qt.UserRole + 1, state)
-        item.setIcon(0, icons[state])
-
-    def _setTestIconStateToDecendents(self, item, state):
-        self._setItemIconState(item, state)
-        for i in range(item.childCount()):
-            self._setTestIconStateToDecendents(item.child(i), state)
-
-    def _setTestIconStateToAncestors(self, item, state):
-        self._setItemIconState(item, state)
-        if item is not self._rootTestItem:
-            self._setTestIconStateToAncestors(item.parent(), state)
+        visibleNodes = self._filter.visibleNodes(keywords)
+        hiddenNodes = set()
+        if visibleNodes is not None:
+            visibleNodes.add(root)
+            for node in visibleNodes:
+                for child in self._store.children(node):
+                    if child not in visibleNodes:
+                        hiddenNodes.add(child)
+
+        updatesEnabled = self.updatesEnabled()
+        self.setUpdatesEnabled(False)
+        try:
+            for node in self._hiddenNodes.difference(hiddenNodes):
+                if self._store.isInTree(node):
+                    self._setNodeHidden(node, False)
+            for node in hiddenNodes.difference(self._hiddenNodes):
+                self._setNodeHidden(node, True)
+        finally:
+            self.setUpdatesEnabled(updatesEnabled)
+        self._hiddenNodes = hiddenNodes
+
+        if visibleNodes and ensureFirstMatchVisible:
+            self.focusNode(self._firstVisibleTestNode(root, visibleNodes))
+
+    def _firstVisibleTestNode(self, node, visibleNodes):
+        while self._store.category(node) != constants.ITEM_CATEGORY_TEST:
+            for child in self._store.children(node):
+                if child in visibleNodes:
+                    node = child
+                    break
+            else:
+                return node
+        return node
+
+    def _setNodeHidden(self, node, hide):
+        parent = self._store.parent(node)
+        self.setRowHidden(self._store.row(node), self._indexOfNode(parent), hide)
 
     def resetAllItemsToNormal(self):
-        self._setTestIconStateToDecendents(
-            self._rootTestItem, constants.TEST_RESULT_NONE
-        )
-        self._resetExpandStates(self._rootTestItem)
-        for item in self._testCases:
-            self._resetItem(item, False)
-
-    def _resetItem(self, item, applyToAllChildren=False):
-        item.setText(1, "")
-        if variantToPyValue(item.data(1, QtCore.Qt.UserRole)):
-            item.setData(1, QtCore.Qt.UserRole, 0)
-
-        if applyToAllChildren:
-            for i in range(item.childCount()):
-                self._resetItem(item.child(i), applyToAllChildren)
-
-    def allItemsIdMap(self):
-        return self._allItemsIdMap
+        root = self._store.root()
+        if root == testnodes.NO_NODE:
+            return
 
-    def _findItemById(self, testId):
-        return self._allItemsIdMap.get(testId, None)
+        self._model.resetNodes(root)
+        self._resetExpandStates(root)
 
     def resetTestItemsById(self, testIds):
         for tid in testIds:
-            item = self._findItemById(tid)
-            if not item:
-                continue
-
-            self._resetItem(item, True)
-            self._setTestIconStateToAncestors(item, constants.TEST_RESULT_NONE)
-            self._setTestIconStateToDecendents(item, constants.TEST_RESULT_NONE)
+            node = self._store.node(tid)
+            if node != testnodes.NO_NODE:
+                self._model.resetNodes(node)
         self.repaint()
 
-    def focusItem(self, item):
-        if item:
-            self.clearSelection()
-            self.setCurrentItem(item)
-            self.scrollToItem(item)
-
-    def _calculateAncestorItemStates(self, item, updatedIds):
-        cId = self.testIdOfItem(item)
-        if cId in updatedIds:
-            return
-
-        updatedIds.add(cId)
-        stateToSet = constants.TEST_RESULT_NONE
-        for i in range(item.childCount()):
-            cState = variantToPyValue(item.child(i).data(0, QtCore.Qt.UserRole + 1))
-            stateToSet = max(stateToSet, cState)
-
-        self._setItemIconState(item, stateToSet)
-
-        if item is self._rootTestItem:
+    def focusNode(self, node):
+        if node == testnodes.NO_NODE:
             return
 
-        self._calculateAncestorItemStates(item.parent(), updatedIds)
+        index = self._indexOfNode(node)
+        self.clearSelection()
+        self.setCurrentIndex(index)
+        self.scrollTo(index)
 
-    def testIdOfItem(self, item):
-        return str(item.toolTip(0))
-
-    def _resetExpandStates(self, item):
-        item.setExpanded(True)
-        childCount = item.childCount()
-        if childCount == 1:
-            self._resetExpandStates(item.child(0))
+    def _resetExpandStates(self, node):
+        self.setExpanded(self._indexOfNode(node), True)
+        children = self._store.children(node)
+        if len(children) == 1:
+            self._resetExpandStates(children[0])
         else:
-            for i in range(childCount):
-                item.child(i).setExpanded(False)
+            for child in children:
+                self.setExpanded(self._indexOfNode(child), False)
+
+    def _selectedNodes(self):
+        return [
+            self._model.nodeFromIndex(index)
+            for index in self.selectionModel().selectedIndexes()
+            if index.column() == 0
+        ]
 
     def _firstSelectedModulePath(self):
-        for item in self.selectedItems():
-            return self.testIdOfItem(item)
+        for node in self._selectedNodes():
+            return self._store.testId(node)
         return None
 
     def copyFirstSelectedTestId(self):
@@ -422,80 +384,156 @@ class UnitTestTreeView(QtWidgets.QTreeWidget):
             event.accept()
             return
 
-        QtWidgets.QTreeWidget.keyPressEvent(self, event)
+        QtWidgets.QTreeView.keyPressEvent(self, event)
+
+    def _categoryOfTestPathPart(self, index, partCount):
+        levelsToLeaf = partCount - 1 - index
+        if levelsToLeaf == 0:
+            return constants.ITEM_CATEGORY_TEST
+        if levelsToLeaf == 1:
+            return constants.ITEM_CATEGORY_SUITE
+        if levelsToLeaf == 2:
+            return constants.ITEM_CATEGORY_MODULE
+        return constants.ITEM_CATEGORY_PACKAGE
+
+    def _setNodeCategory(self, node, category):
+        if self._store.category(node) == category:
+            return
+
+        self._store.setCategory(node, category)
+        self._model.nodeChanged(node)
+
+    def _makeRootNode(self, startDirOrModule):
+        self._model.addNode(
+            testnodes.NO_NODE,
+            startDirOrModule,
+            startDirOrModule,
+            constants.ITEM_CATEGORY_ALL,
+        )
+
+    def _canReloadIncrementally(self, startDirOrModule):
+        root = self._store.root()
+        return bool(
+            root != testnodes.NO_NODE and self._store.testId(root) == startDirOrModule
+        )
+
+    def beginReload(self, keepUiStates=True, incremental=True):
+        """Start to reload the tests, the test ids are then added by addTestIds().
+
+        Args:
+            keepUiStates (bool): Keep the expand states, selection and scroll values.
+            incremental (bool): Keep the items of the tests that still exist as they are,
+                only the added and removed tests change the tree.
+        """
+        startDirOrModule = self._testManager.startDirOrModule()
+        incremental = incremental and self._canReloadIncrementally(startDirOrModule)
+        self._reloadContext = _ReloadContext(startDirOrModule, incremental)
+
+        if incremental:
+            self._reloadContext.seenIds.add(startDirOrModule)
+            return
 
-    def reload(self, keepUiStates=True):
         if keepUiStates:
             self._viewStates.save()
 
-        self._testCases = []
-        self._rootTestItem = None
-        self._allItemsIdMap = {}
-        self.clear()
+        self._model.clear()
+        self._hiddenNodes = set()
+        self._lastStartedNode = testnodes.NO_NODE
 
-        startDirOrModule = self._testManager.startDirOrModule()
-        if not startDirOrModule:
+        if startDirOrModule:
+            self._makeRootNode(startDirOrModule)
+
+    def addTestIds(self, testIds):
+        ctx = self._reloadContext
+        root = self._store.root()
+        if not ctx or root == testnodes.NO_NODE:
             return
 
-        self._rootTestItem = QtWidgets.QTreeWidgetItem([startDirOrModule])
-        self._rootTestItem.setToolTip(0, startDirOrModule)
-        self._rootTestItem.setData(0, QtCore.Qt.UserRole, constants.ITEM_CATEGORY_ALL)
-        self._setItemIconState(self._rootTestItem, constants.TEST_RESULT_NONE)
-        self.addTopLevelItem(self._rootTestItem)
-
-        self._allItemsIdMap[startDirOrModule] = self._rootTestItem
-
-        isModule = not pathutils.isPath(startDirOrModule)
-        headingCount = 0
-        heading = ""
-        if isModule:
-            headingCount = len(startDirOrModule) + 1
-            heading = startDirOrModule + "."
-
-        testCount = 0
-        for test in self._testManager.iterAllTestIds():
-            testCount = testCount + 1
-            if isModule and test.startswith(startDirOrModule):
-                test = test[headingCount:]
+        store = self._store
+        for test in testIds:
+            ctx.testCount += 1
+            if ctx.isModule and test.startswith(ctx.startDirOrModule):
+                test = test[ctx.headingCount :]
             testPaths = test.split(".")
-            cParent = self._rootTestItem
+            partCount = len(testPaths)
+            cParent = root
+            parentPath = ctx.startDirOrModule
             for i, p in enumerate(testPaths):
-                path = heading + ".".join(testPaths[0 : (i + 1)])
-                if path in self._allItemsIdMap:
-                    cParent = self._allItemsIdMap[path]
-                    continue
-
-                item = QtWidgets.QTreeWidgetItem(cParent)
-                item.setText(0, p)
-                item.setToolTip(0, path)
-                item.setSizeHint(0, QtCore.QSize(20, 20))
-                self._allItemsIdMap[path] = item
-                cParent = item
-
-            testCase = cParent
-            testCase.setData(0, QtCore.Qt.UserRole, constants.ITEM_CATEGORY_TEST)
-            self._setItemIconState(testCase, constants.TEST_RESULT_NONE)
-            self._testCases.append(cParent)
-
-            caseItem = testCase.parent()
-            caseItem.setData(0, QtCore.Qt.UserRole, constants.ITEM_CATEGORY_SUITE)
-            self._setItemIconState(caseItem, constants.TEST_RESULT_NONE)
-
-            moduleItem = caseItem.parent()
-            moduleItem.setData(0, QtCore.Qt.UserRole, constants.ITEM_CATEGORY_MODULE)
-            self._setItemIconState(moduleItem, constants.TEST_RESULT_NONE)
-
-            packageItem = moduleItem.parent()
-            while packageItem is not self._rootTestItem and packageItem:
-                packageItem.setData(
-                    0, QtCore.Qt.UserRole, constants.ITEM_CATEGORY_PACKAGE
-                )
-                self._setItemIconState(packageItem, constants.TEST_RESULT_NONE)
-                packageItem = packageItem.parent()
+                path = ctx.heading + ".".join(testPaths[0 : (i + 1)])
+                category = self._categoryOfTestPathPart(i, partCount)
+                node = store.node(path)
+                if node == testnodes.NO_NODE:
+                    node = self._makeChildNode(cParent, parentPath, p, path, category)
+                    if category == constants.ITEM_CATEGORY_TEST:
+                        ctx.addedCount += 1
+                else:
+                    self._setNodeCategory(node, category)
+
+                ctx.seenIds.add(path)
+                ctx.lastSeenChildren[parentPath] = node
+                cParent = node
+                parentPath = path
+
+    def _makeChildNode(self, parentNode, parentPath, label, path, category):
+        # Keep the discovery order for the items added by an incremental reload:
+        lastSeenChild = self._reloadContext.lastSeenChildren.get(parentPath)
+        if self._reloadContext.incremental and lastSeenChild is not None:
+            row = self._store.row(lastSeenChild) + 1
+        elif self._reloadContext.incremental:
+            row = 0
+        else:
+            row = None
+        return self._model.addNode(parentNode, label, path, category, row=row)
+
+    def _removeStaleNodes(self, ctx):
+        store = self._store
+        staleNodes = [
+            store.node(testId)
+            for testId in set(store.allIds()).difference(ctx.seenIds)
+        ]
+        staleNodeSet = set(staleNodes)
+        for node in staleNodes:
+            parent = store.parent(node)
+            if parent == testnodes.NO_NODE or parent in staleNodeSet:
+                continue
+            self._model.removeNode(node)
+
+        return len(staleNodes)
+
+    def endReload(self, keepUiStates=True, complete=True):
+        """Finish the reload.
+
+        Args:
+            keepUiStates (bool): Restore the saved ui states for a non-incremental reload.
+            complete (bool): False if the reload was cancelled, in which case the items of
+                the tests that were not collected are not removed.
+        """
+        ctx = self._reloadContext
+        if not ctx:
+            return
+
+        self._reloadContext = None
+        root = self._store.root()
+        if root == testnodes.NO_NODE:
+            return
+
+        if ctx.incremental and complete:
+            removedCount = self._removeStaleNodes(ctx)
+            logger.debug(
+                "Incremental reload: %s tests added, %s items removed.",
+                ctx.addedCount,
+                removedCount,
+            )
 
         self._uiStream.write("\n{}\n".format("-" * 20))
-        if not self._testManager.hasLastListerError():
-            self._uiStream.write("{} tests collected.\n\n".format(testCount))
+        if not complete:
+            with self._uiStream.resultCtx(constants.TEST_RESULT_SKIP):
+                msg = "Test collecting stopped, {} tests collected.\n\n".format(
+                    ctx.testCount
+                )
+                self._uiStream.write(msg)
+        elif not self._testManager.hasLastListerError():
+            self._uiStream.write("{} tests collected.\n\n".format(ctx.testCount))
         else:
             with self._uiStream.resultCtx(constants.TEST_RESULT_ERROR):
                 msg = "Error collecting tests from {}.\n\n".format(
@@ -503,74 +541,161 @@ class UnitTestTreeView(QtWidgets.QTreeWidget):
                 )
                 self._uiStream.write(msg)
 
+        if ctx.incremental:
+            return
+
         if keepUiStates:
             self._viewStates.restore()
         else:
-            self._resetExpandStates(self._rootTestItem)
+            self._resetExpandStates(root)
+
+    def reload(self, keepUiStates=True, incremental=True):
+        """Reload all the tests into the tree.
+
+        Notes:
+            With incremental on, only the items of the added or removed tests are changed,
+            the untouched tests keep their result states and durations.
+        """
+        self.beginReload(keepUiStates=keepUiStates, incremental=incremental)
+        if self._store.root() != testnodes.NO_NODE:
+            self.addTestIds(self._testManager.iterAllTestIds())
+        self.endReload(keepUiStates=keepUiStates)
+
+    def reloadInBackground(self, keepUiStates=True, incremental=True):
+        """Reload the tests with the test ids collected in a worker thread.
+
+        Notes:
+            The tests are added to the tree in chunks as they are collected, the
+            testsCollected signal is emitted once it is done or cancelled.
+        """
+        self.cancelCollecting()
+        self.beginReload(keepUiStates=keepUiStates, incremental=incremental)
+        if self._store.root() == testnodes.NO_NODE:
+            self.endReload(keepUiStates=keepUiStates)
+            self.testsCollected.emit()
+            return
+
+        self._collectingKeepUiStates = keepUiStates
+        self._collector = testcollector.BackgroundTestCollector(
+            self._testManager.iterAllTestIds
+        )
+        self._collector.start()
+        self._populateTimer.start()
+
+    def isCollecting(self):
+        return self._collector is not None
+
+    def cancelCollecting(self):
+        if not self._collector:
+            return
+
+        self._collector.cancel()
+        self._finishCollecting(complete=False)
+
+    def _writeCollectorLogs(self):
+        for levelno, msg in self._collector.takeLogRecords():
+            uistream.writeLogMessageToUiStream(levelno, msg)
+
+    def _populateCollectedTests(self):
+        if not self._collector:
+            self._populateTimer.stop()
+            return
+
+        self._writeCollectorLogs()
+        testIds = self._collector.takeTestIds(self._populateChunkSize)
+        if testIds:
+            self.addTestIds(testIds)
+            self.collectingProgress.emit(self._reloadContext.testCount)
+
+        if self._collector.isDone():
+            self._writeCollectorLogs()
+            self._finishCollecting(complete=self._collector.error() is None)
+
+    def _finishCollecting(self, complete=True):
+        self._populateTimer.stop()
+        self._collector = None
+        self.endReload(keepUiStates=self._collectingKeepUiStates, complete=complete)
+        self.testsCollected.emit()
 
     def onSingleTestStart(self, testId, startTime):
         isParameterized, testId = self._testManager.parseParameterizedTestId(testId)
-        item = self._findItemById(testId)
-        if item:
-            self.focusItem(item)
-            self._setTestIconStateToAncestors(item, constants.TEST_RESULT_RUNNING)
-            if not isParameterized or not variantToPyValue(
-                item.data(1, QtCore.Qt.UserRole)
-            ):
-                item.setData(1, QtCore.Qt.UserRole, startTime)
-                item.setText(1, "running...")
+        node = self._store.node(testId)
+        if node == testnodes.NO_NODE:
+            return
+
+        self._lastStartedNode = node
+        self._model.setState(node, constants.TEST_RESULT_RUNNING)
+        if not isParameterized or self._store.startTime(node) is None:
+            self._store.setTimes(node, startTime=startTime)
+            self._model.nodeChanged(node, column=1)
+
+    def focusLastStartedTest(self):
+        """Scroll to the test started last since the previous call, if any."""
+        node = self._lastStartedNode
+        self._lastStartedNode = testnodes.NO_NODE
+        if node != testnodes.NO_NODE and self._store.isInTree(node):
+            self.focusNode(node)
 
     def onSingleTestStop(self, testId, endTime):
         _, testId = self._testManager.parseParameterizedTestId(testId)
-        item = self._findItemById(testId)
-        if item:
-            startTime = variantToPyValue(item.data(1, QtCore.Qt.UserRole))
-            item.setData(1, QtCore.Qt.UserRole + 1, endTime)
-            rep = "%.3f s" % (endTime - startTime)
-            item.setText(1, rep)
+        node = self._store.node(testId)
+        if node != testnodes.NO_NODE:
+            self._store.setStopTime(node, endTime)
+            self._model.nodeChanged(node, column=1)
+
+    def markSlowTest(self, testId, duration, baseline):
+        """Highlight the duration of the test that is slower than its history."""
+        _, testId = self._testManager.parseParameterizedTestId(testId)
+        node = self._store.node(testId)
+        if node != testnodes.NO_NODE:
+            toolTip = "Slow: {:.3f} s, the p95 of its recent runs is {:.3f} s."
+            self._store.setNote(
+                node, testnodes.NOTE_SLOW, toolTip.format(duration, baseline)
+            )
+            self._model.nodeChanged(node, column=1)
+
+    def markFlakyTest(self, testId, attempt, flipRate):
+        """Highlight the duration of the failed test that passed when rerun."""
+        _, testId = self._testManager.parseParameterizedTestId(testId)
+        node = self._store.node(testId)
+        if node != testnodes.NO_NODE:
+            toolTip = "Flaky: passed on rerun {}, its result flips {:.0%} of the time."
+            self._store.setNote(
+                node, testnodes.NOTE_FLAKY, toolTip.format(attempt, flipRate)
+            )
+            self._model.nodeChanged(node, column=1)
 
     def showResultOnItemByTestId(self, testId, state):
         _, testId = self._testManager.parseParameterizedTestId(testId)
-        item = self._findItemById(testId)
-        if item:
+        node = self._store.node(testId)
+        if node != testnodes.NO_NODE:
             # For parameterized test, some might succeed but others might failed, we make sure
             # we set failed for this situation.
-            if state == constants.TEST_RESULT_SKIP or state > variantToPyValue(
-                self._stateOfItem(item)
-            ):
-                self._setItemIconState(item, state)
+            if state == constants.TEST_RESULT_SKIP or state > self._store.state(node):
+                self._model.setState(node, state)
 
     def onAllTestsFinished(self):
-        lastRunIds = self._testManager.lastRunTestIds()
-        updatedIds = set()
-
-        lastFailedItem = None
-
-        for testId in lastRunIds:
-            item = self._findItemById(testId)
-            if not item:
-                continue
-
-            self._calculateAncestorItemStates(item.parent(), updatedIds)
-            if self._testManager.lastFailedTestId() == testId:
-                lastFailedItem = item
-
-        self.focusItem(lastFailedItem)
+        # The states of the ancestors follow their children as the tests finish.
+        lastFailedTestId = self._testManager.lastFailedTestId()
+        if lastFailedTestId:
+            _, testId = self._testManager.parseParameterizedTestId(lastFailedTestId)
+            self.focusNode(self._store.node(testId))
 
     def testCount(self):
-        return len(self._testCases)
+        return self._store.testCount()
 
     def hasTests(self):
-        return bool(self._testCases)
+        return bool(self._store.testCount())
+
+    def allTestIds(self):
+        return [self._store.testId(node) for node in self._store.iterTestNodes()]
 
     def selectedTestIds(self, decomposePackageIfNecessary=False):
-        itemsByModulePath = {
-            self.testIdOfItem(item): item for item in self.selectedItems()
-        }
+        modulePaths = set(self._store.testId(node) for node in self._selectedNodes())
 
         lastKey = None
         testsToRun = []
-        for key in sorted(itemsByModulePath.keys()):
+        for key in sorted(modulePaths):
             if lastKey and (key).startswith(lastKey):
                 continue
 
@@ -583,29 +708,25 @@ class UnitTestTreeView(QtWidgets.QTreeWidget):
 
         return tuple(testsToRun)
 
-    def _iterSelectedSuiteOrTestCaseItems(self):
-        for item in self.iterSelectedItemsOfCategories(*self.supportPartialCategories):
-            yield item
+    def _firstSelectedTestCaseNode(self):
+        """Return first selected test case node.
 
-    def _firstSelectedTestCaseItem(self):
-        """Return first selected test case id.
-        
         Notes:
-            If there is any selected test cases, return the first id. 
-            If there isn't but there is selected test suite, return its first test case id.
+            If there is any selected test cases, return the first one.
+            If there isn't but there is selected test suite, return its first test case.
         """
-        for item in self._iterSelectedSuiteOrTestCaseItems():
-            if self._categoryOfItem(item) == constants.ITEM_CATEGORY_TEST:
-                return item
+        for node in self.iterSelectedNodesOfCategories(*self.supportPartialCategories):
+            if self._store.category(node) == constants.ITEM_CATEGORY_TEST:
+                return node
 
-            for i in range(item.childCount()):
-                return item.child(i)
+            for child in self._store.children(node):
+                return child
 
-        return None
+        return testnodes.NO_NODE
 
     def firstSelectedTestCaseId(self):
-        item = self._firstSelectedTestCaseItem()
-        return None if not item else self.testIdOfItem(item)
+        node = self._firstSelectedTestCaseNode()
+        return None if node == testnodes.NO_NODE else self._store.testId(node)
 
     def hasSelectedTests(self, hasSelectedTestOrCase=False):
         if not hasSelectedTestOrCase:
@@ -614,15 +735,14 @@ class UnitTestTreeView(QtWidgets.QTreeWidget):
         return self.hasSelectionOfCategories(*self.supportPartialCategories)
 
     def hasSelectionOfCategories(self, *categories):
-        for item in self.selectedItems():
-            if self._categoryOfItem(item) in categories:
-                return True
+        for _ in self.iterSelectedNodesOfCategories(*categories):
+            return True
         return False
 
-    def iterSelectedItemsOfCategories(self, *categories):
-        for item in self.selectedItems():
-            if self._categoryOfItem(item) in categories:
-                yield item
+    def iterSelectedNodesOfCategories(self, *categories):
+        for node in self._selectedNodes():
+            if self._store.category(node) in categories:
+                yield node
 
     def _makeContextMenu(self):
         self._initAllIcons()
@@ -676,10 +796,10 @@ class UnitTestTreeView(QtWidgets.QTreeWidget):
         self._logLevelActionGrp.setExclusive(True)
 
     def _atReloadSelectedModules(self):
-        for moduleItem in self.iterSelectedItemsOfCategories(
+        for moduleNode in self.iterSelectedNodesOfCategories(
             constants.ITEM_CATEGORY_MODULE
         ):
-            dotPath = self.testIdOfItem(moduleItem)
+            dotPath = self._store.testId(moduleNode)
             importutils.reimportByModulePath(dotPath)
 
     def _atRunSetupOnly(self):